@@ -1,6 +1,7 @@
 #!/bin/bash
 # Muse Studio 服务重启脚本
 # 用法: bash scripts/restart.sh [backend|frontend]
+# 环境变量: GRACEFUL_TIMEOUT（等待 HTTP 请求结束的秒数，默认 30）、DRAIN_TIMEOUT（应与 .env 一致，默认 30）
 
 set -e
 
@@ -42,8 +43,24 @@ mkdir -p logs
 echo "🛑 停止服务..."
 
 if [ "$START_BACKEND" = true ]; then
+    # 先发 SIGTERM 让后端排空：拒绝新请求、等待在途调用，未完成的 Kling 任务保留到重启后恢复轮询
+    # 等待时间 = 排空（DRAIN_TIMEOUT）+ 取消后等待退出（5 秒）+ HTTP 请求优雅关闭
+    #          + 存储回写（storage.flush，最长 DRAIN_TIMEOUT）+ 余量，超时仍未退出再强制结束
+    DRAIN_WAIT=$(( ${DRAIN_TIMEOUT:-30} + 5 + ${GRACEFUL_TIMEOUT:-30} + ${DRAIN_TIMEOUT:-30} + 10 ))
     PID=$(lsof -ti:8000 2>/dev/null || true)
-    [ -n "$PID" ] && kill -9 $PID 2>/dev/null || true
+    if [ -n "$PID" ]; then
+        kill -TERM $PID 2>/dev/null || true
+        echo -e "${YELLOW}  … 等待后端排空（最长 ${DRAIN_WAIT} 秒）${NC}"
+        for _ in $(seq 1 "$DRAIN_WAIT"); do
+            [ -z "$(lsof -ti:8000 2>/dev/null || true)" ] && break
+            sleep 1
+        done
+        PID=$(lsof -ti:8000 2>/dev/null || true)
+        if [ -n "$PID" ]; then
+            echo -e "${YELLOW}  ! 后端未在 ${DRAIN_WAIT} 秒内退出，强制结束${NC}"
+            kill -9 $PID 2>/dev/null || true
+        fi
+    fi
     echo -e "${GREEN}  ✓ 后端端口 8000 已释放${NC}"
 fi
 
@@ -59,7 +76,8 @@ echo ""
 if [ "$START_BACKEND" = true ]; then
     echo "🚀 启动后端服务..."
     source .venv/bin/activate
-    nohup python -m uvicorn src.backend.main:app --host 0.0.0.0 --port 8000 --reload > logs/backend.log 2>&1 &
+    nohup python -m uvicorn src.backend.main:app --host 0.0.0.0 --port 8000 --reload \
+        --timeout-graceful-shutdown "${GRACEFUL_TIMEOUT:-30}" > logs/backend.log 2>&1 &
     sleep 2
     echo -e "${GREEN}  ✓ 后端: http://localhost:8000/docs${NC}"
     echo ""
@@ -1,9 +1,11 @@
 """
 API 路由模块
 
-提供 Provider 相关的 RESTful API 端点。
+提供 Provider 相关的 RESTful API 端点、资源下载与任务进度 WebSocket。
 """
 
+from .assets import assets_router
 from .router import router
+from .ws import ws_router
 
-__all__ = ["router"]
+__all__ = ["assets_router", "router", "ws_router"]
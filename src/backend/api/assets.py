@@ -0,0 +1,239 @@
+"""
+资源下载路由
+
+GET/HEAD /api/v1/assets/{key} 提供存储对象（生成的图片、视频与上传的参考图）的下载，
+使 Kling MP4 可以边下边播、随意拖动进度，画布重复加载时命中浏览器缓存:
+
+    - Range: 单区间请求返回 206 与 Content-Range，越界返回 416，If-Range 不匹配时返回完整内容
+      （多区间请求按完整内容返回）
+    - 条件请求: ETag / If-None-Match（弱比较）与 Last-Modified / If-Modified-Since，未变化时返回 304
+    - 缓存: 内容寻址的键（cas/..，内容永不改变）返回 immutable 长期缓存，其余键每次按 ETag 重新验证
+    - 磁盘文件（local 后端与 tiered 缓存）由 AssetFileResponse 发送：服务器支持 ASGI
+      http.response.zerocopysend / pathsend 扩展时交给服务器 sendfile，否则按块读取，
+      任何情况下都不会把整个文件读入内存；其他后端按块流式返回
+"""
+
+import os
+from email.utils import formatdate, parsedate_to_datetime
+
+import anyio
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.concurrency import iterate_in_threadpool, run_in_threadpool
+from fastapi.responses import RedirectResponse, Response, StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+from src.backend.storage import (
+    ObjectInfo,
+    ObjectNotFound,
+    ServedStorage,
+    is_content_addressed,
+    normalize_key,
+    storage,
+)
+
+assets_router = APIRouter(prefix="/api/v1", tags=["assets"])
+
+# 内容寻址资源：内容永不改变，浏览器与 CDN 可缓存一年且无需重新验证
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# 其他资源：可缓存，但每次使用前按 ETag 重新验证（命中时 304）
+REVALIDATE_CACHE_CONTROL = "public, no-cache"
+
+# 不支持 zero-copy 时按块读取文件的块大小（字节）
+SEND_CHUNK_SIZE = 1024 * 1024
+
+
+class RangeNotSatisfiable(ValueError):
+    """Range 超出对象大小"""
+
+
+def parse_range(header: str, size: int) -> tuple[int, int] | None:
+    """解析单区间 Range 头
+
+    Args:
+        header: Range 头（如 bytes=0-1023, bytes=1024-, bytes=-500）
+        size: 对象字节数
+
+    Returns:
+        闭区间 (start, end)；格式无效或为多区间时返回 None（按完整内容返回）
+
+    Raises:
+        RangeNotSatisfiable: 区间起点超出对象大小
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, sep, last = spec.strip().partition("-")
+    if not sep or not (first.isdigit() or last.isdigit()):
+        return None
+    if not first:
+        # 后缀区间：最后 N 个字节
+        suffix = int(last)
+        if suffix == 0:
+            raise RangeNotSatisfiable(header)
+        return max(0, size - suffix), size - 1
+    start = int(first)
+    if last and not last.isdigit():
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable(header)
+    end = int(last) if last else size - 1
+    if end < start:
+        return None
+    return start, min(end, size - 1)
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    """If-None-Match 弱比较（忽略 W/ 前缀）"""
+    if header.strip() == "*":
+        return True
+    candidates = (tag.strip().removeprefix("W/") for tag in header.split(","))
+    return etag.removeprefix("W/") in candidates
+
+
+def _not_modified(request: Request, etag: str, last_modified: float) -> bool:
+    """条件请求是否命中（If-None-Match 优先于 If-Modified-Since）"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(last_modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def _range_applies(request: Request, etag: str, last_modified: str) -> bool:
+    """If-Range 与当前版本一致（或未携带）时才按 Range 返回"""
+    if_range = request.headers.get("if-range")
+    return if_range is None or if_range in (etag, last_modified)
+
+
+class AssetFileResponse(Response):
+    """发送磁盘文件的 [start, start + count) 区间
+
+    服务器支持 http.response.zerocopysend 时交给服务器 sendfile，发送整个文件且支持
+    http.response.pathsend 时只传路径，否则按 SEND_CHUNK_SIZE 分块读取。HEAD 请求只发送响应头。
+    """
+
+    def __init__(self, path: str, start: int, count: int, status_code: int, headers: dict[str, str]):
+        super().__init__(status_code=status_code, headers=headers)
+        self.path = path
+        self.start = start
+        self.count = count
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope["method"].upper() == "HEAD" or self.count == 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        extensions = scope.get("extensions") or {}
+        if "http.response.zerocopysend" in extensions:
+            with open(self.path, "rb") as f:
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": f.fileno(),
+                    "offset": self.start,
+                    "count": self.count,
+                    "more_body": False,
+                })
+            return
+        if "http.response.pathsend" in extensions and self.start == 0 and self.count == os.path.getsize(self.path):
+            await send({"type": "http.response.pathsend", "path": self.path})
+            return
+
+        async with await anyio.open_file(self.path, mode="rb") as f:
+            await f.seek(self.start)
+            remaining = self.count
+            while remaining > 0:
+                chunk = await f.read(min(SEND_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                # 文件在发送期间被截断
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+def _validator_headers(key: str, info: ObjectInfo) -> dict[str, str]:
+    """ETag、Last-Modified 与 Cache-Control（200 / 206 / 304 共用）"""
+    return {
+        "ETag": f'"{info.etag}"',
+        "Last-Modified": formatdate(info.last_modified, usegmt=True),
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL if is_content_addressed(key) else REVALIDATE_CACHE_CONTROL,
+    }
+
+
+@assets_router.api_route("/assets/{key:path}", methods=["GET", "HEAD"])
+async def get_asset(
+    key: str, request: Request, expires: int | None = None, signature: str | None = None
+) -> Response:
+    """下载存储对象
+
+    local 后端与 tiered 缓存直接发送磁盘文件，memory 后端分块流式返回，oss 后端重定向到签名地址；
+    tiered 后端未命中时先从 OSS 回填本地缓存（超过缓存上限的对象直接流式转发 OSS）。
+
+    带 expires 与 signature 查询参数（presign 地址）时校验签名与有效期，不通过返回 403。
+
+    ### Range 与缓存
+
+    - `Range: bytes=start-end` 返回 206 与 `Content-Range`，越界返回 416
+    - `If-None-Match` / `If-Modified-Since` 命中时返回 304
+    - 内容寻址的键（`cas/...`）返回 `Cache-Control: public, max-age=31536000, immutable`
+    """
+    try:
+        key = normalize_key(key)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Asset not found")
+
+    if expires is not None or signature is not None:
+        if (
+            not isinstance(storage, ServedStorage)
+            or expires is None
+            or not signature
+            or not storage.verify(key, expires, signature)
+        ):
+            raise HTTPException(status_code=403, detail="Invalid or expired signature")
+
+    if not isinstance(storage, ServedStorage):
+        return RedirectResponse(storage.presign(key), status_code=307)
+
+    try:
+        path = await run_in_threadpool(storage.local_path, key)
+    except ObjectNotFound:
+        raise HTTPException(status_code=404, detail="Asset not found")
+    info = await run_in_threadpool(storage.head, key)
+    if info is None:
+        raise HTTPException(status_code=404, detail="Asset not found")
+
+    headers = _validator_headers(key, info)
+    if _not_modified(request, headers["ETag"], info.last_modified):
+        return Response(status_code=304, headers=headers)
+
+    headers["Accept-Ranges"] = "bytes"
+    headers["Content-Type"] = info.content_type
+    status_code, start, end = 200, 0, info.size - 1
+    range_header = request.headers.get("range")
+    if range_header and info.size > 0 and _range_applies(request, headers["ETag"], headers["Last-Modified"]):
+        try:
+            byte_range = parse_range(range_header, info.size)
+        except RangeNotSatisfiable:
+            return Response(status_code=416, headers={"Content-Range": f"bytes */{info.size}"})
+        if byte_range is not None:
+            status_code, (start, end) = 206, byte_range
+            headers["Content-Range"] = f"bytes {start}-{end}/{info.size}"
+    count = max(0, end - start + 1)
+    headers["Content-Length"] = str(count)
+
+    if path is not None:
+        return AssetFileResponse(path, start, count, status_code, headers)
+    if request.method == "HEAD" or count == 0:
+        return Response(status_code=status_code, headers=headers)
+    return StreamingResponse(
+        iterate_in_threadpool(storage.stream(key, start, end)),
+        status_code=status_code,
+        headers=headers,
+    )
@@ -5,25 +5,61 @@ Provider API 路由
 API 入参根据各 Provider 的 ParamSpec.exposed 动态决定。
 """
 
+import asyncio
+import json
+import math
 import os
 import time
 import uuid
-from typing import Any
-
-from fastapi import APIRouter, Body, File, UploadFile
-from pydantic import BaseModel, Field
-
+from typing import Annotated, Any, Callable, Iterator, Literal
+
+from fastapi import APIRouter, Body, File, HTTPException, Request, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, ConfigDict, Field
+
+from src.backend.config import config
+from src.backend.logger import get_logger
+from src.backend.providers.callbacks import kling_callbacks
+from src.backend.providers.context import (
+    CANCEL_CLIENT_DISCONNECTED,
+    CANCEL_SHUTDOWN,
+    DeadlineExceeded,
+    RequestCancelled,
+    RequestContext,
+    use_context,
+)
+from src.backend.providers.events import EVENT_DONE, EVENT_QUEUED, job_events
+from src.backend.services.admission import AdmissionController
+from src.backend.services.batch import ITEM_GENERATORS, BatchService
+from src.backend.services.drain import drain_controller
+from src.backend.services.hedging import LLMHedgingService
+from src.backend.services.idempotency import IdempotencyConflict, fingerprint, idempotency_store
+from src.backend.services.jobs import JOB_RUNNING, detached_jobs
+from src.backend.services.metrics import metrics
 from src.backend.services.provider_service import (
     ImageService,
     LLMService,
     VideoService,
 )
+from src.backend.services.routing import (
+    AUTO_VENDOR,
+    AutoRouter,
+    ImageRoutingService,
+    no_eligible_vendor_result,
+)
+from src.backend.services.scheduler import PRIORITY_INTERACTIVE
+from src.backend.storage import content_key, storage
+
+logger = get_logger(__name__)
 
 
 # =============================================================================
 # 请求/响应模型
 # =============================================================================
 
+Priority = Literal["interactive", "batch", "background"]
+
 
 class LLMGenerateRequest(BaseModel):
     """LLM 生成请求
@@ -36,7 +72,7 @@ class LLMGenerateRequest(BaseModel):
 
     vendor: str = Field(
         ...,
-        description="厂商名称 (zhipu, gemini, thirtytwo)",
+        description="厂商名称 (zhipu, gemini, thirtytwo)，auto 表示按实时延迟、错误率、排队与价格自动选择",
         examples=["zhipu"],
     )
     prompt: str = Field(
@@ -48,19 +84,43 @@ class LLMGenerateRequest(BaseModel):
         default_factory=dict,
         description="厂商特定参数，需根据 Provider 的 exposed_params 提供",
     )
+    queue_timeout: float | None = Field(
+        None,
+        ge=0,
+        description="超出客户端限流时的最长排队时间（秒），不传使用服务端默认值，0 表示立即返回 429",
+    )
+    hedge: bool | None = Field(
+        None,
+        description="是否启用对冲请求（主厂商超过延迟分位数未返回时向备用厂商发起同一请求），不传使用服务端默认值",
+    )
+    hedge_vendor: str | None = Field(
+        None,
+        description="对冲使用的备用厂商，不传使用服务端 LLM_HEDGE_VENDORS 配置",
+        examples=["zhipu"],
+    )
+    deadline: float | None = Field(
+        None,
+        gt=0,
+        description="本次请求的总时间预算（秒），排队、重试、轮询与下载共用，也可用 X-Request-Timeout 头传入；"
+        "不传使用服务端 REQUEST_DEFAULT_DEADLINE",
+    )
+    priority: Priority = Field(
+        "interactive",
+        description="调度优先级：interactive（画布交互）、batch、background；同一厂商容量按优先级与用户公平分配",
+    )
 
 
 class ImageGenerateRequest(BaseModel):
     """Image 生成请求
 
     参数根据各 Provider 的 ParamSpec.exposed 动态决定：
-    - thirtytwo_nano_banana: images, resolution, aspect_ratio
-    - thirtytwo_seedream: image, aspect_ratio
+    - thirtytwo_nano_banana: images, resolution, aspect_ratio, num_images
+    - thirtytwo_seedream: image, aspect_ratio, num_images
     """
 
     vendor: str = Field(
         ...,
-        description="厂商名称 (thirtytwo_nano_banana, thirtytwo_seedream)",
+        description="厂商名称 (thirtytwo_nano_banana, thirtytwo_seedream)，auto 表示自动选择",
         examples=["thirtytwo_nano_banana"],
     )
     prompt: str = Field(
@@ -72,6 +132,36 @@ class ImageGenerateRequest(BaseModel):
         default_factory=dict,
         description="厂商特定参数，需根据 Provider 的 exposed_params 提供",
     )
+    queue_timeout: float | None = Field(
+        None,
+        ge=0,
+        description="超出客户端限流时的最长排队时间（秒），不传使用服务端默认值，0 表示立即返回 429",
+    )
+    fallback_vendors: list[str] | None = Field(
+        None,
+        description="主厂商失败时依次尝试的回退厂商，不传使用服务端 IMAGE_FALLBACK_CHAINS，[] 表示不回退",
+        examples=[["thirtytwo_seedream"]],
+    )
+    detach_on_disconnect: bool = Field(
+        False,
+        description="客户端断开时转为后台任务继续运行，稍后以 X-Request-ID 通过 GET /api/v1/jobs/{job_id} 取回结果；"
+        "默认断开即取消",
+    )
+    deadline: float | None = Field(
+        None,
+        gt=0,
+        description="本次请求的总时间预算（秒），排队、重试、轮询与下载共用，也可用 X-Request-Timeout 头传入；"
+        "不传使用服务端 REQUEST_DEFAULT_DEADLINE",
+    )
+    priority: Priority = Field(
+        "interactive",
+        description="调度优先级：interactive（画布交互）、batch、background；同一厂商容量按优先级与用户公平分配",
+    )
+    return_format: Literal["base64", "url"] = Field(
+        "base64",
+        description="结果格式：base64（原图内容）或 url（原图存储地址）；url 等待派生版本编码并返回 renditions，"
+        "base64 不等待编码，renditions 只在该图片已编码过时返回，否则为 null",
+    )
 
 
 class VideoGenerateRequest(BaseModel):
@@ -83,7 +173,7 @@ class VideoGenerateRequest(BaseModel):
 
     vendor: str = Field(
         ...,
-        description="厂商名称 (thirtytwo_kling)",
+        description="厂商名称 (thirtytwo_kling)，auto 表示自动选择",
         examples=["thirtytwo_kling"],
     )
     prompt: str = Field(
@@ -95,17 +185,109 @@ class VideoGenerateRequest(BaseModel):
         default_factory=dict,
         description="厂商特定参数，需根据 Provider 的 exposed_params 提供",
     )
+    queue_timeout: float | None = Field(
+        None,
+        ge=0,
+        description="超出客户端限流时的最长排队时间（秒），不传使用服务端默认值，0 表示立即返回 429",
+    )
+    detach_on_disconnect: bool = Field(
+        False,
+        description="客户端断开时转为后台任务继续运行，稍后以 X-Request-ID 通过 GET /api/v1/jobs/{job_id} 取回结果；"
+        "默认断开即取消",
+    )
+    deadline: float | None = Field(
+        None,
+        gt=0,
+        description="本次请求的总时间预算（秒），排队、重试、轮询与下载共用，也可用 X-Request-Timeout 头传入；"
+        "不传使用服务端 REQUEST_DEFAULT_DEADLINE",
+    )
+    priority: Priority = Field(
+        "interactive",
+        description="调度优先级：interactive（画布交互）、batch、background；同一厂商容量按优先级与用户公平分配",
+    )
+    return_format: Literal["base64", "url"] = Field(
+        "base64",
+        description="结果格式：base64（视频内容）或 url（faststart 重排后的存储地址，支持 Range 边下边播）",
+    )
+
+
+class BatchItem(BaseModel):
+    """批量生成中的单项"""
+
+    prompt: str = Field(..., description="提示词")
+    vendor: str | None = Field(None, description="厂商名称，不传使用批量请求的 vendor")
+    parameters: dict[str, Any] = Field(
+        default_factory=dict,
+        description="厂商特定参数，与批量请求的 parameters 合并（单项优先）",
+    )
+
+
+class BatchGenerateRequest(BaseModel):
+    """批量生成请求
+
+    每项的参数 = 批量请求的 parameters + 单项 parameters（单项优先）。
+    """
+
+    vendor: str = Field(
+        ...,
+        description="默认厂商名称（可为 auto），单项可覆盖",
+        examples=["thirtytwo_seedream"],
+    )
+    parameters: dict[str, Any] = Field(
+        default_factory=dict,
+        description="所有项共享的厂商特定参数",
+    )
+    items: list[BatchItem] = Field(..., min_length=1, description="批量项列表")
+    concurrency: int | None = Field(
+        None,
+        ge=1,
+        description="最大并发数，不传使用服务端默认值",
+    )
+    queue_timeout: float | None = Field(
+        None,
+        ge=0,
+        description="每项超出客户端限流时的最长排队时间（秒），不传使用 BATCH_QUEUE_TIMEOUT",
+    )
+    fallback_vendors: list[str] | None = Field(
+        None,
+        description="Image 回退厂商列表（仅图片批量生效）",
+    )
+    deadline: float | None = Field(
+        None,
+        gt=0,
+        description="整个批量请求的时间预算（秒），也可用 X-Request-Timeout 头传入，超出后未完成的项失败",
+    )
+    priority: Priority = Field(
+        "batch",
+        description="调度优先级，默认 batch：批量只使用交互请求预留之外的空闲容量",
+    )
 
 
 class GenerateResponse(BaseModel):
     """统一生成响应"""
 
     success: bool = Field(..., description="是否成功")
-    content: Any | None = Field(None, description="生成内容")
+    content: Any | None = Field(None, description="生成内容（图片 num_images > 1 时为列表）")
     format: str | None = Field(None, description="内容格式")
+    poster: str | None = Field(None, description="视频封面 JPEG 地址（需安装 ffmpeg）")
+    renditions: dict[str, Any] | list[dict[str, Any] | None] | None = Field(
+        None,
+        description="图片 thumb / preview / full 派生版本（WebP / AVIF 地址与尺寸，需安装 Pillow），"
+        "num_images > 1 时为与 content 对应的列表；return_format=base64 时派生版本在后台编码，"
+        "尚未编码完成的为 null",
+    )
     error: str | None = Field(None, description="错误信息")
+    error_type: str | None = Field(
+        None,
+        description="错误类型（rate_limited, circuit_open, overloaded, shutting_down, cancelled, deadline_exceeded）",
+    )
+    retry_after: float | None = Field(None, description="建议重试等待秒数")
     vendor: str = Field(..., description="使用的厂商")
     model: str | None = Field(None, description="使用的模型")
+    requested_vendor: str | None = Field(None, description="请求的厂商（auto 或发生回退时与 vendor 不同）")
+    attempts: list[dict[str, Any]] | None = Field(None, description="回退链中每次尝试的厂商、错误与耗时")
+    hedged: bool | None = Field(None, description="是否发起了对冲请求")
+    hedge_vendor: str | None = Field(None, description="对冲使用的备用厂商")
 
 
 class ProviderInfo(BaseModel):
@@ -114,9 +296,22 @@ class ProviderInfo(BaseModel):
     vendor: str = Field(..., description="厂商名称")
     model: str = Field(..., description="模型名称")
     available: bool = Field(..., description="是否可用")
+    health: dict[str, Any] | None = Field(
+        None,
+        description="熔断状态与健康评分（state, score, success_rate, latency_p50, latency_p95）",
+    )
     info: dict[str, Any] = Field(..., description="Provider 详细信息")
 
 
+class JobResponse(BaseModel):
+    """后台任务状态响应"""
+
+    job_id: str = Field(..., description="任务 ID（请求的 X-Request-ID）")
+    provider_type: str = Field(..., description="Provider 类型 (llm, image, video)")
+    status: str = Field(..., description="任务状态 (running, done)")
+    result: GenerateResponse | None = Field(None, description="生成结果（完成后）")
+
+
 class ProvidersListResponse(BaseModel):
     """Provider 列表响应"""
 
@@ -125,6 +320,443 @@ class ProvidersListResponse(BaseModel):
     video: list[ProviderInfo] = Field(default_factory=list, description="Video Provider 列表")
 
 
+class CollageItemModel(BaseModel):
+    """拼图单品（画布坐标，与前端 ImageItem 一致）"""
+
+    url: str = Field(..., description="图片地址（/api/v1/assets、data: 或 SOURCE_ALLOWED_HOSTS 中主机的 http(s) 地址）")
+    x: float = Field(..., description="未旋转时左上角横坐标")
+    y: float = Field(..., description="未旋转时左上角纵坐标")
+    width: float = Field(..., gt=0, description="显示宽度")
+    height: float = Field(..., gt=0, description="显示高度")
+    rotation: float = Field(0.0, description="绕中心顺时针旋转角度（度）")
+
+
+class CollageRequest(BaseModel):
+    """搭配拼图请求"""
+
+    items: list[CollageItemModel] = Field(..., min_length=1, description="单品列表，按绘制顺序（后者在上）")
+    size: int | None = Field(None, ge=1, description="拼图长边像素，不传使用 COLLAGE_MAX_EDGE（也是上限）")
+    background: str | None = Field("#ffffff", description="背景色，null 表示透明（仅 png / webp）")
+    format: Literal["jpg", "png", "webp"] = Field("jpg", description="输出格式")
+
+
+class CanvasImageItemModel(BaseModel):
+    """画布图片元素（与前端 ImageItem 一致，其余字段忽略）"""
+
+    type: Literal["image"]
+    url: str = Field(..., description="图片地址（/api/v1/assets、data: 或 SOURCE_ALLOWED_HOSTS 中主机的 http(s) 地址）")
+    x: float = Field(..., description="未旋转时左上角横坐标")
+    y: float = Field(..., description="未旋转时左上角纵坐标")
+    width: float = Field(..., gt=0, description="显示宽度")
+    height: float = Field(..., gt=0, description="显示高度")
+    rotation: float = Field(0.0, description="绕中心顺时针旋转角度（度）")
+
+
+class CanvasTextItemModel(BaseModel):
+    """画布文字元素（与前端 TextNoteItem 一致，字段名沿用前端 camelCase）"""
+
+    model_config = ConfigDict(populate_by_name=True)
+
+    type: Literal["text"]
+    content: str = Field(..., description="文字内容")
+    x: float = Field(..., description="未旋转时左上角横坐标")
+    y: float = Field(..., description="未旋转时左上角纵坐标")
+    width: float = Field(..., gt=0, description="文本框宽度（按此宽度换行）")
+    height: float = Field(..., gt=0, description="文本框高度")
+    rotation: float = Field(0.0, description="绕中心顺时针旋转角度（度）")
+    font_size: float = Field(16.0, gt=0, alias="fontSize", description="字号")
+    color: str = Field("#1f2329", description="文字颜色")
+
+
+CanvasItemModel = Annotated[CanvasImageItemModel | CanvasTextItemModel, Field(discriminator="type")]
+
+
+class CanvasViewportModel(BaseModel):
+    """视口（与前端 Viewport 一致：屏幕坐标 = 画布坐标 × zoom − x / y）"""
+
+    x: float = Field(0.0, description="视口左上角（画布坐标 × zoom）")
+    y: float = Field(0.0, description="视口左上角（画布坐标 × zoom）")
+    zoom: float = Field(1.0, gt=0, description="缩放倍数")
+
+
+class CanvasRenderRequest(BaseModel):
+    """画布视口渲染请求"""
+
+    items: list[CanvasItemModel] = Field(default_factory=list, description="画布元素，按绘制顺序（后者在上）")
+    viewport: CanvasViewportModel = Field(default_factory=CanvasViewportModel, description="视口")
+    width: int = Field(..., gt=0, description="视口宽度（屏幕像素）")
+    height: int = Field(..., gt=0, description="视口高度（屏幕像素）")
+    background: str | None = Field(None, description="背景色，不传为透明")
+    format: Literal["png", "webp"] = Field("webp", description="分块格式")
+
+
+class CanvasExportRequest(BaseModel):
+    """画布整体导出请求"""
+
+    items: list[CanvasItemModel] = Field(..., min_length=1, description="画布元素，按绘制顺序（后者在上）")
+    scale: float = Field(1.0, gt=0, description="缩放倍数（输出像素 / 画布坐标），不超过 CANVAS_MAX_SCALE")
+    padding: float = Field(0.0, ge=0, description="四周留白（画布坐标）")
+    background: str | None = Field("#ffffff", description="背景色，null 表示透明（jpg 输出时为白色）")
+    format: Literal["png", "webp", "jpg"] = Field("png", description="输出格式（mode=tiles 时分块固定为 png）")
+    mode: Literal["image", "tiles"] = Field(
+        "image",
+        description="image：返回拼接后的整张图片；tiles：以 NDJSON 流式返回各分块地址",
+    )
+
+
+# =============================================================================
+# 响应处理
+# =============================================================================
+
+# 错误类型到 HTTP 状态码的映射，未列出的错误沿用 200 + success=false
+ERROR_STATUS_CODES: dict[str, int] = {
+    "rate_limited": 429,
+    "circuit_open": 503,
+    # 客户端已断开（沿用 nginx 的 499 约定，仅出现在日志中）
+    "cancelled": 499,
+    "deadline_exceeded": 504,
+    # 准入控制：预计排队时间超出预算
+    "overloaded": 503,
+    # 停机排空中
+    "shutting_down": 503,
+    # 服务层抛出未处理的异常
+    "internal_error": 500,
+}
+
+
+def _build_response(result: dict[str, Any]) -> dict[str, Any] | JSONResponse:
+    """根据服务层结果构建响应
+
+    对于需要特殊状态码的错误（如限流），返回带 Retry-After 头的 JSONResponse；
+    已转为后台任务的异步请求返回 202 与 Location 头。
+
+    Args:
+        result: 服务层返回的结果字典
+
+    Returns:
+        结果字典或 JSONResponse
+    """
+    if result.get("status") == JOB_RUNNING and "job_id" in result:
+        # Prefer: respond-async：已转为后台任务，进度经 /ws 推送，结果经 Location 取回
+        location = f"{router.prefix}/jobs/{result['job_id']}"
+        return JSONResponse(status_code=202, content=result, headers={"Location": location})
+
+    status_code = ERROR_STATUS_CODES.get(result.get("error_type") or "")
+    if status_code is None:
+        return result
+
+    content = {k: v for k, v in result.items() if k in GenerateResponse.model_fields}
+    headers = {}
+    if result.get("retry_after") is not None:
+        headers["Retry-After"] = str(max(1, math.ceil(result["retry_after"])))
+    return JSONResponse(status_code=status_code, content=content, headers=headers)
+
+
+def _resolve_deadline(deadline: float | None, http_request: Request) -> float | None:
+    """解析请求的时间预算
+
+    优先级: 请求字段 deadline > X-Request-Timeout 头 > REQUEST_DEFAULT_DEADLINE（0 表示不限）。
+
+    Args:
+        deadline: 请求字段中的预算（秒）
+        http_request: 原始 HTTP 请求
+
+    Returns:
+        预算（秒），不限时返回 None
+
+    Raises:
+        HTTPException: X-Request-Timeout 头不是正数
+    """
+    if deadline is not None:
+        return deadline
+    header = http_request.headers.get("x-request-timeout")
+    if header is not None:
+        try:
+            value = float(header)
+        except ValueError:
+            value = 0.0
+        if not value > 0:
+            raise HTTPException(status_code=400, detail=f"Invalid X-Request-Timeout: {header}")
+        return value
+    return config.REQUEST_DEFAULT_DEADLINE or None
+
+
+def _resolve_tenant(http_request: Request) -> str | None:
+    """解析公平调度的租户 key
+
+    由 X-User-ID 与 X-Design-Scheme-ID 头组成，同一用户的不同设计方案各自排队。
+
+    Args:
+        http_request: 原始 HTTP 请求
+
+    Returns:
+        租户 key，两个头都未传时返回 None（匿名请求共用一个队列）
+    """
+    user_id = http_request.headers.get("x-user-id")
+    scheme_id = http_request.headers.get("x-design-scheme-id")
+    if user_id is None and scheme_id is None:
+        return None
+    return f"{user_id or ''}/{scheme_id or ''}"
+
+
+def _done_event(job_id: str, result: dict[str, Any], detached: bool) -> dict[str, Any]:
+    """构建 done 事件的数据
+
+    结果内容是 URL 时直接给出 asset_urls；后台任务给出 result_url，订阅者据此取回完整结果。
+
+    Args:
+        job_id: 任务 ID
+        result: 服务层结果
+        detached: 是否为后台任务
+
+    Returns:
+        事件数据
+    """
+    content = result.get("content")
+    items = content if isinstance(content, list) else [content]
+    event = {
+        "success": result.get("success", False),
+        "vendor": result.get("vendor"),
+        "error": result.get("error"),
+        "error_type": result.get("error_type"),
+        "asset_urls": [
+            item for item in items if isinstance(item, str) and item.startswith(("http://", "https://", "/"))
+        ],
+    }
+    if result.get("poster"):
+        event["poster"] = result["poster"]
+    if result.get("renditions"):
+        event["renditions"] = result["renditions"]
+    if detached:
+        event["result_url"] = f"{router.prefix}/jobs/{job_id}"
+    return event
+
+
+def _prefers_async(http_request: Request) -> bool:
+    """请求是否声明 Prefer: respond-async（RFC 7240）"""
+    return "respond-async" in http_request.headers.get("prefer", "").lower()
+
+
+async def _run_cancellable(
+    http_request: Request,
+    provider_type: str,
+    func: Callable[..., dict[str, Any]],
+    detach_on_disconnect: bool = False,
+    deadline: float | None = None,
+    priority: str = PRIORITY_INTERACTIVE,
+    on_complete: Callable[[dict[str, Any]], None] | None = None,
+    respond_async: bool = False,
+    **kwargs,
+) -> dict[str, Any]:
+    """经准入控制后在线程池中执行服务调用，客户端断开时取消或转为后台任务
+
+    预计排队时间超出时间预算（未设置时为 ADMISSION_MAX_WAIT 阈值）的请求不会执行，
+    直接返回 error_type 为 overloaded 的结果（503 + Retry-After）；停机排空期间返回
+    error_type 为 shutting_down 的结果。
+
+    执行期间每隔 DISCONNECT_POLL_INTERVAL 秒检测一次客户端是否断开:
+    - 默认取消请求，服务层立即放弃等待并归还限流槽位，Provider 停止重试、轮询与下载
+    - detach_on_disconnect 时转为后台任务继续运行，结果以请求 ID 保存
+
+    deadline 经 RequestContext 传入服务层与 Provider，排队、每次重试、轮询与下载只使用剩余预算；
+    priority 与租户（X-User-ID / X-Design-Scheme-ID）决定厂商调用前的调度顺序。
+
+    respond_async 时不等待结果，立即转为后台任务并返回任务 ID。进度以请求 ID 为任务 ID
+    发布到 job_events（queued、done 等），经 /ws 推送给订阅者。
+
+    Args:
+        http_request: 原始 HTTP 请求
+        provider_type: Provider 类型 (llm, image, video)
+        func: 服务层函数
+        detach_on_disconnect: 断开时是否转为后台任务
+        deadline: 时间预算（秒），None 表示不限
+        priority: 调度优先级类别
+        on_complete: 拿到最终结果时的回调（转为后台任务时在后台任务完成后调用）
+        respond_async: 是否立即返回任务 ID（Prefer: respond-async）
+        **kwargs: 传给 func 的参数
+
+    Returns:
+        服务层结果；被准入控制拒绝时返回 error_type 为 overloaded / shutting_down 的结果，
+        客户端断开时返回 error_type 为 cancelled 的结果，respond_async 时返回
+        {"success": True, "job_id": ..., "status": "running"}
+    """
+    request_id = http_request.headers.get("x-request-id") or uuid.uuid4().hex
+    detached = False
+
+    def finish(result: dict[str, Any]) -> dict[str, Any]:
+        """记录最终结果（后台任务先保存结果），再发布 done 事件"""
+        if on_complete is not None:
+            on_complete(result)
+        if detached:
+            detached_jobs.finish(request_id, result)
+        job_events.publish(request_id, EVENT_DONE, **_done_event(request_id, result, detached))
+        return result
+
+    if drain_controller.draining:
+        return finish(drain_controller.rejection(kwargs.get("vendor")))
+
+    rejected = AdmissionController.check(provider_type, kwargs.get("vendor"), deadline, priority)
+    if rejected is not None:
+        logger.warning(f"Shedding {provider_type} request: {rejected['error']}")
+        return finish(rejected)
+
+    ctx = RequestContext(
+        request_id=request_id,
+        deadline=time.monotonic() + deadline if deadline is not None else None,
+        priority=priority,
+        tenant=_resolve_tenant(http_request),
+    )
+    cancelled_result = {
+        "success": False,
+        "error": str(RequestCancelled(ctx.request_id)),
+        "error_type": RequestCancelled.error_type,
+        "vendor": kwargs.get("vendor"),
+    }
+    job_events.publish(
+        request_id, EVENT_QUEUED, provider_type=provider_type, vendor=kwargs.get("vendor"), priority=priority
+    )
+
+    def call() -> dict[str, Any]:
+        with use_context(ctx):
+            try:
+                return func(**kwargs)
+            except Exception as e:
+                # 异常也要转为最终结果：否则 on_complete 与后台任务收不到结果，幂等键的等待者永远等待
+                logger.exception(f"Unhandled error in {provider_type} request {request_id}")
+                return {
+                    "success": False,
+                    "error": f"Internal error: {e}",
+                    "error_type": "internal_error",
+                    "vendor": kwargs.get("vendor"),
+                }
+
+    def outcome(t: asyncio.Future) -> dict[str, Any]:
+        """线程池任务的结果，任务被取消时视为取消"""
+        return cancelled_result if t.cancelled() else t.result()
+
+    def detach() -> None:
+        """转为后台任务，结果以请求 ID 保存"""
+        nonlocal detached
+        ctx.detach()
+        detached = True
+        detached_jobs.start(request_id, provider_type)
+        task.add_done_callback(lambda t: finish(outcome(t)))
+
+    def abandon(reason: str = CANCEL_CLIENT_DISCONNECTED) -> None:
+        """客户端已断开，或停机时服务端取消了请求协程
+
+        Args:
+            reason: 取消原因；CANCEL_SHUTDOWN 时不转为后台任务（进程即将退出），
+                以停机原因取消，未完成的厂商任务保留到重启后恢复
+        """
+        if detach_on_disconnect and reason != CANCEL_SHUTDOWN:
+            detach()
+            logger.info(f"Client disconnected, {provider_type} request {request_id} detached")
+        else:
+            ctx.cancel(reason)
+            finish(cancelled_result | {"error": str(RequestCancelled(ctx.request_id, reason))})
+            metrics.inc("requests_cancelled", provider_type=provider_type)
+            logger.info(f"{provider_type} request {request_id} cancelled: {reason}")
+
+    task = asyncio.ensure_future(run_in_threadpool(call))
+    if respond_async:
+        detach()
+        return {"success": True, "job_id": request_id, "status": JOB_RUNNING, "vendor": kwargs.get("vendor")}
+
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=config.DISCONNECT_POLL_INTERVAL)
+            if done:
+                result = task.result()
+                if result.get("error_type") == DeadlineExceeded.error_type:
+                    metrics.inc("requests_deadline_exceeded", provider_type=provider_type)
+                return finish(result)
+            if await http_request.is_disconnected():
+                break
+    except asyncio.CancelledError:
+        # 停机时 uvicorn 在优雅关闭超时后取消仍在进行的请求协程
+        abandon(CANCEL_SHUTDOWN if drain_controller.draining else CANCEL_CLIENT_DISCONNECTED)
+        raise
+
+    abandon()
+    return cancelled_result
+
+
+async def _run_idempotent(
+    http_request: Request,
+    provider_type: str,
+    request: BaseModel,
+    func: Callable[..., dict[str, Any]],
+    detach_on_disconnect: bool = False,
+    **kwargs,
+) -> dict[str, Any]:
+    """按 Idempotency-Key 头去重后执行 _run_cancellable
+
+    未传该头时直接执行。传入时:
+    - 首次请求执行并保存结果；客户端中途断开时转为后台任务继续运行，以便重试拿到结果
+    - 执行中的重复请求等待同一次执行（最长 IDEMPOTENCY_WAIT_TIMEOUT 秒，不超过请求的时间预算），
+      已完成的重复请求直接返回保存的结果
+
+    Args:
+        http_request: 原始 HTTP 请求
+        provider_type: Provider 类型 (llm, image, video)
+        request: 请求体，用于计算请求指纹
+        func: 服务层函数
+        detach_on_disconnect: 断开时是否转为后台任务（有幂等键时总是转为后台任务）
+        **kwargs: 传给 _run_cancellable 的其他参数
+
+    Returns:
+        服务层结果
+
+    Raises:
+        HTTPException: 幂等键过长（400）、同一键对应的请求体不一致（422）或
+            重复请求等待首次执行超过 IDEMPOTENCY_WAIT_TIMEOUT（409）
+    """
+    key = http_request.headers.get("idempotency-key")
+    if key is None:
+        return await _run_cancellable(
+            http_request,
+            provider_type,
+            func,
+            detach_on_disconnect=detach_on_disconnect,
+            respond_async=_prefers_async(http_request),
+            **kwargs,
+        )
+    if not key or len(key) > 255:
+        raise HTTPException(status_code=400, detail="Idempotency-Key must be 1-255 characters")
+
+    scoped_key = f"{_resolve_tenant(http_request) or ''}:{provider_type}:{key}"
+    try:
+        future, is_owner = idempotency_store.begin(
+            scoped_key, fingerprint({"provider_type": provider_type} | request.model_dump())
+        )
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=422, detail=str(e)) from e
+
+    if not is_owner:
+        # shield: 重复请求被取消或等待超时时不影响共享的 future
+        timeout = config.IDEMPOTENCY_WAIT_TIMEOUT
+        if kwargs.get("deadline") is not None:
+            timeout = min(timeout, kwargs["deadline"])
+        try:
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout)
+        except asyncio.TimeoutError:
+            raise HTTPException(
+                status_code=409,
+                detail="A request with this Idempotency-Key is still in progress, retry later",
+            ) from None
+
+    return await _run_cancellable(
+        http_request,
+        provider_type,
+        func,
+        detach_on_disconnect=True,
+        on_complete=lambda result: idempotency_store.complete(scoped_key, result),
+        respond_async=_prefers_async(http_request),
+        **kwargs,
+    )
+
+
 # =============================================================================
 # 路由定义
 # =============================================================================
@@ -140,7 +772,7 @@ router = APIRouter(
 # -----------------------------------------------------------------------------
 
 @router.post("/llm/generate", response_model=GenerateResponse)
-async def generate_llm(request: LLMGenerateRequest) -> dict[str, Any]:
+async def generate_llm(request: LLMGenerateRequest, http_request: Request) -> dict[str, Any] | JSONResponse:
     """LLM 文本生成
 
     调用指定厂商的 LLM 模型生成文本内容。
@@ -150,6 +782,42 @@ async def generate_llm(request: LLMGenerateRequest) -> dict[str, Any]:
     通过 `GET /api/v1/llm/providers` 查看每个厂商的 `info.exposed_params`，
     仅可传入暴露的参数，未暴露的参数将被忽略。
 
+    ### 限流
+
+    超出客户端限流时返回 429 与 `Retry-After` 头；传入 `queue_timeout` 可在该时间内排队等待。
+
+    ### 自动路由
+
+    `vendor` 传 `auto` 时，在支持所传参数的可用厂商中按实时 p50/p95 延迟、错误率、
+    排队深度与单次价格选择，响应中的 `vendor` 为实际使用的厂商，`requested_vendor` 为 `auto`。
+
+    ### 对冲请求
+
+    `hedge: true` 时，主厂商超过其历史延迟分位数（默认 p95）仍未返回，会把同一提示词发给
+    备用厂商（`hedge_vendor` 或服务端配置），取先成功的结果。额外调用受预算限制（默认 5%）。
+
+    ### 客户端断开
+
+    生成期间客户端断开时请求被取消，立即归还限流与并发槽位，Provider 不再重试。
+
+    ### 异步响应与进度
+
+    带 `Prefer: respond-async` 头时立即返回 202（`job_id` 与 `Location`），请求转为后台任务；
+    以 `X-Request-ID` 为任务 ID 订阅 `/ws` 可收到 queued / started / retry / done 等进度事件。
+
+    ### 幂等键
+
+    `Idempotency-Key` 头使重试不会重复生成：执行中的重复请求等待同一次执行，已完成的直接返回
+    保存的结果；同一键配不同请求体返回 422。带键的请求在客户端断开时转为后台任务继续执行。
+
+    ### 时间预算
+
+    `deadline`（或 `X-Request-Timeout` 头）设置本次请求的总时间预算（秒），排队与调用共用，
+    预算耗尽或剩余预算低于该厂商近期 p50 延迟时返回 504（`error_type: deadline_exceeded`）。
+
+    预计排队时间（排队深度 × 近期服务时间）超出预算（未设置时为 `ADMISSION_MAX_WAIT` 阈值）时，
+    请求不会执行，立即返回 503（`error_type: overloaded`）与 `Retry-After`。
+
     ### 各厂商暴露参数
 
     | 厂商 | 暴露参数 |
@@ -170,13 +838,29 @@ async def generate_llm(request: LLMGenerateRequest) -> dict[str, Any]:
     }
     ```
     """
-    result = LLMService.generate(
-        vendor=request.vendor,
+    resolved = AutoRouter.resolve("llm", request.vendor, request.parameters)
+    if resolved is None:
+        return no_eligible_vendor_result("LLM")
+    vendor, parameters = resolved
+
+    result = await _run_idempotent(
+        http_request,
+        "llm",
+        request,
+        LLMHedgingService.generate,
+        deadline=_resolve_deadline(request.deadline, http_request),
+        priority=request.priority,
+        vendor=vendor,
         prompt=request.prompt,
-        **request.parameters,
+        hedge=request.hedge,
+        hedge_vendor=request.hedge_vendor,
+        queue_timeout=request.queue_timeout,
+        **parameters,
     )
+    if request.vendor == AUTO_VENDOR:
+        result["requested_vendor"] = AUTO_VENDOR
 
-    return result
+    return _build_response(result)
 
 
 @router.get("/llm/providers", response_model=list[ProviderInfo])
@@ -195,7 +879,7 @@ async def list_llm_providers() -> list[dict[str, Any]]:
 # -----------------------------------------------------------------------------
 
 @router.post("/image/generate", response_model=GenerateResponse)
-async def generate_image(request: ImageGenerateRequest) -> dict[str, Any]:
+async def generate_image(request: ImageGenerateRequest, http_request: Request) -> dict[str, Any] | JSONResponse:
     """Image 图片生成
 
     调用指定厂商的图像模型生成图片。
@@ -209,8 +893,20 @@ async def generate_image(request: ImageGenerateRequest) -> dict[str, Any]:
 
     | 厂商 | 暴露参数 |
     |------|----------|
-    | thirtytwo_nano_banana | images, resolution, aspect_ratio |
-    | thirtytwo_seedream | image, aspect_ratio |
+    | thirtytwo_nano_banana | images, resolution, aspect_ratio, num_images |
+    | thirtytwo_seedream | image, aspect_ratio, num_images |
+
+    `num_images` > 1 时一次请求生成多张，`content` 为 base64 列表。
+
+    ### 派生版本
+
+    原图按内容寻址存入对象存储，并在进程池中编码 thumb（长边 256）/ preview（长边 1024）/ full
+    三档 WebP 与 AVIF（需安装 Pillow），`renditions` 给出各档尺寸与地址，画布按缩放级别加载合适的一档。
+
+    - `return_format: "url"`：`content` 为原图地址，不再内联 base64；等待编码完成，`renditions` 总是给出
+      （未安装 Pillow 等无法编码时为 `null`）
+    - `return_format: "base64"`：存入原图后立即返回，派生版本在后台编码；`renditions` 只在同一图片
+      已编码过时给出，否则为 `null`，需要派生版本地址时以 `url` 格式请求
 
     ### 请求示例
 
@@ -221,18 +917,62 @@ async def generate_image(request: ImageGenerateRequest) -> dict[str, Any]:
       "parameters": {
         "resolution": "2k",
         "aspect_ratio": "16:9"
-      }
+      },
+      "fallback_vendors": ["thirtytwo_seedream"]
     }
     ```
+
+    ### 跨厂商回退
+
+    主厂商失败（超时、熔断、限流等）时按 `fallback_vendors` 顺序切换厂商，
+    参数按双方的 ParamSpec 自动转换（如 `images` → `image`，不支持的宽高比取最接近值）。
+    响应中的 `vendor` 为实际服务的厂商，`requested_vendor` 与 `attempts` 记录回退过程。
+
+    ### 自动路由
+
+    `vendor` 传 `auto` 时按实时延迟、错误率、排队深度与单次价格（如 nano-banana 4K 0.16 PTC
+    vs 1K/2K 0.08 PTC）选择支持所传参数的厂商，未传 `fallback_vendors` 时其余候选依次作为回退。
+
+    ### 客户端断开
+
+    默认取消请求：停止重试、回退与下载。`detach_on_disconnect: true` 时转为后台任务继续生成，
+    稍后以请求头 `X-Request-ID` 的值调用 `GET /api/v1/jobs/{job_id}` 取回结果。
+
+    ### 异步响应与进度
+
+    带 `Prefer: respond-async` 头时立即返回 202（`job_id` 与 `Location`），请求转为后台任务；
+    以 `X-Request-ID` 为任务 ID 订阅 `/ws` 可收到 queued / started / retry / done 等进度事件。
+
+    ### 幂等键
+
+    `Idempotency-Key` 头使重试不会重复生成：执行中的重复请求等待同一次执行，已完成的直接返回
+    保存的结果；同一键配不同请求体返回 422。带键的请求在客户端断开时转为后台任务继续执行。
+
+    ### 时间预算
+
+    `deadline`（或 `X-Request-Timeout` 头）设置总时间预算（秒）：每次重试、回退与结果下载
+    只使用剩余预算，剩余预算不足以再发起一次尝试时立即返回 504（`error_type: deadline_exceeded`）。
+
+    预计排队时间（排队深度 × 近期服务时间）超出预算（未设置时为 `ADMISSION_MAX_WAIT` 阈值）时，
+    请求不会执行，立即返回 503（`error_type: overloaded`）与 `Retry-After`。
     """
-    result = ImageService.generate(
+    result = await _run_idempotent(
+        http_request,
+        "image",
+        request,
+        ImageRoutingService.generate,
+        detach_on_disconnect=request.detach_on_disconnect,
+        deadline=_resolve_deadline(request.deadline, http_request),
+        priority=request.priority,
         vendor=request.vendor,
         prompt=request.prompt,
-        return_format="base64",
+        fallback_vendors=request.fallback_vendors,
+        return_format=request.return_format,
+        queue_timeout=request.queue_timeout,
         **request.parameters,
     )
 
-    return result
+    return _build_response(result)
 
 
 @router.get("/image/providers", response_model=list[ProviderInfo])
@@ -251,7 +991,7 @@ async def list_image_providers() -> list[dict[str, Any]]:
 # -----------------------------------------------------------------------------
 
 @router.post("/video/generate", response_model=GenerateResponse)
-async def generate_video(request: VideoGenerateRequest) -> dict[str, Any]:
+async def generate_video(request: VideoGenerateRequest, http_request: Request) -> dict[str, Any] | JSONResponse:
     """Video 视频生成
 
     调用指定厂商的视频模型生成视频。
@@ -276,18 +1016,64 @@ async def generate_video(request: VideoGenerateRequest) -> dict[str, Any]:
       "parameters": {
         "aspect_ratio": "16:9",
         "duration": 5
-      }
+      },
+      "detach_on_disconnect": true
     }
     ```
+
+    ### 客户端断开
+
+    默认取消请求并停止轮询 Kling 任务（最长 1000 秒）与下载。`detach_on_disconnect: true` 时
+    转为后台任务继续轮询，稍后以请求头 `X-Request-ID` 的值调用 `GET /api/v1/jobs/{job_id}` 取回结果。
+
+    ### 异步响应与进度
+
+    带 `Prefer: respond-async` 头时立即返回 202（`job_id` 与 `Location`），请求转为后台任务；
+    以 `X-Request-ID` 为任务 ID 订阅 `/ws` 可收到 queued / started / retry / done 等进度事件。
+
+    ### 幂等键
+
+    `Idempotency-Key` 头使重试不会重复生成：执行中的重复请求等待同一次执行，已完成的直接返回
+    保存的结果；同一键配不同请求体返回 422。带键的请求在客户端断开时转为后台任务继续执行。
+
+    ### 视频后处理
+
+    返回前把 MP4 的 moov 移到文件开头（faststart，不重新编码）并截取首帧封面，二者存入对象存储；
+    `poster` 为封面地址（未安装 ffmpeg 时为空）。`return_format: "url"` 时 `content` 为视频地址，
+    经 `/api/v1/assets` 以 Range 边下边播，无需先下载完整视频。
+
+    ### 时间预算
+
+    `deadline`（或 `X-Request-Timeout` 头）设置总时间预算（秒）：提交、每次轮询与下载的超时
+    以及轮询间隔都不超过剩余预算，预算不足以再轮询一次时立即返回 504，而不是等满 1000 秒。
+    转为后台任务后不再受预算限制。
+
+    预计排队时间（排队深度 × 近期服务时间）超出预算（未设置时为 `ADMISSION_MAX_WAIT` 阈值）时，
+    请求不会执行，立即返回 503（`error_type: overloaded`）与 `Retry-After`。
     """
-    result = VideoService.generate(
-        vendor=request.vendor,
+    resolved = AutoRouter.resolve("video", request.vendor, request.parameters)
+    if resolved is None:
+        return no_eligible_vendor_result("video")
+    vendor, parameters = resolved
+
+    result = await _run_idempotent(
+        http_request,
+        "video",
+        request,
+        VideoService.generate,
+        detach_on_disconnect=request.detach_on_disconnect,
+        deadline=_resolve_deadline(request.deadline, http_request),
+        priority=request.priority,
+        vendor=vendor,
         prompt=request.prompt,
-        return_format="base64",
-        **request.parameters,
+        return_format=request.return_format,
+        queue_timeout=request.queue_timeout,
+        **parameters,
     )
+    if request.vendor == AUTO_VENDOR:
+        result["requested_vendor"] = AUTO_VENDOR
 
-    return result
+    return _build_response(result)
 
 
 @router.get("/video/providers", response_model=list[ProviderInfo])
@@ -301,36 +1087,366 @@ async def list_video_providers() -> list[dict[str, Any]]:
     return VideoService.get_providers()
 
 
+# -----------------------------------------------------------------------------
+# 批量端点
+# -----------------------------------------------------------------------------
+
+def _stream_batch(
+    provider_type: str,
+    request: BatchGenerateRequest,
+    http_request: Request,
+) -> Response:
+    """执行批量生成并流式返回结果
+
+    `Accept: text/event-stream` 时以 SSE 格式返回，否则返回 NDJSON（每行一个 JSON）。
+
+    Args:
+        provider_type: Provider 类型 (llm, image, video)
+        request: 批量请求
+        http_request: 原始 HTTP 请求（用于内容协商）
+
+    Returns:
+        流式响应；停机排空期间返回 503 JSONResponse
+    """
+    if drain_controller.draining:
+        return _build_response(drain_controller.rejection(request.vendor))
+
+    if len(request.items) > config.BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many items: {len(request.items)} > {config.BATCH_MAX_ITEMS}",
+        )
+
+    queue_timeout = request.queue_timeout
+    if queue_timeout is None:
+        queue_timeout = config.BATCH_QUEUE_TIMEOUT
+    items = [
+        {
+            "vendor": item.vendor or request.vendor,
+            "prompt": item.prompt,
+            "parameters": request.parameters | item.parameters,
+            "queue_timeout": queue_timeout,
+            "fallback_vendors": request.fallback_vendors,
+        }
+        for item in request.items
+    ]
+    results = BatchService.run(
+        items,
+        ITEM_GENERATORS[provider_type],
+        request.concurrency,
+        deadline=_resolve_deadline(request.deadline, http_request),
+        priority=request.priority,
+        tenant=_resolve_tenant(http_request),
+    )
+
+    if "text/event-stream" in http_request.headers.get("accept", ""):
+        def sse() -> Iterator[str]:
+            for result in results:
+                event = "done" if result.get("done") else "result"
+                yield f"event: {event}\ndata: {json.dumps(result, ensure_ascii=False)}\n\n"
+
+        return StreamingResponse(sse(), media_type="text/event-stream")
+
+    def ndjson() -> Iterator[str]:
+        for result in results:
+            yield json.dumps(result, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+
+@router.post("/llm/generate:batch")
+async def generate_llm_batch(request: BatchGenerateRequest, http_request: Request) -> Response:
+    """LLM 批量文本生成
+
+    每项独立执行，以有界并发（`concurrency`）运行并受各厂商限流约束，
+    每完成一项立即返回一行结果（含 `index`），单项失败不影响其他项，
+    最后一行为汇总 `{"done": true, "total", "succeeded", "failed"}`。
+
+    默认返回 NDJSON（`application/x-ndjson`）；`Accept: text/event-stream` 时返回 SSE。
+    """
+    return _stream_batch("llm", request, http_request)
+
+
+@router.post("/image/generate:batch")
+async def generate_image_batch(request: BatchGenerateRequest, http_request: Request) -> Response:
+    """Image 批量图片生成
+
+    用于拍摄流程的 模特 × 场景 × 姿势 变体，一次请求提交全部组合。
+    返回格式与 `POST /api/v1/llm/generate:batch` 相同，支持 `vendor: "auto"` 与 `fallback_vendors`。
+
+    ### 请求示例
+
+    ```json
+    {
+      "vendor": "thirtytwo_seedream",
+      "parameters": {"aspect_ratio": "3:4"},
+      "items": [
+        {"prompt": "模特A，海边，站姿"},
+        {"prompt": "模特A，海边，坐姿"}
+      ],
+      "concurrency": 4
+    }
+    ```
+    """
+    return _stream_batch("image", request, http_request)
+
+
+@router.post("/video/generate:batch")
+async def generate_video_batch(request: BatchGenerateRequest, http_request: Request) -> Response:
+    """Video 批量视频生成
+
+    返回格式与 `POST /api/v1/llm/generate:batch` 相同。
+    """
+    return _stream_batch("video", request, http_request)
+
+
+# -----------------------------------------------------------------------------
+# 后台任务端点
+# -----------------------------------------------------------------------------
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str) -> dict[str, Any]:
+    """获取后台任务状态
+
+    生成请求声明 `detach_on_disconnect` 且客户端中途断开时，请求转为后台任务继续运行，
+    任务 ID 为该请求的 `X-Request-ID`。完成后 `status` 为 `done`，`result` 为生成结果，
+    结果保留 `DETACHED_JOB_TTL` 秒。
+    """
+    job = detached_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    if job["result"] is not None:
+        job["result"] = {k: v for k, v in job["result"].items() if k in GenerateResponse.model_fields}
+    return job
+
+
+# -----------------------------------------------------------------------------
+# 厂商回调端点
+# -----------------------------------------------------------------------------
+
+@router.post("/callbacks/kling")
+async def kling_callback(
+    payload: dict[str, Any] = Body(...),
+    token: str | None = None,
+    expires: int | None = None,
+    signature: str | None = None,
+) -> dict[str, Any]:
+    """Kling 任务状态回调
+
+    配置 `KLING_CALLBACK_BASE_URL` 后，Kling 提交任务时附带本端点的回调地址（带 `token`、`expires`
+    与 `signature` 查询参数，每个任务一个），任务状态变化时由厂商推送，唤醒正在等待该任务的请求；
+    轮询仅作兜底（`KLING_CALLBACK_POLL_INTERVAL`）。
+
+    - 签名无效或地址已过期（`KLING_CALLBACK_TTL`）返回 401
+    - 缺少 `task_id` 返回 400
+    - `task_id` 与回调地址所绑定的任务不一致返回 403
+    - 重复投递的通知（同一任务、状态与 `updated_at`）返回 `duplicate: true`，不再唤醒等待者
+
+    ### 请求示例
+
+    ```json
+    {
+        "task_id": "abc123",
+        "task_status": "succeed",
+        "updated_at": 1722769557708,
+        "task_result": {"videos": [{"url": "https://.../video.mp4"}]}
+    }
+    ```
+    """
+    if not kling_callbacks.verify(token, expires, signature):
+        metrics.inc("kling_callbacks", result="rejected")
+        raise HTTPException(status_code=401, detail="Invalid or expired callback signature")
+
+    # 兼容与查询接口相同的 {"data": {...}} 包装
+    task_data = payload.get("data") if isinstance(payload.get("data"), dict) else payload
+    task_id = task_data.get("task_id")
+    if not task_id:
+        raise HTTPException(status_code=400, detail="task_id is required")
+    if not kling_callbacks.owns(token, str(task_id)):
+        metrics.inc("kling_callbacks", result="rejected")
+        raise HTTPException(status_code=403, detail="Callback does not belong to this task")
+
+    delivered = kling_callbacks.deliver(str(task_id), task_data)
+    metrics.inc("kling_callbacks", result="accepted" if delivered else "duplicate")
+    return {"success": True, "duplicate": not delivered}
+
+
 # -----------------------------------------------------------------------------
 # 图片上传端点
 # -----------------------------------------------------------------------------
 
 @router.post("/upload/image")
 async def upload_image(file: UploadFile = File(...)) -> dict[str, Any]:
-    """上传图片到 OSS，返回永久 URL
+    """上传图片到对象存储，返回永久 URL
 
-    接收 multipart/form-data 格式的图片文件，上传至阿里云 OSS，
-    返回可公开访问的永久 URL。用于将画布选中图片转为 URL 传给 AI Provider。
-    """
-    from src.backend.utils import BucketCommand, DEFAULT_OSS_CONFIG
+    接收 multipart/form-data 格式的图片文件，写入 STORAGE_BACKEND 选择的存储后端
+    （OSS / 本地磁盘 / 内存），返回可访问的永久 URL。用于将画布选中图片转为 URL 传给 AI Provider。
 
+    对象键按内容寻址（cas/{sha256}），同一张图片只存一份，下载时可按 immutable 长期缓存。
+    """
     try:
-        oss_client = BucketCommand.from_str_config(DEFAULT_OSS_CONFIG)
-        if not oss_client:
-            return {"success": False, "error": "OSS 未配置，请检查环境变量"}
-
         file_bytes = await file.read()
         ext = os.path.splitext(file.filename or "image.png")[1].lstrip(".")
         if not ext:
             ext = "png"
 
-        remote_filename = f"upload_{int(time.time())}_{uuid.uuid4()}.{ext}"
-        url = oss_client.upload_file_bytes(file_bytes, remote_filename)
+        key = content_key(file_bytes, ext.lower())
+        if await run_in_threadpool(storage.head, key) is None:
+            await run_in_threadpool(storage.put, key, file_bytes, file.content_type)
+
+        return {"success": True, "url": storage.url(key)}
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+
+# -----------------------------------------------------------------------------
+# 搭配拼图端点
+# -----------------------------------------------------------------------------
+
+@router.post("/outfit/collage")
+async def compose_outfit_collage(request: CollageRequest) -> dict[str, Any]:
+    """合成搭配拼图
+
+    把搭配画布上选中的单品按位置、大小与旋转合成一张图片，`reference_url` 为厂商可访问的地址，
+    可直接作为图生图请求的参考图。缩放后的源图像素在进程内缓存，只调整布局时无需重新解码；
+    相同的单品与布局直接返回已有的拼图。
+
+    单品数量、尺寸无效或源图无法解码时返回 400。
+    """
+    from src.backend.services.outfit import CollageItem, ComposeError, compose_collage
+
+    items = [CollageItem(**item.model_dump()) for item in request.items]
+    try:
+        collage = await run_in_threadpool(
+            compose_collage, items, request.size, request.background, request.format
+        )
+    except (ValueError, ComposeError) as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    except Exception as e:
+        logger.error(f"Collage failed: {e}")
+        return {"success": False, "error": str(e)}
+
+    return {
+        "success": True,
+        "url": collage.url,
+        "reference_url": collage.reference_url,
+        "width": collage.width,
+        "height": collage.height,
+    }
+
+
+# -----------------------------------------------------------------------------
+# 画布渲染端点
+# -----------------------------------------------------------------------------
+
+def _canvas_elements(items: list[CanvasImageItemModel | CanvasTextItemModel]) -> list[Any]:
+    """请求中的画布元素转换为渲染服务的元素"""
+    from src.backend.services.canvas import ImageElement, TextElement
+
+    return [
+        ImageElement(item.url, item.x, item.y, item.width, item.height, item.rotation)
+        if isinstance(item, CanvasImageItemModel)
+        else TextElement(
+            item.content, item.x, item.y, item.width, item.height, item.rotation, item.font_size, item.color
+        )
+        for item in items
+    ]
+
+
+def _tile_json(tile: Any, left: int, top: int) -> dict[str, Any]:
+    """分块响应（位置相对于区域左上角）"""
+    return {
+        "col": tile.col,
+        "row": tile.row,
+        "x": tile.x - left,
+        "y": tile.y - top,
+        "size": tile.size,
+        "url": tile.url,
+        "cached": tile.cached,
+    }
+
 
-        return {"success": True, "url": url}
+@router.post("/canvas/render")
+async def render_canvas(request: CanvasRenderRequest) -> dict[str, Any]:
+    """服务端渲染画布视口
+
+    按视口（`zoom` 为缩放倍数）把覆盖的区域渲染为 `CANVAS_TILE_SIZE` 的分块，返回各分块地址与
+    相对视口左上角的位置（屏幕像素）。分块按其覆盖内容的哈希缓存：内容未变的分块直接返回已有结果
+    （`cached: true`），平移视口或只编辑部分元素时只渲染变化的分块。
+
+    元素过多、视口过大、源图无法解码时返回 400。
+    """
+    from src.backend.services.canvas import CanvasRenderer, ComposeError
+
+    viewport = request.viewport
+    try:
+        renderer = CanvasRenderer(
+            _canvas_elements(request.items), viewport.zoom, request.background, request.format
+        )
+        tiles = await run_in_threadpool(
+            renderer.render_view, viewport.x, viewport.y, request.width, request.height
+        )
+    except (ValueError, ComposeError) as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
     except Exception as e:
+        logger.error(f"Canvas render failed: {e}")
         return {"success": False, "error": str(e)}
 
+    left, top = math.floor(viewport.x), math.floor(viewport.y)
+    return {
+        "success": True,
+        "scale": renderer.scale,
+        "tile_size": renderer.tile_size,
+        "tiles": [_tile_json(tile, left, top) for tile in tiles],
+    }
+
+
+@router.post("/canvas/export")
+async def export_canvas(request: CanvasExportRequest) -> Response:
+    """服务端导出整个画布
+
+    按全部元素的外接区域（加 `padding` 留白）渲染，代替浏览器端 Fabric.js 导出：
+
+    - `mode=image`：返回拼接后的整张图片（`Content-Disposition: attachment`）
+    - `mode=tiles`：以 NDJSON 按完成顺序逐行返回分块
+      `{"col", "row", "x", "y", "size", "url", "cached"}`（位置相对导出区域左上角），
+      最后一行为 `{"done": true, "total", "width", "height"}`；渲染失败时最后一行带 `error`
+
+    分块与 `POST /api/v1/canvas/render` 共用缓存，未变化的分块不再渲染。
+    画布为空、导出区域超过 `CANVAS_MAX_PIXELS` 或源图无法解码时返回 400。
+    """
+    from src.backend.media.compose import OUTPUT_FORMATS
+    from src.backend.services.canvas import CanvasRenderer, ComposeError
+
+    try:
+        renderer = CanvasRenderer(_canvas_elements(request.items), request.scale, request.background, "png")
+        if request.mode == "image":
+            data, _ = await run_in_threadpool(renderer.export_image, request.padding, request.format)
+            return Response(
+                content=data,
+                media_type=OUTPUT_FORMATS[request.format][1],
+                headers={"Content-Disposition": f'attachment; filename="canvas.{request.format}"'},
+            )
+        region = renderer.content_region(request.padding)
+        cells = renderer.cells(region)
+    except (ValueError, ComposeError) as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    except Exception as e:
+        logger.error(f"Canvas export failed: {e}")
+        return JSONResponse({"success": False, "error": str(e)})
+
+    def ndjson() -> Iterator[str]:
+        summary: dict[str, Any] = {"done": True, "total": len(cells), "width": region.width, "height": region.height}
+        try:
+            for tile in renderer.iter_tiles(cells):
+                yield json.dumps(_tile_json(tile, region.left, region.top)) + "\n"
+        except Exception as e:
+            logger.error(f"Canvas export failed: {e}")
+            summary["error"] = str(e)
+        yield json.dumps(summary) + "\n"
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
 
 # -----------------------------------------------------------------------------
 # 统一端点
@@ -342,8 +1458,23 @@ async def list_all_providers() -> dict[str, Any]:
 
     返回所有已注册的 Provider（LLM/Image/Video）及其状态。
 
+    `health.score` 为 0-1 的健康评分（滚动成功率 × 延迟因子），熔断打开时为 0，
+    此时 `available` 为 false。
+
     响应中的 `info.exposed_params` 列表包含每个 Provider 允许通过 API 传入的参数。
     """
     from src.backend.services.provider_service import ProviderRegistry
 
     return ProviderRegistry.list_all_providers()
+
+
+@router.get("/metrics")
+async def get_metrics() -> dict[str, Any]:
+    """获取运行时指标
+
+    返回进程内的计数器、延迟分位数，以及各厂商自适应并发（当前上限 limit、
+    执行中 inflight）和客户端限流的实时状态。
+    """
+    from src.backend.services.metrics import metrics
+
+    return metrics.snapshot()
@@ -0,0 +1,79 @@
+"""
+任务进度 WebSocket
+
+一条连接可同时关注多个任务（任务 ID 即生成请求的 X-Request-ID），服务端推送
+queued / started / retry / task_status / download / done 事件，取代为每个任务保持长 HTTP 连接或轮询。
+
+客户端消息:
+    {"action": "subscribe", "job_ids": ["..."]}
+    {"action": "unsubscribe", "job_ids": ["..."]}
+
+也可在连接时以查询参数 job_ids=a,b 直接关注。服务端消息即事件本身:
+    {"job_id": "...", "event": "task_status", "ts": 1722769557.7, "task_status": "processing", ...}
+
+连接发送队列有上限（WS_QUEUE_SIZE），消费过慢时丢弃最早的事件，不拖慢发布方。
+"""
+
+import asyncio
+from typing import Any
+
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+
+from src.backend.config import config
+from src.backend.logger import get_logger
+from src.backend.providers.events import job_events
+from src.backend.services.metrics import metrics
+
+logger = get_logger(__name__)
+
+ws_router = APIRouter(tags=["events"])
+
+
+def _enqueue(queue: asyncio.Queue, event: dict[str, Any]) -> None:
+    """放入发送队列，队列已满时丢弃最早的事件（在事件循环线程中调用）"""
+    if queue.full():
+        queue.get_nowait()
+        metrics.inc("ws_events_dropped")
+    queue.put_nowait(event)
+
+
+@ws_router.websocket("/ws")
+async def job_events_socket(websocket: WebSocket, job_ids: str | None = None) -> None:
+    """任务进度事件推送"""
+    await websocket.accept()
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=config.WS_QUEUE_SIZE)
+    subscription = job_events.subscribe(lambda event: loop.call_soon_threadsafe(_enqueue, queue, event))
+    for job_id in (job_ids or "").split(","):
+        if job_id:
+            job_events.follow(subscription, job_id)
+
+    async def receive() -> None:
+        while True:
+            message = await websocket.receive_json()
+            action = message.get("action") if isinstance(message, dict) else None
+            ids = message.get("job_ids") if isinstance(message, dict) else None
+            if action not in ("subscribe", "unsubscribe") or not isinstance(ids, list):
+                await websocket.send_json({"event": "error", "error": "expected {action, job_ids}"})
+                continue
+            for job_id in ids:
+                if action == "subscribe":
+                    job_events.follow(subscription, str(job_id))
+                else:
+                    job_events.unfollow(subscription, str(job_id))
+
+    async def send() -> None:
+        while True:
+            await websocket.send_json(await queue.get())
+
+    tasks = [asyncio.ensure_future(receive()), asyncio.ensure_future(send())]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            error = task.exception()
+            if error is not None and not isinstance(error, WebSocketDisconnect):
+                logger.warning(f"Job events socket closed: {error}")
+    finally:
+        for task in tasks:
+            task.cancel()
+        job_events.unsubscribe(subscription)
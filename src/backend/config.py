@@ -1,3 +1,4 @@
+import json
 import os
 from dotenv import load_dotenv
 
@@ -69,6 +70,265 @@ class Config:
     # 文档: https://doc.302.ai/421815034e0
     THIRTYTWO_VIDEO_MODEL = os.getenv("THIRTYTWO_VIDEO_MODEL")
 
+    # =============================================================================
+    # 客户端限流配置
+    # =============================================================================
+    # 每个厂商的默认限流规则: (每分钟请求数 RPM, 并发槽位)，0 表示不限制
+    # 可通过环境变量覆盖: {VENDOR}_RPM / {VENDOR}_CONCURRENCY，如 ZHIPU_RPM=60
+    RATE_LIMIT_DEFAULTS = {
+        "zhipu": (60, 5),
+        "gemini": (60, 5),
+        "thirtytwo": (120, 10),
+        "thirtytwo_nano_banana": (60, 4),
+        "thirtytwo_seedream": (60, 4),
+        "thirtytwo_kling": (20, 2),
+    }
+    RATE_LIMITS = {
+        vendor: {
+            "rpm": int(os.getenv(f"{vendor.upper()}_RPM", rpm)),
+            "concurrency": int(os.getenv(f"{vendor.upper()}_CONCURRENCY", concurrency)),
+        }
+        for vendor, (rpm, concurrency) in RATE_LIMIT_DEFAULTS.items()
+    }
+    # 按模型覆盖的限流规则（JSON），key 为 "{vendor}:{model}"
+    # 示例: {"thirtytwo_nano_banana:google/nano-banana-pro": {"rpm": 30, "concurrency": 2}}
+    RATE_LIMIT_MODEL_OVERRIDES = json.loads(os.getenv("RATE_LIMIT_MODEL_OVERRIDES", "{}"))
+    # 默认排队等待时间（秒），0 表示超限时立即返回 429
+    RATE_LIMIT_QUEUE_TIMEOUT = float(os.getenv("RATE_LIMIT_QUEUE_TIMEOUT", "0"))
+
+    # =============================================================================
+    # 自适应并发配置（AIMD）
+    # =============================================================================
+    # 每个厂商的并发上限在 [MIN, MAX] 之间根据延迟与错误动态调整，
+    # 且不超过上面的静态并发槽位（{VENDOR}_CONCURRENCY=0 时仅受 MAX 约束）
+    ADAPTIVE_CONCURRENCY_MIN = int(os.getenv("ADAPTIVE_CONCURRENCY_MIN", "1"))
+    ADAPTIVE_CONCURRENCY_MAX = int(os.getenv("ADAPTIVE_CONCURRENCY_MAX", "32"))
+    ADAPTIVE_CONCURRENCY_INITIAL = int(os.getenv("ADAPTIVE_CONCURRENCY_INITIAL", "4"))
+
+    # =============================================================================
+    # 熔断配置
+    # =============================================================================
+    # 滚动统计窗口（秒）
+    CIRCUIT_BREAKER_WINDOW = float(os.getenv("CIRCUIT_BREAKER_WINDOW", "60"))
+    # 窗口内至少调用次数达到该值才按失败率判断
+    CIRCUIT_BREAKER_MIN_CALLS = int(os.getenv("CIRCUIT_BREAKER_MIN_CALLS", "5"))
+    # 失败率阈值 (0-1)
+    CIRCUIT_BREAKER_FAILURE_RATE = float(os.getenv("CIRCUIT_BREAKER_FAILURE_RATE", "0.5"))
+    # 连续失败次数阈值
+    CIRCUIT_BREAKER_CONSECUTIVE_FAILURES = int(os.getenv("CIRCUIT_BREAKER_CONSECUTIVE_FAILURES", "3"))
+    # 熔断打开持续时间（秒），之后进入半开探测
+    CIRCUIT_BREAKER_OPEN_SECONDS = float(os.getenv("CIRCUIT_BREAKER_OPEN_SECONDS", "30"))
+
+    # =============================================================================
+    # 跨厂商回退配置
+    # =============================================================================
+    # Image 默认回退链（JSON），如 {"thirtytwo_nano_banana": ["thirtytwo_seedream"]}
+    # 请求中的 fallback_vendors 优先于该配置
+    IMAGE_FALLBACK_CHAINS: dict[str, list[str]] = json.loads(
+        os.getenv("IMAGE_FALLBACK_CHAINS", "{}")
+    )
+
+    # =============================================================================
+    # 自动路由配置（vendor="auto"）
+    # =============================================================================
+    # 各项惩罚的权重：延迟（p50/p95 相对 SLO）、错误率、排队深度、单次价格（相对最贵候选）
+    AUTO_ROUTING_WEIGHTS: dict[str, float] = {
+        "latency": 1.0,
+        "error": 2.0,
+        "queue": 1.0,
+        "cost": 1.0,
+    } | json.loads(os.getenv("AUTO_ROUTING_WEIGHTS", "{}"))
+
+    # =============================================================================
+    # LLM 对冲请求配置
+    # =============================================================================
+    # 是否默认启用对冲（请求中的 hedge 字段优先）
+    LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "false").lower() in ("true", "1", "on")
+    # 各厂商的备用厂商（JSON），如 {"gemini": "zhipu", "zhipu": "gemini"}
+    LLM_HEDGE_VENDORS: dict[str, str] = json.loads(
+        os.getenv("LLM_HEDGE_VENDORS", '{"gemini": "zhipu", "zhipu": "gemini"}')
+    )
+    # 主请求超过该延迟分位数仍未返回时发起对冲
+    LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+    # 样本不足时使用的对冲延迟（秒）
+    LLM_HEDGE_DEFAULT_DELAY = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY", "10"))
+    # 计算分位数所需的最少样本数
+    LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+    # 对冲预算：额外调用占主调用的比例上限
+    LLM_HEDGE_BUDGET_RATIO = float(os.getenv("LLM_HEDGE_BUDGET_RATIO", "0.05"))
+
+    # =============================================================================
+    # 批量生成配置
+    # =============================================================================
+    # 单个批量请求的最大项数
+    BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "100"))
+    # 默认并发数与上限
+    BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+    BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "16"))
+    # 批量项超出限流时的默认排队时间（秒）
+    BATCH_QUEUE_TIMEOUT = float(os.getenv("BATCH_QUEUE_TIMEOUT", "60"))
+
+    # =============================================================================
+    # 结果传输配置
+    # =============================================================================
+    # 预估输出不超过该字节数时让厂商内联返回 base64，否则返回 URL 再下载
+    INLINE_TRANSFER_MAX_BYTES = int(os.getenv("INLINE_TRANSFER_MAX_BYTES", str(6 * 1024 * 1024)))
+    # 预估输出大小时每像素的字节数（压缩后）
+    INLINE_TRANSFER_BYTES_PER_PIXEL = float(os.getenv("INLINE_TRANSFER_BYTES_PER_PIXEL", "1.0"))
+
+    # =============================================================================
+    # 请求取消与时间预算配置
+    # =============================================================================
+    # 生成请求执行期间检测客户端断开的间隔（秒）
+    DISCONNECT_POLL_INTERVAL = float(os.getenv("DISCONNECT_POLL_INTERVAL", "1"))
+    # 转为后台任务（detach_on_disconnect）的结果保留时间（秒）与最大数量
+    DETACHED_JOB_TTL = float(os.getenv("DETACHED_JOB_TTL", "3600"))
+    DETACHED_JOB_MAX = int(os.getenv("DETACHED_JOB_MAX", "100"))
+    # 生成请求未指定 deadline / X-Request-Timeout 时的默认时间预算（秒），0 表示不限
+    REQUEST_DEFAULT_DEADLINE = float(os.getenv("REQUEST_DEFAULT_DEADLINE", "0"))
+
+    # =============================================================================
+    # 优先级调度配置
+    # =============================================================================
+    # 是否在厂商调用前按优先级与租户公平排队
+    SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "true").lower() in ("true", "1", "on")
+    # 各优先级类别的权重（JSON），权重越大分到的槽位越多
+    SCHEDULER_CLASS_WEIGHTS: dict[str, float] = {
+        "interactive": 8.0,
+        "batch": 2.0,
+        "background": 1.0,
+    } | json.loads(os.getenv("SCHEDULER_CLASS_WEIGHTS", "{}"))
+    # 防饿死：排队每满该秒数，请求的调度位次提前一个单位，0 表示不老化
+    SCHEDULER_AGING_SECONDS = float(os.getenv("SCHEDULER_AGING_SECONDS", "30"))
+    # 每个厂商只分配给 interactive 请求的并发槽位数
+    SCHEDULER_INTERACTIVE_RESERVE = int(os.getenv("SCHEDULER_INTERACTIVE_RESERVE", "1"))
+
+    # =============================================================================
+    # 准入控制配置（负载保护）
+    # =============================================================================
+    # 是否在生成端点按预计排队时间提前拒绝请求（503 + Retry-After）
+    ADMISSION_CONTROL_ENABLED = os.getenv("ADMISSION_CONTROL_ENABLED", "true").lower() in ("true", "1", "on")
+    # 请求未设置时间预算时，各 Provider 类型可接受的最长预计排队时间（JSON，秒）
+    ADMISSION_MAX_WAIT: dict[str, float] = {
+        "llm": 20.0,
+        "image": 60.0,
+        "video": 600.0,
+    } | json.loads(os.getenv("ADMISSION_MAX_WAIT", "{}"))
+
+    # =============================================================================
+    # 停机排空配置
+    # =============================================================================
+    # 停机时等待在途厂商调用完成的最长时间（秒），超时后取消并保留未完成的厂商任务
+    DRAIN_TIMEOUT = float(os.getenv("DRAIN_TIMEOUT", "30"))
+    # 排空期间拒绝新请求时建议的重试等待（秒）
+    DRAIN_RETRY_AFTER = float(os.getenv("DRAIN_RETRY_AFTER", "10"))
+    # 已提交未完成的厂商任务（如 Kling task_id）持久化文件，为空表示不持久化
+    PENDING_TASKS_PATH = os.getenv("PENDING_TASKS_PATH", "data/pending_tasks.json")
+    # 重启时只恢复提交时间在该秒数内的任务
+    PENDING_TASK_MAX_AGE = float(os.getenv("PENDING_TASK_MAX_AGE", "86400"))
+
+    # =============================================================================
+    # 幂等键配置（Idempotency-Key）
+    # =============================================================================
+    # 结果在完成后保留的时间（秒）
+    IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", "3600"))
+    # 最多保留的键数
+    IDEMPOTENCY_MAX_KEYS = int(os.getenv("IDEMPOTENCY_MAX_KEYS", "1000"))
+    # 已保存结果（base64 内容）的总字节数上限
+    IDEMPOTENCY_MAX_BYTES = int(os.getenv("IDEMPOTENCY_MAX_BYTES", str(256 * 1024 * 1024)))
+    # 重复请求等待首次执行结果的最长时间（秒），超时返回 409，客户端稍后用同一键重试
+    IDEMPOTENCY_WAIT_TIMEOUT = float(os.getenv("IDEMPOTENCY_WAIT_TIMEOUT", "900"))
+
+    # =============================================================================
+    # Kling 任务回调配置（webhook）
+    # =============================================================================
+    # 本服务对厂商可达的外部地址（如 https://muse.example.com），为空表示不启用回调、按原间隔轮询
+    KLING_CALLBACK_BASE_URL = os.getenv("KLING_CALLBACK_BASE_URL", "")
+    # 回调地址签名密钥，为空时进程启动时随机生成
+    KLING_CALLBACK_SECRET = os.getenv("KLING_CALLBACK_SECRET", "")
+    # 回调地址有效期（秒），应覆盖任务最长生成时间，过期的回调被拒绝（由兜底轮询拿到结果）
+    KLING_CALLBACK_TTL = float(os.getenv("KLING_CALLBACK_TTL", "3600"))
+    # 启用回调时的兜底轮询间隔（秒）：在该时间内未收到回调才查询一次任务状态
+    KLING_CALLBACK_POLL_INTERVAL = float(os.getenv("KLING_CALLBACK_POLL_INTERVAL", "60"))
+
+    # =============================================================================
+    # 任务进度推送配置（/ws）
+    # =============================================================================
+    # 每条 WebSocket 连接待发送事件的上限，消费过慢时丢弃最早的事件
+    WS_QUEUE_SIZE = int(os.getenv("WS_QUEUE_SIZE", "256"))
+
+    # =============================================================================
+    # 对象存储配置
+    # =============================================================================
+    # 存储后端: auto（配置了 OSS_ENDPOINT 时为 oss，否则为 local）, oss, local, memory
+    STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "auto")
+    # local 后端的根目录
+    STORAGE_LOCAL_DIR = os.getenv("STORAGE_LOCAL_DIR", "data/storage")
+    # local / memory 后端的对外地址（如 https://muse.example.com），厂商需下载参考图时必须配置，
+    # 为空时返回相对地址 /api/v1/assets/{key}
+    STORAGE_PUBLIC_BASE_URL = os.getenv("STORAGE_PUBLIC_BASE_URL", "")
+    # local / memory 后端 presign 地址的签名密钥，为空时进程启动时随机生成
+    STORAGE_SIGNING_SECRET = os.getenv("STORAGE_SIGNING_SECRET", "")
+    # oss 后端前的本地磁盘缓存目录（热点对象从本机发送，减少 OSS 读取延迟与外网流量）
+    STORAGE_CACHE_DIR = os.getenv("STORAGE_CACHE_DIR", "data/storage_cache")
+    # 本地磁盘缓存的总字节数上限，超出时按 LRU 淘汰；0 表示不启用缓存
+    STORAGE_CACHE_MAX_BYTES = int(os.getenv("STORAGE_CACHE_MAX_BYTES", str(10 * 1024 * 1024 * 1024)))
+    # 是否回写：写入落盘后立即返回、后台上传 OSS（需配置 STORAGE_PUBLIC_BASE_URL），否则同步写穿
+    STORAGE_CACHE_WRITE_BACK = os.getenv("STORAGE_CACHE_WRITE_BACK", "true").lower() in ("true", "1", "on")
+
+    # =============================================================================
+    # 媒体后处理配置
+    # =============================================================================
+    # 媒体后处理（MP4 faststart、封面截取、图片编码）进程池大小，0 表示在请求线程内执行
+    MEDIA_WORKERS = int(os.getenv("MEDIA_WORKERS", str(min(4, os.cpu_count() or 1))))
+    # 缩放后的元素像素缓存（拼图与画布渲染共用）总字节数上限，0 表示不缓存
+    TILE_CACHE_BYTES = int(os.getenv("TILE_CACHE_BYTES", str(256 * 1024 * 1024)))
+    # 拼图、画布渲染与参考图预处理可下载的源图主机，逗号分隔（以 "." 开头匹配子域名），
+    # 为空表示只接受本服务 /api/v1/assets 地址与 data: 地址
+    SOURCE_ALLOWED_HOSTS: list[str] = [
+        host.strip().lower() for host in os.getenv("SOURCE_ALLOWED_HOSTS", "").split(",") if host.strip()
+    ]
+    # 单张源图（下载或 data: 地址）的字节数上限
+    SOURCE_MAX_BYTES = int(os.getenv("SOURCE_MAX_BYTES", str(32 * 1024 * 1024)))
+    # 生成图片的派生版本（thumb / preview / full）编码格式，逗号分隔，为空表示不生成
+    IMAGE_RENDITION_FORMATS: list[str] = [
+        fmt.strip().lower() for fmt in os.getenv("IMAGE_RENDITION_FORMATS", "avif,webp").split(",") if fmt.strip()
+    ]
+
+    # 参考图预处理配置
+    # =============================================================================
+    # 提交厂商前并行拉取参考图（images / image），缩小到输出尺寸、去除元数据并重新编码，
+    # 作为临时对象上传后以签名地址替换原地址（需要 Pillow，且存储地址可被厂商访问）
+    REFERENCE_PREPROCESS = os.getenv("REFERENCE_PREPROCESS", "false").lower() in ("true", "1", "on")
+    # 厂商未按输出尺寸指定时的参考图长边上限（像素）
+    REFERENCE_IMAGE_MAX_EDGE = int(os.getenv("REFERENCE_IMAGE_MAX_EDGE", "2048"))
+    # 重新编码的 JPEG 质量
+    REFERENCE_IMAGE_QUALITY = int(os.getenv("REFERENCE_IMAGE_QUALITY", "90"))
+    # 提交给厂商的签名地址有效期（秒），需覆盖厂商排队与拉取时间
+    REFERENCE_URL_TTL = int(os.getenv("REFERENCE_URL_TTL", "86400"))
+
+    # 搭配拼图配置
+    # =============================================================================
+    # 单张拼图最多的单品数
+    COLLAGE_MAX_ITEMS = int(os.getenv("COLLAGE_MAX_ITEMS", "6"))
+    # 拼图长边像素（默认值，也是请求可指定的上限）
+    COLLAGE_MAX_EDGE = int(os.getenv("COLLAGE_MAX_EDGE", "2048"))
+    # jpg / webp 拼图的编码质量
+    COLLAGE_QUALITY = int(os.getenv("COLLAGE_QUALITY", "90"))
+
+    # 画布渲染配置
+    # =============================================================================
+    # 渲染分块边长（输出像素）
+    CANVAS_TILE_SIZE = int(os.getenv("CANVAS_TILE_SIZE", "512"))
+    # 渲染缩放倍数上限（输出像素 / 画布坐标）
+    CANVAS_MAX_SCALE = float(os.getenv("CANVAS_MAX_SCALE", "4"))
+    # 单次渲染或导出的输出像素总数上限
+    CANVAS_MAX_PIXELS = int(os.getenv("CANVAS_MAX_PIXELS", str(8192 * 8192)))
+    # 单个画布文档最多的元素数
+    CANVAS_MAX_ITEMS = int(os.getenv("CANVAS_MAX_ITEMS", "500"))
+    # 文字使用的字体文件（TTF / OTF，需包含中文字形），为空使用 Pillow 内置字体
+    CANVAS_FONT_PATH = os.getenv("CANVAS_FONT_PATH", "")
+
     # Debug 模式
     # =============================================================================
     DEBUG_MODE = os.getenv("DEBUG_MODE", "false").lower() in ("true", "1", "on")
@@ -4,23 +4,43 @@ FastAPI 应用入口
 Muse AI Studio 后端服务主入口。
 """
 
+import asyncio
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
-from src.backend.api import router
+from src.backend.api import assets_router, router, ws_router
+from src.backend.config import config
 from src.backend.logger import get_logger
+from src.backend.services.drain import drain_controller
+from src.backend.services.jobs import resume_pending_tasks
+from src.backend.services.media import media_processor
+from src.backend.storage import storage
 
 logger = get_logger(__name__)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """应用生命周期管理"""
+    """应用生命周期管理
+
+    启动时恢复停机前未完成的厂商任务，并接管 SIGTERM：信号到达时先进入排空模式，拒绝新请求
+    （/health 返回 503）并等待在途调用完成，超时后取消剩余调用（未完成的厂商任务保留，下次启动时恢复），
+    再交给服务器关闭。关闭时兜底排空，再等待存储缓存回写完成（未写完的对象保留在本地缓存，
+    下次启动时继续上传）。
+    """
     logger.info("Starting Muse AI Studio backend...")
+    resumed = resume_pending_tasks()
+    if resumed:
+        logger.info(f"Resumed {resumed} pending vendor tasks")
+    drain_controller.install_signal_handler(config.DRAIN_TIMEOUT)
     yield
     logger.info("Shutting down Muse AI Studio backend...")
+    await asyncio.to_thread(drain_controller.drain, config.DRAIN_TIMEOUT)
+    await asyncio.to_thread(storage.flush, config.DRAIN_TIMEOUT)
+    media_processor.shutdown()
 
 
 # 创建 FastAPI 应用
@@ -42,6 +62,8 @@ app.add_middleware(
 
 # 注册路由
 app.include_router(router)
+app.include_router(assets_router)
+app.include_router(ws_router)
 
 
 # 根路径
@@ -58,5 +80,7 @@ async def root():
 # 健康检查
 @app.get("/health")
 async def health_check():
-    """健康检查端点"""
+    """健康检查端点，停机排空期间返回 503"""
+    if drain_controller.draining:
+        return JSONResponse(status_code=503, content={"status": "draining"})
     return {"status": "healthy"}
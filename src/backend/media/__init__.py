@@ -0,0 +1,59 @@
+"""媒体处理模块
+
+CPU 密集的纯函数（MP4 重排、封面截取、图片派生版本编码、画布元素合成等），不依赖服务层，可直接提交到进程池执行。
+
+可用模块:
+    - mp4: MP4 faststart 重排（移动 moov、修正 stco/co64）与封面帧提取
+    - image: 图片 thumb / preview / full 派生版本（WebP、AVIF）与参考图缩小重编码（依赖可选的 Pillow）
+    - compose: 按画布几何信息（位置、宽高、旋转）合成图片与文字元素、拼接渲染分块（依赖可选的 Pillow）
+
+示例:
+    >>> from src.backend.media.mp4 import faststart
+    >>> video = faststart(video_bytes)
+"""
+
+from .compose import (
+    OUTPUT_FORMATS,
+    ComposeError,
+    Placement,
+    TextBlock,
+    Tile,
+    compose,
+    render_tile,
+    rotated_bounds,
+    stitch,
+)
+from .image import (
+    RENDITION_FORMATS,
+    RENDITIONS,
+    ImageRenditions,
+    Rendition,
+    encode_renditions,
+    prepare_reference,
+    supported_formats,
+)
+from .mp4 import MP4Error, extract_poster, faststart, is_faststart, postprocess_video
+
+__all__ = [
+    "RENDITIONS",
+    "RENDITION_FORMATS",
+    "ImageRenditions",
+    "Rendition",
+    "encode_renditions",
+    "prepare_reference",
+    "supported_formats",
+    "OUTPUT_FORMATS",
+    "ComposeError",
+    "Placement",
+    "TextBlock",
+    "Tile",
+    "compose",
+    "render_tile",
+    "rotated_bounds",
+    "stitch",
+    "MP4Error",
+    "extract_poster",
+    "faststart",
+    "is_faststart",
+    "postprocess_video",
+]
@@ -0,0 +1,292 @@
+"""
+画布元素合成
+
+把画布上的图片与文字元素按几何信息（左上角 x / y、宽高、绕中心顺时针旋转角度，与前端 CanvasItem 一致）
+合成到一张图片上，供搭配拼图与画布渲染使用:
+
+    - render_tile(): 解码源图并缩放到元素在目标分辨率下的尺寸，得到未旋转的原始像素（Tile），
+      调用方按 (源图哈希, 尺寸) 缓存，元素只移动或旋转时无需重新解码缩放
+    - compose(): 在给定大小的画布上依次（后者在上）合成各 Tile 与文字（TextBlock）并编码
+    - stitch(): 把已编码的渲染分块拼接为一张图片（画布整体导出）
+
+依赖 Pillow（可选）：未安装时 render_tile() 返回 None，compose() / stitch() 抛出 ComposeError。
+均为纯函数，由 MediaProcessor 在进程池中执行。
+"""
+
+import functools
+import io
+import math
+from dataclasses import dataclass
+
+from .image import Image, decode_image
+
+try:
+    from PIL import ImageDraw, ImageFont
+except ImportError:  # Pillow 为可选依赖
+    ImageDraw = ImageFont = None
+
+# 输出格式 -> (Pillow 格式名, MIME 类型)
+OUTPUT_FORMATS: dict[str, tuple[str, str]] = {
+    "jpg": ("JPEG", "image/jpeg"),
+    "png": ("PNG", "image/png"),
+    "webp": ("WEBP", "image/webp"),
+}
+
+
+class ComposeError(RuntimeError):
+    """无法合成（未安装 Pillow 或参数无效）"""
+
+
+@dataclass(frozen=True)
+class Placement:
+    """元素在输出画布上的位置（像素）
+
+    Attributes:
+        x: 未旋转时左上角横坐标
+        y: 未旋转时左上角纵坐标
+        width: 宽度
+        height: 高度
+        rotation: 绕中心顺时针旋转角度（度）
+    """
+
+    x: float
+    y: float
+    width: float
+    height: float
+    rotation: float = 0.0
+
+
+@dataclass(frozen=True)
+class Tile:
+    """缩放后、未旋转的元素像素（RGBA 原始字节，可在进程间传递与缓存）
+
+    Attributes:
+        width: 宽度
+        height: 高度
+        data: RGBA 像素（width * height * 4 字节）
+    """
+
+    width: int
+    height: int
+    data: bytes
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.data)
+
+
+@dataclass(frozen=True)
+class TextBlock:
+    """文字元素（与前端 Textbox 一致：按宽度逐字换行，左对齐）
+
+    Attributes:
+        content: 文字内容（换行符为硬换行）
+        font_size: 字号（输出像素）
+        color: 文字颜色（CSS 颜色）
+        line_height: 行高倍数（Fabric 默认 1.16）
+    """
+
+    content: str
+    font_size: float
+    color: str = "#1f2329"
+    line_height: float = 1.16
+
+
+def rotated_bounds(
+    x: float, y: float, width: float, height: float, rotation: float = 0.0
+) -> tuple[float, float, float, float]:
+    """元素绕中心旋转后的外接矩形
+
+    Args:
+        x: 未旋转时左上角横坐标
+        y: 未旋转时左上角纵坐标
+        width: 宽度
+        height: 高度
+        rotation: 绕中心顺时针旋转角度（度）
+
+    Returns:
+        (left, top, right, bottom)
+    """
+    cx, cy = x + width / 2, y + height / 2
+    angle = math.radians(rotation)
+    half_w = (abs(width * math.cos(angle)) + abs(height * math.sin(angle))) / 2
+    half_h = (abs(width * math.sin(angle)) + abs(height * math.cos(angle))) / 2
+    return cx - half_w, cy - half_h, cx + half_w, cy + half_h
+
+
+def render_tile(data: bytes, width: int, height: int) -> Tile | None:
+    """解码源图并缩放到指定尺寸
+
+    Args:
+        data: 源图内容
+        width: 目标宽度（像素）
+        height: 目标高度（像素）
+
+    Returns:
+        RGBA Tile；未安装 Pillow 或源图无法解码时返回 None
+    """
+    if Image is None:
+        return None
+    decoded = decode_image(data)
+    if decoded is None:
+        return None
+    image, _ = decoded
+    size = (max(1, width), max(1, height))
+    if image.size != size:
+        image = image.resize(size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+    image = image.convert("RGBA")
+    return Tile(width=image.width, height=image.height, data=image.tobytes())
+
+
+@functools.lru_cache(maxsize=64)
+def _font(font_path: str | None, size: int):
+    """加载字体（未指定字体文件时使用 Pillow 内置字体，不含中文字形）"""
+    if font_path:
+        return ImageFont.truetype(font_path, size)
+    return ImageFont.load_default(size)
+
+
+def _wrap(draw, text: str, font, width: int) -> list[str]:
+    """按宽度逐字换行（与 Textbox splitByGrapheme 一致）"""
+    lines = []
+    for paragraph in text.split("\n"):
+        line = ""
+        for char in paragraph:
+            if line and draw.textlength(line + char, font=font) > width:
+                lines.append(line)
+                line = char
+            else:
+                line += char
+        lines.append(line)
+    return lines
+
+
+def _render_text(block: TextBlock, width: int, height: int, font_path: str | None):
+    """把文字绘制到 width x height 的透明图层（超出高度的部分裁掉）"""
+    layer = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(layer)
+    try:
+        font = _font(font_path, max(1, round(block.font_size)))
+        color = block.color or "#1f2329"
+        step = block.font_size * block.line_height
+        for i, line in enumerate(_wrap(draw, block.content, font, width)):
+            top = i * step
+            if top >= height:
+                break
+            draw.text((0, top), line, font=font, fill=color)
+    except (OSError, ValueError) as e:
+        raise ComposeError(f"Cannot render text: {e}") from e
+    return layer
+
+
+def _paste(canvas, layer, x: int, y: int) -> None:
+    """把 layer 以左上角 (x, y) alpha 合成到 canvas，超出画布的部分裁掉"""
+    left, top = max(0, x), max(0, y)
+    right, bottom = min(canvas.width, x + layer.width), min(canvas.height, y + layer.height)
+    if left >= right or top >= bottom:
+        return
+    canvas.alpha_composite(layer.crop((left - x, top - y, right - x, bottom - y)), (left, top))
+
+
+def compose(
+    width: int,
+    height: int,
+    layers: list[tuple[Tile | TextBlock, Placement]],
+    background: str | None = "#ffffff",
+    fmt: str = "jpg",
+    quality: int = 90,
+    font_path: str | None = None,
+) -> bytes:
+    """合成并编码
+
+    Args:
+        width: 输出宽度（像素）
+        height: 输出高度（像素）
+        layers: (Tile 或 TextBlock, 位置) 列表，按绘制顺序（后者在上）；Tile 尺寸与位置宽高不一致时拉伸
+        background: 背景色（CSS 颜色），None 表示透明（jpg 输出时为白色）
+        fmt: 输出格式 (jpg, png, webp)
+        quality: jpg / webp 质量
+        font_path: 文字使用的字体文件（TTF / OTF），None 使用 Pillow 内置字体
+
+    Returns:
+        编码后的图片
+
+    Raises:
+        ComposeError: 未安装 Pillow、格式、背景色或字体无效
+    """
+    if Image is None:
+        raise ComposeError("Pillow is not installed")
+    if fmt not in OUTPUT_FORMATS:
+        raise ComposeError(f"Unsupported format: {fmt}")
+    try:
+        canvas = Image.new("RGBA", (max(1, width), max(1, height)), background or (0, 0, 0, 0))
+    except ValueError as e:
+        raise ComposeError(f"Invalid background: {background}") from e
+
+    for source, placement in layers:
+        size = (max(1, round(placement.width)), max(1, round(placement.height)))
+        if isinstance(source, TextBlock):
+            layer = _render_text(source, size[0], size[1], font_path)
+        else:
+            layer = Image.frombytes("RGBA", (source.width, source.height), source.data)
+            if layer.size != size:
+                layer = layer.resize(size, Image.Resampling.BILINEAR)
+        if placement.rotation % 360:
+            # PIL 逆时针为正，画布角度顺时针为正
+            layer = layer.rotate(-placement.rotation, resample=Image.Resampling.BICUBIC, expand=True)
+        center_x = placement.x + placement.width / 2
+        center_y = placement.y + placement.height / 2
+        _paste(canvas, layer, round(center_x - layer.width / 2), round(center_y - layer.height / 2))
+
+    return _encode(canvas, fmt, quality)
+
+
+def _encode(canvas, fmt: str, quality: int) -> bytes:
+    """编码 RGBA 画布（jpg 铺白底）"""
+    pil_format, _ = OUTPUT_FORMATS[fmt]
+    buffer = io.BytesIO()
+    if fmt == "jpg":
+        background_layer = Image.new("RGB", canvas.size, "#ffffff")
+        background_layer.paste(canvas, mask=canvas.getchannel("A"))
+        background_layer.save(buffer, format=pil_format, quality=quality, optimize=True)
+    elif fmt == "webp":
+        canvas.save(buffer, format=pil_format, quality=quality, method=4)
+    else:
+        canvas.save(buffer, format=pil_format)
+    return buffer.getvalue()
+
+
+def stitch(
+    width: int,
+    height: int,
+    pieces: list[tuple[bytes, int, int]],
+    fmt: str = "png",
+    quality: int = 90,
+) -> bytes:
+    """把已编码的分块拼接为一张图片
+
+    Args:
+        width: 输出宽度（像素）
+        height: 输出高度（像素）
+        pieces: (分块内容, 左上角 x, 左上角 y) 列表，超出输出范围的部分裁掉
+        fmt: 输出格式 (jpg, png, webp)
+        quality: jpg / webp 质量
+
+    Returns:
+        编码后的图片
+
+    Raises:
+        ComposeError: 未安装 Pillow、格式无效或分块无法解码
+    """
+    if Image is None:
+        raise ComposeError("Pillow is not installed")
+    if fmt not in OUTPUT_FORMATS:
+        raise ComposeError(f"Unsupported format: {fmt}")
+    canvas = Image.new("RGBA", (max(1, width), max(1, height)), (0, 0, 0, 0))
+    for data, x, y in pieces:
+        try:
+            with Image.open(io.BytesIO(data)) as piece:
+                canvas.paste(piece.convert("RGBA"), (x, y))
+        except (OSError, ValueError) as e:
+            raise ComposeError(f"Cannot decode tile: {e}") from e
+    return _encode(canvas, fmt, quality)
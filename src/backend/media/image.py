@@ -0,0 +1,196 @@
+"""
+图片派生版本编码
+
+生成的 2K/4K PNG（如 Seedream 2048x2048、3024x1296）在画布与结果列表中通常只显示为几百像素，
+encode_renditions() 按长边生成 thumb / preview / full 三档，每档编码为 WebP 与 AVIF
+（AVIF 需 Pillow 带 libavif），画布按缩放级别请求合适的一档，传输量通常降低一个数量级。
+
+prepare_reference() 把用户上传的参考图（常为 10 MB 以上的手机照片）缩小到厂商输出尺寸、
+去除 EXIF 等元数据并重新编码，再提交给厂商，缩短厂商拉取参考图的时间。
+
+依赖 Pillow（可选）：未安装或无法解码时返回 None，调用方继续使用原图。
+均为纯函数，由 MediaProcessor 在进程池中执行。
+"""
+
+import io
+from dataclasses import dataclass, field
+from typing import Any
+
+from src.backend.logger import get_logger
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:  # Pillow 为可选依赖
+    Image = ImageOps = features = None
+
+logger = get_logger(__name__)
+
+# 派生档位及其长边像素上限（None 表示保持原尺寸），按从小到大排列
+RENDITIONS: dict[str, int | None] = {
+    "thumb": 256,
+    "preview": 1024,
+    "full": None,
+}
+
+# 支持的编码格式及 MIME 类型
+RENDITION_FORMATS: dict[str, str] = {
+    "avif": "image/avif",
+    "webp": "image/webp",
+}
+
+# 各格式的编码参数（AVIF speed 越大越快、压缩率越低）
+_SAVE_OPTIONS: dict[str, dict] = {
+    "webp": {"format": "WEBP", "quality": 82, "method": 4},
+    "avif": {"format": "AVIF", "quality": 60, "speed": 8},
+}
+
+
+@dataclass(frozen=True)
+class Rendition:
+    """单档派生版本
+
+    Attributes:
+        width: 宽度（像素）
+        height: 高度（像素）
+        files: 格式 -> 编码后的内容
+    """
+
+    width: int
+    height: int
+    files: dict[str, bytes] = field(default_factory=dict)
+
+
+@dataclass(frozen=True)
+class ImageRenditions:
+    """图片的全部派生版本
+
+    Attributes:
+        width: 原图宽度
+        height: 原图高度
+        renditions: 档位名 -> 派生版本（尺寸与更大一档相同的档位复用同一个 Rendition）
+    """
+
+    width: int
+    height: int
+    renditions: dict[str, Rendition]
+
+
+def supported_formats(formats: tuple[str, ...] | list[str]) -> list[str]:
+    """过滤出当前 Pillow 可以编码的格式
+
+    Args:
+        formats: 期望的格式（webp, avif）
+
+    Returns:
+        可编码的格式，未安装 Pillow 时为空列表
+    """
+    if Image is None:
+        return []
+    return [fmt for fmt in formats if fmt in _SAVE_OPTIONS and features.check(fmt)]
+
+
+def _fit(width: int, height: int, max_side: int | None) -> tuple[int, int]:
+    """按长边上限等比缩放后的尺寸（不放大）"""
+    longest = max(width, height)
+    if max_side is None or longest <= max_side:
+        return width, height
+    scale = max_side / longest
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def decode_image(data: bytes) -> tuple[Any, bool] | None:
+    """解码并按 EXIF 方向校正，转换为 RGB / RGBA（丢弃元数据）
+
+    Returns:
+        (图片, 是否带透明通道)；无法解码时返回 None
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as source:
+            image = ImageOps.exif_transpose(source)
+            has_alpha = image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info
+            return image.convert("RGBA" if has_alpha else "RGB"), has_alpha
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        logger.warning(f"Cannot decode image: {e}")
+        return None
+
+
+def encode_renditions(data: bytes, formats: tuple[str, ...] | list[str] = ("avif", "webp")) -> ImageRenditions | None:
+    """生成 thumb / preview / full 三档派生版本
+
+    按 EXIF 方向校正后缩放（LANCZOS），去除元数据，保留透明通道。
+
+    Args:
+        data: 原图内容（PNG / JPEG / WebP 等）
+        formats: 编码格式，Pillow 不支持的格式跳过
+
+    Returns:
+        派生版本；未安装 Pillow、没有可用格式或原图无法解码时返回 None
+    """
+    formats = supported_formats(formats)
+    if not formats:
+        return None
+    decoded = decode_image(data)
+    if decoded is None:
+        return None
+
+    image, _ = decoded
+    width, height = image.size
+    renditions: dict[str, Rendition] = {}
+    # 从大到小编码，每档由上一档缩小（减少 LANCZOS 的计算量）
+    current = image
+    previous: Rendition | None = None
+    for name, max_side in reversed(RENDITIONS.items()):
+        size = _fit(width, height, max_side)
+        if previous is not None and (previous.width, previous.height) == size:
+            renditions[name] = previous
+            continue
+        if current.size != size:
+            current = current.resize(size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+        files = {}
+        for fmt in formats:
+            buffer = io.BytesIO()
+            try:
+                current.save(buffer, **_SAVE_OPTIONS[fmt])
+            except (OSError, ValueError) as e:
+                logger.warning(f"Image rendition {name}.{fmt} failed: {e}")
+                continue
+            files[fmt] = buffer.getvalue()
+        previous = renditions[name] = Rendition(width=size[0], height=size[1], files=files)
+
+    return ImageRenditions(
+        width=width,
+        height=height,
+        renditions={name: renditions[name] for name in RENDITIONS},
+    )
+
+
+def prepare_reference(data: bytes, max_edge: int, quality: int = 90) -> tuple[bytes, str] | None:
+    """缩小并重新编码参考图
+
+    按 EXIF 方向校正后缩放到长边不超过 max_edge（不放大），不保留任何元数据；
+    不透明图片编码为 JPEG，带透明通道的编码为 PNG（厂商均支持这两种格式）。
+
+    Args:
+        data: 原图内容
+        max_edge: 长边像素上限
+        quality: JPEG 质量
+
+    Returns:
+        (编码后的内容, 扩展名)；未安装 Pillow 或原图无法解码时返回 None
+    """
+    if Image is None:
+        return None
+    decoded = decode_image(data)
+    if decoded is None:
+        return None
+
+    image, has_alpha = decoded
+    size = _fit(image.width, image.height, max_edge)
+    if image.size != size:
+        image = image.resize(size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+    buffer = io.BytesIO()
+    if has_alpha:
+        image.save(buffer, format="PNG", optimize=True)
+        return buffer.getvalue(), "png"
+    image.save(buffer, format="JPEG", quality=quality, optimize=True, progressive=True)
+    return buffer.getvalue(), "jpg"
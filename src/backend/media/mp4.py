@@ -0,0 +1,216 @@
+"""
+MP4 faststart 重排与封面帧提取
+
+厂商返回的 MP4 常把 moov（索引）放在文件末尾，浏览器必须先下载到末尾才能开始播放。
+faststart() 把 moov 移到第一个 mdat 之前并修正 stco / co64 中的分块偏移，只重排盒子、
+不重新编码；extract_poster() 调用 ffmpeg（如已安装）截取首帧 JPEG 作为 <video poster>。
+
+均为纯函数，由 MediaProcessor 在进程池中执行。
+"""
+
+import os
+import shutil
+import struct
+import subprocess
+import tempfile
+from dataclasses import dataclass
+
+from src.backend.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 包含 stco / co64 的容器盒子路径上的类型
+_CONTAINERS = {b"moov", b"trak", b"mdia", b"minf", b"stbl", b"edts", b"mvex"}
+
+# ffmpeg 截取封面的超时（秒）
+POSTER_TIMEOUT = 30
+
+
+class MP4Error(ValueError):
+    """MP4 结构无法识别"""
+
+
+@dataclass(frozen=True)
+class Box:
+    """顶层或嵌套盒子
+
+    Attributes:
+        type: 盒子类型（4 字节）
+        start: 盒子起始偏移（含头部）
+        header: 头部长度（8 或 16）
+        size: 盒子总长度
+    """
+
+    type: bytes
+    start: int
+    header: int
+    size: int
+
+    @property
+    def end(self) -> int:
+        return self.start + self.size
+
+
+def iter_boxes(data: bytes | memoryview, start: int = 0, end: int | None = None) -> list[Box]:
+    """解析 [start, end) 范围内的同级盒子
+
+    Raises:
+        MP4Error: 盒子长度越界或无效
+    """
+    end = len(data) if end is None else end
+    boxes = []
+    offset = start
+    while offset + 8 <= end:
+        size, box_type = struct.unpack_from(">I4s", data, offset)
+        header = 8
+        if size == 1:
+            if offset + 16 > end:
+                raise MP4Error("truncated largesize box header")
+            (size,) = struct.unpack_from(">Q", data, offset + 8)
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header or offset + size > end:
+            raise MP4Error(f"invalid size {size} for box {box_type!r} at {offset}")
+        boxes.append(Box(box_type, offset, header, size))
+        offset += size
+    return boxes
+
+
+def is_faststart(data: bytes) -> bool:
+    """moov 是否已位于第一个 mdat 之前"""
+    for box in iter_boxes(data):
+        if box.type == b"moov":
+            return True
+        if box.type == b"mdat":
+            return False
+    return False
+
+
+def _patch_chunk_offsets(moov: bytearray, relocate) -> None:
+    """原地修正 moov 中所有 stco / co64 的分块偏移
+
+    Args:
+        moov: moov 盒子内容（含头部）
+        relocate: 旧文件偏移 -> 新文件偏移
+    """
+
+    def walk(start: int, end: int) -> None:
+        for box in iter_boxes(moov, start, end):
+            body = box.start + box.header
+            if box.type in _CONTAINERS:
+                walk(body, box.end)
+            elif box.type in (b"stco", b"co64"):
+                (count,) = struct.unpack_from(">I", moov, body + 4)
+                fmt, width = (">I", 4) if box.type == b"stco" else (">Q", 8)
+                if body + 8 + count * width > box.end:
+                    raise MP4Error(f"truncated {box.type!r}")
+                for i in range(count):
+                    pos = body + 8 + i * width
+                    (offset,) = struct.unpack_from(fmt, moov, pos)
+                    new_offset = relocate(offset)
+                    if box.type == b"stco" and new_offset > 0xFFFFFFFF:
+                        raise MP4Error("chunk offset overflows stco after relocation")
+                    struct.pack_into(fmt, moov, pos, new_offset)
+
+    moov_box = iter_boxes(moov)[0]
+    walk(moov_box.start + moov_box.header, moov_box.end)
+
+
+def faststart(data: bytes) -> bytes:
+    """把 moov 移到第一个 mdat 之前（不重新编码）
+
+    Args:
+        data: MP4 文件内容
+
+    Returns:
+        重排后的内容；已是 faststart 时原样返回
+
+    Raises:
+        MP4Error: 结构无法识别（无 moov / mdat、分片 MP4、压缩 moov、偏移溢出）
+    """
+    boxes = iter_boxes(data)
+    types = [box.type for box in boxes]
+    if b"moov" not in types or b"mdat" not in types:
+        raise MP4Error("missing moov or mdat")
+    if b"moof" in types:
+        raise MP4Error("fragmented MP4 is not supported")
+    moov_index = types.index(b"moov")
+    first_mdat = types.index(b"mdat")
+    if moov_index < first_mdat:
+        return data
+
+    moov_box = boxes[moov_index]
+    moov = bytearray(data[moov_box.start:moov_box.end])
+    if b"cmov" in moov:
+        for child in iter_boxes(moov, moov_box.header):
+            if child.type == b"cmov":
+                raise MP4Error("compressed moov is not supported")
+
+    # 新布局：第一个 mdat 之前的盒子、moov、其余盒子（保持原顺序）
+    order = boxes[:first_mdat] + [moov_box] + [box for box in boxes[first_mdat:] if box.type != b"moov"]
+    new_start: dict[int, int] = {}
+    position = 0
+    for box in order:
+        new_start[box.start] = position
+        position += box.size
+
+    def relocate(offset: int) -> int:
+        for box in boxes:
+            if box.start <= offset < box.end:
+                return offset - box.start + new_start[box.start]
+        raise MP4Error(f"chunk offset {offset} outside of file")
+
+    _patch_chunk_offsets(moov, relocate)
+    view = memoryview(data)
+    return b"".join(bytes(moov) if box is moov_box else view[box.start:box.end] for box in order)
+
+
+def extract_poster(data: bytes, timeout: float = POSTER_TIMEOUT) -> bytes | None:
+    """用 ffmpeg 截取首帧为 JPEG
+
+    Args:
+        data: MP4 文件内容
+        timeout: ffmpeg 超时（秒）
+
+    Returns:
+        JPEG 内容；未安装 ffmpeg 或截取失败时返回 None
+    """
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        return None
+    fd, path = tempfile.mkstemp(suffix=".mp4")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        result = subprocess.run(
+            [ffmpeg, "-v", "error", "-i", path, "-frames:v", "1", "-q:v", "3", "-f", "image2", "-c:v", "mjpeg", "pipe:1"],
+            capture_output=True,
+            timeout=timeout,
+        )
+    except (OSError, subprocess.TimeoutExpired) as e:
+        logger.warning(f"Poster extraction failed: {e}")
+        return None
+    finally:
+        os.unlink(path)
+    if result.returncode != 0 or not result.stdout:
+        logger.warning(f"Poster extraction failed: {result.stderr.decode('utf-8', 'replace').strip()}")
+        return None
+    return result.stdout
+
+
+def postprocess_video(data: bytes) -> tuple[bytes, bytes | None]:
+    """faststart 重排并截取封面（进程池任务）
+
+    Args:
+        data: MP4 文件内容
+
+    Returns:
+        (重排后的视频, 封面 JPEG)；无法重排时返回原视频，无法截取时封面为 None
+    """
+    try:
+        video = faststart(data)
+    except MP4Error as e:
+        logger.warning(f"MP4 faststart skipped: {e}")
+        video = data
+    return video, extract_poster(video)
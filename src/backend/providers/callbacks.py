@@ -0,0 +1,201 @@
+"""厂商任务完成回调（webhook）
+
+Kling 等异步厂商支持在提交任务时传入 callback_url，任务状态变化时由厂商主动推送。
+启用回调后（配置了 KLING_CALLBACK_BASE_URL），Provider 提交任务时附带由本模块签发的
+回调地址，轮询循环改为等待回调唤醒，只在 KLING_CALLBACK_POLL_INTERVAL 秒内未收到回调时
+才查询一次任务状态作为兜底，轮询请求数降至每个任务一两次。
+
+签名：302.AI 未提供回调签名方案，因此回调地址本身携带签名 —— 提交时为每个任务生成随机 token
+与过期时间 expires，以 KLING_CALLBACK_SECRET 对二者计算 HMAC-SHA256 作为 signature 查询参数。
+提交前厂商任务 ID 未知，提交成功后 Provider 调用 bind() 把 token 绑定到返回的 task_id；回调端点
+校验签名与过期时间，并拒绝通知中的 task_id 与 token 所绑定任务不一致的回调 —— 持有某个任务的
+回调地址不能伪造其他任务的结果。token 只在签发它的进程内有效（重启后旧地址失效，由兜底轮询
+拿到结果）。
+
+去重：厂商可能重复投递同一通知，以 (task_id, task_status, updated_at) 去重，重复通知不再唤醒等待者。
+回调可能先于 Provider 开始等待到达，通知按任务 ID 暂存（有上限），开始等待时立即可取。
+"""
+
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
+from urllib.parse import urlencode
+
+from src.backend.config import config
+
+
+class TaskCallbackHub:
+    """回调地址签发、签名校验、去重与等待者唤醒"""
+
+    def __init__(self, base_url: str, path: str, secret: str = "", ttl: float = 3600, max_entries: int = 1000):
+        """初始化
+
+        Args:
+            base_url: 本服务对厂商可达的外部地址，为空表示不启用回调
+            path: 回调端点路径
+            secret: 签名密钥，为空时随机生成
+            ttl: 回调地址有效期（秒）
+            max_entries: 已签发 token、暂存通知与去重记录的上限
+        """
+        self.base_url = base_url.rstrip("/")
+        self.path = path
+        self._secret = (secret or secrets.token_hex(32)).encode("utf-8")
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # token -> 绑定的厂商任务 ID（提交成功前为 None）
+        self._tokens: OrderedDict[str, str | None] = OrderedDict()
+        self._lock = threading.Lock()
+        self._events: dict[str, threading.Event] = {}
+        self._payloads: OrderedDict[str, dict[str, Any]] = OrderedDict()
+        self._seen: OrderedDict[str, None] = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        """是否启用回调"""
+        return bool(self.base_url)
+
+    def _sign(self, token: str, expires: int) -> str:
+        message = f"{token}.{expires}".encode("utf-8")
+        return hmac.new(self._secret, message, hashlib.sha256).hexdigest()
+
+    def issue(self) -> tuple[str, str]:
+        """为一个待提交的任务签发带签名的回调地址
+
+        Returns:
+            (token, 回调地址)，地址形如 {base_url}{path}?token=...&expires=...&signature=...；
+            提交成功后以 token 调用 bind() 绑定任务
+        """
+        token = secrets.token_urlsafe(16)
+        expires = int(time.time() + self.ttl)
+        with self._lock:
+            self._tokens[token] = None
+            if len(self._tokens) > self.max_entries:
+                self._tokens.popitem(last=False)
+        query = urlencode({"token": token, "expires": expires, "signature": self._sign(token, expires)})
+        return token, f"{self.base_url}{self.path}?{query}"
+
+    def bind(self, token: str, task_id: str) -> None:
+        """把已签发的 token 绑定到厂商返回的任务 ID
+
+        Args:
+            token: issue() 返回的 token
+            task_id: 厂商任务 ID
+        """
+        with self._lock:
+            if token in self._tokens:
+                self._tokens[token] = task_id
+
+    def verify(self, token: str | None, expires: int | None, signature: str | None) -> bool:
+        """校验回调地址上的签名与过期时间
+
+        Args:
+            token: 查询参数 token
+            expires: 查询参数 expires（Unix 时间戳，秒）
+            signature: 查询参数 signature
+
+        Returns:
+            签名有效且未过期
+        """
+        if not token or expires is None or not signature:
+            return False
+        if not hmac.compare_digest(self._sign(token, expires), signature):
+            return False
+        return time.time() <= expires
+
+    def owns(self, token: str, task_id: str) -> bool:
+        """token 是否绑定到该任务
+
+        Args:
+            token: 已通过 verify() 的 token
+            task_id: 通知中的厂商任务 ID
+
+        Returns:
+            False 表示 token 不是本进程签发、尚未绑定或绑定的是其他任务
+        """
+        with self._lock:
+            return self._tokens.get(token) == task_id
+
+    def deliver(self, task_id: str, payload: dict[str, Any]) -> bool:
+        """投递一条任务状态通知
+
+        Args:
+            task_id: 厂商任务 ID
+            payload: 任务数据（task_status, task_result 等，与查询接口的 data 字段一致）
+
+        Returns:
+            False 表示重复通知（已忽略）
+        """
+        dedup_key = f"{task_id}:{payload.get('task_status')}:{payload.get('updated_at')}"
+        with self._lock:
+            if dedup_key in self._seen:
+                return False
+            self._seen[dedup_key] = None
+            if len(self._seen) > self.max_entries:
+                self._seen.popitem(last=False)
+
+            self._payloads[task_id] = payload
+            self._payloads.move_to_end(task_id)
+            if len(self._payloads) > self.max_entries:
+                self._payloads.popitem(last=False)
+            event = self._events.get(task_id)
+        if event is not None:
+            event.set()
+        return True
+
+    def watch(self, task_id: str) -> threading.Event:
+        """开始等待任务的回调
+
+        Args:
+            task_id: 厂商任务 ID
+
+        Returns:
+            收到通知时被置位的事件（已有暂存通知时立即置位）
+        """
+        with self._lock:
+            event = self._events.setdefault(task_id, threading.Event())
+            if task_id in self._payloads:
+                event.set()
+            return event
+
+    def take(self, task_id: str) -> dict[str, Any] | None:
+        """取出最新一条通知并复位事件
+
+        Args:
+            task_id: 厂商任务 ID
+
+        Returns:
+            任务数据，没有新通知时返回 None
+        """
+        with self._lock:
+            event = self._events.get(task_id)
+            if event is not None:
+                event.clear()
+            return self._payloads.pop(task_id, None)
+
+    def unwatch(self, task_id: str) -> None:
+        """停止等待任务的回调，丢弃暂存的通知
+
+        Args:
+            task_id: 厂商任务 ID
+        """
+        with self._lock:
+            self._events.pop(task_id, None)
+            self._payloads.pop(task_id, None)
+
+    def snapshot(self) -> dict[str, Any]:
+        """获取启用状态、等待中的任务数与暂存通知数"""
+        with self._lock:
+            return {"enabled": self.enabled, "watching": len(self._events), "pending": len(self._payloads)}
+
+
+# 单例实例
+kling_callbacks: TaskCallbackHub = TaskCallbackHub(
+    base_url=config.KLING_CALLBACK_BASE_URL,
+    path="/api/v1/callbacks/kling",
+    secret=config.KLING_CALLBACK_SECRET,
+    ttl=config.KLING_CALLBACK_TTL,
+)
@@ -0,0 +1,334 @@
+"""请求上下文、取消传播与截止时间预算
+
+路由层为每个生成请求创建 RequestContext，并通过 contextvars 传递到服务层与 Provider。
+客户端断开时路由层调用 cancel()，停机排空超时时服务层以 CANCEL_SHUTDOWN 原因调用 cancel()，
+各层在以下位置协作式地响应取消:
+    - 服务层等待 Provider 调用时（wait_for），立即放弃等待并中断调用的 HTTP 连接；
+      限流与并发槽位在调用线程真正结束后归还
+    - Provider 重试间隔与 Kling 轮询间隔（sleep）
+    - 每次重试、轮询、下载前（check_cancelled）
+
+请求还可携带截止时间（deadline）。每次重试、轮询与下载的超时通过 budget_timeout()
+截断为剩余预算，剩余预算不足以完成下一次等待时立即抛出 DeadlineExceeded，而不是
+在超时常量（如 Kling 轮询的 1000 秒）耗尽后才失败。
+
+contextvars 不会自动传入自建线程池，提交任务时需用 bind() 包装。
+"""
+
+import contextvars
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterator
+
+
+# 取消原因
+CANCEL_CLIENT_DISCONNECTED = "client disconnected"
+CANCEL_SHUTDOWN = "server shutting down"
+
+
+class RequestCancelled(RuntimeError):
+    """请求已被取消（客户端断开或服务停机）
+
+    Attributes:
+        request_id: 请求 ID
+        reason: 取消原因（CANCEL_CLIENT_DISCONNECTED 或 CANCEL_SHUTDOWN）
+    """
+
+    error_type = "cancelled"
+
+    def __init__(self, request_id: str | None = None, reason: str = CANCEL_CLIENT_DISCONNECTED):
+        self.request_id = request_id
+        self.reason = reason
+        self.retry_after = None
+        super().__init__(f"Request cancelled: {reason}")
+
+    @property
+    def shutdown(self) -> bool:
+        """是否因服务停机而取消（厂商任务应保留以便重启后恢复）"""
+        return self.reason == CANCEL_SHUTDOWN
+
+
+class DeadlineExceeded(RuntimeError):
+    """请求的截止时间预算已耗尽"""
+
+    error_type = "deadline_exceeded"
+
+    def __init__(self, request_id: str | None = None, needed: float | None = None):
+        self.request_id = request_id
+        self.retry_after = None
+        message = "Request deadline exceeded"
+        if needed is not None:
+            message += f": remaining budget cannot cover {needed:.1f}s"
+        super().__init__(message)
+
+
+@dataclass
+class RequestContext:
+    """单个请求的上下文
+
+    Attributes:
+        request_id: 请求 ID（X-Request-ID 或自动生成）
+        deadline: 截止时间（time.monotonic() 时刻），None 表示不限
+        detached: 已转为后台任务，不再响应取消
+        priority: 调度优先级类别 (interactive, batch, background)
+        tenant: 公平调度的租户 key（用户与设计方案），None 表示匿名
+    """
+
+    request_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    deadline: float | None = None
+    detached: bool = False
+    priority: str = "interactive"
+    tenant: str | None = None
+    _cancel_event: threading.Event = field(default_factory=threading.Event, repr=False)
+    _cancel_reason: str = field(default=CANCEL_CLIENT_DISCONNECTED, repr=False)
+    _waiters: set[threading.Event] = field(default_factory=set, repr=False)
+    _children: list["RequestContext"] = field(default_factory=list, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @property
+    def cancelled(self) -> bool:
+        """是否已取消"""
+        return self._cancel_event.is_set()
+
+    def cancel(self, reason: str = CANCEL_CLIENT_DISCONNECTED) -> bool:
+        """取消请求，唤醒所有等待中的调用
+
+        Args:
+            reason: 取消原因；已分离的请求只响应 CANCEL_SHUTDOWN
+
+        Returns:
+            是否生效
+        """
+        with self._lock:
+            if self.detached and reason != CANCEL_SHUTDOWN:
+                return False
+            if not self._cancel_event.is_set():
+                self._cancel_reason = reason
+            self._cancel_event.set()
+            waiters = list(self._waiters)
+            children = list(self._children)
+        for waiter in waiters:
+            waiter.set()
+        for child in children:
+            child.cancel(reason)
+        return True
+
+    def detach(self) -> None:
+        """转为后台任务，此后只有停机才能取消，截止时间也不再适用（客户端已不再等待）"""
+        with self._lock:
+            self.detached = True
+            self.deadline = None
+            children = list(self._children)
+        for child in children:
+            child.detach()
+
+    def child(self) -> "RequestContext":
+        """创建子上下文
+
+        子上下文沿用请求 ID、截止时间、优先级与租户，随父上下文取消与分离，
+        也可单独取消而不影响父上下文（如对冲请求中落败的一路）。
+        """
+        with self._lock:
+            child = RequestContext(
+                request_id=self.request_id,
+                deadline=self.deadline,
+                detached=self.detached,
+                priority=self.priority,
+                tenant=self.tenant,
+            )
+            self._children.append(child)
+            cancelled, reason = self.cancelled, self._cancel_reason
+        if cancelled:
+            child.cancel(reason)
+        return child
+
+    def remaining(self) -> float | None:
+        """剩余预算（秒），未设置截止时间时返回 None"""
+        deadline = self.deadline
+        if deadline is None:
+            return None
+        return deadline - time.monotonic()
+
+    def ensure_budget(self, seconds: float) -> None:
+        """剩余预算不足 seconds 时抛出 DeadlineExceeded
+
+        Raises:
+            DeadlineExceeded: 剩余预算不足
+        """
+        remaining = self.remaining()
+        if remaining is not None and remaining < seconds:
+            raise DeadlineExceeded(self.request_id, seconds)
+
+    def check(self) -> None:
+        """已取消或预算耗尽时抛出异常
+
+        Raises:
+            RequestCancelled: 已取消
+            DeadlineExceeded: 预算耗尽
+        """
+        if self.cancelled:
+            raise RequestCancelled(self.request_id, self._cancel_reason)
+        self.ensure_budget(0.0)
+
+    def budget_timeout(self, timeout: float) -> float:
+        """将单次操作的超时截断为剩余预算
+
+        Args:
+            timeout: 操作自身的超时（秒）
+
+        Returns:
+            min(timeout, 剩余预算)
+
+        Raises:
+            RequestCancelled: 已取消
+            DeadlineExceeded: 预算耗尽
+        """
+        self.check()
+        remaining = self.remaining()
+        return timeout if remaining is None else min(timeout, remaining)
+
+    def sleep(self, seconds: float) -> None:
+        """可被取消打断的 sleep，预算不足以睡完时立即失败
+
+        Raises:
+            RequestCancelled: 等待期间被取消
+            DeadlineExceeded: 剩余预算不足 seconds
+        """
+        self.ensure_budget(seconds)
+        if self._cancel_event.wait(max(0.0, seconds)):
+            raise RequestCancelled(self.request_id, self._cancel_reason)
+
+    def wait_event(self, event: threading.Event, seconds: float) -> bool:
+        """等待 event 最多 seconds 秒，可被取消打断；预算不足 seconds 时只等到预算耗尽
+
+        Args:
+            event: 提前唤醒的事件（如厂商回调到达）
+            seconds: 最长等待时间（秒）
+
+        Returns:
+            event 是否已置位
+
+        Raises:
+            RequestCancelled: 等待期间被取消
+            DeadlineExceeded: 等待期间预算耗尽
+        """
+        with self._lock:
+            self._waiters.add(event)
+        try:
+            self.check()
+            remaining = self.remaining()
+            woke = event.wait(max(0.0, seconds if remaining is None else min(seconds, remaining)))
+        finally:
+            with self._lock:
+                self._waiters.discard(event)
+        self.check()
+        return woke
+
+    def wait_for(self, future: Future) -> Any:
+        """等待 future 完成，被取消或预算耗尽时立即放弃等待
+
+        被放弃的调用在原线程中继续运行，直至其 HTTP 连接被调用方中断或自身检查到取消、超时，结果被丢弃。
+
+        Raises:
+            RequestCancelled: 等待期间被取消
+            DeadlineExceeded: 等待期间预算耗尽
+        """
+        waiter = threading.Event()
+        with self._lock:
+            self._waiters.add(waiter)
+        try:
+            future.add_done_callback(lambda _: waiter.set())
+            while not future.done() and not self.cancelled:
+                remaining = self.remaining()
+                if remaining is not None and remaining <= 0:
+                    break
+                waiter.wait(remaining)
+        finally:
+            with self._lock:
+                self._waiters.discard(waiter)
+        if future.done():
+            return future.result()
+        self.check()
+        raise DeadlineExceeded(self.request_id)
+
+
+_current: contextvars.ContextVar[RequestContext | None] = contextvars.ContextVar(
+    "request_context", default=None
+)
+
+
+def current_context() -> RequestContext | None:
+    """获取当前请求上下文，不在请求中时返回 None"""
+    return _current.get()
+
+
+@contextmanager
+def use_context(ctx: RequestContext) -> Iterator[RequestContext]:
+    """在 with 块内设置当前请求上下文"""
+    token = _current.set(ctx)
+    try:
+        yield ctx
+    finally:
+        _current.reset(token)
+
+
+def check_cancelled() -> None:
+    """当前请求已取消或预算耗尽时抛出 RequestCancelled / DeadlineExceeded"""
+    ctx = _current.get()
+    if ctx is not None:
+        ctx.check()
+
+
+def budget_timeout(timeout: float) -> float:
+    """将单次操作的超时截断为当前请求的剩余预算，不在请求中时原样返回
+
+    Raises:
+        RequestCancelled: 已取消
+        DeadlineExceeded: 预算耗尽
+    """
+    ctx = _current.get()
+    if ctx is None:
+        return timeout
+    return ctx.budget_timeout(timeout)
+
+
+def remaining_budget() -> float | None:
+    """当前请求的剩余预算（秒），不在请求中或未设置截止时间时返回 None"""
+    ctx = _current.get()
+    return None if ctx is None else ctx.remaining()
+
+
+def sleep(seconds: float) -> None:
+    """可被当前请求取消打断的 sleep（预算不足时立即失败），不在请求中时等同 time.sleep"""
+    ctx = _current.get()
+    if ctx is None:
+        time.sleep(seconds)
+    else:
+        ctx.sleep(seconds)
+
+
+def wait_event(event: threading.Event, seconds: float) -> bool:
+    """等待 event 最多 seconds 秒，可被当前请求取消打断，不在请求中时等同 event.wait
+
+    Returns:
+        event 是否已置位
+    """
+    ctx = _current.get()
+    if ctx is None:
+        return event.wait(seconds)
+    return ctx.wait_event(event, seconds)
+
+
+def bind(fn: Callable[..., Any]) -> Callable[..., Any]:
+    """将 fn 绑定到当前请求上下文（连同调用会话等其他 contextvars），用于提交到自建线程池"""
+    snapshot = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        # 同一 Context 不能在多个线程中同时进入，每次执行使用副本
+        return snapshot.copy().run(fn, *args, **kwargs)
+
+    return run
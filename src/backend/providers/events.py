@@ -0,0 +1,179 @@
+"""任务进度事件
+
+生成请求以请求 ID（X-Request-ID）作为任务 ID，各层在关键节点发布事件，经 /ws 推送给订阅者，
+前端不必为每个任务保持一个长 HTTP 连接或轮询 GET /api/v1/jobs/{job_id}:
+
+    - queued: 通过准入控制，等待调度（路由层）
+    - started: 拿到调度、限流与并发槽位，开始调用厂商（服务层）
+    - retry: 单次厂商请求失败后重试（Provider）
+    - task_status: Kling 任务状态变化（Provider）
+    - download: 结果下载进度（Provider，仅在有订阅者时分块下载）
+    - done: 拿到最终结果（路由层）
+
+所有事件经同一个 JobEventBus 广播：发布方只按任务 ID 查找订阅者并逐个投递，每条 WebSocket
+连接是一个订阅者，可同时关注多个任务。每个任务保留最近的若干事件，晚于事件订阅的连接
+订阅时先收到回放。
+
+Provider 在请求线程中调用 emit()，任务 ID 取自当前请求上下文，不在请求中时不发布。
+"""
+
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable
+
+from .context import current_context
+
+# 事件类型
+EVENT_QUEUED = "queued"
+EVENT_STARTED = "started"
+EVENT_RETRY = "retry"
+EVENT_TASK_STATUS = "task_status"
+EVENT_DOWNLOAD = "download"
+EVENT_DONE = "done"
+
+
+class Subscription:
+    """一个订阅者（如一条 WebSocket 连接）
+
+    Attributes:
+        deliver: 投递事件的回调，在发布方线程中调用，不得阻塞
+        jobs: 关注的任务 ID
+    """
+
+    def __init__(self, deliver: Callable[[dict[str, Any]], None]):
+        self.deliver = deliver
+        self.jobs: set[str] = set()
+
+
+class JobEventBus:
+    """任务事件广播"""
+
+    def __init__(self, max_jobs: int = 1000, events_per_job: int = 32):
+        """初始化
+
+        Args:
+            max_jobs: 保留事件回放的任务数上限
+            events_per_job: 每个任务保留的最近事件数
+        """
+        self.max_jobs = max_jobs
+        self.events_per_job = events_per_job
+        self._lock = threading.Lock()
+        self._followers: dict[str, set[Subscription]] = {}
+        self._history: OrderedDict[str, deque[dict[str, Any]]] = OrderedDict()
+        self._subscriptions: set[Subscription] = set()
+
+    def subscribe(self, deliver: Callable[[dict[str, Any]], None]) -> Subscription:
+        """注册订阅者
+
+        Args:
+            deliver: 投递事件的回调（在发布方线程中调用，不得阻塞）
+
+        Returns:
+            订阅对象，用于 follow / unfollow / unsubscribe
+        """
+        subscription = Subscription(deliver)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def follow(self, subscription: Subscription, job_id: str) -> None:
+        """关注一个任务，先回放该任务已发布的事件
+
+        Args:
+            subscription: 订阅对象
+            job_id: 任务 ID
+        """
+        with self._lock:
+            if job_id in subscription.jobs:
+                return
+            subscription.jobs.add(job_id)
+            self._followers.setdefault(job_id, set()).add(subscription)
+            replay = list(self._history.get(job_id, ()))
+        for event in replay:
+            subscription.deliver(event)
+
+    def unfollow(self, subscription: Subscription, job_id: str) -> None:
+        """取消关注一个任务
+
+        Args:
+            subscription: 订阅对象
+            job_id: 任务 ID
+        """
+        with self._lock:
+            subscription.jobs.discard(job_id)
+            followers = self._followers.get(job_id)
+            if followers is not None:
+                followers.discard(subscription)
+                if not followers:
+                    del self._followers[job_id]
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """注销订阅者
+
+        Args:
+            subscription: 订阅对象
+        """
+        for job_id in list(subscription.jobs):
+            self.unfollow(subscription, job_id)
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def watched(self, job_id: str) -> bool:
+        """任务是否有订阅者（无人关注时可跳过开销较大的进度上报）"""
+        return job_id in self._followers
+
+    def publish(self, job_id: str, event: str, **data: Any) -> dict[str, Any]:
+        """发布事件
+
+        Args:
+            job_id: 任务 ID
+            event: 事件类型
+            **data: 事件数据
+
+        Returns:
+            发布的事件（job_id, event, ts 与 data 字段）
+        """
+        payload = {"job_id": job_id, "event": event, "ts": time.time(), **data}
+        with self._lock:
+            history = self._history.get(job_id)
+            if history is None:
+                history = self._history[job_id] = deque(maxlen=self.events_per_job)
+                if len(self._history) > self.max_jobs:
+                    self._history.popitem(last=False)
+            history.append(payload)
+            followers = list(self._followers.get(job_id, ()))
+        for subscription in followers:
+            subscription.deliver(payload)
+        return payload
+
+    def snapshot(self) -> dict[str, int]:
+        """获取订阅者数、被关注的任务数与保留回放的任务数"""
+        with self._lock:
+            return {
+                "subscribers": len(self._subscriptions),
+                "followed_jobs": len(self._followers),
+                "jobs": len(self._history),
+            }
+
+
+# 单例实例
+job_events: JobEventBus = JobEventBus()
+
+
+def emit(event: str, **data: Any) -> None:
+    """以当前请求 ID 为任务 ID 发布事件，不在请求中时忽略
+
+    Args:
+        event: 事件类型
+        **data: 事件数据
+    """
+    ctx = current_context()
+    if ctx is not None:
+        job_events.publish(ctx.request_id, event, **data)
+
+
+def watched() -> bool:
+    """当前请求是否有订阅者"""
+    ctx = current_context()
+    return ctx is not None and job_events.watched(ctx.request_id)
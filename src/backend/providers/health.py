@@ -0,0 +1,242 @@
+"""Provider 熔断与健康评分
+
+每个 Provider 实例持有一个 CircuitBreaker，记录滚动窗口内的调用成功率与延迟:
+
+    CLOSED ──失败率/连续失败超阈值──▶ OPEN ──冷却期结束──▶ HALF_OPEN
+       ▲                                                    │
+       └──────────────────探测成功──────────────────────────┘
+                                  （探测失败则重新 OPEN）
+
+健康评分 (0-1) = 成功率 × 延迟因子，OPEN 状态为 0，用于 /providers 展示与路由决策。
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Any, Callable
+
+from src.backend.config import config
+from src.backend.services.metrics import percentile
+
+
+class CircuitOpenError(Exception):
+    """熔断器处于打开状态，拒绝调用
+
+    Attributes:
+        vendor: 厂商名称
+        retry_after: 距离允许探测的秒数
+    """
+
+    error_type = "circuit_open"
+
+    def __init__(self, vendor: str, retry_after: float):
+        self.vendor = vendor
+        self.retry_after = retry_after
+        super().__init__(
+            f"Provider '{vendor}' circuit is open, retry after {retry_after:.1f}s"
+        )
+
+
+class CircuitBreaker:
+    """熔断器与滚动健康统计
+
+    Attributes:
+        state: 当前状态 (closed, open, half_open)
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        latency_slo: float,
+        window_seconds: float | None = None,
+        min_calls: int | None = None,
+        failure_rate_threshold: float | None = None,
+        consecutive_failures: int | None = None,
+        open_seconds: float | None = None,
+        half_open_max_calls: int = 1,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """初始化熔断器
+
+        Args:
+            latency_slo: 期望的 p95 延迟（秒），超出时健康评分按比例下降
+            window_seconds: 滚动统计窗口（秒）
+            min_calls: 按失败率判断熔断所需的最少调用数
+            failure_rate_threshold: 失败率阈值 (0-1)
+            consecutive_failures: 连续失败次数阈值（低流量时快速熔断）
+            open_seconds: 打开状态持续时间（秒），之后进入半开探测
+            half_open_max_calls: 半开状态允许的并发探测数
+            clock: 单调时钟（测试时可替换）
+        """
+        self.latency_slo = latency_slo
+        self.window_seconds = window_seconds or config.CIRCUIT_BREAKER_WINDOW
+        self.min_calls = min_calls or config.CIRCUIT_BREAKER_MIN_CALLS
+        self.failure_rate_threshold = failure_rate_threshold or config.CIRCUIT_BREAKER_FAILURE_RATE
+        self.consecutive_failures = consecutive_failures or config.CIRCUIT_BREAKER_CONSECUTIVE_FAILURES
+        self.open_seconds = open_seconds or config.CIRCUIT_BREAKER_OPEN_SECONDS
+        self.half_open_max_calls = half_open_max_calls
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._calls: deque[tuple[float, bool, float]] = deque()
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._consecutive = 0
+        self._probes = 0
+
+    # -------------------------------------------------------------------------
+    # 状态
+    # -------------------------------------------------------------------------
+
+    def _current_state(self, now: float) -> str:
+        """获取状态（冷却期结束后 OPEN 自动转为 HALF_OPEN）"""
+        if self._state == self.OPEN and now - self._opened_at >= self.open_seconds:
+            self._state = self.HALF_OPEN
+            self._probes = 0
+        return self._state
+
+    @property
+    def state(self) -> str:
+        """当前状态"""
+        with self._lock:
+            return self._current_state(self._clock())
+
+    def is_open(self) -> bool:
+        """熔断器是否处于打开状态（拒绝所有调用）"""
+        return self.state == self.OPEN
+
+    def retry_after(self) -> float:
+        """距离允许下一次探测的秒数"""
+        with self._lock:
+            now = self._clock()
+            if self._current_state(now) != self.OPEN:
+                return 0.0
+            return max(0.0, self.open_seconds - (now - self._opened_at))
+
+    def allow_request(self) -> bool:
+        """是否允许发起调用（半开状态下会占用一个探测名额）"""
+        with self._lock:
+            state = self._current_state(self._clock())
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and self._probes < self.half_open_max_calls:
+                self._probes += 1
+                return True
+            return False
+
+    def abandon_request(self) -> None:
+        """放弃已获准的调用（如被限流拒绝），归还半开探测名额"""
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._probes = max(0, self._probes - 1)
+
+    def _open(self, now: float) -> None:
+        self._state = self.OPEN
+        self._opened_at = now
+        self._probes = 0
+
+    # -------------------------------------------------------------------------
+    # 记录
+    # -------------------------------------------------------------------------
+
+    def _prune(self, now: float) -> None:
+        """移除窗口外的记录"""
+        while self._calls and now - self._calls[0][0] > self.window_seconds:
+            self._calls.popleft()
+
+    def record_success(self, latency: float) -> None:
+        """记录一次成功调用"""
+        with self._lock:
+            now = self._clock()
+            self._calls.append((now, True, latency))
+            self._prune(now)
+            self._consecutive = 0
+            if self._current_state(now) == self.HALF_OPEN:
+                # 探测成功，恢复并清空旧的失败记录
+                self._state = self.CLOSED
+                self._calls = deque([(now, True, latency)])
+
+    def record_failure(self, latency: float) -> None:
+        """记录一次失败调用"""
+        with self._lock:
+            now = self._clock()
+            self._calls.append((now, False, latency))
+            self._prune(now)
+            self._consecutive += 1
+            state = self._current_state(now)
+            if state == self.HALF_OPEN:
+                self._open(now)
+                return
+            if state != self.CLOSED:
+                return
+            failures = sum(1 for _, ok, _ in self._calls if not ok)
+            if self._consecutive >= self.consecutive_failures or (
+                len(self._calls) >= self.min_calls
+                and failures / len(self._calls) >= self.failure_rate_threshold
+            ):
+                self._open(now)
+
+    def reset(self) -> None:
+        """重置为初始状态"""
+        with self._lock:
+            self._calls.clear()
+            self._state = self.CLOSED
+            self._consecutive = 0
+            self._probes = 0
+
+    # -------------------------------------------------------------------------
+    # 统计
+    # -------------------------------------------------------------------------
+
+    def _stats(self, now: float) -> dict[str, Any]:
+        self._prune(now)
+        total = len(self._calls)
+        successes = [latency for _, ok, latency in self._calls if ok]
+        latencies = [latency for _, _, latency in self._calls]
+        return {
+            "calls": total,
+            "success_rate": len(successes) / total if total else None,
+            "p50": percentile(successes, 50),
+            "p95": percentile(successes, 95),
+            "p95_all": percentile(latencies, 95),
+        }
+
+    def _score(self, state: str, stats: dict[str, Any]) -> float:
+        if state == self.OPEN:
+            return 0.0
+        success_rate = stats["success_rate"]
+        if success_rate is None:
+            # 无调用记录时视为健康
+            success_rate = 1.0
+        latency_factor = 1.0
+        p95 = stats["p95_all"]
+        if p95 and p95 > self.latency_slo:
+            latency_factor = self.latency_slo / p95
+        score = success_rate * latency_factor
+        if state == self.HALF_OPEN:
+            score *= 0.5
+        return round(score, 3)
+
+    def health_score(self) -> float:
+        """健康评分 (0-1)"""
+        with self._lock:
+            now = self._clock()
+            state = self._current_state(now)
+            return self._score(state, self._stats(now))
+
+    def snapshot(self) -> dict[str, Any]:
+        """获取熔断状态与滚动统计"""
+        with self._lock:
+            now = self._clock()
+            state = self._current_state(now)
+            stats = self._stats(now)
+            return {
+                "state": state,
+                "score": self._score(state, stats),
+                "calls": stats["calls"],
+                "success_rate": stats["success_rate"],
+                "latency_p50": stats["p50"],
+                "latency_p95": stats["p95"],
+            }
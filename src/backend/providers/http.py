@@ -0,0 +1,230 @@
+"""Provider HTTP 工具
+
+Provider 的厂商请求与结果下载统一经由 get() / post() 发出，供各 Provider 共用:
+
+    - 服务层在请求上下文中调用 Provider 时，为每次调用创建一个 CallSession（use_session()）。
+      请求被取消或预算耗尽时服务层调用 abort()，关闭该会话所有连接的套接字，阻塞中的读取
+      （如图生图最长 300 秒的同步等待）随即失败并转为 RequestCancelled / DeadlineExceeded
+    - 不在调用会话中（脚本、测试）时直接使用 requests 模块函数
+
+下载超时按请求的剩余预算截断，已取消或预算耗尽时不再下载。
+当前请求有进度订阅者（/ws）时分块下载并发布 download 事件，每块之间检查取消。
+"""
+
+import contextvars
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from .context import bind, budget_timeout, check_cancelled
+from .events import EVENT_DOWNLOAD, emit, watched
+
+# 结果下载超时（秒）
+DOWNLOAD_TIMEOUT = 60
+
+# 并行下载的最大线程数
+MAX_PARALLEL_DOWNLOADS = 8
+
+# 分块下载的块大小（字节）
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+class CallSession(requests.Session):
+    """可中断的 HTTP 会话（每次 Provider 调用一个）
+
+    记录会话建立的全部连接，abort() 关闭它们的套接字：阻塞中的读取立即失败，
+    此后新建的连接在建立后立即断开。经由 SOCKS 代理的连接无法中断。
+
+    Attributes:
+        aborted: 是否已中断
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.aborted = False
+        self._connections: list[Any] = []
+        self._lock = threading.Lock()
+        adapter = _AbortableAdapter(self)
+        self.mount("http://", adapter)
+        self.mount("https://", adapter)
+
+    def register(self, connection: Any) -> None:
+        """登记新建立的连接，会话已中断时立即断开
+
+        Raises:
+            ConnectionAbortedError: 会话已中断
+        """
+        with self._lock:
+            if not self.aborted:
+                self._connections.append(connection)
+                return
+        _shutdown(connection)
+        raise ConnectionAbortedError("HTTP session aborted")
+
+    def abort(self) -> None:
+        """中断会话：关闭全部连接的套接字并关闭会话"""
+        with self._lock:
+            self.aborted = True
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            _shutdown(connection)
+        self.close()
+
+
+def _shutdown(connection: Any) -> None:
+    """关闭连接的套接字，唤醒阻塞在读取上的线程"""
+    sock = getattr(connection, "sock", None)
+    if sock is None:
+        return
+    try:
+        # 直接关闭底层套接字，不经过 SSLSocket 的 TLS 关闭流程
+        socket.socket.shutdown(sock, socket.SHUT_RDWR)
+    except OSError:
+        pass
+
+
+def _abortable_pool(pool_cls: type, session: CallSession) -> type:
+    """构建连接建立后登记到 session 的连接池类"""
+
+    class Connection(pool_cls.ConnectionCls):
+        def connect(self) -> None:
+            super().connect()
+            session.register(self)
+
+    return type(pool_cls.__name__, (pool_cls,), {"ConnectionCls": Connection})
+
+
+class _AbortableAdapter(HTTPAdapter):
+    """连接可被 CallSession.abort() 中断的适配器"""
+
+    def __init__(self, session: CallSession):
+        # init_poolmanager 在父类构造函数中调用，需先设置连接池类
+        self._pool_classes = {
+            "http": _abortable_pool(HTTPConnectionPool, session),
+            "https": _abortable_pool(HTTPSConnectionPool, session),
+        }
+        super().__init__()
+
+    def init_poolmanager(self, *args, **kwargs) -> None:
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = self._pool_classes
+
+    def proxy_manager_for(self, proxy: str, **proxy_kwargs):
+        manager = super().proxy_manager_for(proxy, **proxy_kwargs)
+        if not proxy.lower().startswith("socks"):
+            manager.pool_classes_by_scheme = self._pool_classes
+        return manager
+
+
+_session: contextvars.ContextVar[CallSession | None] = contextvars.ContextVar("call_session", default=None)
+
+
+@contextmanager
+def use_session(session: CallSession) -> Iterator[CallSession]:
+    """在 with 块内通过 session 发出 get() / post() 请求（bind() 包装的子线程同样生效）"""
+    token = _session.set(session)
+    try:
+        yield session
+    finally:
+        _session.reset(token)
+
+
+def _send(method: str, url: str, **kwargs) -> requests.Response:
+    """发出请求：处于调用会话中时使用该会话，会话被中断导致的失败转为取消或预算耗尽"""
+    session = _session.get()
+    if session is None:
+        return getattr(requests, method)(url, **kwargs)
+    try:
+        return getattr(session, method)(url, **kwargs)
+    except requests.RequestException:
+        if session.aborted:
+            check_cancelled()
+        raise
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    """发出 GET 请求，参数同 requests.get
+
+    Raises:
+        requests.RequestException: 请求失败
+        RequestCancelled: 调用会话因请求取消被中断
+        DeadlineExceeded: 调用会话因预算耗尽被中断
+    """
+    return _send("get", url, **kwargs)
+
+
+def post(url: str, **kwargs) -> requests.Response:
+    """发出 POST 请求，参数同 requests.post
+
+    Raises:
+        requests.RequestException: 请求失败
+        RequestCancelled: 调用会话因请求取消被中断
+        DeadlineExceeded: 调用会话因预算耗尽被中断
+    """
+    return _send("post", url, **kwargs)
+
+
+def download(url: str, timeout: float = DOWNLOAD_TIMEOUT) -> bytes:
+    """下载单个结果文件
+
+    Args:
+        url: 文件 URL
+        timeout: 超时时间（秒），不超过请求的剩余预算
+
+    Returns:
+        文件二进制数据
+
+    Raises:
+        requests.RequestException: 下载失败
+        RequestCancelled: 请求已取消
+        DeadlineExceeded: 请求预算耗尽
+    """
+    if not watched():
+        response = get(url, timeout=budget_timeout(timeout))
+        response.raise_for_status()
+        return response.content
+
+    response = get(url, timeout=budget_timeout(timeout), stream=True)
+    with response:
+        response.raise_for_status()
+        total = int(response.headers.get("Content-Length") or 0) or None
+        chunks: list[bytes] = []
+        received = 0
+        emit(EVENT_DOWNLOAD, url=url, received=0, total=total)
+        try:
+            for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                check_cancelled()
+                chunks.append(chunk)
+                received += len(chunk)
+                emit(EVENT_DOWNLOAD, url=url, received=received, total=total)
+        except requests.RequestException:
+            # 调用会话被中断时读取失败，按取消或预算耗尽处理
+            check_cancelled()
+            raise
+    return b"".join(chunks)
+
+
+def download_all(urls: list[str], timeout: float = DOWNLOAD_TIMEOUT) -> list[bytes]:
+    """并行下载多个结果文件，结果顺序与 urls 一致
+
+    Args:
+        urls: 文件 URL 列表
+        timeout: 单个文件的超时时间（秒）
+
+    Returns:
+        文件二进制数据列表
+
+    Raises:
+        requests.RequestException: 任一文件下载失败
+    """
+    if len(urls) <= 1:
+        return [download(url, timeout) for url in urls]
+
+    with ThreadPoolExecutor(max_workers=min(len(urls), MAX_PARALLEL_DOWNLOADS)) as executor:
+        return list(executor.map(bind(lambda url: download(url, timeout)), urls))
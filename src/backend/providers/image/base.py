@@ -7,6 +7,7 @@ Image Provider 抽象基类
 from abc import ABC, abstractmethod
 from typing import Any
 
+from ..health import CircuitBreaker
 from ..param_spec import ParamSpec
 
 
@@ -20,7 +21,12 @@ class BaseImageProvider(ABC):
         api_key: API 密钥
         model_name: 模型名称
         client: 底层 API 客户端实例
+        circuit_breaker: 熔断器，记录调用成功率与延迟
         GENERATE_PARAMS: generate 方法参数规范（子类应覆盖）
+        LATENCY_SLO: 期望的 p95 延迟（秒），用于健康评分
+        COST_PER_CALL: 单张图片价格（PTC），None 表示未知，用于自动路由
+        REFERENCE_IMAGE_EDGE: 参考图预处理的长边像素上限，None 使用配置 REFERENCE_IMAGE_MAX_EDGE
+        NATIVE_MULTI_IMAGE: 单次厂商请求可返回多张图片（generate_images 只发起一次请求）
 
     示例:
         >>> class CustomProvider(BaseImageProvider):
@@ -31,6 +37,19 @@ class BaseImageProvider(ABC):
     # 子类应覆盖此属性定义参数规范
     GENERATE_PARAMS: tuple[ParamSpec, ...] = ()
 
+    # 期望的 p95 延迟（秒），子类可覆盖
+    LATENCY_SLO: float = 60
+
+    # 单张图片价格（PTC），子类可覆盖；价格随参数变化时覆盖 estimate_cost
+    COST_PER_CALL: float | None = None
+
+    # 参考图预处理的长边像素上限（按输出尺寸），子类可覆盖；随参数变化时覆盖 reference_image_edge
+    REFERENCE_IMAGE_EDGE: int | None = None
+
+    # 单次厂商请求可返回多张图片时子类覆盖为 True；否则服务层按张分别调度 generate()，
+    # 每张各占一次限流与并发槽位
+    NATIVE_MULTI_IMAGE: bool = False
+
     def __init__(self, api_key: str, model_name: str):
         """初始化 Image 提供商
 
@@ -41,6 +60,7 @@ class BaseImageProvider(ABC):
         self.api_key = api_key
         self.model_name = model_name
         self.client = None
+        self.circuit_breaker = CircuitBreaker(latency_slo=self.LATENCY_SLO)
 
     @abstractmethod
     def generate(self, prompt: str, **kwargs) -> bytes:
@@ -58,13 +78,28 @@ class BaseImageProvider(ABC):
         """
         pass
 
+    def generate_images(self, prompt: str, num_images: int = 1, **kwargs) -> list[bytes]:
+        """生成多张图片
+
+        默认实现逐次调用 generate()，支持单次调用返回多图的厂商应覆盖此方法并设置 NATIVE_MULTI_IMAGE。
+
+        Args:
+            prompt: 图片描述提示词（必填）
+            num_images: 图片数量
+            **kwargs: 厂商特定参数
+
+        Returns:
+            图片数据列表（bytes 格式）
+        """
+        return [self.generate(prompt, **kwargs) for _ in range(max(1, num_images))]
+
     def is_available(self) -> bool:
         """检查客户端是否可用
 
         Returns:
-            bool: 客户端是否已成功初始化
+            bool: 客户端已成功初始化且熔断器未打开
         """
-        return self.client is not None
+        return self.client is not None and not self.circuit_breaker.is_open()
 
     @classmethod
     def get_exposed_params(cls) -> list[ParamSpec]:
@@ -86,6 +121,32 @@ class BaseImageProvider(ABC):
         """
         return {p.name: p for p in cls.GENERATE_PARAMS}
 
+    @classmethod
+    def estimate_cost(cls, **kwargs) -> float | None:
+        """估算单次调用价格
+
+        Args:
+            **kwargs: 调用参数（num_images 按张数计价）
+
+        Returns:
+            价格（PTC），未知返回 None
+        """
+        if cls.COST_PER_CALL is None:
+            return None
+        return cls.COST_PER_CALL * kwargs.get("num_images", 1)
+
+    @classmethod
+    def reference_image_edge(cls, **kwargs) -> int | None:
+        """参考图预处理时缩小到的长边像素数（不超过输出尺寸即可，更大的参考图只增加厂商拉取时间）
+
+        Args:
+            **kwargs: 调用参数
+
+        Returns:
+            长边像素上限，None 使用配置默认值
+        """
+        return cls.REFERENCE_IMAGE_EDGE
+
     @classmethod
     def get_provider_info(cls) -> dict[str, Any]:
         """获取 Provider 信息
@@ -25,10 +25,16 @@ API 文档:
 """
 
 import time
+from concurrent.futures import ThreadPoolExecutor
 import requests
 from src.backend.config import config
 from src.backend.logger import logger
+from ..context import bind, budget_timeout, sleep
+from ..events import EVENT_RETRY, emit
+from .. import http
+from ..http import download
 from ..param_spec import ParamSpec
+from ..transfer import INLINE, URL, choose_transfer_mode, decode_inline, estimate_output_bytes, transfer_stats
 from .base import BaseImageProvider
 
 
@@ -70,6 +76,7 @@ class ThirtyTwoNanoBananaProvider(BaseImageProvider):
             description="参考图片 URL 列表，用于图生图功能",
             choices=None,
             required=False,
+            canonical="reference_images",
         ),
         ParamSpec(
             name="resolution",
@@ -89,12 +96,21 @@ class ThirtyTwoNanoBananaProvider(BaseImageProvider):
             choices=["1:1", "3:4", "4:3", "9:16", "16:9", "2:3", "3:2"],
             required=False,
         ),
+        ParamSpec(
+            name="num_images",
+            type=int,
+            exposed=True,
+            default=1,
+            description="生成图片数量，多张时并行请求",
+            choices=[1, 2, 3, 4],
+            required=False,
+        ),
         ParamSpec(
             name="enable_base64_output",
             type=bool,
             exposed=False,
-            default=False,
-            description="是否返回 base64 编码的图片数据（内部参数）",
+            default=None,
+            description="是否返回 base64 编码的图片数据（内部参数），None 时按预估输出大小自动选择",
             choices=None,
             required=False,
         ),
@@ -115,6 +131,13 @@ class ThirtyTwoNanoBananaProvider(BaseImageProvider):
     MAX_RETRIES = 3
     RETRY_DELAY = 2
 
+    # 价格（PTC/次）：1K/2K 0.08，4K 0.16
+    COST_PER_CALL = 0.08
+    COST_PER_CALL_4K = 0.16
+
+    # 各分辨率的预估边长（用于选择传输方式）
+    RESOLUTION_EDGES = {"1k": 1024, "2k": 2048, "4k": 4096}
+
     def __init__(self):
         super().__init__(
             api_key=config.THIRTYTWO_API_KEY or "",
@@ -131,30 +154,78 @@ class ThirtyTwoNanoBananaProvider(BaseImageProvider):
             self.client = None
             logger.debug("ThirtyTwoNanoBananaProvider not initialized - THIRTYTWO_GEMINI_IMAGE_API_KEY or THIRTYTWO_API_KEY not configured")
 
+    @classmethod
+    def estimate_cost(cls, **kwargs) -> float | None:
+        """估算单次调用价格（按分辨率计价）"""
+        per_image = cls.COST_PER_CALL
+        if str(kwargs.get("resolution", "2k")).lower() == "4k":
+            per_image = cls.COST_PER_CALL_4K
+        return per_image * kwargs.get("num_images", 1)
+
+    @classmethod
+    def reference_image_edge(cls, **kwargs) -> int | None:
+        """参考图缩小到输出分辨率的边长"""
+        return cls.RESOLUTION_EDGES.get(str(kwargs.get("resolution") or "2k").lower())
+
     def generate(
         self,
         prompt: str,
         images: list[str] | None = None,
         resolution: str = "2k",
         aspect_ratio: str = "3:4",
-        enable_base64_output: bool = False,
+        enable_base64_output: bool | None = None,
         enable_sync_mode: bool = True,
         **kwargs
     ) -> bytes:
-        """生成图片
+        """生成单张图片
+
+        参数说明见 generate_images()。
+
+        Returns:
+            bytes: 图片二进制数据
+        """
+        return self.generate_images(
+            prompt,
+            num_images=1,
+            images=images,
+            resolution=resolution,
+            aspect_ratio=aspect_ratio,
+            enable_base64_output=enable_base64_output,
+            enable_sync_mode=enable_sync_mode,
+            **kwargs,
+        )[0]
+
+    def generate_images(
+        self,
+        prompt: str,
+        num_images: int = 1,
+        images: list[str] | None = None,
+        resolution: str = "2k",
+        aspect_ratio: str = "3:4",
+        enable_base64_output: bool | None = None,
+        enable_sync_mode: bool = True,
+        **kwargs
+    ) -> list[bytes]:
+        """生成图片（支持多张）
+
+        接口每次返回一张图片，num_images 大于 1 时并行发起多个请求，
+        总延迟约等于单次请求。服务层不经过此方法，而是按张分别调度 generate()，
+        使每个厂商请求各占一次限流与并发槽位。
 
         Args:
             prompt: 图片描述提示词（必填）
+            num_images: 图片数量
             images: 参考图片 URL 列表，用于图生图功能
                     当提供此参数时，将使用图片编辑接口
             resolution: 图片分辨率，可选值: "1k", "2k", "4k"
             aspect_ratio: 宽高比，如 "3:4", "1:1", "16:9"
             enable_base64_output: 是否返回 base64 编码的图片数据
+                                  None 时按预估输出大小选择：小图内联返回，省掉二次下载
             enable_sync_mode: 是否启用同步模式
             **kwargs: 其他厂商特定参数
 
         Returns:
-            bytes: 图片二进制数据
+            list[bytes]: 图片二进制数据列表
 
         Raises:
             ValueError: API 密钥未配置
@@ -169,6 +240,8 @@ class ThirtyTwoNanoBananaProvider(BaseImageProvider):
             ...     "变成卡通风格",
             ...     images=["https://example.com/dog.jpg"]
             ... )
+            >>> # 一次生成 4 张
+            >>> variants = provider.generate_images("一只柯基犬", num_images=4)
         """
         if not self.is_available():
             raise ValueError("ThirtyTwoNanoBananaProvider not available - check THIRTYTWO_GEMINI_IMAGE_API_KEY or THIRTYTWO_API_KEY")
@@ -179,14 +252,16 @@ class ThirtyTwoNanoBananaProvider(BaseImageProvider):
         else:
             api_url = self.api_base_text_to_image
 
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
+        resolution = resolution or self.default_resolution
+
+        # 传输方式：每次请求返回一张图，按单张大小选择
+        if enable_base64_output is None:
+            edge = self.RESOLUTION_EDGES.get(str(resolution).lower(), self.RESOLUTION_EDGES["4k"])
+            enable_base64_output = choose_transfer_mode(estimate_output_bytes(edge, edge)) == INLINE
 
         payload = {
             "prompt": prompt,
-            "resolution": resolution or self.default_resolution,
+            "resolution": resolution,
             "aspect_ratio": aspect_ratio,
             "enable_base64_output": enable_base64_output,
             "enable_sync_mode": enable_sync_mode,
@@ -199,24 +274,60 @@ class ThirtyTwoNanoBananaProvider(BaseImageProvider):
         # 添加额外的参数
         payload.update(kwargs)
 
+        num_images = max(1, num_images)
+        if num_images == 1:
+            return self._request_images(api_url, payload, bool(images))
+
+        with ThreadPoolExecutor(max_workers=num_images) as executor:
+            futures = [
+                executor.submit(bind(self._request_images), api_url, payload, bool(images))
+                for _ in range(num_images)
+            ]
+            results = [image for future in futures for image in future.result()]
+        return results[:num_images]
+
+    def _request_images(self, api_url: str, payload: dict, image_to_image: bool) -> list[bytes]:
+        """发起一次生成请求并下载全部输出（含重试）
+
+        Args:
+            api_url: API 端点
+            payload: 请求体
+            image_to_image: 是否为图生图
+
+        Returns:
+            list[bytes]: 图片二进制数据列表
+
+        Raises:
+            RuntimeError: API 请求失败
+        """
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+
         # 根据模式选择超时时间
-        timeout = self.TIMEOUT_IMAGE_TO_IMAGE if images else self.TIMEOUT_TEXT_TO_IMAGE
+        timeout = self.TIMEOUT_IMAGE_TO_IMAGE if image_to_image else self.TIMEOUT_TEXT_TO_IMAGE
+
+        transfer_mode = INLINE if payload.get("enable_base64_output") else URL
 
         # 重试逻辑
         last_error = None
+        start = time.monotonic()
         for attempt in range(self.MAX_RETRIES):
+            # 每次尝试只使用剩余预算，预算耗尽时立即失败
+            attempt_timeout = budget_timeout(timeout)
             try:
                 logger.info(
-                    f"Generating image with prompt: {prompt[:50]}... "
-                    f"(mode: {'image-to-image' if images else 'text-to-image'}, "
+                    f"Generating image with prompt: {payload['prompt'][:50]}... "
+                    f"(mode: {'image-to-image' if image_to_image else 'text-to-image'}, "
                     f"attempt: {attempt + 1}/{self.MAX_RETRIES})"
                 )
 
-                response = requests.post(
+                response = http.post(
                     api_url,
                     headers=headers,
                     json=payload,
-                    timeout=timeout
+                    timeout=attempt_timeout
                 )
                 response.raise_for_status()
 
@@ -225,13 +336,21 @@ class ThirtyTwoNanoBananaProvider(BaseImageProvider):
                 if data.get("code") == 200:
                     outputs = data.get("data", {}).get("outputs", [])
                     if outputs and isinstance(outputs, list):
-                        image_url = outputs[0]
-                        logger.info(f"Image generated successfully: {image_url}")
-
-                        # 下载图片并返回二进制数据
-                        img_response = requests.get(image_url, timeout=60)
-                        img_response.raise_for_status()
-                        return img_response.content
+                        logger.info(f"Image generated successfully ({len(outputs)} outputs, transfer: {transfer_mode})")
+
+                        # 内联 base64 直接解码，URL（或厂商未内联时）下载
+                        images = [
+                            download(output) if output.startswith(("http://", "https://")) else decode_inline(output)
+                            for output in outputs
+                        ]
+                        transfer_stats.record(
+                            "thirtytwo_nano_banana",
+                            transfer_mode,
+                            time.monotonic() - start,
+                            attempt,
+                            sum(len(image) for image in images),
+                        )
+                        return images
                     else:
                         raise RuntimeError("No image URL in response")
                 else:
@@ -246,7 +365,15 @@ class ThirtyTwoNanoBananaProvider(BaseImageProvider):
                         f"Request failed (attempt {attempt + 1}/{self.MAX_RETRIES}): {e}. "
                         f"Retrying in {retry_delay}s..."
                     )
-                    time.sleep(retry_delay)
+                    emit(
+                        EVENT_RETRY,
+                        vendor="thirtytwo_nano_banana",
+                        attempt=attempt + 1,
+                        max_attempts=self.MAX_RETRIES,
+                        error=str(e),
+                        delay=retry_delay,
+                    )
+                    sleep(retry_delay)
                 else:
                     logger.error(f"Max retries reached. Last error: {e}")
             except requests.RequestException as e:
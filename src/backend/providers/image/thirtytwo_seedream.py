@@ -25,11 +25,17 @@ API 文档: https://doc.302.ai/419295548e0
     ...     )
 """
 
+import re
 import time
 import requests
 from src.backend.config import config
 from src.backend.logger import logger
+from ..context import budget_timeout, sleep
+from ..events import EVENT_RETRY, emit
+from .. import http
+from ..http import download, download_all
 from ..param_spec import ParamSpec
+from ..transfer import INLINE, URL, choose_transfer_mode, decode_inline, estimate_output_bytes, transfer_stats
 from .base import BaseImageProvider
 
 
@@ -66,6 +72,12 @@ class ThirtyTwoSeedreamProvider(BaseImageProvider):
     API_URL = "https://api.302.ai/doubao/images/generations"
     DEFAULT_MODEL = "doubao-seedream-5-0-260128"
 
+    # 价格（PTC/张）
+    COST_PER_CALL = 0.035
+
+    # 组图（sequential_image_generation）单次请求返回多张
+    NATIVE_MULTI_IMAGE = True
+
     # generate 方法参数规范
     GENERATE_PARAMS = (
         ParamSpec(
@@ -76,6 +88,16 @@ class ThirtyTwoSeedreamProvider(BaseImageProvider):
             description="参考图片 URL（单张）或 URL 列表（多张），用于图生图功能",
             choices=None,
             required=False,
+            canonical="reference_images",
+        ),
+        ParamSpec(
+            name="num_images",
+            type=int,
+            exposed=True,
+            default=1,
+            description="生成图片数量（组图），一次请求返回多张",
+            choices=[1, 2, 3, 4],
+            required=False,
         ),
         ParamSpec(
             name="size",
@@ -108,8 +130,8 @@ class ThirtyTwoSeedreamProvider(BaseImageProvider):
             name="response_format",
             type=str,
             exposed=False,
-            default="url",
-            description="返回格式，内部使用",
+            default=None,
+            description="返回格式，内部使用；None 时按预估输出大小自动选择",
             choices=["url", "b64_json"],
             required=False,
         ),
@@ -144,6 +166,36 @@ class ThirtyTwoSeedreamProvider(BaseImageProvider):
 
     DEFAULT_ASPECT_RATIO = "1:1"
 
+    # 以 "2K"/"4K" 形式指定 size 时的预估边长
+    SIZE_PRESET_EDGES = {"1K": 1024, "2K": 2048, "4K": 4096}
+
+    @classmethod
+    def _estimate_pixels(cls, size: str) -> int:
+        """预估单张输出图片的像素数
+
+        Args:
+            size: "WxH" 形式的分辨率或 "2K" 等预设
+
+        Returns:
+            像素数，无法解析时按 4K 保守估计
+        """
+        match = re.fullmatch(r"(\d+)\s*[xX*]\s*(\d+)", size.strip())
+        if match:
+            return int(match.group(1)) * int(match.group(2))
+        edge = cls.SIZE_PRESET_EDGES.get(size.strip().upper(), cls.SIZE_PRESET_EDGES["4K"])
+        return edge * edge
+
+    @classmethod
+    def reference_image_edge(cls, **kwargs) -> int | None:
+        """参考图缩小到输出尺寸（size 或 aspect_ratio 对应分辨率）的长边"""
+        size = kwargs.get("size") or cls.ASPECT_RATIO_MAP.get(kwargs.get("aspect_ratio") or cls.DEFAULT_ASPECT_RATIO)
+        if not size:
+            return None
+        match = re.fullmatch(r"(\d+)\s*[xX*]\s*(\d+)", size.strip())
+        if match:
+            return max(int(match.group(1)), int(match.group(2)))
+        return cls.SIZE_PRESET_EDGES.get(size.strip().upper())
+
     def __init__(self):
         super().__init__(
             api_key=config.THIRTYTWO_API_KEY or "",
@@ -166,14 +218,47 @@ class ThirtyTwoSeedreamProvider(BaseImageProvider):
         size: str | None = None,
         aspect_ratio: str = "1:1",
         watermark: bool = False,
-        response_format: str = "url",
+        response_format: str | None = None,
         model: str | None = None,
         **kwargs
     ) -> bytes:
-        """生成图片
+        """生成单张图片
+
+        参数说明见 generate_images()。
+
+        Returns:
+            bytes: 图片二进制数据
+        """
+        return self.generate_images(
+            prompt,
+            num_images=1,
+            image=image,
+            size=size,
+            aspect_ratio=aspect_ratio,
+            watermark=watermark,
+            response_format=response_format,
+            model=model,
+            **kwargs,
+        )[0]
+
+    def generate_images(
+        self,
+        prompt: str,
+        num_images: int = 1,
+        image: str | list[str] | None = None,
+        size: str | None = None,
+        aspect_ratio: str = "1:1",
+        watermark: bool = False,
+        response_format: str | None = None,
+        model: str | None = None,
+        **kwargs
+    ) -> list[bytes]:
+        """生成图片（支持一次请求生成多张）
 
         Args:
             prompt: 图片描述提示词（必填）
+            num_images: 图片数量，大于 1 时启用组图（sequential_image_generation），
+                        厂商可能返回少于请求数量的图片
             image: 参考图片 URL（单张）或 URL 列表（多张），用于图生图功能
                    - str: 单张图片 URL
                    - list[str]: 多张图片 URL 列表，用于多图融合
@@ -183,11 +268,12 @@ class ThirtyTwoSeedreamProvider(BaseImageProvider):
                         默认: "1:1" (2048x2048)
             watermark: 是否添加水印
             response_format: 返回格式，"url" 或 "b64_json"
+                             None 时按预估输出大小选择：小图内联 b64_json，省掉二次下载
             model: 模型名称，默认使用 doubao-seedream-5-0-260128
-            **kwargs: 其他厂商特定参数（如 sequential_image_generation 等）
+            **kwargs: 其他厂商特定参数
 
         Returns:
-            bytes: 图片二进制数据
+            list[bytes]: 图片二进制数据列表
 
         Raises:
             ValueError: API 密钥未配置或宽高比不支持
@@ -210,6 +296,8 @@ class ThirtyTwoSeedreamProvider(BaseImageProvider):
             ...     "将图1的服装换为图2的服装",
             ...     image=["https://example.com/img1.jpg", "https://example.com/img2.jpg"]
             ... )
+            >>> # 一次生成 4 张
+            >>> images = provider.generate_images("同一模特的四种姿势", num_images=4)
         """
         if not self.is_available():
             raise ValueError("ThirtyTwoSeedreamProvider not available - check THIRTYTWO_DOUBAO_API_KEY or THIRTYTWO_API_KEY")
@@ -227,6 +315,12 @@ class ThirtyTwoSeedreamProvider(BaseImageProvider):
                 supported = ", ".join(f'"{k}"' for k in self.ASPECT_RATIO_MAP.keys())
                 raise ValueError(f"Unsupported aspect_ratio: {aspect_ratio}. Supported values: {supported}")
 
+        # 传输方式：小图内联 base64，大图返回 URL 再下载
+        if response_format is None:
+            estimated = estimate_output_bytes(self._estimate_pixels(size), 1, num_images)
+            response_format = "b64_json" if choose_transfer_mode(estimated) == INLINE else "url"
+        transfer_mode = INLINE if response_format == "b64_json" else URL
+
         payload = {
             "model": model or self.default_model,
             "prompt": prompt,
@@ -239,6 +333,11 @@ class ThirtyTwoSeedreamProvider(BaseImageProvider):
         if image:
             payload["image"] = image
 
+        # 组图：一次请求返回多张
+        if num_images > 1:
+            payload["sequential_image_generation"] = "auto"
+            payload["sequential_image_generation_options"] = {"max_images": num_images}
+
         # 添加额外的参数
         payload.update(kwargs)
 
@@ -247,7 +346,10 @@ class ThirtyTwoSeedreamProvider(BaseImageProvider):
 
         # 重试逻辑
         last_error = None
+        start = time.monotonic()
         for attempt in range(self.MAX_RETRIES):
+            # 每次尝试只使用剩余预算，预算耗尽时立即失败
+            attempt_timeout = budget_timeout(timeout)
             try:
                 # 确定生成模式
                 if image:
@@ -262,11 +364,11 @@ class ThirtyTwoSeedreamProvider(BaseImageProvider):
                     f"(mode: {mode}, attempt: {attempt + 1}/{self.MAX_RETRIES})"
                 )
 
-                response = requests.post(
+                response = http.post(
                     self.api_url,
                     headers=headers,
                     json=payload,
-                    timeout=timeout
+                    timeout=attempt_timeout
                 )
                 response.raise_for_status()
 
@@ -284,27 +386,35 @@ class ThirtyTwoSeedreamProvider(BaseImageProvider):
                 if not images_data:
                     raise RuntimeError("No image data in response")
 
-                image_info = images_data[0]
-
-                if response_format == "b64_json":
-                    # 返回 base64 编码的图片
-                    import base64
-                    b64_data = image_info.get("b64_json")
-                    if b64_data:
-                        return base64.b64decode(b64_data)
-                    else:
-                        raise RuntimeError("No base64 image data in response")
+                images_data = images_data[:num_images]
+
+                if transfer_mode == INLINE:
+                    # 内联 base64，缺失时回退为下载该项的 URL
+                    images = []
+                    for info in images_data:
+                        if info.get("b64_json"):
+                            images.append(decode_inline(info["b64_json"]))
+                        elif info.get("url"):
+                            images.append(download(info["url"]))
+                        else:
+                            raise RuntimeError("No base64 image data in response")
                 else:
                     # 返回 URL 下载的图片
-                    image_url = image_info.get("url")
-                    if image_url:
-                        logger.info(f"Image generated successfully: {image_url}")
-                        # 下载图片并返回二进制数据
-                        img_response = requests.get(image_url, timeout=60)
-                        img_response.raise_for_status()
-                        return img_response.content
-                    else:
+                    image_urls = [info.get("url") for info in images_data]
+                    if not all(image_urls):
                         raise RuntimeError("No image URL in response")
+                    logger.info(f"Image generated successfully: {', '.join(image_urls)}")
+                    # 并行下载图片并返回二进制数据
+                    images = download_all(image_urls)
+
+                transfer_stats.record(
+                    "thirtytwo_seedream",
+                    transfer_mode,
+                    time.monotonic() - start,
+                    attempt,
+                    sum(len(data) for data in images),
+                )
+                return images
 
             except (requests.Timeout, requests.ConnectionError) as e:
                 last_error = e
@@ -314,7 +424,15 @@ class ThirtyTwoSeedreamProvider(BaseImageProvider):
                         f"Request failed (attempt {attempt + 1}/{self.MAX_RETRIES}): {e}. "
                         f"Retrying in {retry_delay}s..."
                     )
-                    time.sleep(retry_delay)
+                    emit(
+                        EVENT_RETRY,
+                        vendor="thirtytwo_seedream",
+                        attempt=attempt + 1,
+                        max_attempts=self.MAX_RETRIES,
+                        error=str(e),
+                        delay=retry_delay,
+                    )
+                    sleep(retry_delay)
                 else:
                     logger.error(f"Max retries reached. Last error: {e}")
             except requests.RequestException as e:
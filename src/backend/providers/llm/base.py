@@ -7,6 +7,7 @@ LLM Provider 抽象基类
 from abc import ABC, abstractmethod
 from typing import Any
 
+from ..health import CircuitBreaker
 from ..param_spec import ParamSpec
 
 
@@ -20,7 +21,10 @@ class BaseLLMProvider(ABC):
         api_key: API 密钥
         model_name: 模型名称
         client: 底层 API 客户端实例
+        circuit_breaker: 熔断器，记录调用成功率与延迟
         GENERATE_PARAMS: generate 方法参数规范（子类应覆盖）
+        LATENCY_SLO: 期望的 p95 延迟（秒），用于健康评分
+        COST_PER_CALL: 单次调用价格（PTC），None 表示未知，用于自动路由
 
     示例:
         >>> class CustomProvider(BaseLLMProvider):
@@ -31,6 +35,12 @@ class BaseLLMProvider(ABC):
     # 子类应覆盖此属性定义参数规范
     GENERATE_PARAMS: tuple[ParamSpec, ...] = ()
 
+    # 期望的 p95 延迟（秒），子类可覆盖
+    LATENCY_SLO: float = 30
+
+    # 单次调用价格（PTC），子类可覆盖；价格随参数变化时覆盖 estimate_cost
+    COST_PER_CALL: float | None = None
+
     def __init__(self, api_key: str, model_name: str):
         """初始化 LLM 提供商
 
@@ -41,6 +51,7 @@ class BaseLLMProvider(ABC):
         self.api_key = api_key
         self.model_name = model_name
         self.client = None
+        self.circuit_breaker = CircuitBreaker(latency_slo=self.LATENCY_SLO)
 
     @abstractmethod
     def generate(self, prompt: str, **kwargs) -> str:
@@ -62,9 +73,9 @@ class BaseLLMProvider(ABC):
         """检查客户端是否可用
 
         Returns:
-            bool: 客户端是否已成功初始化
+            bool: 客户端已成功初始化且熔断器未打开
         """
-        return self.client is not None
+        return self.client is not None and not self.circuit_breaker.is_open()
 
     @classmethod
     def get_exposed_params(cls) -> list[ParamSpec]:
@@ -86,6 +97,18 @@ class BaseLLMProvider(ABC):
         """
         return {p.name: p for p in cls.GENERATE_PARAMS}
 
+    @classmethod
+    def estimate_cost(cls, **kwargs) -> float | None:
+        """估算单次调用价格
+
+        Args:
+            **kwargs: 调用参数
+
+        Returns:
+            价格（PTC），未知返回 None
+        """
+        return cls.COST_PER_CALL
+
     @classmethod
     def get_provider_info(cls) -> dict[str, Any]:
         """获取 Provider 信息
@@ -21,6 +21,7 @@ class ParamSpec:
         description: 参数描述
         choices: 可选值列表（枚举类型参数使用）
         required: 是否必填
+        canonical: 跨厂商通用参数名，用于厂商间参数转换（None 表示与 name 相同）
     """
 
     name: str
@@ -30,6 +31,7 @@ class ParamSpec:
     description: str = ""
     choices: list[Any] | None = None
     required: bool = False
+    canonical: str | None = None
 
 
 @dataclass(frozen=True)
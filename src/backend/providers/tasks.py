@@ -0,0 +1,100 @@
+"""已提交的厂商任务持久化
+
+Kling 等异步厂商先提交任务、再轮询结果。进程在轮询期间退出（重启、发布）时，若不记录任务 ID，
+客户端只能重新提交并再次付费。Provider 提交成功后把任务登记到本存储（JSON 文件），
+拿到终态（成功、失败、超时）或客户端放弃后移除；因停机而中断的任务保留在文件中，
+重启后由服务层恢复轮询。
+
+PENDING_TASKS_PATH 为空时不持久化。
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Any
+
+from src.backend.config import config
+from src.backend.logger import logger
+
+
+class PendingTaskStore:
+    """已提交、尚未拿到结果的厂商任务"""
+
+    def __init__(self, path: str):
+        """初始化
+
+        Args:
+            path: JSON 文件路径，为空表示不持久化
+        """
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _load(self) -> dict[str, dict[str, Any]]:
+        """读取文件（调用方持有锁）"""
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to load pending tasks from {self.path}: {e}")
+            return {}
+
+    def _save(self, tasks: dict[str, dict[str, Any]]) -> None:
+        """原子写入文件（调用方持有锁）"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(tasks, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def add(self, vendor: str, task_id: str, request_id: str | None = None, **task_info: Any) -> None:
+        """登记已提交的任务
+
+        Args:
+            vendor: 厂商名称
+            task_id: 厂商任务 ID
+            request_id: 发起请求的 ID，恢复后结果以该 ID 作为后台任务保存
+            **task_info: 恢复轮询所需的其他信息（如 is_text2video）
+        """
+        if not self.path:
+            return
+        with self._lock:
+            tasks = self._load()
+            tasks[task_id] = {
+                "vendor": vendor,
+                "task_id": task_id,
+                "request_id": request_id,
+                "submitted_at": time.time(),
+                "task_info": task_info,
+            }
+            self._save(tasks)
+
+    def remove(self, task_id: str) -> None:
+        """移除任务（已拿到终态或无需恢复）
+
+        Args:
+            task_id: 厂商任务 ID
+        """
+        if not self.path:
+            return
+        with self._lock:
+            tasks = self._load()
+            if tasks.pop(task_id, None) is not None:
+                self._save(tasks)
+
+    def list(self) -> list[dict[str, Any]]:
+        """获取全部待恢复的任务
+
+        Returns:
+            任务列表，每项包含 vendor, task_id, request_id, submitted_at, task_info
+        """
+        with self._lock:
+            return list(self._load().values())
+
+
+# 单例实例
+pending_tasks: PendingTaskStore = PendingTaskStore(config.PENDING_TASKS_PATH)
@@ -0,0 +1,118 @@
+"""Provider 结果传输方式选择
+
+厂商既可以在响应中内联返回 base64 图片（Seedream b64_json、nano-banana enable_base64_output），
+也可以返回 URL 再由我们二次下载。内联省掉一次往返，但大图会让响应体膨胀约 1/3 且无法流式读取，
+因此按预估输出大小选择：小于 INLINE_TRANSFER_MAX_BYTES 时内联，否则走 URL 下载。
+
+每种方式的耗时、重试次数与字节数记录在 transfer_stats 中，由服务层注册到 /api/v1/metrics。
+"""
+
+import base64
+import threading
+from collections import deque
+from typing import Any
+
+from src.backend.config import config
+from src.backend.services.metrics import percentile
+
+INLINE = "inline"
+URL = "url"
+
+
+def estimate_output_bytes(width: int, height: int, count: int = 1) -> int:
+    """预估输出图片的总字节数
+
+    Args:
+        width: 图片宽度（像素）
+        height: 图片高度（像素）
+        count: 图片数量
+
+    Returns:
+        预估字节数
+    """
+    return int(width * height * count * config.INLINE_TRANSFER_BYTES_PER_PIXEL)
+
+
+def choose_transfer_mode(estimated_bytes: int) -> str:
+    """根据预估输出大小选择传输方式
+
+    Args:
+        estimated_bytes: 预估输出字节数
+
+    Returns:
+        INLINE 或 URL
+    """
+    if estimated_bytes <= config.INLINE_TRANSFER_MAX_BYTES:
+        return INLINE
+    return URL
+
+
+def decode_inline(data: str) -> bytes:
+    """解码内联 base64 图片（兼容 data URI 前缀）
+
+    Args:
+        data: base64 字符串或 data:image/...;base64,... 形式的 URI
+
+    Returns:
+        图片二进制数据
+    """
+    if data.startswith("data:"):
+        data = data.split(",", 1)[1]
+    return base64.b64decode(data)
+
+
+class TransferStats:
+    """按 (厂商, 传输方式) 统计耗时、重试次数与字节数"""
+
+    def __init__(self, window: int = 256):
+        """初始化
+
+        Args:
+            window: 每个 key 保留的耗时样本数
+        """
+        self.window = window
+        self._lock = threading.Lock()
+        self._stats: dict[tuple[str, str], dict[str, Any]] = {}
+
+    def record(self, vendor: str, mode: str, latency: float, retries: int, nbytes: int) -> None:
+        """记录一次成功的传输
+
+        Args:
+            vendor: 厂商名称
+            mode: 传输方式 (inline, url)
+            latency: 从发起请求到拿到图片字节的耗时（秒）
+            retries: 重试次数
+            nbytes: 图片总字节数
+        """
+        with self._lock:
+            stats = self._stats.setdefault(
+                (vendor, mode),
+                {"count": 0, "retries": 0, "bytes": 0, "latencies": deque(maxlen=self.window)},
+            )
+            stats["count"] += 1
+            stats["retries"] += retries
+            stats["bytes"] += nbytes
+            stats["latencies"].append(latency)
+
+    def snapshot(self) -> dict[str, dict[str, Any]]:
+        """获取统计快照
+
+        Returns:
+            以 "{vendor}:{mode}" 为 key 的统计字典
+        """
+        with self._lock:
+            items = [(key, dict(stats), list(stats["latencies"])) for key, stats in self._stats.items()]
+        return {
+            f"{vendor}:{mode}": {
+                "count": stats["count"],
+                "retries": stats["retries"],
+                "bytes": stats["bytes"],
+                "latency_p50": percentile(latencies, 50),
+                "latency_p95": percentile(latencies, 95),
+            }
+            for (vendor, mode), stats, latencies in items
+        }
+
+
+# 单例实例
+transfer_stats: TransferStats = TransferStats()
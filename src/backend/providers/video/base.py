@@ -7,6 +7,7 @@ Video Provider 抽象基类
 from abc import ABC, abstractmethod
 from typing import Any
 
+from ..health import CircuitBreaker
 from ..param_spec import ParamSpec
 
 
@@ -20,7 +21,11 @@ class BaseVideoProvider(ABC):
         api_key: API 密钥
         model_name: 模型名称
         client: 底层 API 客户端实例
+        circuit_breaker: 熔断器，记录调用成功率与延迟
         GENERATE_PARAMS: generate 方法参数规范（子类应覆盖）
+        LATENCY_SLO: 期望的 p95 延迟（秒），用于健康评分
+        COST_PER_CALL: 单次调用价格（PTC），None 表示未知，用于自动路由
+        REFERENCE_IMAGE_EDGE: 参考图预处理的长边像素上限，None 使用配置 REFERENCE_IMAGE_MAX_EDGE
 
     示例:
         >>> class CustomProvider(BaseVideoProvider):
@@ -31,6 +36,15 @@ class BaseVideoProvider(ABC):
     # 子类应覆盖此属性定义参数规范
     GENERATE_PARAMS: tuple[ParamSpec, ...] = ()
 
+    # 期望的 p95 延迟（秒），子类可覆盖
+    LATENCY_SLO: float = 300
+
+    # 单次调用价格（PTC），子类可覆盖；价格随参数变化时覆盖 estimate_cost
+    COST_PER_CALL: float | None = None
+
+    # 参考图预处理的长边像素上限（按输出尺寸），子类可覆盖；随参数变化时覆盖 reference_image_edge
+    REFERENCE_IMAGE_EDGE: int | None = None
+
     def __init__(self, api_key: str, model_name: str):
         """初始化 Video 提供商
 
@@ -41,6 +55,7 @@ class BaseVideoProvider(ABC):
         self.api_key = api_key
         self.model_name = model_name
         self.client = None
+        self.circuit_breaker = CircuitBreaker(latency_slo=self.LATENCY_SLO)
 
     @abstractmethod
     def generate(self, prompt: str, **kwargs) -> bytes:
@@ -58,13 +73,28 @@ class BaseVideoProvider(ABC):
         """
         pass
 
+    def resume(self, task_id: str, **task_info: Any) -> bytes:
+        """恢复等待重启前已提交的异步任务（异步任务型厂商覆盖）
+
+        Args:
+            task_id: 厂商任务 ID
+            **task_info: 提交时登记的任务信息
+
+        Returns:
+            生成的视频数据（bytes 格式）
+
+        Raises:
+            NotImplementedError: 该厂商不支持恢复
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support resuming tasks")
+
     def is_available(self) -> bool:
         """检查客户端是否可用
 
         Returns:
-            bool: 客户端是否已成功初始化
+            bool: 客户端已成功初始化且熔断器未打开
         """
-        return self.client is not None
+        return self.client is not None and not self.circuit_breaker.is_open()
 
     @classmethod
     def get_exposed_params(cls) -> list[ParamSpec]:
@@ -86,6 +116,30 @@ class BaseVideoProvider(ABC):
         """
         return {p.name: p for p in cls.GENERATE_PARAMS}
 
+    @classmethod
+    def estimate_cost(cls, **kwargs) -> float | None:
+        """估算单次调用价格
+
+        Args:
+            **kwargs: 调用参数
+
+        Returns:
+            价格（PTC），未知返回 None
+        """
+        return cls.COST_PER_CALL
+
+    @classmethod
+    def reference_image_edge(cls, **kwargs) -> int | None:
+        """参考图预处理时缩小到的长边像素数（不超过输出尺寸即可，更大的参考图只增加厂商拉取时间）
+
+        Args:
+            **kwargs: 调用参数
+
+        Returns:
+            长边像素上限，None 使用配置默认值
+        """
+        return cls.REFERENCE_IMAGE_EDGE
+
     @classmethod
     def get_provider_info(cls) -> dict[str, Any]:
         """获取 Provider 信息
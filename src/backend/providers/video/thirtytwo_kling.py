@@ -41,7 +41,13 @@ from typing import Any
 import requests
 from src.backend.config import config
 from src.backend.logger import logger
+from ..callbacks import kling_callbacks
+from ..context import DeadlineExceeded, RequestCancelled, budget_timeout, current_context, sleep, wait_event
+from ..events import EVENT_TASK_STATUS, emit
+from .. import http
+from ..http import download
 from ..param_spec import ParamSpec
+from ..tasks import pending_tasks
 from .base import BaseVideoProvider
 
 
@@ -57,12 +63,14 @@ class ThirtyTwoKlingProvider(BaseVideoProvider):
         - 支持 5秒/10秒 时长
         - 支持多种宽高比
         - 异步任务模式，支持轮询获取结果
+        - 配置 KLING_CALLBACK_BASE_URL 后由厂商回调唤醒，轮询仅作兜底
 
     Attributes:
         default_duration: 默认视频时长（秒）
         default_aspect_ratio: 默认宽高比
         default_mode: 默认模式（图生视频）
         polling_interval: 轮询间隔（秒）
+        callback_poll_interval: 启用回调时的兜底轮询间隔（秒）
         max_polling_time: 最大轮询时间（秒）
 
     可用模型:
@@ -86,6 +94,9 @@ class ThirtyTwoKlingProvider(BaseVideoProvider):
     FETCH_API_BASE_TEXT2VIDEO = "https://api.302.ai/klingai/v1/videos/text2video"
     FETCH_API_BASE_IMAGE2VIDEO = "https://api.302.ai/klingai/v1/videos/image2video"
 
+    # 参考图长边上限：输出最高 1080p
+    REFERENCE_IMAGE_EDGE = 1920
+
     # generate 方法参数规范
     GENERATE_PARAMS = (
         ParamSpec(
@@ -96,6 +107,7 @@ class ThirtyTwoKlingProvider(BaseVideoProvider):
             description="参考图片 URL，支持单个 URL 字符串或 URL 列表。不提供时使用文生视频模式",
             choices=None,
             required=False,
+            canonical="reference_images",
         ),
         ParamSpec(
             name="model_name",
@@ -153,6 +165,7 @@ class ThirtyTwoKlingProvider(BaseVideoProvider):
         self.default_aspect_ratio = "16:9"
         self.default_mode = "std"
         self.polling_interval = 5  # 轮询间隔（秒）
+        self.callback_poll_interval = config.KLING_CALLBACK_POLL_INTERVAL  # 启用回调时的兜底轮询间隔（秒）
         self.max_polling_time = 1000  # 最大轮询时间（秒）
 
         if self.api_key:
@@ -273,6 +286,11 @@ class ThirtyTwoKlingProvider(BaseVideoProvider):
                 "duration": duration,
             }
 
+        # 启用回调时由厂商推送任务状态，轮询仅作兜底（调用方传入的 callback_url 优先）
+        callback_token = None
+        if kling_callbacks.enabled:
+            callback_token, payload["callback_url"] = kling_callbacks.issue()
+
         # 添加额外的参数
         payload.update(kwargs)
 
@@ -282,11 +300,11 @@ class ThirtyTwoKlingProvider(BaseVideoProvider):
         try:
             logger.info(f"Submitting Kling video generation task ({mode_str}) with prompt: {prompt[:50]}...")
 
-            response = requests.post(
+            response = http.post(
                 api_base,
                 headers=headers,
                 json=payload,
-                timeout=60
+                timeout=budget_timeout(60)
             )
             response.raise_for_status()
 
@@ -326,6 +344,9 @@ class ThirtyTwoKlingProvider(BaseVideoProvider):
                     raise RuntimeError("No task ID in response")
 
                 logger.info(f"Kling video task submitted successfully: {task_id}")
+                # 回调地址只接受该任务的通知
+                if callback_token is not None:
+                    kling_callbacks.bind(callback_token, str(task_id))
 
                 if not wait_for_result:
                     # 返回任务信息
@@ -335,8 +356,17 @@ class ThirtyTwoKlingProvider(BaseVideoProvider):
                         "task_info": task_info
                     }
 
-                # 轮询等待任务完成，根据模式选择正确的 fetch 端点
+                # 登记任务，进程在轮询期间退出时重启后可恢复轮询，而不是重新提交
                 is_text2video = not bool(images)
+                ctx = current_context()
+                pending_tasks.add(
+                    "thirtytwo_kling",
+                    task_id,
+                    request_id=ctx.request_id if ctx is not None else None,
+                    is_text2video=is_text2video,
+                )
+
+                # 轮询等待任务完成，根据模式选择正确的 fetch 端点
                 return self._fetch_video_result(task_id, is_text2video=is_text2video)
 
             else:
@@ -344,6 +374,8 @@ class ThirtyTwoKlingProvider(BaseVideoProvider):
                 logger.debug(f"API error response: {data}")
                 raise RuntimeError(f"API error: {error_msg}")
 
+        except (RequestCancelled, DeadlineExceeded):
+            raise
         except requests.RequestException as e:
             logger.error(f"HTTP error during video generation: {e}")
             raise RuntimeError(f"HTTP error: {e}") from e
@@ -363,6 +395,9 @@ class ThirtyTwoKlingProvider(BaseVideoProvider):
 
         Raises:
             RuntimeError: 获取结果失败或超时
+            RequestCancelled: 请求被取消，停止轮询（厂商任务不会被取消；因停机取消时任务保留在
+                pending_tasks 中，重启后恢复轮询）
+            DeadlineExceeded: 请求预算耗尽（轮询间隔与每次查询的超时均不超过剩余预算）
         """
         headers = {
             "Authorization": f"Bearer {self.api_key}"
@@ -375,6 +410,10 @@ class ThirtyTwoKlingProvider(BaseVideoProvider):
         )
 
         start_time = time.time()
+        keep_pending = False
+        last_status = None
+        # 启用回调时等待回调唤醒，超过兜底间隔未收到回调才查询一次
+        wake = kling_callbacks.watch(task_id) if kling_callbacks.enabled else None
 
         try:
             while True:
@@ -382,71 +421,115 @@ class ThirtyTwoKlingProvider(BaseVideoProvider):
                 if elapsed > self.max_polling_time:
                     raise RuntimeError(f"Video generation timeout after {self.max_polling_time} seconds")
 
-                logger.debug(f"Polling task status: {task_id} (elapsed: {int(elapsed)}s)")
-
-                response = requests.get(
-                    f"{fetch_api_base}/{task_id}",
-                    headers=headers,
-                    timeout=600
-                )
-                response.raise_for_status()
-
-                data = response.json()
-
-                # 检查响应是否成功
-                # API 返回格式: {"code": 0, "data": {...}, "message": "SUCCEED"}
-                is_success = (
-                    data.get("code") == 0 or
-                    data.get("status") == 200 or
-                    data.get("result") == 1 or
-                    response.status_code == 200
-                )
+                task_data = kling_callbacks.take(task_id) if wake is not None else None
+                if task_data is not None:
+                    logger.debug(f"Received callback for task {task_id}")
+                else:
+                    logger.debug(f"Polling task status: {task_id} (elapsed: {int(elapsed)}s)")
+                    task_data = self._poll_task(fetch_api_base, task_id, headers)
+
+                # 官方 API: data.task_status (字符串: "submitted", "processing", "succeed", "failed")
+                task_status = task_data.get("task_status") if task_data is not None else None
+                logger.debug(f"Task status: {task_status}")
+                if task_status is not None and task_status != last_status:
+                    emit(EVENT_TASK_STATUS, vendor="thirtytwo_kling", task_id=task_id, task_status=task_status)
+                    last_status = task_status
+
+                # 任务成功 (官方 API 使用 "succeed" 而非 "succeeded")
+                if task_status == "succeed":
+                    task_result = task_data.get("task_result", {})
+
+                    # 视频在 task_result.videos 数组中
+                    videos = task_result.get("videos", [])
+                    if videos and isinstance(videos, list):
+                        video_url = videos[0].get("url")
+                        if video_url:
+                            logger.info(f"Video generated successfully: {video_url}")
+
+                            # 下载视频并返回二进制数据
+                            return download(video_url, timeout=120)
+
+                    raise RuntimeError("No video URL in completed task")
+
+                elif task_status == "failed":
+                    error_msg = (
+                        task_data.get("task_status_msg") or
+                        "Unknown error"
+                    )
+                    raise RuntimeError(f"Video generation failed: {error_msg}")
+
+                # 任务处理中或响应状态异常，等待后重试
+                if wake is not None:
+                    wait_event(wake, self.callback_poll_interval)
+                else:
+                    sleep(self.polling_interval)
+
+        except (RequestCancelled, DeadlineExceeded) as e:
+            logger.info(f"Stopped polling Kling task {task_id}: {e}")
+            keep_pending = isinstance(e, RequestCancelled) and e.shutdown
+            raise
+        except requests.RequestException as e:
+            logger.error(f"HTTP error while fetching video result: {e}")
+            raise RuntimeError(f"HTTP error: {e}") from e
+        finally:
+            if wake is not None:
+                kling_callbacks.unwatch(task_id)
+            if not keep_pending:
+                pending_tasks.remove(task_id)
 
-                if is_success:
-                    task_data = data.get("data", {})
+    def _poll_task(self, fetch_api_base: str, task_id: str, headers: dict[str, str]) -> dict[str, Any] | None:
+        """查询一次任务状态
 
-                    # 处理响应格式
-                    # 官方 API: data.task_status (字符串: "processing", "succeed", "failed")
-                    task_status = task_data.get("task_status")
+        Args:
+            fetch_api_base: 查询端点
+            task_id: 任务 ID
+            headers: 请求头
 
-                    logger.debug(f"Task status: {task_status}")
+        Returns:
+            dict: 任务数据（data 字段），响应状态异常时返回 None
 
-                    # 任务成功 (官方 API 使用 "succeed" 而非 "succeeded")
-                    if task_status == "succeed":
-                        task_result = task_data.get("task_result", {})
+        Raises:
+            requests.RequestException: HTTP 请求失败
+        """
+        response = http.get(
+            f"{fetch_api_base}/{task_id}",
+            headers=headers,
+            timeout=budget_timeout(600)
+        )
+        response.raise_for_status()
 
-                        # 视频在 task_result.videos 数组中
-                        videos = task_result.get("videos", [])
-                        if videos and isinstance(videos, list):
-                            video_url = videos[0].get("url")
-                            if video_url:
-                                logger.info(f"Video generated successfully: {video_url}")
+        data = response.json()
 
-                                # 下载视频并返回二进制数据
-                                video_response = requests.get(video_url, timeout=120)
-                                video_response.raise_for_status()
-                                return video_response.content
+        # 检查响应是否成功
+        # API 返回格式: {"code": 0, "data": {...}, "message": "SUCCEED"}
+        is_success = (
+            data.get("code") == 0 or
+            data.get("status") == 200 or
+            data.get("result") == 1 or
+            response.status_code == 200
+        )
+        return data.get("data", {}) if is_success else None
 
-                        raise RuntimeError("No video URL in completed task")
+    def resume(self, task_id: str, is_text2video: bool = True, **kwargs) -> bytes:
+        """恢复轮询重启前已提交的任务
 
-                    elif task_status == "processing":
-                        # 任务处理中，继续轮询
-                        time.sleep(self.polling_interval)
-                        continue
+        Args:
+            task_id: 任务 ID
+            is_text2video: 是否为文生视频模式（True）或图生视频模式（False）
+            **kwargs: 登记任务时保存的其他信息（忽略）
 
-                    elif task_status == "failed":
-                        error_msg = (
-                            task_data.get("task_status_msg") or
-                            "Unknown error"
-                        )
-                        raise RuntimeError(f"Video generation failed: {error_msg}")
+        Returns:
+            bytes: 视频二进制数据
 
-                # 响应状态异常，继续重试
-                time.sleep(self.polling_interval)
+        Raises:
+            ValueError: API 密钥未配置
+            RuntimeError: 获取结果失败或超时
+        """
+        if not self.is_available():
+            raise ValueError("ThirtyTwoKlingProvider not available")
 
-        except requests.RequestException as e:
-            logger.error(f"HTTP error while fetching video result: {e}")
-            raise RuntimeError(f"HTTP error: {e}") from e
+        logger.info(f"Resuming Kling task {task_id}")
+        return self._fetch_video_result(task_id, is_text2video=is_text2video)
 
     def fetch_task(self, task_id: str, is_text2video: bool = True) -> dict[str, Any]:
         """获取任务状态
@@ -472,7 +555,7 @@ class ThirtyTwoKlingProvider(BaseVideoProvider):
         )
 
         try:
-            response = requests.get(
+            response = http.get(
                 f"{fetch_api_base}/{task_id}",
                 headers=headers,
                 timeout=30
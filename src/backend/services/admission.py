@@ -0,0 +1,124 @@
+"""
+准入控制（负载保护）
+
+流量突增时，若照单全收，请求会在调度与限流队列中堆积，直到客户端超时离开，而厂商仍为
+这些无人接收的结果计费。生成端点在执行前先估算排队等待时间:
+
+    等待时间 ≈ 排在前面的请求数 / 并发槽位数 × 该厂商近期 p50 服务时间
+
+排在前面的请求 = 在途超出槽位的部分 + 调度器中同级或更高优先级的排队数 + 限流排队数。
+若调用方设置了时间预算（deadline），等待时间加一次服务时间超出预算即拒绝；否则与
+ADMISSION_MAX_WAIT 中该 Provider 类型的阈值比较。被拒绝的请求返回 503
+（error_type: overloaded）与 Retry-After，调用方可稍后重试或换用其他厂商。
+
+尚无延迟样本的厂商无法估算，一律放行。
+"""
+
+import math
+from typing import Any
+
+from src.backend.config import config
+from src.backend.services.concurrency import adaptive_limiter_registry
+from src.backend.services.metrics import metrics
+from src.backend.services.provider_service import ProviderRegistry
+from src.backend.services.rate_limit import rate_limiter_registry
+from src.backend.services.routing import AUTO_VENDOR
+from src.backend.services.scheduler import PRIORITIES, PRIORITY_INTERACTIVE, scheduler_registry
+
+# 拒绝时的错误类型
+ERROR_OVERLOADED = "overloaded"
+
+
+class AdmissionController:
+    """基于排队深度与近期服务时间的准入控制"""
+
+    @staticmethod
+    def estimate_wait(vendor: str, provider: Any, priority: str = PRIORITY_INTERACTIVE) -> float | None:
+        """估算新请求在该厂商的排队等待时间
+
+        Args:
+            vendor: 厂商名称
+            provider: Provider 实例
+            priority: 调度优先级类别，只统计同级及更高优先级的排队请求
+
+        Returns:
+            预计等待时间（秒），尚无延迟样本时返回 None
+        """
+        service_time = provider.circuit_breaker.snapshot()["latency_p50"]
+        if service_time is None:
+            return None
+
+        adaptive = adaptive_limiter_registry.get(vendor).snapshot()
+        slots = max(1.0, adaptive["limit"])
+        queued = scheduler_registry.get(vendor).snapshot()["queued"]
+        rank = PRIORITIES.index(priority) if priority in PRIORITIES else 0
+        ahead = sum(queued.get(p, 0) for p in PRIORITIES[:rank + 1])
+        limiter = rate_limiter_registry.get(vendor, provider.model_name)
+        if limiter is not None:
+            ahead += limiter.snapshot()["waiting"]
+        ahead += max(0.0, adaptive["inflight"] - slots + 1)
+        if ahead <= 0:
+            return 0.0
+        return math.ceil(ahead / slots) * service_time
+
+    @classmethod
+    def check(
+        cls,
+        provider_type: str,
+        vendor: str,
+        deadline: float | None = None,
+        priority: str = PRIORITY_INTERACTIVE,
+    ) -> dict[str, Any] | None:
+        """判断是否接受请求
+
+        Args:
+            provider_type: Provider 类型 (llm, image, video)
+            vendor: 厂商名称，auto 时取所有可用厂商中的最短等待
+            deadline: 调用方的时间预算（秒），None 时使用 ADMISSION_MAX_WAIT 阈值
+            priority: 调度优先级类别
+
+        Returns:
+            接受时返回 None；拒绝时返回 error_type 为 overloaded 的结果字典（含 retry_after）
+        """
+        if not config.ADMISSION_CONTROL_ENABLED:
+            return None
+
+        providers = ProviderRegistry.get_providers(provider_type)
+        if vendor == AUTO_VENDOR:
+            candidates = {v: p for v, p in providers.items() if p.is_available()}
+        elif vendor in providers:
+            candidates = {vendor: providers[vendor]}
+        else:
+            # 未知厂商交给服务层返回错误
+            return None
+
+        best: tuple[float, float] | None = None
+        for name, provider in candidates.items():
+            service_time = provider.circuit_breaker.snapshot()["latency_p50"]
+            wait = cls.estimate_wait(name, provider, priority)
+            if wait is None or service_time is None:
+                return None
+            if best is None or wait + service_time < sum(best):
+                best = (wait, service_time)
+        if best is None:
+            return None
+
+        wait, service_time = best
+        if wait <= 0:
+            # 无需排队；预算连一次服务时间都不够时由服务层返回 deadline_exceeded
+            overloaded = False
+        elif deadline is not None:
+            overloaded = wait + service_time > deadline
+        else:
+            overloaded = wait > config.ADMISSION_MAX_WAIT.get(provider_type, math.inf)
+        if not overloaded:
+            return None
+
+        metrics.inc("requests_shed", provider_type=provider_type, vendor=vendor, priority=priority)
+        return {
+            "success": False,
+            "error": f"{provider_type} provider '{vendor}' is overloaded: estimated wait {wait:.1f}s",
+            "error_type": ERROR_OVERLOADED,
+            "retry_after": wait,
+            "vendor": vendor,
+        }
@@ -0,0 +1,166 @@
+"""
+批量生成
+
+拍摄流程需要 模特 × 场景 × 姿势 的组合变体。批量服务在有界线程池中并发执行多个生成请求，
+每完成一项立即产出结果（由路由层以 NDJSON 或 SSE 流式返回），单项失败不影响其他项。
+
+厂商级限流、自适应并发与熔断仍由服务层的 _call_provider 负责，批量项默认会在
+BATCH_QUEUE_TIMEOUT 内排队等待限流许可，而不是立即返回 429。
+"""
+
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Iterator
+
+from src.backend.config import config
+from src.backend.logger import get_logger
+from src.backend.providers.context import RequestContext, use_context
+from src.backend.services.hedging import LLMHedgingService
+from src.backend.services.metrics import metrics
+from src.backend.services.provider_service import VideoService
+from src.backend.services.routing import (
+    AUTO_VENDOR,
+    AutoRouter,
+    ImageRoutingService,
+    no_eligible_vendor_result,
+)
+from src.backend.services.scheduler import PRIORITY_BATCH
+
+logger = get_logger(__name__)
+
+
+def generate_llm_item(item: dict[str, Any]) -> dict[str, Any]:
+    """执行单个 LLM 批量项
+
+    Args:
+        item: 包含 vendor, prompt, parameters, queue_timeout 的字典
+
+    Returns:
+        LLM 生成结果
+    """
+    resolved = AutoRouter.resolve("llm", item["vendor"], item["parameters"])
+    if resolved is None:
+        return no_eligible_vendor_result("LLM")
+    vendor, params = resolved
+    result = LLMHedgingService.generate(
+        vendor=vendor,
+        prompt=item["prompt"],
+        queue_timeout=item["queue_timeout"],
+        **params,
+    )
+    if item["vendor"] == AUTO_VENDOR:
+        result["requested_vendor"] = AUTO_VENDOR
+    return result
+
+
+def generate_image_item(item: dict[str, Any]) -> dict[str, Any]:
+    """执行单个 Image 批量项（支持 auto 与回退链）"""
+    return ImageRoutingService.generate(
+        vendor=item["vendor"],
+        prompt=item["prompt"],
+        fallback_vendors=item.get("fallback_vendors"),
+        return_format="base64",
+        queue_timeout=item["queue_timeout"],
+        **item["parameters"],
+    )
+
+
+def generate_video_item(item: dict[str, Any]) -> dict[str, Any]:
+    """执行单个 Video 批量项"""
+    resolved = AutoRouter.resolve("video", item["vendor"], item["parameters"])
+    if resolved is None:
+        return no_eligible_vendor_result("video") | {"format": "base64"}
+    vendor, params = resolved
+    result = VideoService.generate(
+        vendor=vendor,
+        prompt=item["prompt"],
+        return_format="base64",
+        queue_timeout=item["queue_timeout"],
+        **params,
+    )
+    if item["vendor"] == AUTO_VENDOR:
+        result["requested_vendor"] = AUTO_VENDOR
+    return result
+
+
+# 各类型的单项执行函数
+ITEM_GENERATORS: dict[str, Callable[[dict[str, Any]], dict[str, Any]]] = {
+    "llm": generate_llm_item,
+    "image": generate_image_item,
+    "video": generate_video_item,
+}
+
+
+class BatchService:
+    """批量生成服务"""
+
+    @staticmethod
+    def run(
+        items: list[dict[str, Any]],
+        worker: Callable[[dict[str, Any]], dict[str, Any]],
+        concurrency: int | None = None,
+        deadline: float | None = None,
+        priority: str = PRIORITY_BATCH,
+        tenant: str | None = None,
+    ) -> Iterator[dict[str, Any]]:
+        """并发执行批量项，按完成顺序产出结果
+
+        Args:
+            items: 批量项列表
+            worker: 单项执行函数
+            concurrency: 最大并发数，None 使用 BATCH_CONCURRENCY，不超过 BATCH_MAX_CONCURRENCY
+            deadline: 整个批量的时间预算（秒），None 表示不限；超出后未完成的项失败
+            priority: 调度优先级类别，默认 batch（只使用交互请求预留之外的容量）
+            tenant: 公平调度的租户 key，同一租户的各项在调度器中共用一个流
+
+        Yields:
+            每项的结果（附带 index 字段），全部完成后产出汇总:
+                {"done": True, "total": N, "succeeded": S, "failed": F}
+
+        Note:
+            生成器提前关闭（如客户端断开）时，尚未开始的项会被取消，
+            执行中的项收到取消信号后停止重试、轮询与下载。
+        """
+        if concurrency is None:
+            concurrency = config.BATCH_CONCURRENCY
+        concurrency = max(1, min(concurrency, config.BATCH_MAX_CONCURRENCY, len(items) or 1))
+
+        ctx = RequestContext(
+            deadline=time.monotonic() + deadline if deadline is not None else None,
+            priority=priority,
+            tenant=tenant,
+        )
+
+        def run_item(index: int) -> dict[str, Any]:
+            try:
+                with use_context(ctx):
+                    result = worker(items[index])
+            except Exception as e:
+                logger.error(f"Batch item {index} failed: {e}")
+                result = {"success": False, "error": str(e), "vendor": items[index].get("vendor")}
+            return {"index": index} | result
+
+        succeeded = 0
+        executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch")
+        pending = set()
+        try:
+            pending = {executor.submit(run_item, i) for i in range(len(items))}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    result = future.result()
+                    if result["success"]:
+                        succeeded += 1
+                    metrics.inc("batch_items", success=result["success"])
+                    yield result
+        finally:
+            if pending:
+                ctx.cancel()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        yield {
+            "done": True,
+            "total": len(items),
+            "succeeded": succeeded,
+            "failed": len(items) - succeeded,
+        }
@@ -0,0 +1,492 @@
+"""
+画布渲染服务
+
+大画布的整体导出原先只能在浏览器中由 Fabric.js 完成，会卡住页面。CanvasRenderer 在服务端按画布文档
+（图片与文字元素，几何信息与前端 CanvasItem 一致）渲染:
+
+    - 输出像素按 CANVAS_TILE_SIZE 划分固定网格，分块 (col, row) 覆盖 [col*T, (col+1)*T) x [row*T, (row+1)*T)；
+      网格与画布坐标对齐，平移视口不改变已有分块
+    - 分块的键为与其相交的元素（相对分块原点的几何信息、源图标识、文字内容）及输出参数的哈希，
+      渲染结果存为临时对象 tmp/canvas/..：内容未变的分块直接复用，编辑只重新渲染受影响的分块，
+      内容相同的分块（如空白分块）共用一个对象
+    - 源图标识随内容变化：内容寻址地址取自键，其余 /api/v1/assets 地址取对象键与存储 ETag，
+      外部地址与 data: 地址读取后按内容 SHA-256（与搭配拼图一致）；首次渲染前并行解析
+    - 图片元素缩放后的像素复用 tile_cache，分块的合成与编码在进程池中执行
+    - render_view() 渲染视口覆盖的分块；iter_tiles() 按完成顺序产出分块（流式导出）；
+      export_image() 把整个画布的分块拼接为一张图片
+"""
+
+import hashlib
+import json
+import math
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Iterator
+
+from src.backend.config import config
+from src.backend.logger import get_logger
+from src.backend.media.compose import (
+    OUTPUT_FORMATS,
+    ComposeError,
+    Placement,
+    TextBlock,
+    compose,
+    rotated_bounds,
+    stitch,
+)
+from src.backend.providers.context import bind
+from src.backend.providers.http import MAX_PARALLEL_DOWNLOADS
+from src.backend.services.media import asset_key, fetch_source, load_tile, media_processor, source_digest
+from src.backend.services.metrics import metrics
+from src.backend.storage import storage
+
+logger = get_logger(__name__)
+
+# 渲染分块的键前缀（临时对象，建议在 OSS 上为 tmp/ 前缀配置生命周期规则）
+CANVAS_PREFIX = "tmp/canvas"
+
+# 分块格式（整体导出时以 png 分块拼接，避免二次有损编码）
+TILE_FORMATS = ("png", "webp")
+
+# webp 分块与 jpg / webp 导出的编码质量
+TILE_QUALITY = 90
+
+
+@dataclass(frozen=True)
+class ImageElement:
+    """图片元素（画布坐标，与前端 ImageItem 一致）
+
+    Attributes:
+        url: 图片地址（/api/v1/assets、data: 或 SOURCE_ALLOWED_HOSTS 中主机的 http(s) 地址）
+        x: 未旋转时左上角横坐标
+        y: 未旋转时左上角纵坐标
+        width: 显示宽度
+        height: 显示高度
+        rotation: 绕中心顺时针旋转角度（度）
+    """
+
+    url: str
+    x: float
+    y: float
+    width: float
+    height: float
+    rotation: float = 0.0
+
+
+@dataclass(frozen=True)
+class TextElement:
+    """文字元素（画布坐标，与前端 TextNoteItem 一致）
+
+    Attributes:
+        content: 文字内容
+        x: 未旋转时左上角横坐标
+        y: 未旋转时左上角纵坐标
+        width: 文本框宽度（按此宽度换行）
+        height: 文本框高度
+        rotation: 绕中心顺时针旋转角度（度）
+        font_size: 字号
+        color: 文字颜色
+    """
+
+    content: str
+    x: float
+    y: float
+    width: float
+    height: float
+    rotation: float = 0.0
+    font_size: float = 16.0
+    color: str = "#1f2329"
+
+
+CanvasElement = ImageElement | TextElement
+
+
+@dataclass(frozen=True)
+class CanvasTile:
+    """渲染分块
+
+    Attributes:
+        col: 列号
+        row: 行号
+        x: 左上角横坐标（输出像素，col * tile_size）
+        y: 左上角纵坐标（输出像素，row * tile_size）
+        size: 边长（输出像素）
+        key: 对象键
+        url: 分块地址
+        cached: 是否复用了已有的渲染结果
+    """
+
+    col: int
+    row: int
+    x: int
+    y: int
+    size: int
+    key: str
+    url: str
+    cached: bool
+
+
+@dataclass(frozen=True)
+class Region:
+    """输出像素区域 [left, right) x [top, bottom)"""
+
+    left: int
+    top: int
+    right: int
+    bottom: int
+
+    @property
+    def width(self) -> int:
+        return self.right - self.left
+
+    @property
+    def height(self) -> int:
+        return self.bottom - self.top
+
+
+@dataclass(frozen=True)
+class _Prepared:
+    """预先计算的元素信息（输出像素外接矩形）"""
+
+    element: CanvasElement
+    bounds: tuple[float, float, float, float]
+
+
+class CanvasRenderer:
+    """画布分块渲染器（每个请求一个实例）
+
+    Attributes:
+        scale: 缩放倍数（输出像素 / 画布坐标）
+        background: 背景色，None 表示透明
+        fmt: 分块格式 (png, webp)
+        tile_size: 分块边长（输出像素）
+    """
+
+    def __init__(
+        self,
+        elements: list[CanvasElement],
+        scale: float = 1.0,
+        background: str | None = None,
+        fmt: str = "png",
+    ):
+        """初始化
+
+        Args:
+            elements: 画布元素，按绘制顺序（后者在上）
+            scale: 缩放倍数（输出像素 / 画布坐标）
+            background: 背景色（CSS 颜色），None 表示透明
+            fmt: 分块格式 (png, webp)
+
+        Raises:
+            ValueError: 元素数量、尺寸、缩放倍数或格式无效
+        """
+        if len(elements) > config.CANVAS_MAX_ITEMS:
+            raise ValueError(f"Too many items: {len(elements)} > {config.CANVAS_MAX_ITEMS}")
+        if not 0 < scale <= config.CANVAS_MAX_SCALE:
+            raise ValueError(f"scale must be in (0, {config.CANVAS_MAX_SCALE}]")
+        if fmt not in TILE_FORMATS:
+            raise ValueError(f"Unsupported tile format: {fmt}")
+        if any(element.width <= 0 or element.height <= 0 for element in elements):
+            raise ValueError("Item width and height must be positive")
+
+        self.scale = scale
+        self.background = background
+        self.fmt = fmt
+        self.tile_size = config.CANVAS_TILE_SIZE
+        self._elements = [
+            _Prepared(
+                element=element,
+                # 舍去三角函数的浮点误差，避免整数边界被 floor / ceil 扩大一像素
+                bounds=tuple(
+                    round(v * scale, 6)
+                    for v in rotated_bounds(element.x, element.y, element.width, element.height, element.rotation)
+                ),
+            )
+            for element in elements
+        ]
+        # 源图地址 -> 源图标识，外部地址 -> 已读取的内容（首次渲染前解析，见 _resolve_sources）
+        self._source_ids: dict[str, str] | None = None
+        self._sources: dict[str, bytes] = {}
+
+    # -------------------------------------------------------------------------
+    # 区域与分块网格
+    # -------------------------------------------------------------------------
+
+    def content_region(self, padding: float = 0.0) -> Region:
+        """全部元素的外接区域（输出像素）
+
+        Args:
+            padding: 四周留白（画布坐标）
+
+        Raises:
+            ValueError: 画布为空
+        """
+        if not self._elements:
+            raise ValueError("Canvas is empty")
+        pad = padding * self.scale
+        return Region(
+            left=math.floor(min(p.bounds[0] for p in self._elements) - pad),
+            top=math.floor(min(p.bounds[1] for p in self._elements) - pad),
+            right=math.ceil(max(p.bounds[2] for p in self._elements) + pad),
+            bottom=math.ceil(max(p.bounds[3] for p in self._elements) + pad),
+        )
+
+    def cells(self, region: Region) -> list[tuple[int, int]]:
+        """覆盖区域的分块 (col, row)，按行排列
+
+        Raises:
+            ValueError: 区域为空或输出像素超过 CANVAS_MAX_PIXELS
+        """
+        if region.width <= 0 or region.height <= 0:
+            raise ValueError("Region is empty")
+        size = self.tile_size
+        cols = range(region.left // size, -(-region.right // size))
+        rows = range(region.top // size, -(-region.bottom // size))
+        if len(cols) * len(rows) * size * size > config.CANVAS_MAX_PIXELS:
+            raise ValueError(f"Region too large: {region.width}x{region.height} at scale {self.scale}")
+        return [(col, row) for row in rows for col in cols]
+
+    # -------------------------------------------------------------------------
+    # 源图标识
+    # -------------------------------------------------------------------------
+
+    def _source_id(self, url: str) -> str:
+        """源图标识：内容寻址地址取自键，其余本服务地址取键与 ETag，其他地址读取后按内容哈希"""
+        digest = source_digest(url)
+        if digest is not None:
+            return digest
+        key = asset_key(url)
+        if key is not None:
+            info = storage.head(key)
+            if info is not None:
+                return hashlib.sha256(f"{key}\n{info.etag}".encode("utf-8")).hexdigest()
+        # 对象不存在时由 fetch_source 抛出 ObjectNotFound
+        self._sources[url] = fetch_source(url)
+        return hashlib.sha256(self._sources[url]).hexdigest()
+
+    def _resolve_sources(self) -> dict[str, str]:
+        """并行解析全部图片元素的源图标识（只解析一次）
+
+        Raises:
+            ValueError: 源图地址不被允许或超过大小上限
+            Exception: 源图读取失败
+        """
+        if self._source_ids is None:
+            urls = list(dict.fromkeys(p.element.url for p in self._elements if isinstance(p.element, ImageElement)))
+            if len(urls) <= 1:
+                ids = [self._source_id(url) for url in urls]
+            else:
+                with ThreadPoolExecutor(max_workers=min(len(urls), MAX_PARALLEL_DOWNLOADS)) as executor:
+                    ids = list(executor.map(bind(self._source_id), urls))
+            self._source_ids = dict(zip(urls, ids))
+        return self._source_ids
+
+    # -------------------------------------------------------------------------
+    # 单个分块
+    # -------------------------------------------------------------------------
+
+    def _members(self, col: int, row: int) -> list[_Prepared]:
+        """与分块相交的元素，按绘制顺序"""
+        x0, y0 = col * self.tile_size, row * self.tile_size
+        x1, y1 = x0 + self.tile_size, y0 + self.tile_size
+        return [
+            p for p in self._elements
+            if p.bounds[0] < x1 and p.bounds[2] > x0 and p.bounds[1] < y1 and p.bounds[3] > y0
+        ]
+
+    def _placement(self, element: CanvasElement, col: int, row: int) -> Placement:
+        """元素相对分块原点的位置（输出像素）"""
+        return Placement(
+            x=element.x * self.scale - col * self.tile_size,
+            y=element.y * self.scale - row * self.tile_size,
+            width=element.width * self.scale,
+            height=element.height * self.scale,
+            rotation=element.rotation,
+        )
+
+    def tile_key(self, col: int, row: int) -> str:
+        """分块的对象键：相交元素与输出参数的哈希（与分块所在位置无关）
+
+        Raises:
+            ValueError: 源图地址不被允许或超过大小上限
+            Exception: 源图读取失败
+        """
+        source_ids = self._resolve_sources()
+        layers = []
+        for p in self._members(col, row):
+            placement = self._placement(p.element, col, row)
+            geometry = [round(v, 2) for v in (placement.x, placement.y, placement.width, placement.height)]
+            geometry.append(round(placement.rotation, 2))
+            if isinstance(p.element, ImageElement):
+                layers.append(["image", source_ids[p.element.url], *geometry])
+            else:
+                text = p.element
+                layers.append(["text", text.content, round(text.font_size * self.scale, 2), text.color, *geometry])
+        spec = json.dumps(
+            {
+                "layers": layers,
+                "size": self.tile_size,
+                "background": self.background,
+                "format": self.fmt,
+                "quality": TILE_QUALITY,
+                "font": config.CANVAS_FONT_PATH if any(layer[0] == "text" for layer in layers) else None,
+            },
+            sort_keys=True,
+            ensure_ascii=False,
+        )
+        spec_hash = hashlib.sha256(spec.encode("utf-8")).hexdigest()
+        return f"{CANVAS_PREFIX}/{spec_hash[:2]}/{spec_hash}.{self.fmt}"
+
+    def _render(self, col: int, row: int, key: str) -> bool:
+        """渲染分块并写入存储（已存在时跳过），返回是否复用了已有结果"""
+        if storage.head(key) is not None:
+            metrics.inc("canvas_tiles", cached=True)
+            return True
+
+        start = time.monotonic()
+        source_ids = self._resolve_sources()
+        layers = []
+        for p in self._members(col, row):
+            placement = self._placement(p.element, col, row)
+            if isinstance(p.element, ImageElement):
+                source = load_tile(
+                    p.element.url,
+                    source_ids[p.element.url],
+                    max(1, round(placement.width)),
+                    max(1, round(placement.height)),
+                    self._sources.get(p.element.url),
+                )
+            else:
+                source = TextBlock(p.element.content, p.element.font_size * self.scale, p.element.color)
+            layers.append((source, placement))
+
+        data = media_processor.run(
+            compose,
+            self.tile_size,
+            self.tile_size,
+            layers,
+            self.background,
+            self.fmt,
+            TILE_QUALITY,
+            config.CANVAS_FONT_PATH or None,
+        )
+        storage.put(key, data, OUTPUT_FORMATS[self.fmt][1])
+        metrics.inc("canvas_tiles", cached=False)
+        metrics.observe("canvas_tile_seconds", time.monotonic() - start)
+        return False
+
+    def render_tile(self, col: int, row: int) -> CanvasTile:
+        """渲染单个分块
+
+        Raises:
+            ValueError: 源图无法解码
+            ComposeError: 未安装 Pillow、背景色或字体无效
+            Exception: 源图读取或存储写入失败
+        """
+        key = self.tile_key(col, row)
+        cached = self._render(col, row, key)
+        return self._tile(col, row, key, cached)
+
+    def _tile(self, col: int, row: int, key: str, cached: bool) -> CanvasTile:
+        size = self.tile_size
+        return CanvasTile(col, row, col * size, row * size, size, key, storage.url(key), cached)
+
+    # -------------------------------------------------------------------------
+    # 多个分块
+    # -------------------------------------------------------------------------
+
+    def iter_tiles(self, cells: list[tuple[int, int]]) -> Iterator[CanvasTile]:
+        """并行渲染分块，按完成顺序产出
+
+        内容相同的分块（相同的键）只渲染一次。生成器提前关闭（如客户端断开）时，尚未开始的分块被取消。
+
+        Raises:
+            ValueError: 源图无法解码
+            ComposeError: 未安装 Pillow、背景色或字体无效
+            Exception: 源图读取或存储写入失败
+        """
+        by_key: dict[str, list[tuple[int, int]]] = {}
+        for col, row in cells:
+            by_key.setdefault(self.tile_key(col, row), []).append((col, row))
+        if not by_key:
+            return
+
+        executor = ThreadPoolExecutor(
+            max_workers=min(len(by_key), MAX_PARALLEL_DOWNLOADS),
+            thread_name_prefix="canvas",
+        )
+        render = bind(self._render)
+        try:
+            pending = {
+                executor.submit(render, *members[0], key): key
+                for key, members in by_key.items()
+            }
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    key = pending.pop(future)
+                    cached = future.result()
+                    for index, (col, row) in enumerate(by_key[key]):
+                        yield self._tile(col, row, key, cached or index > 0)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def render_view(self, x: float, y: float, width: int, height: int) -> list[CanvasTile]:
+        """渲染视口覆盖的分块
+
+        Args:
+            x: 视口左上角（输出像素，即前端 Viewport.x，scale 为 Viewport.zoom）
+            y: 视口左上角（输出像素，即前端 Viewport.y）
+            width: 视口宽度（屏幕像素）
+            height: 视口高度（屏幕像素）
+
+        Returns:
+            分块列表，按行排列
+
+        Raises:
+            ValueError: 视口过大
+            ComposeError: 未安装 Pillow、背景色或字体无效
+            Exception: 源图读取、解码或存储写入失败
+        """
+        region = Region(math.floor(x), math.floor(y), math.ceil(x + width), math.ceil(y + height))
+        cells = self.cells(region)
+        tiles = {(tile.col, tile.row): tile for tile in self.iter_tiles(cells)}
+        return [tiles[cell] for cell in cells]
+
+    def export_image(self, padding: float = 0.0, fmt: str = "png") -> tuple[bytes, Region]:
+        """渲染整个画布并拼接为一张图片
+
+        Args:
+            padding: 四周留白（画布坐标）
+            fmt: 输出格式 (jpg, png, webp)
+
+        Returns:
+            (编码后的图片, 输出像素区域)
+
+        Raises:
+            ValueError: 画布为空、过大或格式无效
+            ComposeError: 未安装 Pillow、背景色或字体无效
+            Exception: 源图读取、解码或存储写入失败
+        """
+        if fmt not in OUTPUT_FORMATS:
+            raise ValueError(f"Unsupported format: {fmt}")
+        region = self.content_region(padding)
+        tiles = list(self.iter_tiles(self.cells(region)))
+        pieces = [(storage.get(tile.key), tile.x - region.left, tile.y - region.top) for tile in tiles]
+        data = media_processor.run(stitch, region.width, region.height, pieces, fmt, TILE_QUALITY)
+        logger.info(
+            f"Canvas exported: {len(self._elements)} items, {len(tiles)} tiles -> {region.width}x{region.height} {fmt}"
+        )
+        return data, region
+
+
+__all__ = [
+    "CanvasElement",
+    "CanvasRenderer",
+    "CanvasTile",
+    "ComposeError",
+    "ImageElement",
+    "Region",
+    "TextElement",
+]
@@ -0,0 +1,304 @@
+"""
+自适应并发控制（AIMD）
+
+每个厂商维护一个并发上限，根据调用延迟与错误信号动态调整:
+    - 加性增 (Additive Increase): 延迟稳定时，每完成约 limit 次成功调用上限 +1
+    - 乘性减 (Multiplicative Decrease): 超时、429 或 p95 延迟明显上升时，上限乘以 decrease_factor
+
+静态并发槽位（rate_limit）是厂商合同上限；自适应上限在其之下寻找最佳工作点。
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator
+
+import requests
+
+from src.backend.config import config
+from src.backend.logger import logger
+from src.backend.providers.context import DeadlineExceeded, RequestCancelled
+from src.backend.services.metrics import metrics, percentile
+from src.backend.services.rate_limit import RateLimitExceeded
+
+# 错误分类
+ERROR_TIMEOUT = "timeout"
+ERROR_RATE_LIMITED = "rate_limited"
+ERROR_OTHER = "error"
+ERROR_CANCELLED = "cancelled"
+
+# 触发降低并发的错误类型
+OVERLOAD_ERRORS = frozenset({ERROR_TIMEOUT, ERROR_RATE_LIMITED})
+
+
+def classify_error(error: BaseException | str) -> str:
+    """将异常或错误信息归类为 timeout / rate_limited / cancelled / error
+
+    请求取消与自身截止时间预算耗尽都归为 cancelled，不作为厂商过载信号。
+
+    Provider 通常把 requests 异常包装为 RuntimeError 抛出，这里会沿异常链查找原始异常；
+    LLM Provider 以字符串返回错误，这里按内容匹配。
+
+    Args:
+        error: 异常实例或错误信息字符串
+
+    Returns:
+        错误类型
+    """
+    if isinstance(error, (RequestCancelled, DeadlineExceeded)):
+        return ERROR_CANCELLED
+
+    exc = error if isinstance(error, BaseException) else None
+    while exc is not None:
+        if isinstance(exc, requests.Timeout):
+            return ERROR_TIMEOUT
+        response = getattr(exc, "response", None)
+        if getattr(response, "status_code", None) == 429:
+            return ERROR_RATE_LIMITED
+        exc = exc.__cause__ or exc.__context__
+
+    message = str(error).lower()
+    if "429" in message or "too many requests" in message or "rate limit" in message:
+        return ERROR_RATE_LIMITED
+    if "timeout" in message or "timed out" in message:
+        return ERROR_TIMEOUT
+    return ERROR_OTHER
+
+
+class CallOutcome:
+    """单次调用结果标记
+
+    调用未抛出异常但业务上失败时（如 LLM 返回错误字符串），调用方通过 fail() 标记。
+    """
+
+    def __init__(self):
+        self.error_kind: str | None = None
+
+    def fail(self, error_kind: str) -> None:
+        """标记本次调用失败"""
+        self.error_kind = error_kind
+
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD 自适应并发限制器
+
+    Attributes:
+        limit: 当前并发上限（浮点数，向下取整后生效）
+        inflight: 正在执行的调用数
+    """
+
+    def __init__(
+        self,
+        min_limit: int = 1,
+        max_limit: int = 32,
+        initial_limit: int = 4,
+        decrease_factor: float = 0.5,
+        latency_tolerance: float = 1.5,
+        window: int = 50,
+        decrease_cooldown: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """初始化限制器
+
+        Args:
+            min_limit: 并发下限
+            max_limit: 并发上限
+            initial_limit: 初始并发
+            decrease_factor: 乘性减系数
+            latency_tolerance: 近期 p95 超过基线 p95 的倍数视为延迟上升
+            window: 近期延迟窗口大小
+            decrease_cooldown: 两次乘性减之间的最短间隔（秒），避免同一波拥塞重复降级
+            clock: 单调时钟（测试时可替换）
+        """
+        self.min_limit = min_limit
+        self.max_limit = max(min_limit, max_limit)
+        self.limit = float(min(max(initial_limit, min_limit), self.max_limit))
+        self.inflight = 0
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+        self.decrease_cooldown = decrease_cooldown
+        self._clock = clock
+        self._recent: deque[float] = deque(maxlen=window)
+        self._baseline_p95: float | None = None
+        self._last_decrease = float("-inf")
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout: float = 0.0) -> None:
+        """获取并发许可
+
+        Args:
+            timeout: 最长等待时间（秒）
+
+        Raises:
+            RateLimitExceeded: 在截止时间内无法获得许可（vendor 由调用方补充）
+        """
+        deadline = time.monotonic() + max(0.0, timeout)
+        with self._cond:
+            while self.inflight >= int(self.limit):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise RateLimitExceeded("", None, self._estimate_wait())
+                self._cond.wait(remaining)
+            self.inflight += 1
+
+    def _estimate_wait(self) -> float:
+        """估算等待一个空闲并发的时间（秒）"""
+        p50 = percentile(self._recent, 50)
+        return p50 if p50 is not None else 1.0
+
+    def release(self, latency: float, error_kind: str | None = None) -> None:
+        """归还并发许可并根据结果调整上限
+
+        Args:
+            latency: 本次调用耗时（秒）
+            error_kind: 错误类型，None 表示成功
+        """
+        with self._cond:
+            self.inflight = max(0, self.inflight - 1)
+            if error_kind in OVERLOAD_ERRORS:
+                self._decrease(f"error={error_kind}")
+            elif error_kind is None:
+                self._on_success(latency)
+            self._cond.notify_all()
+
+    def _on_success(self, latency: float) -> None:
+        """成功调用: 延迟稳定则加性增，p95 上升则乘性减"""
+        self._recent.append(latency)
+        if len(self._recent) < min(10, self._recent.maxlen or 10):
+            self._increase()
+            return
+
+        recent_p95 = percentile(self._recent, 95)
+        if self._baseline_p95 is None:
+            self._baseline_p95 = recent_p95
+
+        if recent_p95 > self._baseline_p95 * self.latency_tolerance:
+            self._decrease(f"p95={recent_p95:.2f}s baseline={self._baseline_p95:.2f}s")
+        else:
+            self._increase()
+        # 基线缓慢跟随，适应厂商长期的延迟变化
+        self._baseline_p95 = 0.95 * self._baseline_p95 + 0.05 * recent_p95
+
+    def _increase(self) -> None:
+        """加性增: 每个"往返"（约 limit 次成功）上限 +1"""
+        # 仅当并发被实际用满时才提升，避免空闲时上限无意义地膨胀
+        if self.inflight + 1 < int(self.limit):
+            return
+        self.limit = min(float(self.max_limit), self.limit + 1.0 / self.limit)
+
+    def _decrease(self, reason: str) -> None:
+        """乘性减"""
+        now = self._clock()
+        if now - self._last_decrease < self.decrease_cooldown:
+            return
+        self._last_decrease = now
+        old = self.limit
+        self.limit = max(float(self.min_limit), self.limit * self.decrease_factor)
+        logger.info(f"Adaptive concurrency decreased {old:.1f} -> {self.limit:.1f} ({reason})")
+
+    def snapshot(self) -> dict[str, Any]:
+        """获取当前状态"""
+        with self._cond:
+            return {
+                "limit": int(self.limit),
+                "limit_raw": round(self.limit, 2),
+                "inflight": self.inflight,
+                "baseline_p95": self._baseline_p95,
+                "recent_p95": percentile(self._recent, 95),
+            }
+
+
+class AdaptiveLimiterRegistry:
+    """按厂商管理自适应并发限制器"""
+
+    def __init__(
+        self,
+        min_limit: int,
+        max_limit: int,
+        initial_limit: int,
+        vendor_caps: dict[str, int] | None = None,
+    ):
+        """初始化注册表
+
+        Args:
+            min_limit: 并发下限
+            max_limit: 并发上限
+            initial_limit: 初始并发
+            vendor_caps: 厂商静态并发上限（来自限流配置），自适应上限不会超过它
+        """
+        self._min_limit = min_limit
+        self._max_limit = max_limit
+        self._initial_limit = initial_limit
+        self._vendor_caps = vendor_caps or {}
+        self._limiters: dict[str, AdaptiveConcurrencyLimiter] = {}
+        self._lock = threading.Lock()
+
+    def get(self, vendor: str) -> AdaptiveConcurrencyLimiter:
+        """获取（或创建）厂商的限制器"""
+        with self._lock:
+            limiter = self._limiters.get(vendor)
+            if limiter is None:
+                cap = self._vendor_caps.get(vendor, 0)
+                max_limit = min(self._max_limit, cap) if cap > 0 else self._max_limit
+                limiter = AdaptiveConcurrencyLimiter(
+                    min_limit=self._min_limit,
+                    max_limit=max_limit,
+                    initial_limit=self._initial_limit,
+                )
+                self._limiters[vendor] = limiter
+            return limiter
+
+    @contextmanager
+    def acquire(self, vendor: str, timeout: float | None = None) -> Iterator[CallOutcome]:
+        """在自适应并发许可内执行调用
+
+        退出时自动记录延迟与错误类型（异常会被分类后重新抛出）。
+
+        Args:
+            vendor: 厂商名称
+            timeout: 最长等待时间（秒），None 使用 RATE_LIMIT_QUEUE_TIMEOUT
+
+        Yields:
+            CallOutcome，可用于标记业务失败
+
+        Raises:
+            RateLimitExceeded: 在截止时间内无法获得许可
+        """
+        limiter = self.get(vendor)
+        if timeout is None:
+            timeout = config.RATE_LIMIT_QUEUE_TIMEOUT
+        try:
+            limiter.acquire(timeout)
+        except RateLimitExceeded as e:
+            metrics.inc("adaptive_concurrency_rejected", vendor=vendor)
+            raise RateLimitExceeded(vendor, None, e.retry_after) from None
+
+        outcome = CallOutcome()
+        start = time.monotonic()
+        try:
+            yield outcome
+        except BaseException as e:
+            outcome.fail(classify_error(e))
+            raise
+        finally:
+            latency = time.monotonic() - start
+            limiter.release(latency, outcome.error_kind)
+            metrics.observe("provider_call_seconds", latency, vendor=vendor)
+            metrics.inc("provider_calls", vendor=vendor, outcome=outcome.error_kind or "success")
+
+    def snapshot(self) -> dict[str, dict[str, Any]]:
+        """获取所有厂商限制器的状态"""
+        with self._lock:
+            items = list(self._limiters.items())
+        return {vendor: limiter.snapshot() for vendor, limiter in items}
+
+
+# 单例实例
+adaptive_limiter_registry: AdaptiveLimiterRegistry = AdaptiveLimiterRegistry(
+    min_limit=config.ADAPTIVE_CONCURRENCY_MIN,
+    max_limit=config.ADAPTIVE_CONCURRENCY_MAX,
+    initial_limit=config.ADAPTIVE_CONCURRENCY_INITIAL,
+    vendor_caps={vendor: rule["concurrency"] for vendor, rule in config.RATE_LIMITS.items()},
+)
+metrics.register_collector("adaptive_concurrency", adaptive_limiter_registry.snapshot)
@@ -0,0 +1,189 @@
+"""
+停机排空
+
+进程收到 SIGTERM 时（install_signal_handler() 安装的处理函数，先于服务器关闭）进入排空模式:
+
+    1. 生成端点不再接受新请求，返回 503（error_type: shutting_down）与 Retry-After，
+       /health 返回 503，负载均衡据此摘除实例
+    2. 最多等待 DRAIN_TIMEOUT 秒，让在途的厂商调用（含后台任务与 Kling 轮询）自然完成
+    3. 超时后以 CANCEL_SHUTDOWN 原因取消剩余调用：Kling 停止轮询，但任务 ID 保留在
+       pending_tasks 中，重启后恢复轮询（jobs.resume_pending_tasks），不会重新提交
+    4. 把信号交给服务器原有的处理函数：uvicorn 关闭监听、等待剩余 HTTP 请求后执行 lifespan 关闭
+
+uvicorn 的 lifespan 关闭阶段在监听关闭、HTTP 请求结束之后才执行，只在那里排空时客户端与负载均衡
+看不到 503。lifespan 关闭阶段仍会调用 drain() 兜底（未安装信号处理时，如非主线程启动）。
+
+在途调用由服务层 _call_provider 通过 track() 登记。
+"""
+
+import signal
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+from src.backend.config import config
+from src.backend.logger import get_logger
+from src.backend.providers.context import CANCEL_SHUTDOWN, RequestContext
+from src.backend.services.metrics import metrics
+
+logger = get_logger(__name__)
+
+# 停机时拒绝请求的错误类型
+ERROR_SHUTTING_DOWN = "shutting_down"
+
+# 取消剩余调用后等待其退出的时间（秒）
+_CANCEL_GRACE_SECONDS = 5.0
+
+
+class DrainController:
+    """在途调用登记与停机排空"""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._draining = False
+        self._inflight: list[RequestContext | None] = []
+
+    @property
+    def draining(self) -> bool:
+        """是否处于排空模式"""
+        return self._draining
+
+    @contextmanager
+    def track(self, ctx: RequestContext | None) -> Iterator[None]:
+        """登记一次在途调用
+
+        Args:
+            ctx: 调用所属的请求上下文，None 表示不在请求中（无法在停机时取消）
+        """
+        with self._cond:
+            self._inflight.append(ctx)
+        try:
+            yield
+        finally:
+            with self._cond:
+                for i, item in enumerate(self._inflight):
+                    if item is ctx:
+                        del self._inflight[i]
+                        break
+                self._cond.notify_all()
+
+    def start_drain(self) -> None:
+        """进入排空模式，此后生成端点拒绝新请求"""
+        with self._cond:
+            self._draining = True
+
+    def wait_idle(self, timeout: float) -> bool:
+        """等待在途调用全部结束
+
+        Args:
+            timeout: 最长等待时间（秒）
+
+        Returns:
+            是否已全部结束
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._inflight:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    def cancel_inflight(self) -> int:
+        """以停机原因取消全部在途调用（含已分离的后台任务）
+
+        Returns:
+            被取消的请求数
+        """
+        with self._cond:
+            contexts = {id(ctx): ctx for ctx in self._inflight if ctx is not None}
+        for ctx in contexts.values():
+            ctx.cancel(CANCEL_SHUTDOWN)
+        return len(contexts)
+
+    def drain(self, timeout: float) -> bool:
+        """进入排空模式并等待在途调用结束，超时后取消剩余调用
+
+        Args:
+            timeout: 最长等待时间（秒）
+
+        Returns:
+            是否在 timeout 内全部自然结束
+        """
+        self.start_drain()
+        inflight = self.snapshot()["inflight"]
+        logger.info(f"Draining {inflight} in-flight provider calls (timeout {timeout}s)")
+        if self.wait_idle(timeout):
+            logger.info("Drain complete")
+            return True
+
+        cancelled = self.cancel_inflight()
+        metrics.inc("drain_cancelled", value=cancelled)
+        logger.warning(f"Drain timed out, cancelled {cancelled} requests; pending vendor tasks will resume on restart")
+        self.wait_idle(_CANCEL_GRACE_SECONDS)
+        return False
+
+    def install_signal_handler(self, timeout: float, signum: int = signal.SIGTERM) -> bool:
+        """收到 signum 时先排空，再交给原有的处理函数
+
+        信号到达时立即进入排空模式，在后台线程中执行 drain(timeout)，结束后调用原处理函数
+        （uvicorn 随即关闭监听并退出）。排空期间再次收到信号时直接交给原处理函数。
+        需在服务器安装信号处理之后（lifespan 启动阶段）于主线程调用。
+
+        Args:
+            timeout: 排空等待时间（秒）
+            signum: 信号
+
+        Returns:
+            是否已安装（不在主线程或原处理函数不可调用时不安装）
+        """
+        if threading.current_thread() is not threading.main_thread():
+            return False
+        previous = signal.getsignal(signum)
+        if not callable(previous):
+            return False
+
+        def handle(sig: int, frame: Any) -> None:
+            if self._draining:
+                previous(sig, frame)
+                return
+            self.start_drain()
+            logger.info(f"Received signal {sig}, draining before shutdown")
+
+            def run() -> None:
+                self.drain(timeout)
+                previous(sig, frame)
+
+            threading.Thread(target=run, name="drain", daemon=True).start()
+
+        signal.signal(signum, handle)
+        return True
+
+    def rejection(self, vendor: str | None = None) -> dict[str, Any]:
+        """排空期间拒绝新请求的结果
+
+        Args:
+            vendor: 请求的厂商名称
+
+        Returns:
+            error_type 为 shutting_down 的结果字典
+        """
+        return {
+            "success": False,
+            "error": "Server is shutting down, retry on another instance",
+            "error_type": ERROR_SHUTTING_DOWN,
+            "retry_after": config.DRAIN_RETRY_AFTER,
+            "vendor": vendor,
+        }
+
+    def snapshot(self) -> dict[str, Any]:
+        """获取排空状态与在途调用数"""
+        with self._cond:
+            return {"draining": self._draining, "inflight": len(self._inflight)}
+
+
+# 单例实例
+drain_controller: DrainController = DrainController()
+metrics.register_collector("drain", drain_controller.snapshot)
@@ -0,0 +1,271 @@
+"""
+LLM 对冲请求
+
+LLM 延迟长尾明显（gemini/zhipu 开启思考时尤甚）。对冲请求在主请求超过该厂商
+历史延迟分位数仍未返回时，将同一提示词发给备用厂商，取先成功的结果，丢弃另一个。
+
+额外调用受预算约束：每个主请求积累 LLM_HEDGE_BUDGET_RATIO 个额度，每次对冲消耗 1 个，
+默认最多带来约 5% 的额外调用。
+
+每一路在各自的子请求上下文中运行，胜出后取消落败一路的上下文：落败一路不再重试，
+服务层立即放弃等待其结果。
+
+Note:
+    LLM SDK 的 HTTP 请求无法中断，落败一路已发出的请求在后台线程中运行结束，
+    其限流与并发槽位保持到那时才归还。
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from typing import Any
+
+from src.backend.config import config
+from src.backend.logger import get_logger
+from src.backend.providers.context import RequestContext, bind, current_context, use_context
+from src.backend.services.metrics import metrics, percentile
+from src.backend.services.provider_service import LLMService, ProviderRegistry
+from src.backend.services.routing import translate_params
+
+logger = get_logger(__name__)
+
+# 对冲请求使用的线程池大小
+_MAX_WORKERS = 32
+
+
+class HedgeBudget:
+    """对冲预算（令牌桶）
+
+    每个主请求存入 ratio 个额度，每次对冲取出 1 个，额度上限为 max_tokens。
+    """
+
+    def __init__(self, ratio: float, max_tokens: float = 10.0):
+        """初始化预算
+
+        Args:
+            ratio: 额外调用占主调用的比例上限
+            max_tokens: 可累积的额度上限（允许的对冲突发数）
+        """
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self._tokens = 0.0
+        self._lock = threading.Lock()
+
+    def on_request(self) -> None:
+        """记录一次主请求，存入额度"""
+        with self._lock:
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        """尝试消耗一次对冲额度
+
+        Returns:
+            是否有足够额度
+        """
+        with self._lock:
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return True
+            return False
+
+    def snapshot(self) -> dict[str, Any]:
+        """获取当前状态"""
+        with self._lock:
+            return {"ratio": self.ratio, "tokens": round(self._tokens, 3)}
+
+
+class LatencyTracker:
+    """按厂商记录最近成功调用的延迟，用于计算对冲延迟"""
+
+    def __init__(self, window: int = 200):
+        """初始化
+
+        Args:
+            window: 每个厂商保留的样本数
+        """
+        self.window = window
+        self._samples: dict[str, deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, vendor: str, latency: float) -> None:
+        """记录一次成功调用的延迟"""
+        with self._lock:
+            self._samples.setdefault(vendor, deque(maxlen=self.window)).append(latency)
+
+    def hedge_delay(
+        self,
+        vendor: str,
+        q: float,
+        min_samples: int,
+        default: float,
+    ) -> float:
+        """计算对冲延迟
+
+        Args:
+            vendor: 厂商名称
+            q: 分位数 (0-100)
+            min_samples: 所需最少样本数
+            default: 样本不足时的默认延迟（秒）
+
+        Returns:
+            对冲延迟（秒）
+        """
+        with self._lock:
+            samples = list(self._samples.get(vendor, ()))
+        if len(samples) < min_samples:
+            return default
+        return percentile(samples, q)
+
+    def snapshot(self) -> dict[str, dict[str, Any]]:
+        """获取各厂商样本数与延迟分位数"""
+        with self._lock:
+            items = {vendor: list(samples) for vendor, samples in self._samples.items()}
+        return {
+            vendor: {
+                "samples": len(samples),
+                "p50": percentile(samples, 50),
+                "p95": percentile(samples, 95),
+                "p99": percentile(samples, 99),
+            }
+            for vendor, samples in items.items()
+        }
+
+
+class LLMHedgingService:
+    """LLM 对冲请求服务"""
+
+    budget: HedgeBudget = HedgeBudget(config.LLM_HEDGE_BUDGET_RATIO)
+    latencies: LatencyTracker = LatencyTracker()
+    _executor: ThreadPoolExecutor = ThreadPoolExecutor(
+        max_workers=_MAX_WORKERS, thread_name_prefix="llm-hedge"
+    )
+
+    @classmethod
+    def _submit(
+        cls,
+        vendor: str,
+        prompt: str,
+        queue_timeout: float | None,
+        params: dict[str, Any],
+    ) -> tuple[Future, RequestContext]:
+        """在线程池中以子请求上下文调用 LLMService.generate，并记录成功调用的延迟
+
+        Returns:
+            (调用 future, 该路的请求上下文)，取消上下文即放弃这一路
+        """
+        parent = current_context()
+        ctx = parent.child() if parent is not None else RequestContext()
+
+        def call() -> dict[str, Any]:
+            start = time.monotonic()
+            with use_context(ctx):
+                result = LLMService.generate(vendor=vendor, prompt=prompt, queue_timeout=queue_timeout, **params)
+            if result["success"]:
+                cls.latencies.record(vendor, time.monotonic() - start)
+            return result
+
+        return cls._executor.submit(bind(call)), ctx
+
+    @classmethod
+    def _get_hedge_vendor(cls, vendor: str, hedge_vendor: str | None) -> str | None:
+        """获取可用的备用厂商，不可用返回 None"""
+        backup = hedge_vendor or config.LLM_HEDGE_VENDORS.get(vendor)
+        if not backup or backup == vendor:
+            return None
+        provider = ProviderRegistry.get_llm_provider(backup)
+        if provider is None or not provider.is_available():
+            return None
+        return backup
+
+    @classmethod
+    def generate(
+        cls,
+        vendor: str,
+        prompt: str,
+        hedge: bool | None = None,
+        hedge_vendor: str | None = None,
+        queue_timeout: float | None = None,
+        **kwargs,
+    ) -> dict[str, Any]:
+        """生成文本，主请求过慢时向备用厂商发起对冲
+
+        Args:
+            vendor: 厂商名称
+            prompt: 输入提示词
+            hedge: 是否启用对冲，None 使用 LLM_HEDGE_ENABLED
+            hedge_vendor: 备用厂商，None 使用 LLM_HEDGE_VENDORS 配置
+            queue_timeout: 超出限流时的最长排队时间（秒）
+            **kwargs: 主厂商参数（对冲时按 ParamSpec 转换给备用厂商）
+
+        Returns:
+            LLMService.generate 的结果，发起对冲时额外包含:
+                - hedged: True
+                - hedge_vendor: 备用厂商
+                - requested_vendor: 主厂商
+        """
+        if hedge is None:
+            hedge = config.LLM_HEDGE_ENABLED
+        if not hedge:
+            return LLMService.generate(vendor=vendor, prompt=prompt, queue_timeout=queue_timeout, **kwargs)
+
+        primary = ProviderRegistry.get_llm_provider(vendor)
+        if primary is None:
+            return LLMService.generate(vendor=vendor, prompt=prompt, queue_timeout=queue_timeout, **kwargs)
+
+        cls.budget.on_request()
+        primary_future, primary_ctx = cls._submit(vendor, prompt, queue_timeout, kwargs)
+        delay = cls.latencies.hedge_delay(
+            vendor,
+            config.LLM_HEDGE_PERCENTILE,
+            config.LLM_HEDGE_MIN_SAMPLES,
+            config.LLM_HEDGE_DEFAULT_DELAY,
+        )
+        try:
+            return primary_future.result(timeout=delay)
+        except FuturesTimeoutError:
+            pass
+
+        backup = cls._get_hedge_vendor(vendor, hedge_vendor)
+        if backup is None or not cls.budget.try_spend():
+            metrics.inc("llm_hedge_skipped", vendor=vendor)
+            return primary_future.result()
+
+        logger.info(f"Hedging LLM request: {vendor} exceeded {delay:.1f}s, racing {backup}")
+        metrics.inc("llm_hedge_fired", vendor=vendor, hedge_vendor=backup)
+        backup_params = translate_params(
+            primary.GENERATE_PARAMS,
+            ProviderRegistry.get_llm_provider(backup).GENERATE_PARAMS,
+            kwargs,
+        )
+        backup_future, backup_ctx = cls._submit(backup, prompt, queue_timeout, backup_params)
+        legs = {primary_future: (primary_ctx, vendor), backup_future: (backup_ctx, backup)}
+
+        results: dict[Future, dict[str, Any]] = {}
+        pending = {primary_future, backup_future}
+        winner: dict[str, Any] | None = None
+        while pending and winner is None:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[future] = future.result()
+                if results[future]["success"] and winner is None:
+                    winner = results[future]
+
+        # 取消落败一路：不再重试，服务层放弃等待，结果丢弃
+        for future in pending:
+            loser_ctx, loser = legs[future]
+            loser_ctx.cancel()
+            metrics.inc("llm_hedge_cancelled", vendor=loser)
+
+        result = winner or results.get(primary_future) or results[backup_future]
+        metrics.inc("llm_hedge_won", vendor=result["vendor"])
+        return result | {"hedged": True, "hedge_vendor": backup, "requested_vendor": vendor}
+
+    @classmethod
+    def snapshot(cls) -> dict[str, Any]:
+        """获取对冲预算与延迟统计"""
+        return {"budget": cls.budget.snapshot(), "latencies": cls.latencies.snapshot()}
+
+
+metrics.register_collector("llm_hedging", LLMHedgingService.snapshot)
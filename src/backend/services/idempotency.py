@@ -0,0 +1,191 @@
+"""
+幂等键（Idempotency-Key）
+
+网络抖动与前端重试会让同一次生成被执行多次并重复计费。生成端点接受 Idempotency-Key 头:
+
+    - 首次请求登记 键 → 请求指纹（请求体的 SHA-256），执行并保存结果
+    - 执行中收到同一键的重复请求：加入等待同一次执行，不再调用厂商
+    - 执行完成后收到重复请求：直接返回保存的结果
+    - 同一键但请求体不同：拒绝（422）
+
+键按租户（X-User-ID / X-Design-Scheme-ID）与 Provider 类型隔离。结果在完成后保留
+IDEMPOTENCY_TTL 秒；键数超过 IDEMPOTENCY_MAX_KEYS 或结果总大小超过 IDEMPOTENCY_MAX_BYTES 时
+淘汰最早完成的键。限流、熔断、过载、停机、取消、预算耗尽与服务端内部错误等瞬时失败不保存，
+重试时重新执行。
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from src.backend.config import config
+from src.backend.services.metrics import metrics
+
+# 不保存的瞬时失败类型
+TRANSIENT_ERROR_TYPES = frozenset({
+    "rate_limited",
+    "circuit_open",
+    "overloaded",
+    "shutting_down",
+    "cancelled",
+    "deadline_exceeded",
+    "internal_error",
+})
+
+
+class IdempotencyConflict(ValueError):
+    """同一幂等键对应的请求体不一致"""
+
+    def __init__(self, key: str):
+        self.key = key
+        super().__init__(f"Idempotency-Key '{key}' was already used with a different request payload")
+
+
+def fingerprint(payload: dict[str, Any]) -> str:
+    """计算请求指纹
+
+    Args:
+        payload: 请求体（可 JSON 序列化的字典）
+
+    Returns:
+        规范化 JSON（键排序）的 SHA-256 十六进制摘要
+    """
+    canonical = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _result_size(result: dict[str, Any]) -> int:
+    """估算结果占用的字节数（以 base64 内容为主）"""
+    content = result.get("content")
+    if isinstance(content, (str, bytes)):
+        return len(content)
+    if isinstance(content, list):
+        return sum(len(item) for item in content if isinstance(item, (str, bytes)))
+    return 0
+
+
+@dataclass
+class _Entry:
+    """幂等键记录"""
+
+    fingerprint: str
+    future: Future = field(default_factory=Future)
+    completed_at: float | None = None
+    size: int = 0
+
+
+class IdempotencyStore:
+    """幂等键存储"""
+
+    def __init__(
+        self,
+        ttl: float,
+        max_keys: int,
+        max_bytes: int,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """初始化
+
+        Args:
+            ttl: 完成后结果保留时间（秒）
+            max_keys: 最多保留的键数
+            max_bytes: 已保存结果的总字节数上限
+            clock: 时钟函数（测试用）
+        """
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self.max_bytes = max_bytes
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._bytes = 0
+
+    def _drop(self, key: str) -> None:
+        """删除键（调用方持有锁）"""
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def _prune(self) -> None:
+        """清理过期键，超出容量时按完成顺序淘汰（调用方持有锁），执行中的键不淘汰"""
+        now = self._clock()
+        for key, entry in list(self._entries.items()):
+            if entry.completed_at is not None and now - entry.completed_at > self.ttl:
+                self._drop(key)
+
+        for key, entry in list(self._entries.items()):
+            if len(self._entries) <= self.max_keys and self._bytes <= self.max_bytes:
+                break
+            if entry.completed_at is not None:
+                self._drop(key)
+
+    def begin(self, key: str, request_fingerprint: str) -> tuple[Future, bool]:
+        """登记或查找幂等键
+
+        Args:
+            key: 幂等键（已包含租户与 Provider 类型作用域）
+            request_fingerprint: 请求指纹
+
+        Returns:
+            (future, is_owner)：is_owner 为 True 时调用方负责执行并调用 complete()；
+            否则等待 future 即可拿到首次执行的结果
+
+        Raises:
+            IdempotencyConflict: 同一键对应的请求体不一致
+        """
+        with self._lock:
+            self._prune()
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry.fingerprint != request_fingerprint:
+                    metrics.inc("idempotency_conflicts")
+                    raise IdempotencyConflict(key)
+                metrics.inc("idempotency_replayed" if entry.future.done() else "idempotency_joined")
+                return entry.future, False
+
+            entry = _Entry(fingerprint=request_fingerprint)
+            self._entries[key] = entry
+            return entry.future, True
+
+    def complete(self, key: str, result: dict[str, Any]) -> None:
+        """记录首次执行的结果并唤醒等待者
+
+        瞬时失败只通知正在等待的重复请求，不保存，之后的重试重新执行。
+
+        Args:
+            key: 幂等键
+            result: 服务层结果
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.future.done():
+                return
+            if result.get("error_type") in TRANSIENT_ERROR_TYPES:
+                del self._entries[key]
+            else:
+                # 完成的键移到末尾，淘汰按完成顺序进行
+                self._entries.move_to_end(key)
+                entry.completed_at = self._clock()
+                entry.size = _result_size(result)
+                self._bytes += entry.size
+                self._prune()
+        entry.future.set_result(result)
+
+    def snapshot(self) -> dict[str, int]:
+        """获取键数、执行中的键数与已保存结果的字节数"""
+        with self._lock:
+            inflight = sum(1 for entry in self._entries.values() if entry.completed_at is None)
+            return {"keys": len(self._entries), "inflight": inflight, "bytes": self._bytes}
+
+
+# 单例实例
+idempotency_store: IdempotencyStore = IdempotencyStore(
+    ttl=config.IDEMPOTENCY_TTL,
+    max_keys=config.IDEMPOTENCY_MAX_KEYS,
+    max_bytes=config.IDEMPOTENCY_MAX_BYTES,
+)
+metrics.register_collector("idempotency", idempotency_store.snapshot)
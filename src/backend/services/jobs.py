@@ -0,0 +1,174 @@
+"""
+后台任务（分离的请求）
+
+客户端断开时，请求默认被取消；若请求声明 detach_on_disconnect，则转为后台任务继续运行
+（如 Kling 视频继续轮询并下载），结果保存在本存储中，客户端稍后以请求 ID
+（X-Request-ID）通过 GET /api/v1/jobs/{job_id} 取回。
+
+结果保留 DETACHED_JOB_TTL 秒，最多保留 DETACHED_JOB_MAX 个，超出时淘汰最早完成的任务。
+
+进程重启时，停机前未完成的厂商任务（pending_tasks）由 resume_pending_tasks() 恢复轮询，
+同样作为后台任务以原请求 ID 保存结果。
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from src.backend.config import config
+from src.backend.logger import get_logger
+from src.backend.providers.context import RequestContext, use_context
+from src.backend.providers.tasks import pending_tasks
+from src.backend.services.metrics import metrics
+from src.backend.services.provider_service import VideoService
+from src.backend.services.scheduler import PRIORITY_BACKGROUND
+
+logger = get_logger(__name__)
+
+# 任务状态
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+
+
+class DetachedJobStore:
+    """后台任务存储"""
+
+    def __init__(
+        self,
+        ttl: float,
+        max_jobs: int,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """初始化
+
+        Args:
+            ttl: 完成后结果保留时间（秒）
+            max_jobs: 最多保留的任务数
+            clock: 时钟函数（测试用）
+        """
+        self.ttl = ttl
+        self.max_jobs = max_jobs
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._jobs: dict[str, dict[str, Any]] = {}
+
+    def _prune(self) -> None:
+        """清理过期任务，超出容量时淘汰最早完成的任务（调用方持有锁）"""
+        now = self._clock()
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job["status"] == JOB_DONE and now - job["finished_at"] > self.ttl
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+        finished = sorted(
+            (job["finished_at"], job_id)
+            for job_id, job in self._jobs.items()
+            if job["status"] == JOB_DONE
+        )
+        overflow = len(self._jobs) - self.max_jobs
+        for _, job_id in finished[:max(0, overflow)]:
+            del self._jobs[job_id]
+
+    def start(self, job_id: str, provider_type: str) -> None:
+        """登记一个运行中的后台任务
+
+        Args:
+            job_id: 任务 ID（请求 ID）
+            provider_type: Provider 类型 (llm, image, video)
+        """
+        with self._lock:
+            self._prune()
+            self._jobs[job_id] = {
+                "job_id": job_id,
+                "provider_type": provider_type,
+                "status": JOB_RUNNING,
+                "finished_at": None,
+                "result": None,
+            }
+        metrics.inc("jobs_detached", provider_type=provider_type)
+
+    def finish(self, job_id: str, result: dict[str, Any]) -> None:
+        """记录后台任务结果
+
+        Args:
+            job_id: 任务 ID
+            result: 服务层返回的结果字典
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job["status"] = JOB_DONE
+            job["finished_at"] = self._clock()
+            job["result"] = result
+            self._prune()
+
+    def get(self, job_id: str) -> dict[str, Any] | None:
+        """获取任务状态
+
+        Args:
+            job_id: 任务 ID
+
+        Returns:
+            任务信息字典（job_id, provider_type, status, result），不存在或已过期返回 None
+        """
+        with self._lock:
+            self._prune()
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            return {k: v for k, v in job.items() if k != "finished_at"}
+
+    def snapshot(self) -> dict[str, int]:
+        """获取运行中与已完成的任务数"""
+        with self._lock:
+            running = sum(1 for job in self._jobs.values() if job["status"] == JOB_RUNNING)
+            return {"running": running, "done": len(self._jobs) - running}
+
+
+# 单例实例
+detached_jobs: DetachedJobStore = DetachedJobStore(
+    ttl=config.DETACHED_JOB_TTL,
+    max_jobs=config.DETACHED_JOB_MAX,
+)
+metrics.register_collector("detached_jobs", detached_jobs.snapshot)
+
+
+# 恢复轮询使用的线程池（与请求线程池隔离）
+_resume_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="resume")
+
+
+def resume_pending_tasks() -> int:
+    """恢复停机前未完成的厂商任务
+
+    每个任务以原请求 ID（缺失时为厂商任务 ID）登记为后台任务并在后台恢复轮询，
+    客户端通过 GET /api/v1/jobs/{job_id} 取回结果。提交超过 PENDING_TASK_MAX_AGE 秒的
+    任务视为已过期，直接丢弃。
+
+    Returns:
+        恢复的任务数
+    """
+    resumed = 0
+    for task in pending_tasks.list():
+        task_id = task["task_id"]
+        if time.time() - task["submitted_at"] > config.PENDING_TASK_MAX_AGE:
+            logger.warning(f"Dropping expired {task['vendor']} task {task_id}")
+            pending_tasks.remove(task_id)
+            continue
+
+        job_id = task.get("request_id") or task_id
+        ctx = RequestContext(request_id=job_id, detached=True, priority=PRIORITY_BACKGROUND)
+        detached_jobs.start(job_id, "video")
+
+        def run(task: dict[str, Any] = task, ctx: RequestContext = ctx) -> dict[str, Any]:
+            with use_context(ctx):
+                return VideoService.resume(task["vendor"], task["task_id"], **task["task_info"])
+
+        future = _resume_executor.submit(run)
+        future.add_done_callback(lambda f, job_id=job_id: detached_jobs.finish(job_id, f.result()))
+        metrics.inc("tasks_resumed", vendor=task["vendor"])
+        resumed += 1
+    return resumed
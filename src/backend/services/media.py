@@ -0,0 +1,514 @@
+"""
+媒体后处理
+
+生成结果在返回前做 CPU 密集的后处理（MP4 faststart 重排、封面截取、图片编码），
+这些工作在进程池（MEDIA_WORKERS 个进程）中执行，不占用事件循环与请求线程的 GIL;
+MEDIA_WORKERS=0 时在调用线程内执行（测试与单核部署）。
+
+视频后处理:
+    - moov 移到文件开头（不重新编码），浏览器拿到前几百 KB 即可开始播放与拖动
+    - 截取首帧 JPEG 作为 <video poster>，视频下载前先显示封面
+    - 二者按内容寻址存入对象存储，封面与视频并列（cas/ab/{sha256}.mp4 与 {sha256}.poster.jpg），
+      由 /api/v1/assets 以 Range 与 immutable 缓存提供下载
+
+图片派生版本:
+    - 原图按内容寻址存入对象存储，thumb / preview / full 三档 WebP / AVIF 与原图并列
+      （按尺寸命名，如 {sha256}.256x256.webp），另存一份清单 {sha256}.renditions.json
+    - 清单存在即视为已编码（同一内容再次生成或重复请求时不再占用进程池）
+    - 只有 return_format=url 的请求等待编码（响应需要给出派生版本地址）；其余格式存入原图后
+      立即返回，派生版本在后台编码，同一内容再以 url 格式请求时直接读取清单
+
+源图读取与 Tile 缓存（参考图预处理、拼图与画布渲染共用）:
+    - fetch_source() 读取 /api/v1/assets 地址（直接读对象存储）、data: 地址，或经 HTTP 下载
+      SOURCE_ALLOWED_HOSTS 中主机的 http(s) 地址（其他主机一律拒绝，不跟随重定向）；
+      data: 内容与下载均以 SOURCE_MAX_BYTES 为上限，下载分块读取、超过上限立即中止
+    - load_tile() 读取缩放后的元素像素：tile_cache 按 (源图内容标识, 尺寸) 缓存，总字节数受
+      TILE_CACHE_BYTES 限制，LRU 淘汰；未命中时读取源图并在进程池中解码缩放
+"""
+
+import base64
+import json
+import multiprocessing
+import posixpath
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable
+from urllib.parse import unquote, urlsplit
+
+from src.backend.config import config
+from src.backend.logger import get_logger
+from src.backend.media.compose import Tile, render_tile
+from src.backend.media.image import RENDITION_FORMATS, encode_renditions
+from src.backend.media.mp4 import MP4Error, is_faststart, postprocess_video
+from src.backend.providers import http
+from src.backend.providers.context import budget_timeout, check_cancelled, current_context
+from src.backend.services.metrics import metrics
+from src.backend.storage import (
+    ServedStorage,
+    content_key,
+    derived_key,
+    is_content_addressed,
+    normalize_key,
+    storage,
+)
+
+logger = get_logger(__name__)
+
+
+class MediaProcessor:
+    """在进程池中执行媒体处理函数
+
+    Attributes:
+        workers: 进程数，0 表示在调用线程内执行
+    """
+
+    def __init__(self, workers: int):
+        """初始化（进程池在首次使用时创建）
+
+        Args:
+            workers: 进程数，0 表示在调用线程内执行
+        """
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._pool: ProcessPoolExecutor | None = None
+        self._running = 0
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # spawn：服务进程有多个线程，fork 可能继承被其他线程持有的锁
+                self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+            return self._pool
+
+    def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """执行 fn(*args)，等待期间可被当前请求取消
+
+        Args:
+            fn: 模块级函数（需可被 pickle）
+            *args: 参数
+
+        Returns:
+            fn 的返回值
+
+        Raises:
+            RequestCancelled: 等待期间请求被取消（子进程中的任务继续执行，结果被丢弃）
+            DeadlineExceeded: 等待期间预算耗尽
+        """
+        if self.workers <= 0:
+            return fn(*args)
+        future: Future = self._get_pool().submit(fn, *args)
+        with self._lock:
+            self._running += 1
+        try:
+            ctx = current_context()
+            return ctx.wait_for(future) if ctx is not None else future.result()
+        finally:
+            with self._lock:
+                self._running -= 1
+
+    def shutdown(self) -> None:
+        """关闭进程池"""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def snapshot(self) -> dict[str, int]:
+        """获取进程数与执行中的任务数"""
+        with self._lock:
+            return {"workers": self.workers, "running": self._running}
+
+
+# 单例实例
+media_processor: MediaProcessor = MediaProcessor(config.MEDIA_WORKERS)
+metrics.register_collector("media", media_processor.snapshot)
+
+
+class TileCache:
+    """缩放后的元素像素缓存（LRU，按总字节数限制）
+
+    Attributes:
+        max_bytes: 总字节数上限，0 表示不缓存
+    """
+
+    def __init__(self, max_bytes: int):
+        """初始化
+
+        Args:
+            max_bytes: 总字节数上限，0 表示不缓存
+        """
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[Hashable, Tile] = OrderedDict()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, key: Hashable) -> Tile | None:
+        """读取缓存（命中时移到最近使用）"""
+        with self._lock:
+            tile = self._entries.get(key)
+            if tile is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return tile
+
+    def put(self, key: Hashable, tile: Tile) -> None:
+        """写入缓存，超出上限时淘汰最久未使用的条目（单个超过上限的条目不缓存）"""
+        if tile.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous.nbytes
+            self._entries[key] = tile
+            self._bytes += tile.nbytes
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def snapshot(self) -> dict[str, int]:
+        """获取条目数、字节数与命中统计"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+            }
+
+
+# 单例实例
+tile_cache: TileCache = TileCache(config.TILE_CACHE_BYTES)
+metrics.register_collector("tile_cache", tile_cache.snapshot)
+
+
+def asset_key(url: str) -> str | None:
+    """本服务 /api/v1/assets 地址对应的对象键
+
+    Args:
+        url: 相对地址或以 STORAGE_PUBLIC_BASE_URL 开头的地址
+
+    Returns:
+        对象键，其他地址返回 None
+    """
+    parts = urlsplit(url)
+    prefix = ServedStorage.ASSET_PATH + "/"
+    if not parts.path.startswith(prefix):
+        return None
+    if parts.netloc:
+        base = config.STORAGE_PUBLIC_BASE_URL
+        if not base or urlsplit(base).netloc != parts.netloc:
+            return None
+    try:
+        return normalize_key(unquote(parts.path[len(prefix):]))
+    except ValueError:
+        return None
+
+
+def source_digest(url: str) -> str | None:
+    """不读取内容即可得到的源图内容标识，否则返回 None
+
+    内容寻址的 /api/v1/assets 地址：原图为 SHA-256，派生版本为 {sha256}.{名称}（与原图区分）。
+    """
+    key = asset_key(url)
+    if key is None or not is_content_addressed(key):
+        return None
+    return posixpath.splitext(posixpath.basename(key))[0]
+
+
+def source_host_allowed(url: str) -> bool:
+    """http(s) 地址的主机是否在 SOURCE_ALLOWED_HOSTS 中
+
+    以 "." 开头的条目匹配该域名的全部子域名（".example.com" 匹配 "cdn.example.com"）。
+    """
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower()
+    if parts.scheme not in ("http", "https") or not host:
+        return False
+    return any(
+        host.endswith(entry) if entry.startswith(".") else host == entry
+        for entry in config.SOURCE_ALLOWED_HOSTS
+    )
+
+
+def _download_source(url: str, max_bytes: int) -> bytes:
+    """分块下载源图，超过 max_bytes 立即中止（不跟随重定向）"""
+    response = http.get(url, timeout=budget_timeout(http.DOWNLOAD_TIMEOUT), stream=True, allow_redirects=False)
+    with response:
+        if response.is_redirect:
+            raise ValueError(f"Source URL redirects are not allowed: {url[:100]}")
+        response.raise_for_status()
+        if int(response.headers.get("Content-Length") or 0) > max_bytes:
+            raise ValueError(f"Source image exceeds {max_bytes} bytes: {url[:100]}")
+        chunks: list[bytes] = []
+        received = 0
+        for chunk in response.iter_content(http.DOWNLOAD_CHUNK_SIZE):
+            check_cancelled()
+            received += len(chunk)
+            if received > max_bytes:
+                raise ValueError(f"Source image exceeds {max_bytes} bytes: {url[:100]}")
+            chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def fetch_source(url: str) -> bytes:
+    """读取源图内容
+
+    Args:
+        url: /api/v1/assets 地址（直接读对象存储）、data: 地址或 SOURCE_ALLOWED_HOSTS 中主机的 http(s) 地址
+
+    Returns:
+        源图内容
+
+    Raises:
+        ObjectNotFound: 对象不存在
+        ValueError: data: 地址格式无效、主机不在允许列表中、重定向或内容超过 SOURCE_MAX_BYTES
+        requests.RequestException: 下载失败
+        RequestCancelled: 请求已取消
+        DeadlineExceeded: 请求预算耗尽
+    """
+    key = asset_key(url)
+    if key is not None:
+        return storage.get(key)
+    max_bytes = config.SOURCE_MAX_BYTES
+    if url.startswith("data:"):
+        header, sep, payload = url.partition(",")
+        if not sep:
+            raise ValueError("Invalid data URL")
+        # base64 每 4 个字符 3 字节，解码前按编码长度拒绝超限内容
+        if len(payload) > (max_bytes + 2) // 3 * 4:
+            raise ValueError(f"Source image exceeds {max_bytes} bytes: data URL")
+        data = base64.b64decode(payload) if header.endswith(";base64") else unquote(payload).encode("utf-8")
+        if len(data) > max_bytes:
+            raise ValueError(f"Source image exceeds {max_bytes} bytes: data URL")
+        return data
+    if not source_host_allowed(url):
+        raise ValueError(f"Source URL not allowed: {url[:100]}")
+    return _download_source(url, max_bytes)
+
+
+def load_tile(url: str, digest: str, width: int, height: int, source: bytes | None = None) -> Tile:
+    """读取缩放后的元素像素（先查 tile_cache，未命中时读取源图并在进程池中解码缩放）
+
+    Args:
+        url: 源图地址
+        digest: 源图内容标识（见 source_digest）
+        width: 目标宽度（像素）
+        height: 目标高度（像素）
+        source: 已读取的源图内容，None 时按 url 读取
+
+    Returns:
+        RGBA Tile
+
+    Raises:
+        ValueError: 源图无法解码（或未安装 Pillow）
+        Exception: 源图读取失败
+    """
+    cache_key = (digest, width, height)
+    tile = tile_cache.get(cache_key)
+    if tile is not None:
+        return tile
+    if source is None:
+        source = fetch_source(url)
+    tile = media_processor.run(render_tile, source, width, height)
+    if tile is None:
+        raise ValueError(f"Cannot decode image: {url[:100]}")
+    tile_cache.put(cache_key, tile)
+    return tile
+
+
+def _is_faststart(data: bytes) -> bool:
+    try:
+        return is_faststart(data)
+    except MP4Error:
+        return False
+
+
+@dataclass(frozen=True)
+class ProcessedVideo:
+    """后处理后的视频
+
+    Attributes:
+        video: 视频内容（faststart 重排后）
+        url: 视频地址
+        poster_url: 封面地址，未能截取时为 None
+    """
+
+    video: bytes
+    url: str
+    poster_url: str | None
+
+
+def process_video(video_bytes: bytes) -> ProcessedVideo:
+    """faststart 重排、截取封面并存入对象存储
+
+    Args:
+        video_bytes: 厂商返回的 MP4 内容
+
+    Returns:
+        后处理结果
+
+    Raises:
+        RequestCancelled: 等待后处理期间请求被取消
+        DeadlineExceeded: 等待后处理期间预算耗尽
+        Exception: 写入存储失败
+    """
+    start = time.monotonic()
+    video, poster = media_processor.run(postprocess_video, video_bytes)
+    metrics.observe("video_postprocess_seconds", time.monotonic() - start)
+    if video != video_bytes:
+        layout = "remuxed"
+    else:
+        layout = "faststart" if _is_faststart(video) else "unsupported"
+    metrics.inc("video_postprocess", layout=layout, poster=poster is not None)
+
+    key = content_key(video, "mp4")
+    if storage.head(key) is None:
+        storage.put(key, video, "video/mp4")
+    poster_url = None
+    if poster is not None:
+        poster_key = derived_key(key, "poster.jpg")
+        if storage.head(poster_key) is None:
+            storage.put(poster_key, poster, "image/jpeg")
+        poster_url = storage.url(poster_key)
+    return ProcessedVideo(video=video, url=storage.url(key), poster_url=poster_url)
+
+
+@dataclass(frozen=True)
+class ProcessedImage:
+    """存入对象存储的图片及其派生版本
+
+    Attributes:
+        url: 原图地址
+        renditions: 派生版本清单（见 process_image），未能生成时为 None
+    """
+
+    url: str
+    renditions: dict[str, Any] | None
+
+
+def _renditions_with_urls(manifest: dict[str, Any]) -> dict[str, Any]:
+    """把清单中的对象键替换为地址（地址随部署配置变化，清单只保存键）"""
+    result: dict[str, Any] = {"width": manifest["width"], "height": manifest["height"]}
+    for name, rendition in manifest["renditions"].items():
+        result[name] = {
+            "width": rendition["width"],
+            "height": rendition["height"],
+        } | {fmt: storage.url(key) for fmt, key in rendition["keys"].items()}
+    return result
+
+
+def _load_manifest(key: str) -> dict[str, Any] | None:
+    try:
+        return json.loads(storage.get(key))
+    except (FileNotFoundError, ValueError, KeyError):
+        return None
+
+
+def _encode_renditions(key: str, manifest_key: str, image_bytes: bytes) -> dict[str, Any] | None:
+    """编码并存储派生版本，最后写入清单
+
+    Returns:
+        清单，无法编码时返回 None
+    """
+    start = time.monotonic()
+    encoded = media_processor.run(encode_renditions, image_bytes, config.IMAGE_RENDITION_FORMATS)
+    metrics.observe("image_rendition_seconds", time.monotonic() - start)
+    metrics.inc("image_renditions", cached=False, encoded=encoded is not None)
+    if encoded is None:
+        return None
+
+    manifest = {"width": encoded.width, "height": encoded.height, "renditions": {}}
+    for name, rendition in encoded.renditions.items():
+        keys = {}
+        for fmt, data in rendition.files.items():
+            # 尺寸相同的档位复用同一份内容，同样内容寻址
+            rendition_key = derived_key(key, f"{rendition.width}x{rendition.height}.{fmt}")
+            keys[fmt] = rendition_key
+            if storage.head(rendition_key) is None:
+                storage.put(rendition_key, data, RENDITION_FORMATS[fmt])
+        manifest["renditions"][name] = {"width": rendition.width, "height": rendition.height, "keys": keys}
+    # 清单最后写入：清单存在即表示全部派生版本已写完
+    storage.put(manifest_key, json.dumps(manifest).encode("utf-8"), "application/json")
+    return manifest
+
+
+# 后台编码派生版本的线程池（不属于任何请求，不随请求取消）与编码中的原图键
+_rendition_executor = ThreadPoolExecutor(max_workers=max(1, config.MEDIA_WORKERS), thread_name_prefix="renditions")
+_rendition_lock = threading.Lock()
+_encoding: set[str] = set()
+
+
+def _encode_in_background(key: str, manifest_key: str, image_bytes: bytes) -> None:
+    """提交后台编码，同一原图正在编码时忽略"""
+    with _rendition_lock:
+        if key in _encoding:
+            return
+        _encoding.add(key)
+
+    def run() -> None:
+        try:
+            _encode_renditions(key, manifest_key, image_bytes)
+        except Exception as e:
+            logger.warning(f"Background rendition encoding failed for {key}: {e}")
+        finally:
+            with _rendition_lock:
+                _encoding.discard(key)
+
+    _rendition_executor.submit(run)
+
+
+def process_image(image_bytes: bytes, ext: str = "png", wait: bool = True) -> ProcessedImage:
+    """原图存入对象存储，生成并存储 thumb / preview / full 派生版本
+
+    Args:
+        image_bytes: 原图内容
+        ext: 原图扩展名
+        wait: 是否等待编码；False 时存入原图后立即返回，尚未编码过的内容在后台编码
+
+    Returns:
+        处理结果，renditions 形如::
+
+            {"width": 2048, "height": 2048,
+             "thumb": {"width": 256, "height": 256, "avif": "/api/v1/assets/cas/..thumb.avif", "webp": "..."},
+             "preview": {...}, "full": {...}}
+
+        未安装 Pillow、未配置 IMAGE_RENDITION_FORMATS、原图无法解码或不等待且尚未编码过时 renditions 为 None
+
+    Raises:
+        RequestCancelled: 等待编码期间请求被取消
+        DeadlineExceeded: 等待编码期间预算耗尽
+        Exception: 读写存储失败
+    """
+    key = content_key(image_bytes, ext)
+    if storage.head(key) is None:
+        storage.put(key, image_bytes, f"image/{'jpeg' if ext == 'jpg' else ext}")
+    url = storage.url(key)
+    if not config.IMAGE_RENDITION_FORMATS:
+        return ProcessedImage(url=url, renditions=None)
+
+    manifest_key = derived_key(key, "renditions.json")
+    manifest = _load_manifest(manifest_key)
+    if manifest is not None:
+        metrics.inc("image_renditions", cached=True)
+        return ProcessedImage(url=url, renditions=_renditions_with_urls(manifest))
+
+    if not wait:
+        _encode_in_background(key, manifest_key, image_bytes)
+        return ProcessedImage(url=url, renditions=None)
+
+    manifest = _encode_renditions(key, manifest_key, image_bytes)
+    return ProcessedImage(url=url, renditions=_renditions_with_urls(manifest) if manifest is not None else None)
@@ -0,0 +1,114 @@
+"""
+运行时指标
+
+进程内的轻量指标注册表，提供计数器、分布统计（分位数）与按需采集的状态快照，
+通过 GET /api/v1/metrics 以 JSON 形式导出。
+"""
+
+import math
+import threading
+from collections import deque
+from typing import Any, Callable, Iterable
+
+
+def percentile(values: Iterable[float], q: float) -> float | None:
+    """计算分位数（最近秩法）
+
+    Args:
+        values: 样本
+        q: 分位（0-100）
+
+    Returns:
+        分位数值，样本为空时返回 None
+    """
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    rank = max(1, math.ceil(q / 100.0 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def _labels_key(labels: dict[str, Any]) -> tuple[tuple[str, str], ...]:
+    """将标签字典转为可哈希的 key"""
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class MetricsRegistry:
+    """指标注册表
+
+    - 计数器: inc(name, **labels)
+    - 分布: observe(name, value, **labels)，保留最近 max_samples 个样本计算分位数
+    - 采集器: register_collector(name, fn)，导出时调用 fn() 获取实时状态
+    """
+
+    def __init__(self, max_samples: int = 1024):
+        """初始化指标注册表
+
+        Args:
+            max_samples: 每个分布保留的最大样本数
+        """
+        self._max_samples = max_samples
+        self._lock = threading.Lock()
+        self._counters: dict[tuple[str, tuple], float] = {}
+        self._samples: dict[tuple[str, tuple], deque[float]] = {}
+        self._collectors: dict[str, Callable[[], Any]] = {}
+
+    def inc(self, name: str, value: float = 1.0, **labels: Any) -> None:
+        """累加计数器"""
+        key = (name, _labels_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        """记录一次分布样本（如延迟）"""
+        key = (name, _labels_key(labels))
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = deque(maxlen=self._max_samples)
+                self._samples[key] = samples
+            samples.append(value)
+
+    def register_collector(self, name: str, collector: Callable[[], Any]) -> None:
+        """注册状态采集器，导出时调用"""
+        with self._lock:
+            self._collectors[name] = collector
+
+    def get_counter(self, name: str, **labels: Any) -> float:
+        """读取计数器当前值"""
+        with self._lock:
+            return self._counters.get((name, _labels_key(labels)), 0.0)
+
+    def snapshot(self) -> dict[str, Any]:
+        """导出所有指标
+
+        Returns:
+            包含 counters、summaries、gauges 的字典
+        """
+        with self._lock:
+            counters = list(self._counters.items())
+            samples = [(key, list(values)) for key, values in self._samples.items()]
+            collectors = list(self._collectors.items())
+
+        return {
+            "counters": [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in counters
+            ],
+            "summaries": [
+                {
+                    "name": name,
+                    "labels": dict(labels),
+                    "count": len(values),
+                    "p50": percentile(values, 50),
+                    "p95": percentile(values, 95),
+                    "p99": percentile(values, 99),
+                }
+                for (name, labels), values in samples
+            ],
+            "gauges": {name: collector() for name, collector in collectors},
+        }
+
+
+# 单例实例
+metrics: MetricsRegistry = MetricsRegistry()
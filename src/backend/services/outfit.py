@@ -0,0 +1,191 @@
+"""
+搭配服务
+
+搭配画布上选中 2–6 件单品后，compose_collage() 按它们在画布上的位置、大小与旋转（前端 ImageItem 的
+x / y / width / height / rotation）合成一张拼图，作为一张参考图提交给厂商：厂商只需拉取一张图，
+也不受单次调用参考图数量的限制。
+
+    - 按选中元素的外接矩形取景，长边缩放到目标分辨率（默认 COLLAGE_MAX_EDGE）
+    - 源图并行读取，缩放后的像素按 (源图哈希, 尺寸) 存入 tile_cache，调整布局后重新合成时不再解码缩放
+    - 解码缩放与合成在进程池中执行
+    - 拼图按 (源图哈希, 布局, 输出参数) 的哈希存为临时对象 tmp/collages/..，相同请求直接返回已有结果
+"""
+
+import hashlib
+import json
+import math
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from src.backend.config import config
+from src.backend.logger import get_logger
+from src.backend.media.compose import OUTPUT_FORMATS, ComposeError, Placement, Tile, compose, rotated_bounds
+from src.backend.providers.context import bind
+from src.backend.providers.http import MAX_PARALLEL_DOWNLOADS
+from src.backend.services.media import fetch_source, load_tile, media_processor, source_digest
+from src.backend.services.metrics import metrics
+from src.backend.storage import storage
+
+logger = get_logger(__name__)
+
+# 拼图的键前缀（临时对象，建议在 OSS 上为 tmp/ 前缀配置生命周期规则）
+COLLAGE_PREFIX = "tmp/collages"
+
+
+@dataclass(frozen=True)
+class CollageItem:
+    """拼图中的一件单品（画布坐标，与前端 ImageItem 一致）
+
+    Attributes:
+        url: 图片地址（/api/v1/assets、data: 或 SOURCE_ALLOWED_HOSTS 中主机的 http(s) 地址）
+        x: 未旋转时左上角横坐标
+        y: 未旋转时左上角纵坐标
+        width: 显示宽度
+        height: 显示高度
+        rotation: 绕中心顺时针旋转角度（度）
+    """
+
+    url: str
+    x: float
+    y: float
+    width: float
+    height: float
+    rotation: float = 0.0
+
+
+@dataclass(frozen=True)
+class Collage:
+    """合成结果
+
+    Attributes:
+        key: 对象键
+        url: 拼图地址（供画布显示）
+        reference_url: 厂商可访问的地址（签名地址），可直接作为生成请求的参考图
+        width: 宽度（像素）
+        height: 高度（像素）
+        cached: 是否直接返回了已有结果
+    """
+
+    key: str
+    url: str
+    reference_url: str
+    width: int
+    height: int
+    cached: bool
+
+
+def item_bounds(item: CollageItem) -> tuple[float, float, float, float]:
+    """元素旋转后的外接矩形 (left, top, right, bottom)"""
+    return rotated_bounds(item.x, item.y, item.width, item.height, item.rotation)
+
+
+def _vendor_url(key: str) -> str:
+    """厂商可访问的签名地址，存储地址不可从外部访问时退回 storage.url"""
+    url = storage.presign(key, config.REFERENCE_URL_TTL)
+    return url if url.startswith(("http://", "https://")) else storage.url(key)
+
+
+def compose_collage(
+    items: list[CollageItem],
+    size: int | None = None,
+    background: str | None = "#ffffff",
+    fmt: str = "jpg",
+) -> Collage:
+    """合成搭配拼图
+
+    Args:
+        items: 单品列表，按绘制顺序（后者在上）
+        size: 输出长边像素，None 使用 COLLAGE_MAX_EDGE
+        background: 背景色，None 表示透明（仅 png / webp）
+        fmt: 输出格式 (jpg, png, webp)
+
+    Returns:
+        合成结果
+
+    Raises:
+        ValueError: 单品数量、尺寸或输出参数无效，或源图无法解码
+        ComposeError: 未安装 Pillow
+        RequestCancelled: 请求已取消
+        DeadlineExceeded: 请求预算耗尽
+        Exception: 源图读取或存储写入失败
+    """
+    if not 1 <= len(items) <= config.COLLAGE_MAX_ITEMS:
+        raise ValueError(f"Collage needs 1-{config.COLLAGE_MAX_ITEMS} items, got {len(items)}")
+    if fmt not in OUTPUT_FORMATS:
+        raise ValueError(f"Unsupported format: {fmt}")
+    edge = size or config.COLLAGE_MAX_EDGE
+    if not 1 <= edge <= config.COLLAGE_MAX_EDGE:
+        raise ValueError(f"size must be between 1 and {config.COLLAGE_MAX_EDGE}")
+    if any(item.width <= 0 or item.height <= 0 for item in items):
+        raise ValueError("Item width and height must be positive")
+
+    # 外接矩形取景，长边缩放到 edge
+    bounds = [item_bounds(item) for item in items]
+    left, top = min(b[0] for b in bounds), min(b[1] for b in bounds)
+    right, bottom = max(b[2] for b in bounds), max(b[3] for b in bounds)
+    scale = edge / max(right - left, bottom - top)
+    width, height = max(1, math.ceil((right - left) * scale)), max(1, math.ceil((bottom - top) * scale))
+    placements = [
+        Placement(
+            x=(item.x - left) * scale,
+            y=(item.y - top) * scale,
+            width=item.width * scale,
+            height=item.height * scale,
+            rotation=item.rotation,
+        )
+        for item in items
+    ]
+
+    # 源图内容标识：内容寻址地址直接取自键，其余并行读取后计算 SHA-256
+    urls = list(dict.fromkeys(item.url for item in items))
+    sources: dict[str, bytes] = {}
+    digests: dict[str, str] = {}
+
+    def resolve(url: str) -> None:
+        digest = source_digest(url)
+        if digest is None:
+            sources[url] = fetch_source(url)
+            digest = hashlib.sha256(sources[url]).hexdigest()
+        digests[url] = digest
+
+    workers = min(len(urls), MAX_PARALLEL_DOWNLOADS)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(bind(resolve), urls))
+
+    spec = json.dumps(
+        {
+            "items": [
+                [digests[item.url], *(round(v, 2) for v in (p.x, p.y, p.width, p.height, p.rotation))]
+                for item, p in zip(items, placements)
+            ],
+            "size": [width, height],
+            "background": background,
+            "format": fmt,
+            "quality": config.COLLAGE_QUALITY,
+        },
+        sort_keys=True,
+    )
+    spec_hash = hashlib.sha256(spec.encode("utf-8")).hexdigest()
+    key = f"{COLLAGE_PREFIX}/{spec_hash[:2]}/{spec_hash}.{fmt}"
+    if storage.head(key) is not None:
+        metrics.inc("collages", cached=True)
+        return Collage(key, storage.url(key), _vendor_url(key), width, height, cached=True)
+
+    def tile_for(item: CollageItem, placement: Placement) -> Tile:
+        tile_width = max(1, round(placement.width))
+        tile_height = max(1, round(placement.height))
+        return load_tile(item.url, digests[item.url], tile_width, tile_height, sources.get(item.url))
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        tiles = list(executor.map(bind(tile_for), items, placements))
+
+    data = media_processor.run(
+        compose, width, height, list(zip(tiles, placements)), background, fmt, config.COLLAGE_QUALITY
+    )
+    storage.put(key, data, OUTPUT_FORMATS[fmt][1])
+    metrics.inc("collages", cached=False)
+    logger.info(f"Collage composed: {len(items)} items -> {width}x{height} {fmt}, {len(data)} bytes")
+    return Collage(key, storage.url(key), _vendor_url(key), width, height, cached=False)
+
+
+__all__ = ["Collage", "CollageItem", "ComposeError", "compose_collage", "item_bounds"]
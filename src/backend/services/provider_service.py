@@ -6,9 +6,23 @@ Provider 服务层
 
 import base64
 import io
-from typing import Any
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from typing import Any, Callable
 
 from src.backend.config import config
+from src.backend.logger import get_logger
+from src.backend.providers import http
+from src.backend.providers.context import (
+    DeadlineExceeded,
+    RequestCancelled,
+    bind,
+    check_cancelled,
+    current_context,
+    remaining_budget,
+)
+from src.backend.providers.health import CircuitOpenError
 from src.backend.providers.llm import (
     BaseLLMProvider,
     gemini_provider,
@@ -24,6 +38,19 @@ from src.backend.providers.video import (
     BaseVideoProvider,
     thirtytwo_kling_provider,
 )
+from src.backend.providers.callbacks import kling_callbacks
+from src.backend.providers.events import EVENT_STARTED, emit, job_events
+from src.backend.providers.transfer import transfer_stats
+from src.backend.services.concurrency import adaptive_limiter_registry, classify_error
+from src.backend.services.drain import drain_controller
+from src.backend.services.media import ProcessedImage, process_image, process_video
+from src.backend.services.references import prepare_references
+from src.backend.services.metrics import metrics
+from src.backend.services.rate_limit import RateLimitExceeded, rate_limiter_registry
+from src.backend.services.scheduler import PRIORITY_INTERACTIVE, scheduler_registry
+from src.backend.storage import storage
+
+logger = get_logger(__name__)
 
 
 # =============================================================================
@@ -90,6 +117,23 @@ class ProviderRegistry:
         """
         return cls._video_providers.get(vendor)
 
+    @classmethod
+    def get_providers(cls, provider_type: str) -> dict[str, Any]:
+        """获取某一类型的全部 Provider
+
+        Args:
+            provider_type: Provider 类型 (llm, image, video)
+
+        Returns:
+            厂商名称到 Provider 实例的字典，未知类型返回空字典
+        """
+        providers = {
+            "llm": cls._llm_providers,
+            "image": cls._image_providers,
+            "video": cls._video_providers,
+        }.get(provider_type, {})
+        return dict(providers)
+
     @classmethod
     def list_llm_providers(cls) -> list[dict[str, Any]]:
         """列出所有 LLM Provider 信息
@@ -102,6 +146,7 @@ class ProviderRegistry:
                 "vendor": vendor,
                 "model": provider.model_name,
                 "available": provider.is_available(),
+                "health": provider.circuit_breaker.snapshot(),
                 "info": provider.get_provider_info(),
             }
             for vendor, provider in cls._llm_providers.items()
@@ -119,6 +164,7 @@ class ProviderRegistry:
                 "vendor": vendor,
                 "model": provider.model_name,
                 "available": provider.is_available(),
+                "health": provider.circuit_breaker.snapshot(),
                 "info": provider.get_provider_info(),
             }
             for vendor, provider in cls._image_providers.items()
@@ -136,6 +182,7 @@ class ProviderRegistry:
                 "vendor": vendor,
                 "model": provider.model_name,
                 "available": provider.is_available(),
+                "health": provider.circuit_breaker.snapshot(),
                 "info": provider.get_provider_info(),
             }
             for vendor, provider in cls._video_providers.items()
@@ -155,6 +202,178 @@ class ProviderRegistry:
         }
 
 
+# =============================================================================
+# Provider 调用调度
+# =============================================================================
+
+# 可重试的调度错误：携带 error_type 与 retry_after，由路由层映射为对应状态码
+RETRYABLE_ERRORS = (RateLimitExceeded, CircuitOpenError)
+
+# 调度错误：可重试错误、请求取消与预算耗尽，均以 error_type 返回给调用方
+DISPATCH_ERRORS = (*RETRYABLE_ERRORS, RequestCancelled, DeadlineExceeded)
+
+# 请求提前终止的错误类型：不计入厂商健康，也不再回退到其他厂商
+TERMINAL_ERROR_TYPES = frozenset({RequestCancelled.error_type, DeadlineExceeded.error_type})
+
+# 请求上下文中执行 Provider 调用的线程池大小
+_CALL_WORKERS = 64
+
+# 请求上下文中的 Provider 调用在独立线程执行，客户端断开时调用方可立即放弃等待并中断其 HTTP 连接
+_call_executor = ThreadPoolExecutor(max_workers=_CALL_WORKERS, thread_name_prefix="provider-call")
+
+
+def _run_call(call: Callable[[], Any], slots: ExitStack | None = None) -> Any:
+    """执行 Provider 调用，处于请求上下文中时可被取消
+
+    调用在独立线程中通过专属的 CallSession 发出 HTTP 请求。被取消或预算耗尽时立即抛出并中断该会话，
+    阻塞中的厂商请求随即失败；slots 中的限流、调度与并发槽位延后到调用线程真正结束时才归还，
+    避免厂商仍在处理的调用被当作空闲槽位。LLM SDK 不经过 CallSession，无法中断，其槽位同样保持到调用结束。
+
+    Args:
+        call: 实际发起调用的无参函数
+        slots: 调用占用的槽位，被放弃时转移到调用线程结束时退出
+
+    Returns:
+        call() 的返回值
+
+    Raises:
+        RequestCancelled: 请求被取消
+        DeadlineExceeded: 请求预算耗尽
+    """
+    ctx = current_context()
+    if ctx is None:
+        return call()
+
+    session = http.CallSession()
+
+    def run() -> Any:
+        with http.use_session(session):
+            return call()
+
+    future = _call_executor.submit(bind(run))
+    future.add_done_callback(lambda _: session.close())
+    try:
+        return ctx.wait_for(future)
+    except (RequestCancelled, DeadlineExceeded) as e:
+        session.abort()
+        if slots is not None:
+            held, error = slots.pop_all(), e
+            future.add_done_callback(lambda _: held.__exit__(type(error), error, error.__traceback__))
+        raise
+
+
+def _unavailable_result(provider_type: str, vendor: str, provider: Any) -> dict[str, Any]:
+    """构建 Provider 不可用时的结果
+
+    区分未配置 API Key 与熔断打开两种情况。
+
+    Args:
+        provider_type: Provider 类型名称（LLM, Image, Video）
+        vendor: 厂商名称
+        provider: Provider 实例
+
+    Returns:
+        失败结果字典
+    """
+    if provider.client is not None and provider.circuit_breaker.is_open():
+        return {
+            "success": False,
+            "error": f"{provider_type} provider '{vendor}' is temporarily unavailable (circuit open)",
+            "error_type": CircuitOpenError.error_type,
+            "retry_after": provider.circuit_breaker.retry_after(),
+            "vendor": vendor,
+        }
+    return {
+        "success": False,
+        "error": f"{provider_type} provider '{vendor}' is not available (check API key)",
+        "vendor": vendor,
+    }
+
+
+def _call_provider(
+    vendor: str,
+    provider: Any,
+    call: Callable[[], Any],
+    queue_timeout: float | None = None,
+    is_error: Callable[[Any], bool] | None = None,
+) -> Any:
+    """在熔断、优先级调度、限流与自适应并发控制下调用 Provider
+
+    Args:
+        vendor: 厂商名称
+        provider: Provider 实例
+        call: 实际发起调用的无参函数
+        queue_timeout: 最长排队时间（秒），None 使用配置默认值
+        is_error: 判断返回值是否为业务失败的函数（用于不抛异常的 Provider）
+
+    Returns:
+        call() 的返回值
+
+    Raises:
+        CircuitOpenError: 熔断器打开
+        RateLimitExceeded: 超出限流或自适应并发上限
+        RequestCancelled: 请求被取消（客户端断开）
+        DeadlineExceeded: 剩余预算不足以完成一次调用（按该厂商近期 p50 延迟估计）
+    """
+    check_cancelled()
+    breaker = provider.circuit_breaker
+
+    # 截止时间预算：排队时间不超过剩余预算，剩余预算低于厂商 p50 延迟时不再发起调用
+    if queue_timeout is None:
+        queue_timeout = config.RATE_LIMIT_QUEUE_TIMEOUT
+    remaining = remaining_budget()
+    if remaining is not None:
+        typical = breaker.snapshot()["latency_p50"]
+        if typical is not None and remaining < typical:
+            raise DeadlineExceeded(needed=typical)
+        queue_timeout = min(queue_timeout, remaining)
+
+    if not breaker.allow_request():
+        raise CircuitOpenError(vendor, breaker.retry_after())
+
+    # 优先级与租户取自请求上下文，不在请求中的调用（脚本、测试）视为交互请求
+    ctx = current_context()
+    priority = ctx.priority if ctx is not None else PRIORITY_INTERACTIVE
+    tenant = ctx.tenant if ctx is not None else None
+
+    queued_at = time.monotonic()
+    try:
+        with ExitStack() as slots:
+            slots.enter_context(drain_controller.track(ctx))
+            waited = slots.enter_context(scheduler_registry.acquire(vendor, priority, tenant, queue_timeout))
+            queue_timeout = max(0.0, queue_timeout - waited)
+            slots.enter_context(rate_limiter_registry.acquire(vendor, provider.model_name, queue_timeout))
+            outcome = slots.enter_context(adaptive_limiter_registry.acquire(vendor, queue_timeout))
+
+            start = time.monotonic()
+            emit(EVENT_STARTED, vendor=vendor, model=provider.model_name, waited=round(start - queued_at, 3))
+            try:
+                result = _run_call(call, slots)
+            except (RequestCancelled, DeadlineExceeded):
+                # 取消与预算耗尽不代表厂商故障，由外层归还半开探测名额；
+                # 槽位已转移给调用线程，在厂商调用真正结束后归还
+                raise
+            except ValueError:
+                # 参数校验错误属于调用方问题，不计入厂商健康
+                breaker.abandon_request()
+                raise
+            except Exception:
+                breaker.record_failure(time.monotonic() - start)
+                raise
+
+            latency = time.monotonic() - start
+            if is_error is not None and is_error(result):
+                outcome.fail(classify_error(str(result)))
+                breaker.record_failure(latency)
+            else:
+                breaker.record_success(latency)
+            return result
+    except (RateLimitExceeded, RequestCancelled, DeadlineExceeded):
+        # 排队超时、排队或调用期间被取消：调用未完成，不计入厂商健康
+        breaker.abandon_request()
+        raise
+
+
 # =============================================================================
 # LLM 服务
 # =============================================================================
@@ -182,10 +401,21 @@ class LLMService:
         exposed_names = {p.name for p in provider.get_exposed_params()}
         return {k: v for k, v in params.items() if k in exposed_names}
 
+    @staticmethod
+    def _is_error_content(content: Any) -> bool:
+        """判断 LLM Provider 返回的内容是否为错误信息
+
+        LLM Provider 捕获异常后以 "Error..." 字符串返回，这里识别出来用于并发控制信号。
+        """
+        return isinstance(content, str) and content.startswith(
+            ("Error generating content:", "Error: LLM configuration missing.")
+        )
+
     @staticmethod
     def generate(
         vendor: str,
         prompt: str,
+        queue_timeout: float | None = None,
         **kwargs,
     ) -> dict[str, Any]:
         """生成文本
@@ -193,6 +423,7 @@ class LLMService:
         Args:
             vendor: 厂商名称
             prompt: 输入提示词
+            queue_timeout: 超出限流时的最长排队时间（秒），None 使用配置默认值
             **kwargs: 厂商特定参数
 
         Returns:
@@ -200,6 +431,8 @@ class LLMService:
                 - success: 是否成功
                 - content: 生成内容（成功时）
                 - error: 错误信息（失败时）
+                - error_type: 错误类型（rate_limited, circuit_open, cancelled, deadline_exceeded）
+                - retry_after: 建议重试等待秒数（限流或熔断时）
                 - vendor: 实际使用的厂商
                 - model: 模型名称
 
@@ -216,23 +449,34 @@ class LLMService:
             }
 
         if not provider.is_available():
-            return {
-                "success": False,
-                "error": f"LLM provider '{vendor}' is not available (check API key)",
-                "vendor": vendor,
-            }
+            return _unavailable_result("LLM", vendor, provider)
 
         # 过滤参数，只传递暴露的参数
         filtered_params = LLMService._filter_exposed_params(provider, kwargs)
 
         try:
-            content = provider.generate(prompt, **filtered_params)
+            content = _call_provider(
+                vendor,
+                provider,
+                lambda: provider.generate(prompt, **filtered_params),
+                queue_timeout=queue_timeout,
+                is_error=LLMService._is_error_content,
+            )
             return {
                 "success": True,
                 "content": content,
                 "vendor": vendor,
                 "model": provider.model_name,
             }
+        except DISPATCH_ERRORS as e:
+            return {
+                "success": False,
+                "error": str(e),
+                "error_type": e.error_type,
+                "retry_after": e.retry_after,
+                "vendor": vendor,
+                "model": provider.model_name,
+            }
         except Exception as e:
             return {
                 "success": False,
@@ -273,6 +517,29 @@ class ImageService:
         """
         return base64.b64encode(image_bytes).decode("utf-8")
 
+    @staticmethod
+    def _process(image_bytes: bytes, return_format: str) -> ProcessedImage | None:
+        """存储原图并生成派生版本
+
+        只有 url 格式等待派生版本编码（响应需要给出地址），其余格式存入原图后派生版本在后台编码。
+
+        Args:
+            image_bytes: 图片二进制数据
+            return_format: 返回格式，url 时失败直接抛出（没有可返回的地址）
+
+        Returns:
+            处理结果；非 url 格式下处理失败时返回 None（仍返回原图）
+        """
+        try:
+            return process_image(image_bytes, wait=return_format == "url")
+        except DISPATCH_ERRORS:
+            raise
+        except Exception as e:
+            if return_format == "url":
+                raise
+            logger.warning(f"Image post-processing failed, returning original image: {e}")
+            return None
+
     @staticmethod
     def _filter_exposed_params(
         provider: BaseImageProvider,
@@ -295,6 +562,7 @@ class ImageService:
         vendor: str,
         prompt: str,
         return_format: str = "base64",
+        queue_timeout: float | None = None,
         **kwargs,
     ) -> dict[str, Any]:
         """生成图片
@@ -302,15 +570,21 @@ class ImageService:
         Args:
             vendor: 厂商名称
             prompt: 图片描述提示词
-            return_format: 返回格式 (base64, bytes)
-            **kwargs: 厂商特定参数
+            return_format: 返回格式 (base64, bytes, url)
+            queue_timeout: 超出限流时的最长排队时间（秒），None 使用配置默认值
+            **kwargs: 厂商特定参数（num_images > 1 时一次生成多张）
 
         Returns:
             包含生成结果的字典:
                 - success: 是否成功
-                - content: 图片内容（格式取决于 return_format）
-                - format: 内容格式 (base64, bytes)
+                - content: 图片内容（格式取决于 return_format，url 时为存储地址），num_images > 1 时为列表
+                - format: 内容格式 (base64, bytes, url)
+                - renditions: thumb / preview / full 派生版本地址（见 process_image），
+                  num_images > 1 时为与 content 对应的列表，未能生成的为 None；
+                  非 url 格式不等待编码，尚未编码过的内容为 None
                 - error: 错误信息（失败时）
+                - error_type: 错误类型（rate_limited, circuit_open, cancelled, deadline_exceeded）
+                - retry_after: 建议重试等待秒数（限流或熔断时）
                 - vendor: 实际使用的厂商
                 - model: 模型名称
 
@@ -328,31 +602,71 @@ class ImageService:
             }
 
         if not provider.is_available():
-            return {
-                "success": False,
-                "error": f"Image provider '{vendor}' is not available (check API key)",
-                "vendor": vendor,
-                "format": return_format,
-            }
+            return _unavailable_result("Image", vendor, provider) | {"format": return_format}
 
         # 过滤参数，只传递暴露的参数
         filtered_params = ImageService._filter_exposed_params(provider, kwargs)
 
+        num_images = filtered_params.pop("num_images", 1) or 1
+
         try:
-            image_bytes = provider.generate(prompt, **filtered_params)
+            # 参考图缩小重编码后以临时地址提交（REFERENCE_PREPROCESS 开启时）
+            filtered_params = prepare_references(provider, filtered_params)
+
+            if num_images > 1 and provider.NATIVE_MULTI_IMAGE:
+                images = _call_provider(
+                    vendor,
+                    provider,
+                    lambda: provider.generate_images(prompt, num_images=num_images, **filtered_params),
+                    queue_timeout=queue_timeout,
+                )
+            else:
+                # 厂商每次请求只返回一张：按张分别调度，每个厂商请求各占一次限流与并发槽位
+                def generate_one(_: int) -> bytes:
+                    return _call_provider(
+                        vendor,
+                        provider,
+                        lambda: provider.generate(prompt, **filtered_params),
+                        queue_timeout=queue_timeout,
+                    )
+
+                if num_images == 1:
+                    images = [generate_one(0)]
+                else:
+                    with ThreadPoolExecutor(max_workers=num_images) as executor:
+                        images = list(executor.map(bind(generate_one), range(num_images)))
+
+            # 原图与派生版本（进程池编码，非 url 格式在后台编码）存入对象存储
+            processed = [ImageService._process(image_bytes, return_format) for image_bytes in images]
 
             if return_format == "base64":
-                content = ImageService._encode_image(image_bytes)
+                encoded = [ImageService._encode_image(image_bytes) for image_bytes in images]
+            elif return_format == "url":
+                encoded = [item.url for item in processed]
             else:
-                content = image_bytes
+                encoded = images
+            renditions = [item.renditions if item is not None else None for item in processed]
+            # 单张时保持原有返回形式，多张时返回列表
+            content = encoded if num_images > 1 else encoded[0]
 
             return {
                 "success": True,
                 "content": content,
                 "format": return_format,
+                "renditions": renditions if num_images > 1 else renditions[0],
                 "vendor": vendor,
                 "model": provider.model_name,
             }
+        except DISPATCH_ERRORS as e:
+            return {
+                "success": False,
+                "error": str(e),
+                "error_type": e.error_type,
+                "retry_after": e.retry_after,
+                "vendor": vendor,
+                "model": provider.model_name,
+                "format": return_format,
+            }
         except Exception as e:
             return {
                 "success": False,
@@ -379,7 +693,7 @@ class ImageService:
 class VideoService:
     """Video 生成服务
 
-    封装 Video Provider 的调用逻辑，处理视频数据的编码和传输。
+    封装 Video Provider 的调用逻辑，处理视频数据的后处理（faststart、封面）、编码和传输。
     """
 
     @staticmethod
@@ -416,6 +730,7 @@ class VideoService:
         vendor: str,
         prompt: str,
         return_format: str = "base64",
+        queue_timeout: float | None = None,
         **kwargs,
     ) -> dict[str, Any]:
         """生成视频
@@ -423,15 +738,19 @@ class VideoService:
         Args:
             vendor: 厂商名称
             prompt: 视频描述提示词
-            return_format: 返回格式 (base64, bytes)
+            return_format: 返回格式 (base64, bytes, url)
+            queue_timeout: 超出限流时的最长排队时间（秒），None 使用配置默认值
             **kwargs: 厂商特定参数
 
         Returns:
             包含生成结果的字典:
                 - success: 是否成功
-                - content: 视频内容（格式取决于 return_format）
-                - format: 内容格式 (base64, bytes)
+                - content: 视频内容（格式取决于 return_format，url 时为存储地址）
+                - format: 内容格式 (base64, bytes, url)
+                - poster: 封面 JPEG 地址（未安装 ffmpeg 或后处理失败时为 None）
                 - error: 错误信息（失败时）
+                - error_type: 错误类型（rate_limited, circuit_open, cancelled, deadline_exceeded）
+                - retry_after: 建议重试等待秒数（限流或熔断时）
                 - vendor: 实际使用的厂商
                 - model: 模型名称
 
@@ -449,21 +768,101 @@ class VideoService:
             }
 
         if not provider.is_available():
+            return _unavailable_result("Video", vendor, provider) | {"format": return_format}
+
+        # 过滤参数，只传递暴露的参数
+        filtered_params = VideoService._filter_exposed_params(provider, kwargs)
+
+        return VideoService._execute(
+            vendor,
+            provider,
+            lambda params: provider.generate(prompt, **params),
+            return_format,
+            queue_timeout,
+            params=filtered_params,
+        )
+
+    @staticmethod
+    def resume(
+        vendor: str,
+        task_id: str,
+        return_format: str = "base64",
+        **task_info,
+    ) -> dict[str, Any]:
+        """恢复等待重启前已提交的厂商任务
+
+        Args:
+            vendor: 厂商名称
+            task_id: 厂商任务 ID
+            return_format: 返回格式 (base64, bytes, url)
+            **task_info: 提交时登记的任务信息
+
+        Returns:
+            与 generate 相同格式的结果字典
+        """
+        provider = ProviderRegistry.get_video_provider(vendor)
+
+        if provider is None:
             return {
                 "success": False,
-                "error": f"Video provider '{vendor}' is not available (check API key)",
+                "error": f"Unknown video vendor: {vendor}",
                 "vendor": vendor,
                 "format": return_format,
             }
 
-        # 过滤参数，只传递暴露的参数
-        filtered_params = VideoService._filter_exposed_params(provider, kwargs)
+        if not provider.is_available():
+            return _unavailable_result("Video", vendor, provider) | {"format": return_format}
+
+        return VideoService._execute(
+            vendor,
+            provider,
+            lambda params: provider.resume(task_id, **task_info),
+            return_format,
+        )
 
+    @staticmethod
+    def _execute(
+        vendor: str,
+        provider: BaseVideoProvider,
+        call: Callable[[dict[str, Any]], bytes],
+        return_format: str,
+        queue_timeout: float | None = None,
+        params: dict[str, Any] | None = None,
+    ) -> dict[str, Any]:
+        """调用 Provider 并构建结果字典
+
+        Args:
+            vendor: 厂商名称
+            provider: Provider 实例
+            call: 以（参考图预处理后的）调用参数返回视频字节的函数
+            return_format: 返回格式 (base64, bytes, url)
+            queue_timeout: 超出限流时的最长排队时间（秒），None 使用配置默认值
+            params: 调用参数
+
+        Returns:
+            结果字典
+        """
         try:
-            video_bytes = provider.generate(prompt, **filtered_params)
+            # 参考图缩小重编码后以临时地址提交（REFERENCE_PREPROCESS 开启时）
+            params = prepare_references(provider, params or {})
+            video_bytes = _call_provider(vendor, provider, lambda: call(params), queue_timeout=queue_timeout)
+
+            # faststart 重排与封面截取（进程池），结果存入对象存储
+            video_url = poster_url = None
+            try:
+                processed = process_video(video_bytes)
+                video_bytes, video_url, poster_url = processed.video, processed.url, processed.poster_url
+            except DISPATCH_ERRORS:
+                raise
+            except Exception as e:
+                if return_format == "url":
+                    raise
+                logger.warning(f"Video post-processing failed, returning original video: {e}")
 
             if return_format == "base64":
                 content = VideoService._encode_video(video_bytes)
+            elif return_format == "url":
+                content = video_url
             else:
                 content = video_bytes
 
@@ -471,8 +870,19 @@ class VideoService:
                 "success": True,
                 "content": content,
                 "format": return_format,
+                "poster": poster_url,
+                "vendor": vendor,
+                "model": provider.model_name,
+            }
+        except DISPATCH_ERRORS as e:
+            return {
+                "success": False,
+                "error": str(e),
+                "error_type": e.error_type,
+                "retry_after": e.retry_after,
                 "vendor": vendor,
                 "model": provider.model_name,
+                "format": return_format,
             }
         except Exception as e:
             return {
@@ -512,3 +922,9 @@ def get_service(provider_type: str) -> type[LLMService] | type[ImageService] | t
         "video": VideoService,
     }
     return services.get(provider_type)
+
+
+metrics.register_collector("image_transfer", transfer_stats.snapshot)
+metrics.register_collector("kling_callbacks", kling_callbacks.snapshot)
+metrics.register_collector("job_events", job_events.snapshot)
+metrics.register_collector("storage", storage.snapshot)
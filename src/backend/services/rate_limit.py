@@ -0,0 +1,253 @@
+"""
+客户端限流
+
+按厂商 + 模型维护令牌桶（每分钟请求数）与并发槽位，在调用厂商 API 前进行准入控制，
+避免触发厂商侧限流后才通过失败与重试得知。
+
+调用方可以选择:
+    - 立即失败: queue_timeout=0，超限时抛出 RateLimitExceeded（携带预计等待时间）
+    - 排队等待: queue_timeout>0，在截止时间内等待令牌与槽位
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Iterator
+
+from src.backend.config import config
+from src.backend.logger import logger
+from src.backend.services.metrics import metrics
+
+
+class RateLimitExceeded(Exception):
+    """超出客户端限流
+
+    Attributes:
+        vendor: 厂商名称
+        model: 模型名称
+        retry_after: 预计需要等待的秒数
+    """
+
+    error_type = "rate_limited"
+
+    def __init__(self, vendor: str, model: str | None, retry_after: float):
+        self.vendor = vendor
+        self.model = model
+        self.retry_after = retry_after
+        super().__init__(
+            f"Rate limit exceeded for '{vendor}' ({model}), retry after {retry_after:.1f}s"
+        )
+
+
+@dataclass(frozen=True)
+class RateLimitRule:
+    """限流规则
+
+    Attributes:
+        rpm: 每分钟请求数，<=0 表示不限制
+        concurrency: 并发槽位，<=0 表示不限制
+    """
+
+    rpm: int = 0
+    concurrency: int = 0
+
+
+class RateLimiter:
+    """单个厂商/模型的限流器
+
+    令牌桶容量等于 rpm（允许一分钟内的突发），按 rpm/60 每秒匀速补充；
+    并发槽位在调用结束时归还。两者同时满足才放行。
+    """
+
+    def __init__(self, rule: RateLimitRule, clock: Callable[[], float] = time.monotonic):
+        """初始化限流器
+
+        Args:
+            rule: 限流规则
+            clock: 单调时钟（测试时可替换）
+        """
+        self.rule = rule
+        self._clock = clock
+        self._cond = threading.Condition()
+        self._tokens = float(rule.rpm) if rule.rpm > 0 else 0.0
+        self._last_refill = clock()
+        self._inflight = 0
+        self._waiting = 0
+        # 并发槽位平均占用时长（EWMA），用于估算槽位等待时间
+        self._avg_hold = 1.0
+
+    def _refill(self, now: float) -> None:
+        """按流逝时间补充令牌"""
+        if self.rule.rpm <= 0:
+            return
+        elapsed = max(0.0, now - self._last_refill)
+        self._tokens = min(float(self.rule.rpm), self._tokens + elapsed * self.rule.rpm / 60.0)
+        self._last_refill = now
+
+    def _estimate_wait(self, now: float) -> float:
+        """估算获得令牌与槽位所需的等待时间（秒），0 表示可立即放行"""
+        self._refill(now)
+        token_wait = 0.0
+        if self.rule.rpm > 0 and self._tokens < 1.0:
+            token_wait = (1.0 - self._tokens) * 60.0 / self.rule.rpm
+        slot_wait = 0.0
+        if 0 < self.rule.concurrency <= self._inflight:
+            slot_wait = self._avg_hold
+        return max(token_wait, slot_wait)
+
+    def acquire(self, timeout: float = 0.0) -> None:
+        """获取一次调用许可
+
+        Args:
+            timeout: 最长排队时间（秒），0 表示不排队
+
+        Raises:
+            RateLimitExceeded: 在截止时间内无法获得许可
+        """
+        deadline = self._clock() + max(0.0, timeout)
+        with self._cond:
+            self._waiting += 1
+            try:
+                while True:
+                    now = self._clock()
+                    wait = self._estimate_wait(now)
+                    if wait <= 0:
+                        if self.rule.rpm > 0:
+                            self._tokens -= 1.0
+                        self._inflight += 1
+                        return
+                    remaining = deadline - now
+                    token_blocked = self.rule.rpm > 0 and self._tokens < 1.0
+                    # 令牌等待时间是确定的，超过剩余时间则无需排队
+                    if remaining <= 0 or (token_blocked and wait > remaining):
+                        raise RateLimitExceeded("", None, wait)
+                    self._cond.wait(min(wait, remaining))
+            finally:
+                self._waiting -= 1
+
+    def release(self, hold_time: float | None = None) -> None:
+        """归还并发槽位
+
+        Args:
+            hold_time: 本次占用槽位的时长（秒），用于更新等待估算
+        """
+        with self._cond:
+            self._inflight = max(0, self._inflight - 1)
+            if hold_time is not None:
+                self._avg_hold = 0.8 * self._avg_hold + 0.2 * hold_time
+            self._cond.notify()
+
+    def snapshot(self) -> dict[str, Any]:
+        """获取当前状态
+
+        Returns:
+            包含规则、剩余令牌、并发占用与排队数的字典
+        """
+        with self._cond:
+            self._refill(self._clock())
+            return {
+                "rpm": self.rule.rpm,
+                "concurrency": self.rule.concurrency,
+                "tokens": round(self._tokens, 2) if self.rule.rpm > 0 else None,
+                "inflight": self._inflight,
+                "waiting": self._waiting,
+            }
+
+
+class RateLimiterRegistry:
+    """限流器注册表
+
+    按 (vendor, model) 懒加载限流器。模型级覆盖规则优先于厂商规则，
+    未配置规则的厂商不做限制。
+    """
+
+    def __init__(
+        self,
+        vendor_rules: dict[str, dict[str, int]],
+        model_overrides: dict[str, dict[str, int]] | None = None,
+    ):
+        """初始化注册表
+
+        Args:
+            vendor_rules: 厂商规则，如 {"zhipu": {"rpm": 60, "concurrency": 5}}
+            model_overrides: 模型覆盖规则，key 为 "{vendor}:{model}"
+        """
+        self._vendor_rules = {k: RateLimitRule(**v) for k, v in vendor_rules.items()}
+        self._model_overrides = {
+            k: RateLimitRule(**v) for k, v in (model_overrides or {}).items()
+        }
+        self._limiters: dict[tuple[str, str | None], RateLimiter] = {}
+        self._lock = threading.Lock()
+
+    def get_rule(self, vendor: str, model: str | None) -> RateLimitRule | None:
+        """获取 vendor/model 对应的规则，未配置返回 None"""
+        return self._model_overrides.get(f"{vendor}:{model}") or self._vendor_rules.get(vendor)
+
+    def get(self, vendor: str, model: str | None) -> RateLimiter | None:
+        """获取（或创建）限流器，未配置规则返回 None"""
+        key = (vendor, model)
+        with self._lock:
+            limiter = self._limiters.get(key)
+            if limiter is None:
+                rule = self.get_rule(vendor, model)
+                if rule is None:
+                    return None
+                limiter = RateLimiter(rule)
+                self._limiters[key] = limiter
+            return limiter
+
+    @contextmanager
+    def acquire(
+        self,
+        vendor: str,
+        model: str | None,
+        timeout: float | None = None,
+    ) -> Iterator[None]:
+        """在限流许可内执行调用
+
+        Args:
+            vendor: 厂商名称
+            model: 模型名称
+            timeout: 最长排队时间（秒），None 使用 RATE_LIMIT_QUEUE_TIMEOUT
+
+        Raises:
+            RateLimitExceeded: 在截止时间内无法获得许可
+        """
+        limiter = self.get(vendor, model)
+        if limiter is None:
+            yield
+            return
+
+        if timeout is None:
+            timeout = config.RATE_LIMIT_QUEUE_TIMEOUT
+        try:
+            limiter.acquire(timeout)
+        except RateLimitExceeded as e:
+            logger.warning(f"Rate limit exceeded: {vendor} ({model}), retry after {e.retry_after:.1f}s")
+            metrics.inc("rate_limit_rejected", vendor=vendor)
+            raise RateLimitExceeded(vendor, model, e.retry_after) from None
+
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            limiter.release(time.monotonic() - start)
+
+    def snapshot(self) -> dict[str, dict[str, Any]]:
+        """获取所有已创建限流器的状态
+
+        Returns:
+            以 "{vendor}:{model}" 为 key 的状态字典
+        """
+        with self._lock:
+            items = list(self._limiters.items())
+        return {f"{vendor}:{model}": limiter.snapshot() for (vendor, model), limiter in items}
+
+
+# 单例实例
+rate_limiter_registry: RateLimiterRegistry = RateLimiterRegistry(
+    config.RATE_LIMITS,
+    config.RATE_LIMIT_MODEL_OVERRIDES,
+)
+metrics.register_collector("rate_limits", rate_limiter_registry.snapshot)
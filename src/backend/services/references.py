@@ -0,0 +1,160 @@
+"""
+参考图预处理
+
+图生图与图生视频请求把用户上传的原图地址（常为 10 MB 以上的手机照片）直接交给厂商，
+厂商拉取大图拖慢了任务开始。开启 REFERENCE_PREPROCESS 后，提交厂商前:
+
+    1. 并行拉取参考图（本服务 /api/v1/assets 地址直接读对象存储，SOURCE_ALLOWED_HOSTS 中主机的地址经 HTTP 下载）
+    2. 在进程池中缩小到厂商输出尺寸（Provider.reference_image_edge）、去除元数据、重新编码
+    3. 作为临时对象（tmp/refs/）上传，以签名地址替换请求参数中的原地址
+
+结果按原图 SHA-256 与目标尺寸缓存：临时对象已存在时不再编码；内容寻址的原图（cas/..）
+从键中即可得到哈希，缓存命中时连原图都不读取。任一参考图预处理失败（含主机不在允许列表中）时保留其原地址，
+不影响生成请求本身（取消与预算耗尽除外）。
+"""
+
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+from src.backend.config import config
+from src.backend.logger import get_logger
+from src.backend.media.image import prepare_reference
+from src.backend.providers.context import DeadlineExceeded, RequestCancelled, bind
+from src.backend.providers.http import MAX_PARALLEL_DOWNLOADS
+from src.backend.services.media import fetch_source, media_processor, source_digest
+from src.backend.services.metrics import metrics
+from src.backend.storage import storage
+
+logger = get_logger(__name__)
+
+# 预处理后参考图的键前缀（临时对象，建议在 OSS 上为该前缀配置生命周期规则）
+REFERENCE_PREFIX = "tmp/refs"
+
+# 参考图的规范参数名（见 ParamSpec.canonical）
+REFERENCE_CANONICAL = "reference_images"
+
+# 重新编码可能产生的扩展名
+_REFERENCE_EXTS = {"jpg": "image/jpeg", "png": "image/png"}
+
+
+def _cached(digest: str, edge: int) -> str | None:
+    """已预处理的临时对象键"""
+    for ext in _REFERENCE_EXTS:
+        key = f"{REFERENCE_PREFIX}/{digest[:2]}/{digest}.{edge}.{ext}"
+        if storage.head(key) is not None:
+            return key
+    return None
+
+
+def _vendor_url(key: str) -> str | None:
+    """厂商可访问的签名地址，存储地址不可从外部访问（相对地址）时返回 None"""
+    url = storage.presign(key, config.REFERENCE_URL_TTL)
+    return url if url.startswith(("http://", "https://")) else None
+
+
+def preprocess_reference(url: str, edge: int) -> str:
+    """预处理单张参考图
+
+    Args:
+        url: 原图地址
+        edge: 长边像素上限
+
+    Returns:
+        预处理后的签名地址；无法预处理时返回原地址
+
+    Raises:
+        RequestCancelled: 请求已取消
+        DeadlineExceeded: 请求预算耗尽
+    """
+    start = time.monotonic()
+    outcome = "failed"
+    try:
+        digest = source_digest(url)
+        if digest is not None:
+            cached = _cached(digest, edge)
+            if cached is not None:
+                outcome = "cached"
+                return _vendor_url(cached) or url
+
+        source = fetch_source(url)
+        digest = digest or hashlib.sha256(source).hexdigest()
+        cached = _cached(digest, edge)
+        if cached is not None:
+            outcome = "cached"
+            return _vendor_url(cached) or url
+
+        prepared = media_processor.run(prepare_reference, source, edge, config.REFERENCE_IMAGE_QUALITY)
+        if prepared is None:
+            outcome = "skipped"
+            return url
+        data, ext = prepared
+        reference_key = f"{REFERENCE_PREFIX}/{digest[:2]}/{digest}.{edge}.{ext}"
+        storage.put(reference_key, data, _REFERENCE_EXTS[ext])
+        outcome = "encoded"
+        metrics.inc("reference_bytes_saved", max(0, len(source) - len(data)))
+        return _vendor_url(reference_key) or url
+    except (RequestCancelled, DeadlineExceeded):
+        outcome = "cancelled"
+        raise
+    except Exception as e:
+        logger.warning(f"Reference image preprocessing failed, using original URL {url}: {e}")
+        return url
+    finally:
+        metrics.inc("reference_preprocess", outcome=outcome)
+        metrics.observe("reference_preprocess_seconds", time.monotonic() - start)
+
+
+def prepare_references(provider: Any, params: dict[str, Any]) -> dict[str, Any]:
+    """替换请求参数中的参考图地址
+
+    参考图参数由 ParamSpec.canonical == "reference_images" 识别（nano-banana images、
+    Seedream image、Kling images），值可为单个地址或地址列表，替换后保持原类型。
+
+    Args:
+        provider: Image / Video Provider 实例
+        params: 已过滤的调用参数
+
+    Returns:
+        替换后的参数（未开启或没有参考图时原样返回）
+
+    Raises:
+        RequestCancelled: 请求已取消
+        DeadlineExceeded: 请求预算耗尽
+    """
+    if not config.REFERENCE_PREPROCESS:
+        return params
+    names = [
+        spec.name
+        for spec in provider.GENERATE_PARAMS
+        if spec.canonical == REFERENCE_CANONICAL and params.get(spec.name)
+    ]
+    if not names:
+        return params
+
+    edge = provider.reference_image_edge(**params) or config.REFERENCE_IMAGE_MAX_EDGE
+    urls = [
+        url
+        for name in names
+        for url in ([params[name]] if isinstance(params[name], str) else params[name])
+        if isinstance(url, str) and url.startswith(("http://", "https://", "/"))
+    ]
+    if not urls:
+        return params
+
+    unique = list(dict.fromkeys(urls))
+    if len(unique) == 1:
+        replaced = {unique[0]: preprocess_reference(unique[0], edge)}
+    else:
+        with ThreadPoolExecutor(max_workers=min(len(unique), MAX_PARALLEL_DOWNLOADS)) as executor:
+            replaced = dict(zip(unique, executor.map(bind(lambda url: preprocess_reference(url, edge)), unique)))
+
+    result = dict(params)
+    for name in names:
+        value = params[name]
+        if isinstance(value, str):
+            result[name] = replaced.get(value, value)
+        else:
+            result[name] = [replaced.get(url, url) if isinstance(url, str) else url for url in value]
+    return result
@@ -0,0 +1,478 @@
+"""
+跨厂商路由
+
+在 ImageService 之上提供按请求的有序回退链：主厂商失败（超时、熔断、限流等）时，
+将参数通过双方的 ParamSpec 转换后交给下一个厂商，并记录最终实际服务的厂商。
+
+vendor="auto" 时由 AutoRouter 根据实时延迟（p50/p95）、错误率、排队深度与单次价格
+为请求挑选厂商，只考虑暴露参数能满足请求的厂商，每次决策都会记录日志以便审计。
+
+参数转换规则:
+    - ParamSpec.canonical 相同的参数视为同一语义（如 nano-banana 的 images 与
+      Seedream 的 image 都是 reference_images）
+    - 目标厂商不支持的参数会被丢弃（如 Seedream 没有 resolution，尺寸由 aspect_ratio 推导）
+    - 取值不在目标 choices 中时，宽高比取数值最接近的选项，其他参数回落到目标默认值
+"""
+
+import json
+import time
+import types
+import typing
+from dataclasses import dataclass, field
+from typing import Any
+
+from src.backend.config import config
+from src.backend.logger import get_logger
+from src.backend.providers.param_spec import ParamSpec
+from src.backend.services.concurrency import adaptive_limiter_registry
+from src.backend.services.metrics import metrics
+from src.backend.services.provider_service import TERMINAL_ERROR_TYPES, ImageService, ProviderRegistry
+from src.backend.services.rate_limit import rate_limiter_registry
+from src.backend.services.scheduler import scheduler_registry
+
+logger = get_logger(__name__)
+
+
+# =============================================================================
+# 参数转换
+# =============================================================================
+
+def _parse_ratio(value: Any) -> float | None:
+    """解析 "W:H" 形式的宽高比，无法解析返回 None"""
+    if not isinstance(value, str) or ":" not in value:
+        return None
+    try:
+        width, height = value.split(":", 1)
+        return float(width) / float(height)
+    except (ValueError, ZeroDivisionError):
+        return None
+
+
+def _accepts_type(spec_type: Any, target: type) -> bool:
+    """判断 ParamSpec.type 是否接受某个基础类型（支持 str | list[str] 等联合类型）"""
+    if isinstance(spec_type, types.UnionType) or typing.get_origin(spec_type) is typing.Union:
+        return any(_accepts_type(arg, target) for arg in typing.get_args(spec_type))
+    return (typing.get_origin(spec_type) or spec_type) is target
+
+
+def _coerce_value(value: Any, spec: ParamSpec) -> Any:
+    """将通用值转换为目标参数可接受的形式
+
+    Args:
+        value: 通用参数值
+        spec: 目标参数规范
+
+    Returns:
+        转换后的值，无法转换时返回目标默认值
+    """
+    # 列表 <-> 单值（单元素列表在目标接受字符串时展开）
+    if isinstance(value, str) and not _accepts_type(spec.type, str) and _accepts_type(spec.type, list):
+        value = [value]
+    elif isinstance(value, list) and len(value) == 1 and _accepts_type(spec.type, str):
+        value = value[0]
+
+    if not spec.choices or value in spec.choices:
+        return value
+
+    # 宽高比取最接近的可选值
+    ratio = _parse_ratio(value)
+    if ratio is not None:
+        candidates = [(abs(_parse_ratio(c) - ratio), c) for c in spec.choices if _parse_ratio(c)]
+        if candidates:
+            return min(candidates)[1]
+
+    # 大小写差异（如 "2K" vs "2k"）
+    if isinstance(value, str):
+        for choice in spec.choices:
+            if isinstance(choice, str) and choice.lower() == value.lower():
+                return choice
+
+    return spec.default
+
+
+def translate_params(
+    source_params: tuple[ParamSpec, ...],
+    target_params: tuple[ParamSpec, ...],
+    params: dict[str, Any],
+) -> dict[str, Any]:
+    """将参数从源厂商的规范转换为目标厂商的规范
+
+    只输出目标厂商暴露的参数。
+
+    Args:
+        source_params: 源厂商 GENERATE_PARAMS
+        target_params: 目标厂商 GENERATE_PARAMS
+        params: 源厂商参数
+
+    Returns:
+        目标厂商参数
+    """
+    source_specs = {p.name: p for p in source_params}
+    canonical_values: dict[str, Any] = {}
+    for name, value in params.items():
+        spec = source_specs.get(name)
+        key = (spec.canonical or spec.name) if spec else name
+        canonical_values[key] = value
+
+    translated: dict[str, Any] = {}
+    for spec in target_params:
+        if not spec.exposed:
+            continue
+        key = spec.canonical or spec.name
+        if key in canonical_values and canonical_values[key] is not None:
+            translated[spec.name] = _coerce_value(canonical_values[key], spec)
+    return translated
+
+
+def _in_choices(value: Any, spec: ParamSpec) -> bool:
+    """判断取值是否在参数可选值内（字符串忽略大小写，列表逐项判断）"""
+    if not spec.choices or value is None:
+        return True
+    if isinstance(value, list):
+        return all(_in_choices(item, spec) for item in value)
+    if value in spec.choices:
+        return True
+    return isinstance(value, str) and any(
+        isinstance(c, str) and c.lower() == value.lower() for c in spec.choices
+    )
+
+
+def canonicalize_params(providers: dict[str, Any], params: dict[str, Any]) -> dict[str, Any]:
+    """将任一厂商的参数名转换为通用参数名
+
+    Args:
+        providers: 同类型的 Provider 字典
+        params: 参数（可使用任一厂商的参数名或通用参数名）
+
+    Returns:
+        以通用参数名为 key 的参数
+    """
+    aliases: dict[str, str] = {}
+    for provider in providers.values():
+        for spec in provider.GENERATE_PARAMS:
+            aliases.setdefault(spec.name, spec.canonical or spec.name)
+    return {aliases.get(name, name): value for name, value in params.items()}
+
+
+# =============================================================================
+# 自动路由
+# =============================================================================
+
+AUTO_VENDOR = "auto"
+
+
+def no_eligible_vendor_result(provider_type: str) -> dict[str, Any]:
+    """构建 vendor=auto 时没有可用厂商的结果
+
+    Args:
+        provider_type: Provider 类型名称（LLM, image, video）
+
+    Returns:
+        失败结果字典
+    """
+    return {
+        "success": False,
+        "error": f"No available {provider_type} vendor supports the requested parameters",
+        "vendor": AUTO_VENDOR,
+        "requested_vendor": AUTO_VENDOR,
+    }
+
+
+@dataclass
+class RoutingDecision:
+    """自动路由决策
+
+    Attributes:
+        vendor: 选中的厂商
+        params: 转换为该厂商参数名后的参数
+        candidates: 全部候选及其评分（按优先级排序）
+    """
+
+    vendor: str
+    params: dict[str, Any]
+    candidates: list[dict[str, Any]] = field(default_factory=list)
+
+    @property
+    def ranked_vendors(self) -> list[str]:
+        """可用候选厂商（按优先级排序）"""
+        return [c["vendor"] for c in self.candidates if c["eligible"]]
+
+
+class AutoRouter:
+    """自动路由
+
+    对每个候选厂商计算惩罚分（越低越好）:
+
+        latency × (p50 + p95) / (2 × SLO)
+        + error × 错误率
+        + queue × (在途 + 排队) / 自适应并发上限
+        + cost  × 单次价格 / 候选中的最高价格
+
+    权重来自 AUTO_ROUTING_WEIGHTS。无调用记录时延迟按 SLO 的一半估计，
+    价格未知时按已知价格的平均值估计。
+    """
+
+    @staticmethod
+    def _unsupported_reason(provider: Any, canonical_params: dict[str, Any]) -> str | None:
+        """检查 Provider 暴露参数能否满足请求，返回不满足的原因"""
+        specs = {(s.canonical or s.name): s for s in provider.get_exposed_params()}
+        for key, value in canonical_params.items():
+            if value is None:
+                continue
+            spec = specs.get(key)
+            if spec is None:
+                return f"unsupported parameter: {key}"
+            if not _in_choices(value, spec):
+                return f"unsupported value for {key}: {value}"
+        return None
+
+    @staticmethod
+    def _queue_depth(vendor: str, provider: Any) -> float:
+        """在途与排队请求数（含调度器队列）相对自适应并发上限的比例"""
+        adaptive = adaptive_limiter_registry.get(vendor).snapshot()
+        limiter = rate_limiter_registry.get(vendor, provider.model_name)
+        waiting = limiter.snapshot()["waiting"] if limiter else 0
+        waiting += sum(scheduler_registry.get(vendor).snapshot()["queued"].values())
+        return (adaptive["inflight"] + waiting) / max(1, adaptive["limit"])
+
+    @staticmethod
+    def rank(provider_type: str, params: dict[str, Any]) -> list[dict[str, Any]]:
+        """为请求评估全部候选厂商
+
+        Args:
+            provider_type: Provider 类型 (llm, image, video)
+            params: 请求参数（可使用任一厂商的参数名或通用参数名）
+
+        Returns:
+            候选列表，可用候选按惩罚分升序排在前面，每项包含:
+                - vendor, eligible, reason（不可用原因）
+                - params: 转换后的参数
+                - latency_p50, latency_p95, error_rate, queue_depth, cost, penalty
+        """
+        providers = ProviderRegistry.get_providers(provider_type)
+        canonical = canonicalize_params(providers, params)
+        weights = config.AUTO_ROUTING_WEIGHTS
+
+        candidates: list[dict[str, Any]] = []
+        for vendor, provider in providers.items():
+            candidate: dict[str, Any] = {"vendor": vendor, "eligible": False, "reason": None}
+            candidates.append(candidate)
+            if not provider.is_available():
+                candidate["reason"] = "unavailable"
+                continue
+            reason = AutoRouter._unsupported_reason(provider, canonical)
+            if reason:
+                candidate["reason"] = reason
+                continue
+
+            translated = translate_params((), provider.GENERATE_PARAMS, canonical)
+            health = provider.circuit_breaker.snapshot()
+            slo = provider.LATENCY_SLO
+            p50 = health["latency_p50"] if health["latency_p50"] is not None else slo / 2
+            p95 = health["latency_p95"] if health["latency_p95"] is not None else slo / 2
+            success_rate = health["success_rate"]
+            candidate.update({
+                "eligible": True,
+                "params": translated,
+                "latency_p50": p50,
+                "latency_p95": p95,
+                "error_rate": 0.0 if success_rate is None else round(1.0 - success_rate, 3),
+                "queue_depth": round(AutoRouter._queue_depth(vendor, provider), 3),
+                "cost": provider.estimate_cost(**translated),
+                "_slo": slo,
+            })
+
+        eligible = [c for c in candidates if c["eligible"]]
+        known_costs = [c["cost"] for c in eligible if c["cost"] is not None]
+        max_cost = max(known_costs) if known_costs else 0.0
+        avg_cost = sum(known_costs) / len(known_costs) if known_costs else 0.0
+        for c in eligible:
+            cost = c["cost"] if c["cost"] is not None else avg_cost
+            penalty = (
+                weights.get("latency", 0.0) * (c["latency_p50"] + c["latency_p95"]) / (2 * c.pop("_slo"))
+                + weights.get("error", 0.0) * c["error_rate"]
+                + weights.get("queue", 0.0) * c["queue_depth"]
+                + weights.get("cost", 0.0) * (cost / max_cost if max_cost else 0.0)
+            )
+            c["penalty"] = round(penalty, 4)
+
+        eligible.sort(key=lambda c: c["penalty"])
+        return eligible + [c for c in candidates if not c["eligible"]]
+
+    @staticmethod
+    def select(provider_type: str, params: dict[str, Any]) -> RoutingDecision | None:
+        """为请求选择厂商
+
+        Args:
+            provider_type: Provider 类型 (llm, image, video)
+            params: 请求参数（可使用任一厂商的参数名或通用参数名）
+
+        Returns:
+            路由决策，没有可用厂商时返回 None
+        """
+        candidates = AutoRouter.rank(provider_type, params)
+        audit = [
+            {k: c.get(k) for k in ("vendor", "penalty", "cost", "latency_p95", "error_rate", "queue_depth", "reason")}
+            for c in candidates
+        ]
+        if not candidates or not candidates[0]["eligible"]:
+            logger.warning(f"Auto routing [{provider_type}] found no eligible vendor: {json.dumps(audit, ensure_ascii=False)}")
+            metrics.inc("auto_routing", provider_type=provider_type, vendor="none")
+            return None
+
+        best = candidates[0]
+        logger.info(
+            f"Auto routing [{provider_type}] selected {best['vendor']}: {json.dumps(audit, ensure_ascii=False)}"
+        )
+        metrics.inc("auto_routing", provider_type=provider_type, vendor=best["vendor"])
+        return RoutingDecision(vendor=best["vendor"], params=best["params"], candidates=candidates)
+
+    @staticmethod
+    def resolve(
+        provider_type: str,
+        vendor: str,
+        params: dict[str, Any],
+    ) -> tuple[str, dict[str, Any]] | None:
+        """解析请求的厂商
+
+        Args:
+            provider_type: Provider 类型 (llm, image, video)
+            vendor: 请求的厂商名称或 "auto"
+            params: 请求参数
+
+        Returns:
+            (厂商, 参数)；非 auto 时原样返回，auto 且没有可用厂商时返回 None
+        """
+        if vendor != AUTO_VENDOR:
+            return vendor, params
+        decision = AutoRouter.select(provider_type, params)
+        if decision is None:
+            return None
+        return decision.vendor, decision.params
+
+
+# =============================================================================
+# Image 路由服务
+# =============================================================================
+
+class ImageRoutingService:
+    """Image 回退路由服务
+
+    按顺序尝试回退链中的厂商，直到某一厂商成功。
+    """
+
+    @staticmethod
+    def get_fallback_chain(vendor: str, fallback_vendors: list[str] | None = None) -> list[str]:
+        """获取回退链
+
+        Args:
+            vendor: 主厂商
+            fallback_vendors: 请求指定的回退厂商，None 时使用 IMAGE_FALLBACK_CHAINS 配置
+
+        Returns:
+            去重后的有序厂商列表（主厂商在首位）
+        """
+        if fallback_vendors is None:
+            fallback_vendors = config.IMAGE_FALLBACK_CHAINS.get(vendor, [])
+        chain: list[str] = []
+        for name in [vendor, *fallback_vendors]:
+            if name not in chain:
+                chain.append(name)
+        return chain
+
+    @staticmethod
+    def generate(
+        vendor: str,
+        prompt: str,
+        fallback_vendors: list[str] | None = None,
+        return_format: str = "base64",
+        queue_timeout: float | None = None,
+        **kwargs,
+    ) -> dict[str, Any]:
+        """生成图片，失败时按回退链切换厂商
+
+        Args:
+            vendor: 主厂商名称，kwargs 按该厂商的参数规范提供；"auto" 时由 AutoRouter 选择，
+                kwargs 可使用任一厂商的参数名或通用参数名
+            prompt: 图片描述提示词
+            fallback_vendors: 回退厂商列表，None 使用配置默认值（auto 时为其余候选），[] 表示不回退
+            return_format: 返回格式 (base64, bytes, url)
+            queue_timeout: 超出限流时的最长排队时间（秒）
+            **kwargs: 主厂商参数
+
+        Returns:
+            ImageService.generate 的结果，启用回退或自动路由时额外包含:
+                - requested_vendor: 请求的主厂商
+                - attempts: 每次尝试的厂商、错误与耗时
+        """
+        if vendor == AUTO_VENDOR:
+            decision = AutoRouter.select("image", kwargs)
+            if decision is None:
+                return no_eligible_vendor_result("image") | {"format": return_format}
+            # 未指定回退厂商时，依次尝试排名靠后的候选
+            if fallback_vendors is None:
+                chain = decision.ranked_vendors
+            else:
+                chain = ImageRoutingService.get_fallback_chain(decision.vendor, fallback_vendors)
+            source_params: tuple[ParamSpec, ...] = ()
+            base_params = canonicalize_params(ProviderRegistry.get_providers("image"), kwargs)
+        else:
+            chain = ImageRoutingService.get_fallback_chain(vendor, fallback_vendors)
+            primary = ProviderRegistry.get_image_provider(vendor)
+            if len(chain) == 1 or primary is None:
+                return ImageService.generate(
+                    vendor=vendor,
+                    prompt=prompt,
+                    return_format=return_format,
+                    queue_timeout=queue_timeout,
+                    **kwargs,
+                )
+            source_params = primary.GENERATE_PARAMS
+            base_params = kwargs
+
+        attempts: list[dict[str, Any]] = []
+        result: dict[str, Any] = {}
+        for target in chain:
+            provider = ProviderRegistry.get_image_provider(target)
+            if provider is None:
+                attempts.append({"vendor": target, "error": f"Unknown image vendor: {target}"})
+                continue
+
+            params = kwargs if target == vendor else translate_params(
+                source_params, provider.GENERATE_PARAMS, base_params
+            )
+            start = time.monotonic()
+            result = ImageService.generate(
+                vendor=target,
+                prompt=prompt,
+                return_format=return_format,
+                queue_timeout=queue_timeout,
+                **params,
+            )
+            attempts.append({
+                "vendor": target,
+                "success": result["success"],
+                "error": result.get("error"),
+                "error_type": result.get("error_type"),
+                "latency": round(time.monotonic() - start, 3),
+            })
+            if result["success"]:
+                if target != chain[0]:
+                    logger.info(f"Image request failed over from {chain[0]} to {target}")
+                    metrics.inc("image_failover", requested=chain[0], served=target)
+                break
+            if result.get("error_type") in TERMINAL_ERROR_TYPES:
+                # 客户端已断开或预算耗尽，不再回退
+                break
+            logger.warning(f"Image vendor {target} failed: {result.get('error')}")
+
+        if not result:
+            result = {
+                "success": False,
+                "error": "No available image vendor in fallback chain",
+                "vendor": vendor,
+                "format": return_format,
+            }
+        result["requested_vendor"] = vendor
+        result["attempts"] = attempts
+        return result
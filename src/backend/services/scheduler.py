@@ -0,0 +1,289 @@
+"""
+优先级与公平调度
+
+交互式画布生成与批量任务（商品打标、批量拍摄变体）共用同一厂商容量。调度器位于
+限流与自适应并发之前，按厂商维护一个加权公平队列（WFQ），决定谁拿到下一个并发槽位:
+
+    - 优先级类别: interactive / batch / background，权重由 SCHEDULER_CLASS_WEIGHTS 配置
+    - 公平性: 同一类别内按 (用户, 设计方案) 分流，每个流轮流获得服务，单个用户的大批量
+      不会挤占其他用户
+    - 防饿死: 排队每满 SCHEDULER_AGING_SECONDS 秒，虚拟完成时间提前一个单位
+    - 交互预留: 最后 SCHEDULER_INTERACTIVE_RESERVE 个槽位只分配给 interactive，
+      长时间运行的批量调用不会占满容量
+
+槽位总数取该厂商自适应并发的当前上限，调度器放行的请求随后几乎无需再在自适应
+限制器中等待。各类别的排队时间以 scheduler_queue_wait_seconds 分布导出。
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterator
+
+from src.backend.config import config
+from src.backend.providers.context import check_cancelled
+from src.backend.services.concurrency import adaptive_limiter_registry
+from src.backend.services.metrics import metrics
+from src.backend.services.rate_limit import RateLimitExceeded
+
+# 优先级类别
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_BATCH = "batch"
+PRIORITY_BACKGROUND = "background"
+PRIORITIES = (PRIORITY_INTERACTIVE, PRIORITY_BATCH, PRIORITY_BACKGROUND)
+
+# 排队时检查请求取消的间隔（秒）
+_CANCEL_CHECK_INTERVAL = 0.5
+
+
+@dataclass
+class _Ticket:
+    """排队中的请求"""
+
+    flow: tuple[str, str]
+    priority: str
+    tag: float
+    enqueued_at: float
+    granted: bool = field(default=False)
+
+
+class FairScheduler:
+    """单个厂商的加权公平队列"""
+
+    def __init__(
+        self,
+        capacity: Callable[[], int],
+        weights: dict[str, float],
+        aging_seconds: float,
+        interactive_reserve: int = 0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """初始化调度器
+
+        Args:
+            capacity: 返回当前并发槽位总数的函数
+            weights: 各优先级类别的权重
+            aging_seconds: 排队多少秒后虚拟完成时间提前一个单位，<=0 表示不老化
+            interactive_reserve: 只分配给 interactive 的槽位数
+            clock: 单调时钟（测试时可替换）
+        """
+        self._capacity = capacity
+        self.weights = weights
+        self.aging_seconds = aging_seconds
+        self.interactive_reserve = interactive_reserve
+        self._clock = clock
+        self._cond = threading.Condition()
+        self._queue: list[_Ticket] = []
+        self._flow_finish: dict[tuple[str, str], float] = {}
+        self._virtual = 0.0
+        self._inflight = 0
+        # 槽位平均占用时长（EWMA），用于估算排队时间
+        self._avg_hold = 1.0
+
+    def _effective_tag(self, ticket: _Ticket, now: float) -> float:
+        """老化后的虚拟完成时间，越小越先服务"""
+        if self.aging_seconds <= 0:
+            return ticket.tag
+        return ticket.tag - (now - ticket.enqueued_at) / self.aging_seconds
+
+    def _dispatch(self) -> None:
+        """在有空闲槽位时放行排队请求（调用方持有锁）"""
+        capacity = max(1, self._capacity())
+        shared = max(1, capacity - self.interactive_reserve)
+        now = self._clock()
+        granted = False
+        while self._queue and self._inflight < capacity:
+            eligible = [
+                t for t in self._queue
+                if t.priority == PRIORITY_INTERACTIVE or self._inflight < shared
+            ]
+            if not eligible:
+                break
+            ticket = min(eligible, key=lambda t: self._effective_tag(t, now))
+            self._queue.remove(ticket)
+            ticket.granted = True
+            self._inflight += 1
+            self._virtual = max(self._virtual, ticket.tag)
+            granted = True
+
+        if granted:
+            # 清理已无排队请求且已被虚拟时间追上的流
+            active = {t.flow for t in self._queue}
+            self._flow_finish = {
+                flow: finish for flow, finish in self._flow_finish.items()
+                if flow in active or finish > self._virtual
+            }
+            self._cond.notify_all()
+
+    def _estimate_wait(self) -> float:
+        """估算新请求的排队时间（秒）"""
+        capacity = max(1, self._capacity())
+        return self._avg_hold * (len(self._queue) + 1) / capacity
+
+    def acquire(self, priority: str, tenant: str, timeout: float) -> float:
+        """排队获取一个并发槽位
+
+        Args:
+            priority: 优先级类别
+            tenant: 公平分流的租户 key（用户与设计方案）
+            timeout: 最长排队时间（秒）
+
+        Returns:
+            实际排队时间（秒）
+
+        Raises:
+            RateLimitExceeded: 在截止时间内未获得槽位
+            RequestCancelled: 排队期间请求被取消
+        """
+        weight = self.weights.get(priority) or 1.0
+        flow = (priority, tenant)
+        with self._cond:
+            now = self._clock()
+            start = max(self._virtual, self._flow_finish.get(flow, 0.0))
+            ticket = _Ticket(flow=flow, priority=priority, tag=start + 1.0 / weight, enqueued_at=now)
+            self._flow_finish[flow] = ticket.tag
+            self._queue.append(ticket)
+            self._dispatch()
+
+            deadline = now + max(0.0, timeout)
+            try:
+                while not ticket.granted:
+                    remaining = deadline - self._clock()
+                    if remaining <= 0:
+                        raise RateLimitExceeded("", None, self._estimate_wait())
+                    self._cond.wait(min(remaining, _CANCEL_CHECK_INTERVAL))
+                    if not ticket.granted:
+                        check_cancelled()
+                        self._dispatch()
+            except BaseException:
+                if ticket in self._queue:
+                    self._queue.remove(ticket)
+                raise
+            return self._clock() - ticket.enqueued_at
+
+    def release(self, hold_time: float | None = None) -> None:
+        """归还槽位并放行下一个请求
+
+        Args:
+            hold_time: 本次占用槽位的时长（秒）
+        """
+        with self._cond:
+            self._inflight = max(0, self._inflight - 1)
+            if hold_time is not None:
+                self._avg_hold = 0.8 * self._avg_hold + 0.2 * hold_time
+            self._dispatch()
+
+    def snapshot(self) -> dict[str, Any]:
+        """获取当前状态
+
+        Returns:
+            包含槽位总数、在途数与各类别排队数的字典
+        """
+        with self._cond:
+            queued = {priority: 0 for priority in PRIORITIES}
+            for ticket in self._queue:
+                queued[ticket.priority] = queued.get(ticket.priority, 0) + 1
+            return {
+                "capacity": self._capacity(),
+                "inflight": self._inflight,
+                "queued": queued,
+                "flows": len({t.flow for t in self._queue}),
+            }
+
+
+class SchedulerRegistry:
+    """按厂商管理调度器"""
+
+    def __init__(
+        self,
+        weights: dict[str, float],
+        aging_seconds: float,
+        interactive_reserve: int,
+        capacity_of: Callable[[str], int] | None = None,
+    ):
+        """初始化注册表
+
+        Args:
+            weights: 各优先级类别的权重
+            aging_seconds: 老化时间（秒）
+            interactive_reserve: 只分配给 interactive 的槽位数
+            capacity_of: 返回厂商当前槽位总数的函数，默认取自适应并发上限
+        """
+        self._weights = weights
+        self._aging_seconds = aging_seconds
+        self._interactive_reserve = interactive_reserve
+        self._capacity_of = capacity_of or (
+            lambda vendor: int(adaptive_limiter_registry.get(vendor).limit)
+        )
+        self._schedulers: dict[str, FairScheduler] = {}
+        self._lock = threading.Lock()
+
+    def get(self, vendor: str) -> FairScheduler:
+        """获取（或创建）厂商的调度器"""
+        with self._lock:
+            scheduler = self._schedulers.get(vendor)
+            if scheduler is None:
+                scheduler = FairScheduler(
+                    capacity=lambda: self._capacity_of(vendor),
+                    weights=self._weights,
+                    aging_seconds=self._aging_seconds,
+                    interactive_reserve=self._interactive_reserve,
+                )
+                self._schedulers[vendor] = scheduler
+            return scheduler
+
+    @contextmanager
+    def acquire(
+        self,
+        vendor: str,
+        priority: str,
+        tenant: str | None,
+        timeout: float,
+    ) -> Iterator[float]:
+        """在调度器分配的槽位内执行调用
+
+        Args:
+            vendor: 厂商名称
+            priority: 优先级类别
+            tenant: 租户 key，None 表示匿名
+            timeout: 最长排队时间（秒）
+
+        Yields:
+            实际排队时间（秒）
+
+        Raises:
+            RateLimitExceeded: 在截止时间内未获得槽位
+        """
+        if not config.SCHEDULER_ENABLED:
+            yield 0.0
+            return
+
+        scheduler = self.get(vendor)
+        try:
+            waited = scheduler.acquire(priority, tenant or "", timeout)
+        except RateLimitExceeded as e:
+            metrics.inc("scheduler_rejected", vendor=vendor, priority=priority)
+            raise RateLimitExceeded(vendor, None, e.retry_after) from None
+        metrics.observe("scheduler_queue_wait_seconds", waited, priority=priority)
+
+        start = time.monotonic()
+        try:
+            yield waited
+        finally:
+            scheduler.release(time.monotonic() - start)
+
+    def snapshot(self) -> dict[str, dict[str, Any]]:
+        """获取所有厂商调度器的状态"""
+        with self._lock:
+            items = list(self._schedulers.items())
+        return {vendor: scheduler.snapshot() for vendor, scheduler in items}
+
+
+# 单例实例
+scheduler_registry: SchedulerRegistry = SchedulerRegistry(
+    weights=config.SCHEDULER_CLASS_WEIGHTS,
+    aging_seconds=config.SCHEDULER_AGING_SECONDS,
+    interactive_reserve=config.SCHEDULER_INTERACTIVE_RESERVE,
+)
+metrics.register_collector("scheduler", scheduler_registry.snapshot)
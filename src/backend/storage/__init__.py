@@ -0,0 +1,105 @@
+"""对象存储模块
+
+上传、生成结果转存与资源下载统一经 StorageBackend 接口读写对象，后端由 STORAGE_BACKEND 选择:
+
+    - oss: 阿里云 OSS（OSS_* 环境变量），生产部署；STORAGE_CACHE_MAX_BYTES > 0 时在前面加一层
+      本地磁盘缓存（TieredStorage，读穿 + 回写 + LRU 淘汰）
+    - local: 本地磁盘（STORAGE_LOCAL_DIR），由 /api/v1/assets 路由直接从磁盘发送，
+      用于开发、离线性能测试与单机部署
+    - memory: 进程内存，用于测试与基准测试
+    - auto（默认）: 配置了 OSS_ENDPOINT 时为 oss，否则为 local
+
+示例:
+    >>> from src.backend.storage import storage
+    >>> info = storage.put("upload/cat.png", image_bytes)
+    >>> url = storage.url("upload/cat.png")
+"""
+
+import json
+import secrets
+
+from src.backend.config import config
+
+from .base import (
+    ObjectInfo,
+    ObjectNotFound,
+    ServedStorage,
+    StorageBackend,
+    content_key,
+    derived_key,
+    is_content_addressed,
+    normalize_key,
+)
+from .local import LocalStorage
+from .memory import MemoryStorage
+from .tiered import TieredStorage
+
+STORAGE_BACKENDS = ("auto", "oss", "local", "memory")
+
+
+def create_storage(backend: str | None = None) -> StorageBackend:
+    """按配置创建存储后端
+
+    Args:
+        backend: 后端名称，None 时取 config.STORAGE_BACKEND
+
+    Returns:
+        存储后端实例
+
+    Raises:
+        ValueError: 后端名称未知，或选择了 oss 但未配置 OSS_ENDPOINT
+    """
+    from src.backend.utils import DEFAULT_OSS_CONFIG
+
+    backend = (backend or config.STORAGE_BACKEND).lower()
+    if backend not in STORAGE_BACKENDS:
+        raise ValueError(f"Unknown storage backend: {backend} (expected one of {STORAGE_BACKENDS})")
+
+    oss_config = json.loads(DEFAULT_OSS_CONFIG)
+    if backend == "auto":
+        backend = "oss" if oss_config else "local"
+
+    secret = config.STORAGE_SIGNING_SECRET or secrets.token_hex(32)
+    if backend == "oss":
+        if not oss_config:
+            raise ValueError("STORAGE_BACKEND=oss requires OSS_ENDPOINT to be configured")
+        from src.backend.utils import BucketCommand
+
+        from .oss import OSSStorage
+
+        origin = OSSStorage(BucketCommand(**oss_config))
+        if config.STORAGE_CACHE_MAX_BYTES <= 0:
+            return origin
+        return TieredStorage(
+            origin,
+            config.STORAGE_CACHE_DIR,
+            config.STORAGE_CACHE_MAX_BYTES,
+            write_back=config.STORAGE_CACHE_WRITE_BACK,
+            public_base_url=config.STORAGE_PUBLIC_BASE_URL,
+            signing_secret=secret,
+        )
+
+    if backend == "memory":
+        return MemoryStorage(config.STORAGE_PUBLIC_BASE_URL, secret)
+    return LocalStorage(config.STORAGE_LOCAL_DIR, config.STORAGE_PUBLIC_BASE_URL, secret)
+
+
+# 单例实例
+storage: StorageBackend = create_storage()
+
+__all__ = [
+    "STORAGE_BACKENDS",
+    "LocalStorage",
+    "MemoryStorage",
+    "ObjectInfo",
+    "ObjectNotFound",
+    "ServedStorage",
+    "StorageBackend",
+    "TieredStorage",
+    "content_key",
+    "create_storage",
+    "derived_key",
+    "is_content_addressed",
+    "normalize_key",
+    "storage",
+]
@@ -0,0 +1,229 @@
+"""
+对象存储后端抽象基类
+
+定义所有存储后端必须实现的接口（put / get / stream / head / delete / presign），
+上传、生成结果转存与资源读取只依赖本接口，不直接依赖 oss2。
+"""
+
+import hashlib
+import hmac
+import mimetypes
+import posixpath
+import re
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Iterator
+from urllib.parse import quote, urlencode
+
+# 流式读取的默认块大小（字节）
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+# 内容寻址对象的键前缀
+CONTENT_ADDRESSED_PREFIX = "cas"
+_CONTENT_KEY = re.compile(rf"{CONTENT_ADDRESSED_PREFIX}/([0-9a-f]{{2}})/\1[0-9a-f]{{62}}(\.[0-9A-Za-z_-]+)*")
+
+
+class ObjectNotFound(FileNotFoundError):
+    """对象不存在"""
+
+    def __init__(self, key: str):
+        self.key = key
+        super().__init__(f"Object not found: {key}")
+
+
+@dataclass(frozen=True)
+class ObjectInfo:
+    """对象元数据
+
+    Attributes:
+        key: 对象键
+        size: 字节数
+        etag: 内容标识（不含引号）
+        content_type: MIME 类型
+        last_modified: 最后修改时间（Unix 时间戳）
+    """
+
+    key: str
+    size: int
+    etag: str
+    content_type: str
+    last_modified: float
+
+
+def normalize_key(key: str) -> str:
+    """规范化对象键，拒绝越出根目录的路径
+
+    Args:
+        key: 对象键（如 upload/a.png）
+
+    Returns:
+        规范化后的键
+
+    Raises:
+        ValueError: 键为空、为绝对路径或包含 ..
+    """
+    if not key or key.startswith(("/", "\\")):
+        raise ValueError(f"Invalid object key: {key}")
+    normalized = posixpath.normpath(key.replace("\\", "/"))
+    if normalized in (".", "..") or normalized.startswith("../"):
+        raise ValueError(f"Invalid object key: {key}")
+    return normalized
+
+
+def content_key(data: bytes, ext: str) -> str:
+    """按内容 SHA-256 生成对象键（内容寻址：同一内容只存一份，键对应的内容永不改变）
+
+    Args:
+        data: 对象内容
+        ext: 扩展名（不含点）
+
+    Returns:
+        形如 cas/ab/ab12...ef.png 的键
+    """
+    digest = hashlib.sha256(data).hexdigest()
+    return f"{CONTENT_ADDRESSED_PREFIX}/{digest[:2]}/{digest}.{ext}"
+
+
+def derived_key(key: str, suffix: str) -> str:
+    """与源对象并列存放的派生对象键（如视频封面、图片缩略图）
+
+    Args:
+        key: 源对象键（如 cas/ab/ab12...ef.mp4）
+        suffix: 派生后缀（如 poster.jpg）
+
+    Returns:
+        去掉源扩展名后追加后缀的键（如 cas/ab/ab12...ef.poster.jpg）；
+        源对象为内容寻址时派生对象同样不可变
+    """
+    stem, _ = posixpath.splitext(normalize_key(key))
+    return f"{stem}.{suffix}"
+
+
+def is_content_addressed(key: str) -> bool:
+    """是否为 content_key() / derived_key() 生成的内容寻址键（可按 immutable 长期缓存）"""
+    return _CONTENT_KEY.fullmatch(key) is not None
+
+
+def guess_content_type(key: str) -> str:
+    """按扩展名推断 MIME 类型"""
+    return mimetypes.guess_type(key)[0] or "application/octet-stream"
+
+
+class StorageBackend(ABC):
+    """对象存储后端抽象基类
+
+    Attributes:
+        name: 后端名称 (oss, local, memory)
+    """
+
+    name: str = ""
+
+    @abstractmethod
+    def put(self, key: str, data: bytes, content_type: str | None = None) -> ObjectInfo:
+        """写入对象（已存在时覆盖）
+
+        Args:
+            key: 对象键
+            data: 对象内容
+            content_type: MIME 类型，None 时按扩展名推断
+
+        Returns:
+            写入后的元数据
+        """
+
+    @abstractmethod
+    def get(self, key: str) -> bytes:
+        """读取整个对象
+
+        Raises:
+            ObjectNotFound: 对象不存在
+        """
+
+    @abstractmethod
+    def stream(
+        self, key: str, start: int = 0, end: int | None = None, chunk_size: int = STREAM_CHUNK_SIZE
+    ) -> Iterator[bytes]:
+        """分块读取对象的 [start, end] 字节区间（闭区间，end 为 None 表示到末尾）
+
+        Raises:
+            ObjectNotFound: 对象不存在
+        """
+
+    @abstractmethod
+    def head(self, key: str) -> ObjectInfo | None:
+        """获取对象元数据，不存在时返回 None"""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """删除对象（不存在时忽略）"""
+
+    @abstractmethod
+    def presign(self, key: str, expires: int = 3600) -> str:
+        """生成有时效的下载地址
+
+        Args:
+            key: 对象键
+            expires: 有效期（秒）
+        """
+
+    @abstractmethod
+    def url(self, key: str) -> str:
+        """对象的永久访问地址"""
+
+    def local_path(self, key: str) -> str | None:
+        """对象在本机磁盘上的路径（可直接 sendfile），不在本地磁盘时返回 None"""
+        return None
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """等待尚未写入持久存储的对象写完（停机时调用）
+
+        Args:
+            timeout: 最长等待时间（秒），None 表示一直等待
+
+        Returns:
+            是否全部写完
+        """
+        return True
+
+    def snapshot(self) -> dict:
+        """获取后端名称与运行时统计（/api/v1/metrics）"""
+        return {"backend": self.name}
+
+
+class ServedStorage(StorageBackend):
+    """由本服务 /api/v1/assets 路由提供下载的后端（local、memory）
+
+    永久地址为 {public_base_url}/api/v1/assets/{key}；presign 附加过期时间与 HMAC 签名，
+    路由校验后才提供下载。
+    """
+
+    ASSET_PATH = "/api/v1/assets"
+
+    def __init__(self, public_base_url: str = "", signing_secret: str = ""):
+        """初始化
+
+        Args:
+            public_base_url: 本服务对外地址（厂商需下载参考图时必须配置），为空时返回相对地址
+            signing_secret: presign 签名密钥
+        """
+        self.public_base_url = public_base_url.rstrip("/")
+        self._secret = signing_secret.encode("utf-8")
+
+    def url(self, key: str) -> str:
+        return f"{self.public_base_url}{self.ASSET_PATH}/{quote(normalize_key(key))}"
+
+    def _signature(self, key: str, expires_at: int) -> str:
+        message = f"{normalize_key(key)}:{expires_at}".encode("utf-8")
+        return hmac.new(self._secret, message, hashlib.sha256).hexdigest()
+
+    def presign(self, key: str, expires: int = 3600) -> str:
+        expires_at = int(time.time()) + expires
+        query = urlencode({"expires": expires_at, "signature": self._signature(key, expires_at)})
+        return f"{self.url(key)}?{query}"
+
+    def verify(self, key: str, expires_at: int, signature: str) -> bool:
+        """校验 presign 地址的签名与有效期"""
+        if expires_at < time.time():
+            return False
+        return hmac.compare_digest(self._signature(key, expires_at), signature)
@@ -0,0 +1,112 @@
+"""
+本地磁盘存储后端
+
+对象以文件形式保存在 STORAGE_LOCAL_DIR 下（键即相对路径），由 /api/v1/assets 路由直接从磁盘
+发送。适用于开发、离线性能测试与单机部署（省去一次到 OSS 的网络往返）。
+"""
+
+import os
+import tempfile
+from typing import Iterator
+
+from .base import (
+    STREAM_CHUNK_SIZE,
+    ObjectInfo,
+    ObjectNotFound,
+    ServedStorage,
+    guess_content_type,
+    normalize_key,
+)
+
+
+class LocalStorage(ServedStorage):
+    """本地磁盘存储后端
+
+    Attributes:
+        root: 根目录
+    """
+
+    name = "local"
+
+    def __init__(self, root: str, public_base_url: str = "", signing_secret: str = ""):
+        """初始化
+
+        Args:
+            root: 根目录（不存在时创建）
+            public_base_url: 本服务对外地址
+            signing_secret: presign 签名密钥
+        """
+        super().__init__(public_base_url, signing_secret)
+        self.root = os.path.abspath(root)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, *normalize_key(key).split("/"))
+
+    def put(self, key: str, data: bytes, content_type: str | None = None) -> ObjectInfo:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 先写临时文件再替换，读者不会看到写了一半的对象
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        return self._info(key, path)
+
+    def get(self, key: str) -> bytes:
+        try:
+            with open(self._path(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            raise ObjectNotFound(key) from None
+
+    def stream(
+        self, key: str, start: int = 0, end: int | None = None, chunk_size: int = STREAM_CHUNK_SIZE
+    ) -> Iterator[bytes]:
+        try:
+            f = open(self._path(key), "rb")
+        except FileNotFoundError:
+            raise ObjectNotFound(key) from None
+
+        def chunks() -> Iterator[bytes]:
+            with f:
+                f.seek(start)
+                remaining = None if end is None else end - start + 1
+                while remaining is None or remaining > 0:
+                    chunk = f.read(chunk_size if remaining is None else min(chunk_size, remaining))
+                    if not chunk:
+                        break
+                    if remaining is not None:
+                        remaining -= len(chunk)
+                    yield chunk
+
+        return chunks()
+
+    def _info(self, key: str, path: str) -> ObjectInfo:
+        stat = os.stat(path)
+        return ObjectInfo(
+            key=normalize_key(key),
+            size=stat.st_size,
+            etag=f"{stat.st_mtime_ns:x}-{stat.st_size:x}",
+            content_type=guess_content_type(key),
+            last_modified=stat.st_mtime,
+        )
+
+    def head(self, key: str) -> ObjectInfo | None:
+        path = self._path(key)
+        if not os.path.isfile(path):
+            return None
+        return self._info(key, path)
+
+    def delete(self, key: str) -> None:
+        try:
+            os.unlink(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def local_path(self, key: str) -> str | None:
+        path = self._path(key)
+        return path if os.path.isfile(path) else None
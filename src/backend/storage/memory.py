@@ -0,0 +1,71 @@
+"""
+内存存储后端
+
+对象保存在进程内存中，进程退出即丢失。用于测试与基准测试（排除磁盘与网络开销）。
+"""
+
+import hashlib
+import threading
+import time
+from typing import Iterator
+
+from .base import (
+    STREAM_CHUNK_SIZE,
+    ObjectInfo,
+    ObjectNotFound,
+    ServedStorage,
+    guess_content_type,
+    normalize_key,
+)
+
+
+class MemoryStorage(ServedStorage):
+    """内存存储后端"""
+
+    name = "memory"
+
+    def __init__(self, public_base_url: str = "", signing_secret: str = ""):
+        super().__init__(public_base_url, signing_secret)
+        self._lock = threading.Lock()
+        self._objects: dict[str, tuple[bytes, ObjectInfo]] = {}
+
+    def put(self, key: str, data: bytes, content_type: str | None = None) -> ObjectInfo:
+        key = normalize_key(key)
+        info = ObjectInfo(
+            key=key,
+            size=len(data),
+            etag=hashlib.md5(data).hexdigest(),
+            content_type=content_type or guess_content_type(key),
+            last_modified=time.time(),
+        )
+        with self._lock:
+            self._objects[key] = (bytes(data), info)
+        return info
+
+    def _entry(self, key: str) -> tuple[bytes, ObjectInfo]:
+        with self._lock:
+            entry = self._objects.get(normalize_key(key))
+        if entry is None:
+            raise ObjectNotFound(key)
+        return entry
+
+    def get(self, key: str) -> bytes:
+        return self._entry(key)[0]
+
+    def stream(
+        self, key: str, start: int = 0, end: int | None = None, chunk_size: int = STREAM_CHUNK_SIZE
+    ) -> Iterator[bytes]:
+        data = self._entry(key)[0]
+        stop = len(data) if end is None else min(end + 1, len(data))
+        view = memoryview(data)
+        return (bytes(view[i:min(i + chunk_size, stop)]) for i in range(start, stop, chunk_size))
+
+    def head(self, key: str) -> ObjectInfo | None:
+        try:
+            return self._entry(key)[1]
+        except ObjectNotFound:
+            return None
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._objects.pop(normalize_key(key), None)
@@ -0,0 +1,102 @@
+"""
+阿里云 OSS 存储后端
+
+对象键映射为 {remote_dir}/{key}，沿用 BucketCommand 的配置（OSS_* 环境变量）。
+配置了 display_host 时永久地址为 {display_host}/{remote_dir}/{key}，否则为签名地址。
+"""
+
+import time
+from typing import Iterator
+
+import oss2
+
+from src.backend.utils import BucketCommand
+
+from .base import (
+    STREAM_CHUNK_SIZE,
+    ObjectInfo,
+    ObjectNotFound,
+    StorageBackend,
+    guess_content_type,
+    normalize_key,
+)
+
+
+class OSSStorage(StorageBackend):
+    """阿里云 OSS 存储后端
+
+    Attributes:
+        client: BucketCommand 实例（持有 bucket、display_host 与 remote_dir）
+    """
+
+    name = "oss"
+
+    def __init__(self, client: BucketCommand):
+        """初始化
+
+        Args:
+            client: BucketCommand 实例
+        """
+        self.client = client
+
+    def _remote_key(self, key: str) -> str:
+        key = normalize_key(key)
+        return f"{self.client.remote_dir}/{key}" if self.client.remote_dir else key
+
+    def put(self, key: str, data: bytes, content_type: str | None = None) -> ObjectInfo:
+        content_type = content_type or guess_content_type(key)
+        result = self.client.bucket.put_object(
+            self._remote_key(key), data, headers={"Content-Type": content_type}
+        )
+        return ObjectInfo(
+            key=normalize_key(key),
+            size=len(data),
+            etag=(result.etag or "").strip('"'),
+            content_type=content_type,
+            last_modified=time.time(),
+        )
+
+    def get(self, key: str) -> bytes:
+        return b"".join(self.stream(key))
+
+    def stream(
+        self, key: str, start: int = 0, end: int | None = None, chunk_size: int = STREAM_CHUNK_SIZE
+    ) -> Iterator[bytes]:
+        byte_range = (start, end) if start or end is not None else None
+        try:
+            result = self.client.bucket.get_object(self._remote_key(key), byte_range=byte_range)
+        except oss2.exceptions.NotFound:
+            raise ObjectNotFound(key) from None
+
+        def chunks() -> Iterator[bytes]:
+            while True:
+                chunk = result.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+        return chunks()
+
+    def head(self, key: str) -> ObjectInfo | None:
+        try:
+            result = self.client.bucket.head_object(self._remote_key(key))
+        except oss2.exceptions.NotFound:
+            return None
+        return ObjectInfo(
+            key=normalize_key(key),
+            size=result.content_length,
+            etag=(result.etag or "").strip('"'),
+            content_type=result.content_type or guess_content_type(key),
+            last_modified=float(result.last_modified or 0),
+        )
+
+    def delete(self, key: str) -> None:
+        self.client.bucket.delete_object(self._remote_key(key))
+
+    def presign(self, key: str, expires: int = 3600) -> str:
+        return self.client.bucket.sign_url("GET", self._remote_key(key), expires, slash_safe=True)
+
+    def url(self, key: str) -> str:
+        if self.client.display_host:
+            return f"{self.client.display_host}/{self._remote_key(key)}"
+        return self.presign(key)
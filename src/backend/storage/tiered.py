@@ -0,0 +1,480 @@
+"""
+分层存储：本地磁盘缓存 + 源站（OSS）
+
+画布反复读取生成结果，图生图又把它们作为参考图传回厂商，每次都访问 OSS 既慢又产生外网流量。
+TieredStorage 在源站前加一层容量受限的本地磁盘缓存:
+
+    - 读穿（read-through）：未命中时从源站回填整份对象，之后由 /api/v1/assets 直接从磁盘发送
+      （sendfile，支持 Range）；Range 读取未命中时直接转发源站的字节区间，同时在后台回填
+    - 写穿 / 回写：put() 先落盘；回写模式下立即返回，由后台线程上传源站（失败按退避重试，
+      进程重启后继续上传未写完的对象），写穿模式下同步上传后返回
+    - LRU 淘汰：缓存总字节数超过 max_bytes 时淘汰最久未访问的对象，未写回源站的对象不淘汰；
+      超过 max_bytes 的单个对象不缓存
+    - 校验：回填时按源站对象大小（以及 OSS 简单上传的 MD5 ETag）校验，落盘时记录 SHA-256；
+      进程启动后每个缓存对象首次被读取前重新计算 SHA-256，不一致则丢弃并重新回填
+
+缓存目录结构: {cache_dir}/objects/{key} 为对象内容，{cache_dir}/meta/{key}.json 为元数据
+（大小、SHA-256、MIME 类型、是否待回写），进程重启后据此重建索引。
+
+未配置对外地址（STORAGE_PUBLIC_BASE_URL）时 url() 指向源站，此时回写退化为写穿，
+保证返回的地址立即可访问。
+"""
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from dataclasses import asdict, dataclass
+from typing import Iterable, Iterator
+
+from src.backend.logger import get_logger
+
+from .base import (
+    STREAM_CHUNK_SIZE,
+    ObjectInfo,
+    ObjectNotFound,
+    ServedStorage,
+    StorageBackend,
+    guess_content_type,
+    normalize_key,
+)
+from .local import LocalStorage
+
+logger = get_logger(__name__)
+
+# OSS 简单上传的 ETag 为内容 MD5（分片上传的 ETag 带 "-N" 后缀，无法用于校验）
+_MD5_ETAG = re.compile(r"[0-9a-fA-F]{32}")
+
+
+@dataclass
+class _Entry:
+    """缓存条目（与 meta/{key}.json 一一对应）"""
+
+    size: int
+    sha256: str
+    content_type: str
+    last_modified: float
+    dirty: bool = False
+    verified: bool = True
+
+    def info(self, key: str) -> ObjectInfo:
+        return ObjectInfo(
+            key=key,
+            size=self.size,
+            etag=self.sha256,
+            content_type=self.content_type,
+            last_modified=self.last_modified,
+        )
+
+
+class TieredStorage(ServedStorage):
+    """本地磁盘缓存 + 源站的分层存储
+
+    Attributes:
+        origin: 源站后端（通常为 OSSStorage）
+        cache_dir: 缓存目录
+        max_bytes: 缓存总字节数上限
+        write_back: 是否回写（put 落盘后立即返回，后台上传源站）
+    """
+
+    name = "tiered"
+
+    def __init__(
+        self,
+        origin: StorageBackend,
+        cache_dir: str,
+        max_bytes: int,
+        write_back: bool = True,
+        public_base_url: str = "",
+        signing_secret: str = "",
+        workers: int = 4,
+        retry_delays: tuple[float, ...] = (1.0, 2.0, 4.0),
+    ):
+        """初始化，从缓存目录重建索引并继续上传未写完的对象
+
+        Args:
+            origin: 源站后端
+            cache_dir: 缓存目录（不存在时创建）
+            max_bytes: 缓存总字节数上限
+            write_back: 是否回写；未配置 public_base_url 时强制写穿
+            public_base_url: 本服务对外地址，为空时 url() 指向源站
+            signing_secret: presign 签名密钥
+            workers: 回写与后台回填线程数
+            retry_delays: 回写失败后的重试间隔（秒）
+        """
+        super().__init__(public_base_url, signing_secret)
+        self.origin = origin
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.max_bytes = max_bytes
+        self.write_back = write_back and bool(self.public_base_url)
+        self.retry_delays = retry_delays
+        self._disk = LocalStorage(os.path.join(self.cache_dir, "objects"))
+        self._meta_root = os.path.join(self.cache_dir, "meta")
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="storage-tier")
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._bytes = 0
+        self._key_locks = [threading.RLock() for _ in range(64)]
+        self._filling: set[str] = set()
+        self._pending: set[Future] = set()
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "fills": 0,
+            "evictions": 0,
+            "checksum_failures": 0,
+            "write_backs": 0,
+            "write_back_failures": 0,
+        }
+        self._load()
+
+    # ------------------------------------------------------------------
+    # 索引与磁盘
+    # ------------------------------------------------------------------
+
+    def _meta_path(self, key: str) -> str:
+        return os.path.join(self._meta_root, *key.split("/")) + ".json"
+
+    def _key_lock(self, key: str) -> threading.RLock:
+        """同一对象的写入、回填、回写与删除串行执行（按键哈希分段加锁）"""
+        return self._key_locks[hash(key) % len(self._key_locks)]
+
+    def _count(self, stat: str) -> None:
+        with self._lock:
+            self._stats[stat] += 1
+
+    def _load(self) -> None:
+        """从 meta 目录重建索引（按对象修改时间近似 LRU 顺序），继续上传待回写的对象"""
+        found: list[tuple[float, str, _Entry]] = []
+        for dirpath, _, filenames in os.walk(self._meta_root):
+            for filename in filenames:
+                meta_path = os.path.join(dirpath, filename)
+                if not filename.endswith(".json"):
+                    os.unlink(meta_path)
+                    continue
+                key = os.path.relpath(meta_path, self._meta_root)[: -len(".json")].replace(os.sep, "/")
+                try:
+                    with open(meta_path, encoding="utf-8") as f:
+                        entry = _Entry(**json.load(f))
+                    stat = os.stat(self._disk._path(key))
+                except (OSError, ValueError, TypeError):
+                    stat = None
+                if stat is None or stat.st_size != entry.size:
+                    os.unlink(meta_path)
+                    continue
+                entry.verified = False
+                found.append((stat.st_mtime, key, entry))
+
+        for _, key, entry in sorted(found, key=lambda item: item[0]):
+            self._entries[key] = entry
+            self._bytes += entry.size
+            if entry.dirty:
+                self._submit(self._write_back, key)
+        if found:
+            logger.info(f"Storage cache: loaded {len(found)} objects ({self._bytes} bytes) from {self.cache_dir}")
+        self._evict()
+
+    def _write(self, key: str, chunks: Iterable[bytes]) -> tuple[int, str, str]:
+        """将内容原子地写入缓存目录
+
+        Returns:
+            (字节数, SHA-256, MD5)
+        """
+        path = self._disk._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        sha256, md5, size = hashlib.sha256(), hashlib.md5(), 0
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    sha256.update(chunk)
+                    md5.update(chunk)
+                    size += len(chunk)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        return size, sha256.hexdigest(), md5.hexdigest()
+
+    def _save_meta(self, key: str, entry: _Entry) -> None:
+        path = self._meta_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = {k: v for k, v in asdict(entry).items() if k != "verified"}
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def _insert(self, key: str, entry: _Entry) -> None:
+        """登记缓存条目（覆盖旧条目），调用方释放键锁后再调用 _evict()"""
+        self._save_meta(key, entry)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old.size
+            self._entries[key] = entry
+            self._bytes += entry.size
+
+    def _drop(self, key: str) -> None:
+        """移除缓存条目与磁盘文件"""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._bytes -= entry.size
+        for path in (self._disk._path(key), self._meta_path(key)):
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+    def _evict(self) -> None:
+        """淘汰最久未访问的已写回对象，直至总字节数不超过上限（不得在持有键锁时调用）"""
+        victims = []
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                if self._bytes <= self.max_bytes:
+                    break
+                if entry.dirty:
+                    continue
+                del self._entries[key]
+                self._bytes -= entry.size
+                self._stats["evictions"] += 1
+                victims.append(key)
+        for key in victims:
+            with self._key_lock(key):
+                with self._lock:
+                    if key in self._entries:
+                        # 淘汰后又被重新写入
+                        continue
+                for path in (self._disk._path(key), self._meta_path(key)):
+                    try:
+                        os.unlink(path)
+                    except FileNotFoundError:
+                        pass
+
+    def _cached(self, key: str) -> str | None:
+        """命中缓存时返回文件路径（更新 LRU 顺序，首次读取前校验 SHA-256），否则返回 None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is None:
+            return None
+        path = self._disk._path(key)
+        if entry.verified:
+            return path
+
+        with self._key_lock(key):
+            if entry.verified:
+                return path
+            sha256 = hashlib.sha256()
+            try:
+                with open(path, "rb") as f:
+                    for chunk in iter(lambda: f.read(STREAM_CHUNK_SIZE), b""):
+                        sha256.update(chunk)
+            except FileNotFoundError:
+                pass
+            if sha256.hexdigest() != entry.sha256:
+                self._count("checksum_failures")
+                if entry.dirty:
+                    logger.error(f"Storage cache: {key} corrupted before write-back, object lost")
+                else:
+                    logger.warning(f"Storage cache: {key} failed checksum verification, refilling")
+                self._drop(key)
+                return None
+            entry.verified = True
+        return path
+
+    # ------------------------------------------------------------------
+    # 回填与回写
+    # ------------------------------------------------------------------
+
+    def _submit(self, fn, key: str) -> None:
+        future = self._executor.submit(fn, key)
+        with self._lock:
+            self._pending.add(future)
+        future.add_done_callback(self._discard_pending)
+
+    def _discard_pending(self, future: Future) -> None:
+        with self._lock:
+            self._pending.discard(future)
+
+    def _fill(self, key: str) -> str | None:
+        """从源站回填对象
+
+        Returns:
+            缓存文件路径；对象超过缓存上限或校验失败时返回 None（调用方直接读源站）
+
+        Raises:
+            ObjectNotFound: 源站不存在该对象
+        """
+        with self._key_lock(key):
+            path = self._cached(key)
+            if path is not None:
+                return path
+            info = self.origin.head(key)
+            if info is None:
+                raise ObjectNotFound(key)
+            if info.size > self.max_bytes:
+                return None
+
+            size, sha256, md5 = self._write(key, self.origin.stream(key))
+            if size != info.size or (_MD5_ETAG.fullmatch(info.etag) and md5 != info.etag.lower()):
+                self._count("checksum_failures")
+                logger.warning(f"Storage cache: {key} from {self.origin.name} failed verification, not cached")
+                os.unlink(self._disk._path(key))
+                return None
+
+            self._insert(key, _Entry(size, sha256, info.content_type, info.last_modified))
+            self._count("fills")
+        self._evict()
+        return self._disk._path(key)
+
+    def _fill_in_background(self, key: str) -> None:
+        with self._lock:
+            if key in self._filling:
+                return
+            self._filling.add(key)
+
+        def run(key: str) -> None:
+            try:
+                self._fill(key)
+            except Exception as e:
+                logger.warning(f"Storage cache: background fill of {key} failed: {e}")
+            finally:
+                with self._lock:
+                    self._filling.discard(key)
+
+        self._submit(run, key)
+
+    def _write_back(self, key: str) -> None:
+        """将待回写的对象上传源站，失败按 retry_delays 重试"""
+        with self._key_lock(key):
+            with self._lock:
+                entry = self._entries.get(key)
+            if entry is None or not entry.dirty:
+                return
+            data = self._disk.get(key)
+
+            for attempt in range(len(self.retry_delays) + 1):
+                try:
+                    self.origin.put(key, data, entry.content_type)
+                    break
+                except Exception as e:
+                    if attempt == len(self.retry_delays):
+                        self._count("write_back_failures")
+                        logger.error(f"Storage cache: write-back of {key} failed, will retry on restart: {e}")
+                        return
+                    time.sleep(self.retry_delays[attempt])
+
+            entry.dirty = False
+            self._save_meta(key, entry)
+            self._count("write_backs")
+        self._evict()
+
+    # ------------------------------------------------------------------
+    # StorageBackend 接口
+    # ------------------------------------------------------------------
+
+    def put(self, key: str, data: bytes, content_type: str | None = None) -> ObjectInfo:
+        key = normalize_key(key)
+        content_type = content_type or guess_content_type(key)
+        if len(data) > self.max_bytes:
+            with self._key_lock(key):
+                self._drop(key)
+            return self.origin.put(key, data, content_type)
+
+        with self._key_lock(key):
+            size, sha256, _ = self._write(key, (data,))
+            entry = _Entry(size, sha256, content_type, time.time(), dirty=True)
+            self._insert(key, entry)
+        self._evict()
+        if self.write_back:
+            self._submit(self._write_back, key)
+        else:
+            self._write_back(key)
+            if entry.dirty:
+                raise OSError(f"Failed to write {key} to {self.origin.name}")
+        return entry.info(key)
+
+    def get(self, key: str) -> bytes:
+        key = normalize_key(key)
+        path = self._cached(key)
+        self._count("hits" if path else "misses")
+        if path is None:
+            path = self._fill(key)
+        if path is None:
+            return self.origin.get(key)
+        return self._disk.get(key)
+
+    def stream(
+        self, key: str, start: int = 0, end: int | None = None, chunk_size: int = STREAM_CHUNK_SIZE
+    ) -> Iterator[bytes]:
+        key = normalize_key(key)
+        if self._cached(key) is not None:
+            self._count("hits")
+            return self._disk.stream(key, start, end, chunk_size)
+        # 未命中时不等整份对象回填完成：直接转发源站的字节区间，后台回填
+        self._count("misses")
+        self._fill_in_background(key)
+        return self.origin.stream(key, start, end, chunk_size)
+
+    def head(self, key: str) -> ObjectInfo | None:
+        key = normalize_key(key)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None:
+            return entry.info(key)
+        return self.origin.head(key)
+
+    def delete(self, key: str) -> None:
+        key = normalize_key(key)
+        with self._key_lock(key):
+            self._drop(key)
+            self.origin.delete(key)
+
+    def local_path(self, key: str) -> str | None:
+        """缓存文件路径，未命中时先从源站回填；对象超过缓存上限时返回 None
+
+        Raises:
+            ObjectNotFound: 源站不存在该对象
+        """
+        key = normalize_key(key)
+        path = self._cached(key)
+        self._count("hits" if path else "misses")
+        return path if path is not None else self._fill(key)
+
+    def url(self, key: str) -> str:
+        if self.public_base_url:
+            return super().url(key)
+        return self.origin.url(key)
+
+    def presign(self, key: str, expires: int = 3600) -> str:
+        if self.public_base_url:
+            return super().presign(key, expires)
+        return self.origin.presign(key, expires)
+
+    def flush(self, timeout: float | None = None) -> bool:
+        with self._lock:
+            pending = list(self._pending)
+        _, not_done = wait(pending, timeout=timeout)
+        return not not_done
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "backend": self.name,
+                "origin": self.origin.name,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "dirty": sum(1 for entry in self._entries.values() if entry.dirty),
+                "pending": len(self._pending),
+                **self._stats,
+            }
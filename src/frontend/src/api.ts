@@ -0,0 +1,250 @@
+import type { CanvasItem, ImageItem } from './types';
+
+// ==================== 任务进度（/ws） ====================
+
+/** 任务进度事件：queued / started / retry / task_status / download / done */
+export interface JobEvent {
+  job_id: string;
+  event: string;
+  ts: number;
+  [key: string]: unknown;
+}
+
+type JobListener = (event: JobEvent) => void;
+
+/** 单条 WebSocket 连接复用所有任务的进度订阅，断线后自动重连并重新订阅 */
+class JobEventsSocket {
+  private socket: WebSocket | null = null;
+  private listeners = new Map<string, Set<JobListener>>();
+  private reconnectTimer: number | null = null;
+
+  /** 关注任务进度，返回取消关注的函数 */
+  subscribe(jobId: string, listener: JobListener): () => void {
+    let listeners = this.listeners.get(jobId);
+    if (!listeners) {
+      listeners = new Set();
+      this.listeners.set(jobId, listeners);
+      this.send({ action: 'subscribe', job_ids: [jobId] });
+    }
+    listeners.add(listener);
+    this.connect();
+
+    return () => {
+      listeners.delete(listener);
+      if (listeners.size === 0 && this.listeners.get(jobId) === listeners) {
+        this.listeners.delete(jobId);
+        this.send({ action: 'unsubscribe', job_ids: [jobId] });
+      }
+    };
+  }
+
+  private connect() {
+    if (this.socket || this.reconnectTimer !== null) return;
+    const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+    const socket = new WebSocket(`${protocol}//${window.location.host}/ws`);
+
+    // 连接（或重连）后重新订阅全部任务，服务端会先回放已发生的事件
+    socket.onopen = () => {
+      if (this.listeners.size > 0) {
+        socket.send(JSON.stringify({ action: 'subscribe', job_ids: [...this.listeners.keys()] }));
+      }
+    };
+    socket.onmessage = (msg) => {
+      const event = JSON.parse(msg.data) as JobEvent;
+      this.listeners.get(event.job_id)?.forEach((listener) => listener(event));
+    };
+    socket.onclose = () => {
+      this.socket = null;
+      if (this.listeners.size > 0) {
+        this.reconnectTimer = window.setTimeout(() => {
+          this.reconnectTimer = null;
+          this.connect();
+        }, 1000);
+      }
+    };
+    this.socket = socket;
+  }
+
+  private send(message: unknown) {
+    if (this.socket?.readyState === WebSocket.OPEN) {
+      this.socket.send(JSON.stringify(message));
+    }
+  }
+}
+
+export const jobEvents = new JobEventsSocket();
+
+// ==================== 生成请求 ====================
+
+/** 最多尝试次数（含首次） */
+const MAX_ATTEMPTS = 4;
+
+/** 可重试的状态码：限流 / 熔断 / 过载 / 停机 */
+const RETRYABLE_STATUS = new Set([429, 503]);
+
+/** WebSocket 不可用时查询任务状态的兜底间隔（毫秒） */
+const JOB_FALLBACK_POLL_MS = 15000;
+
+/** 图片派生版本中的一档：尺寸与各格式地址 */
+export interface Rendition {
+  width: number;
+  height: number;
+  avif?: string;
+  webp?: string;
+}
+
+/** 图片的 thumb（长边 256）/ preview（长边 1024）/ full 派生版本 */
+export interface ImageRenditions {
+  width: number;
+  height: number;
+  thumb: Rendition;
+  preview: Rendition;
+  full: Rendition;
+}
+
+/** 生成端点的响应 */
+export interface GenerateResponse {
+  success: boolean;
+  content?: unknown;
+  /** 视频封面地址 */
+  poster?: string | null;
+  /** 图片派生版本（num_images > 1 时为与 content 对应的列表） */
+  renditions?: ImageRenditions | (ImageRenditions | null)[] | null;
+  error?: string;
+  error_type?: string;
+}
+
+function sleep(ms: number): Promise<void> {
+  return new Promise((resolve) => setTimeout(resolve, ms));
+}
+
+/** 重试等待时间：优先使用 Retry-After，否则指数退避（1s, 2s, 4s）加随机抖动 */
+function retryDelay(resp: Response | null, attempt: number): number {
+  const retryAfter = Number(resp?.headers.get('Retry-After'));
+  if (Number.isFinite(retryAfter) && retryAfter > 0) return retryAfter * 1000;
+  return 1000 * 2 ** attempt + Math.random() * 250;
+}
+
+/** 等待后台任务完成（done 事件，或兜底查询到 done），返回生成结果 */
+async function waitForJob(location: string, done: Promise<JobEvent>): Promise<GenerateResponse> {
+  for (;;) {
+    const event = await Promise.race([done, sleep(JOB_FALLBACK_POLL_MS).then(() => null)]);
+    const job = await (await fetch(location)).json();
+    if (job.status === 'done') return job.result as GenerateResponse;
+    if (event !== null) throw new Error('任务结果获取失败');
+  }
+}
+
+/**
+ * 调用生成端点（/api/v1/{llm,image,video}/generate）
+ *
+ * 请求以 Prefer: respond-async 提交，后端立即返回 202 与任务 ID，进度经 /ws 推送给 onEvent，
+ * 收到 done 事件后取回结果，不再为每个任务保持长 HTTP 连接。
+ *
+ * 每次调用生成一个 Idempotency-Key，网络错误与 429/503 时以同一个键重试：
+ * 后端要么让重试加入仍在执行的那次生成，要么直接返回已保存的结果，不会重复计费。
+ */
+export async function postGenerate(
+  endpoint: string,
+  body: unknown,
+  onEvent?: JobListener,
+): Promise<GenerateResponse> {
+  const idempotencyKey = crypto.randomUUID();
+
+  for (let attempt = 0; ; attempt++) {
+    const isLast = attempt === MAX_ATTEMPTS - 1;
+    // 每次尝试使用新的任务 ID，避免收到上一次被拒绝尝试的 done 事件
+    const jobId = crypto.randomUUID();
+    let resolveDone: (event: JobEvent) => void = () => {};
+    const done = new Promise<JobEvent>((resolve) => {
+      resolveDone = resolve;
+    });
+    const unsubscribe = jobEvents.subscribe(jobId, (event) => {
+      onEvent?.(event);
+      if (event.event === 'done') resolveDone(event);
+    });
+
+    try {
+      let resp: Response;
+      try {
+        resp = await fetch(endpoint, {
+          method: 'POST',
+          headers: {
+            'Content-Type': 'application/json',
+            'Idempotency-Key': idempotencyKey,
+            'X-Request-ID': jobId,
+            Prefer: 'respond-async',
+          },
+          body: JSON.stringify(body),
+        });
+      } catch (err) {
+        if (isLast) throw err;
+        await sleep(retryDelay(null, attempt));
+        continue;
+      }
+
+      if (RETRYABLE_STATUS.has(resp.status) && !isLast) {
+        await sleep(retryDelay(resp, attempt));
+        continue;
+      }
+      if (resp.status === 202) {
+        return await waitForJob(resp.headers.get('Location') || `/api/v1/jobs/${jobId}`, done);
+      }
+      return (await resp.json()) as GenerateResponse;
+    } finally {
+      unsubscribe();
+    }
+  }
+}
+
+// ==================== 搭配拼图 ====================
+
+/** 拼图结果：url 供画布显示，reference_url 可直接作为生成请求的参考图 */
+export interface CollageResponse {
+  success: boolean;
+  url?: string;
+  reference_url?: string;
+  width?: number;
+  height?: number;
+  error?: string;
+}
+
+/** 按画布上的位置、大小与旋转把选中的图片合成一张拼图（/api/v1/outfit/collage） */
+export async function composeCollage(items: ImageItem[]): Promise<CollageResponse> {
+  const resp = await fetch('/api/v1/outfit/collage', {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({
+      items: items.map(({ url, x, y, width, height, rotation }) => ({ url, x, y, width, height, rotation })),
+    }),
+  });
+  if (!resp.ok) {
+    const body = await resp.json().catch(() => null);
+    return { success: false, error: body?.detail || `拼图失败（${resp.status}）` };
+  }
+  return (await resp.json()) as CollageResponse;
+}
+
+// ==================== 画布导出 ====================
+
+/**
+ * 服务端渲染并导出整个画布（/api/v1/canvas/export），返回图片 Blob
+ *
+ * 代替浏览器端 Fabric.js 导出：大画布不再卡住页面，未变化的分块在服务端复用。
+ */
+export async function exportCanvas(
+  items: CanvasItem[],
+  options: { scale?: number; padding?: number; format?: 'png' | 'webp' | 'jpg' } = {},
+): Promise<Blob> {
+  const resp = await fetch('/api/v1/canvas/export', {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ items, scale: 1, padding: 24, format: 'png', ...options }),
+  });
+  const type = resp.headers.get('Content-Type') || '';
+  if (!resp.ok || !type.startsWith('image/')) {
+    const body = await resp.json().catch(() => null);
+    throw new Error(body?.detail || body?.error || `导出失败（${resp.status}）`);
+  }
+  return await resp.blob();
+}
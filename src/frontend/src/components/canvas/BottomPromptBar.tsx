@@ -1,4 +1,6 @@
 import { useState, useEffect, useRef } from 'react';
+import { composeCollage, postGenerate, type ImageRenditions, type JobEvent } from '../../api';
+import type { ImageItem } from '../../types';
 import './BottomPromptBar.css';
 
 // ==================== 类型定义 ====================
@@ -25,9 +27,12 @@ interface ProviderInfo {
 }
 
 interface Props {
-  onImageGenerated: (base64: string) => void;
-  onVideoGenerated: (base64: string) => void;
+  onImageGenerated: (src: string, renditions?: ImageRenditions | null) => void;
+  /** src 为视频地址（faststart 重排后，可边下边播），poster 为封面地址 */
+  onVideoGenerated: (src: string, poster?: string | null) => void;
   selectedImageDataUrl?: string | null;
+  /** 多选的图片（2 张及以上），生成时合成一张拼图作为参考图 */
+  selectedItems?: ImageItem[];
 }
 
 // ==================== 工具 ====================
@@ -82,9 +87,29 @@ async function uploadImageToOSS(file: File): Promise<string> {
   return data.url as string;
 }
 
+/** 任务进度事件的简短描述（显示在生成按钮旁） */
+function describeProgress(event: JobEvent): string | null {
+  switch (event.event) {
+    case 'queued':
+      return '排队中';
+    case 'started':
+      return '生成中';
+    case 'retry':
+      return `重试中（第 ${event.attempt} 次）`;
+    case 'task_status':
+      return `任务 ${event.task_status}`;
+    case 'download': {
+      const total = Number(event.total);
+      return total > 0 ? `下载 ${Math.round((Number(event.received) / total) * 100)}%` : '下载中';
+    }
+    default:
+      return null;
+  }
+}
+
 // ==================== 主组件 ====================
 
-export function BottomPromptBar({ onImageGenerated, onVideoGenerated, selectedImageDataUrl }: Props) {
+export function BottomPromptBar({ onImageGenerated, onVideoGenerated, selectedImageDataUrl, selectedItems = [] }: Props) {
   const [mode, setMode] = useState<Mode>('image');
   const [imageProviders, setImageProviders] = useState<ProviderInfo[]>([]);
   const [videoProviders, setVideoProviders] = useState<ProviderInfo[]>([]);
@@ -93,6 +118,7 @@ export function BottomPromptBar({ onImageGenerated, onVideoGenerated, selectedIm
   const [prompt, setPrompt] = useState('');
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState<string | null>(null);
+  const [progress, setProgress] = useState<string | null>(null);
   const [openChip, setOpenChip] = useState<string | null>(null);
   const textareaRef = useRef<HTMLTextAreaElement>(null);
 
@@ -178,10 +204,18 @@ export function BottomPromptBar({ onImageGenerated, onVideoGenerated, selectedIm
     try {
       const requestParams = buildRequestParams();
 
-      // 如果有选中的画布图片，上传到 OSS 并注入到 image 参数
-      if (selectedImageDataUrl) {
+      // 多选时按画布布局合成拼图，单选时上传选中图片，注入到 image 参数
+      let url: string | null = null;
+      if (selectedItems.length > 1) {
+        setProgress('合成拼图');
+        const collage = await composeCollage(selectedItems);
+        if (!collage.success || !collage.reference_url) throw new Error(collage.error || '拼图失败');
+        url = collage.reference_url;
+      } else if (selectedImageDataUrl) {
         const file = dataUrlToFile(selectedImageDataUrl, `canvas_${Date.now()}.png`);
-        const url = await uploadImageToOSS(file);
+        url = await uploadImageToOSS(file);
+      }
+      if (url) {
         // 查找当前 provider 的图片参数名
         const imageParam = exposedParams.find((p) => isImageParam(p));
         if (imageParam) {
@@ -194,21 +228,25 @@ export function BottomPromptBar({ onImageGenerated, onVideoGenerated, selectedIm
       }
 
       const endpoint = mode === 'image' ? '/api/v1/image/generate' : '/api/v1/video/generate';
-      const resp = await fetch(endpoint, {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({
+      const data = await postGenerate(
+        endpoint,
+        {
           vendor: selectedVendor,
           prompt: prompt.trim(),
           parameters: requestParams,
-        }),
-      });
-      const data = await resp.json();
+          // 以存储地址返回：视频经 Range 边下边播，图片按缩放级别加载派生版本，不再内联整个 base64
+          return_format: 'url',
+        },
+        (event) => setProgress(describeProgress(event)),
+      );
       if (data.success) {
         if (mode === 'image') {
-          onImageGenerated(data.content as string);
+          // num_images > 1 时 content 为列表，每张图片单独加入画布
+          const images: string[] = Array.isArray(data.content) ? data.content : [data.content];
+          const renditions = Array.isArray(data.renditions) ? data.renditions : [data.renditions];
+          images.forEach((image, i) => onImageGenerated(image, renditions[i]));
         } else {
-          onVideoGenerated(data.content as string);
+          onVideoGenerated(data.content as string, data.poster);
         }
       } else {
         setError(data.error || '生成失败');
@@ -217,6 +255,7 @@ export function BottomPromptBar({ onImageGenerated, onVideoGenerated, selectedIm
       setError(err instanceof Error ? err.message : '请求失败，请检查后端服务');
     } finally {
       setLoading(false);
+      setProgress(null);
     }
   }
 
@@ -333,6 +372,15 @@ export function BottomPromptBar({ onImageGenerated, onVideoGenerated, selectedIm
         </div>
       )}
 
+      {selectedItems.length > 1 && (
+        <div className="selected-image-row">
+          {selectedItems.map((item) => (
+            <img key={item.id} src={item.url} alt="选中单品" className="selected-image-thumb" />
+          ))}
+          <span className="selected-image-label">已选中 {selectedItems.length} 张，将按画布布局合成拼图作为参考图</span>
+        </div>
+      )}
+
       {/* 输入区域 */}
       <textarea
         ref={textareaRef}
@@ -420,7 +468,7 @@ export function BottomPromptBar({ onImageGenerated, onVideoGenerated, selectedIm
 
         {/* 右侧 */}
         <div className="controls-right">
-          <span className="prompt-hint">{'\u2318'} Enter</span>
+          <span className="prompt-hint">{loading && progress ? progress : '\u2318 Enter'}</span>
           <button
             className={`generate-btn ${loading ? 'loading' : ''}`}
             onClick={handleGenerate}
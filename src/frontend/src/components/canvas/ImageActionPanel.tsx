@@ -1,4 +1,5 @@
 import { useState, useEffect } from 'react';
+import { postGenerate } from '../../api';
 import './ImageActionPanel.css';
 
 // ==================== 类型定义 ====================
@@ -215,16 +216,11 @@ export function ImageActionPanel({ anchor, onClose, onImageGenerated }: Props) {
     const endpoint = mode === 'image' ? '/api/v1/image/generate' : '/api/v1/video/generate';
 
     try {
-      const resp = await fetch(endpoint, {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({
-          vendor: selectedVendor,
-          prompt: prompt.trim(),
-          parameters: buildRequestParams(),
-        }),
+      const data = await postGenerate(endpoint, {
+        vendor: selectedVendor,
+        prompt: prompt.trim(),
+        parameters: buildRequestParams(),
       });
-      const data = await resp.json();
 
       if (!data.success) {
         setError(data.error || '生成失败');
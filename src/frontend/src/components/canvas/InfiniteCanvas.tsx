@@ -1,7 +1,8 @@
 import { useEffect, useRef, useCallback, useState } from 'react';
+import { exportCanvas, type ImageRenditions } from '../../api';
 import { useFabricCanvas } from '../../hooks/useFabricCanvas';
 import { useCanvasStore } from '../../store';
-import { LIMITS } from '../../types';
+import { LIMITS, type ImageItem } from '../../types';
 import { BottomPromptBar } from './BottomPromptBar';
 import './InfiniteCanvas.css';
 
@@ -17,17 +18,24 @@ export function InfiniteCanvas() {
   const { isPanning, setPanning, togglePanMode } = useCanvasStore();
 
   // Fabric 画布 Hook（背景设为透明，让 CSS 点阵网格透出）
-  const { canvas, viewport, resize, setZoom, pan, addImage, addVideo, addText, deleteSelected } =
+  const { canvas, viewport, resize, setZoom, pan, addImage, addVideo, addText, deleteSelected, getCanvasItems } =
     useFabricCanvas(canvasRef, {
       width: window.innerWidth,
       height: window.innerHeight,
       backgroundColor: '',          // 透明，CSS 背景透出
       onViewportChange: () => {},
       onImageSelect: (info) => {
+        setSelectedItems([]);
         setSelectedImageUrl(info.dataUrl);
         setSelectedImagePos({ x: info.canvasLeft + info.canvasWidth / 2, y: info.canvasTop + info.canvasHeight / 2 });
       },
       onSelectionClear: () => {
+        setSelectedItems([]);
+        setSelectedImageUrl(null);
+        setSelectedImagePos(null);
+      },
+      onItemsSelect: (items) => {
+        setSelectedItems(items);
         setSelectedImageUrl(null);
         setSelectedImagePos(null);
       },
@@ -39,6 +47,9 @@ export function InfiniteCanvas() {
   const [isSpacePressed, setIsSpacePressed] = useState(false);
   const [selectedImageUrl, setSelectedImageUrl] = useState<string | null>(null);
   const [selectedImagePos, setSelectedImagePos] = useState<{ x: number; y: number } | null>(null);
+  // 多选的图片（搭配单品），生成时合成一张拼图作为参考图
+  const [selectedItems, setSelectedItems] = useState<ImageItem[]>([]);
+  const [isExporting, setIsExporting] = useState(false);
 
   /**
    * 点阵网格随视口平移/缩放而移动
@@ -61,11 +72,12 @@ export function InfiniteCanvas() {
    * 生成图片后放置在画布视口中心
    */
   const handleImageGenerated = useCallback(
-    (base64: string) => {
-      const url = `data:image/png;base64,${base64}`;
+    (src: string, renditions?: ImageRenditions | null) => {
+      // src 为存储地址或 base64 内容
+      const url = /^(\/api\/|https?:|data:|blob:)/.test(src) ? src : `data:image/png;base64,${src}`;
       const cx = (window.innerWidth / 2 + viewport.x) / viewport.zoom;
       const cy = (window.innerHeight / 2 + viewport.y) / viewport.zoom;
-      addImage(url, { x: cx, y: cy });
+      addImage(url, { x: cx, y: cy }, renditions);
     },
     [addImage, viewport]
   );
@@ -74,7 +86,7 @@ export function InfiniteCanvas() {
    * 视频生成后添加到画布
    */
   const handleVideoGenerated = useCallback(
-    (base64: string) => {
+    (src: string, poster?: string | null) => {
       // 如果有选中的图片，放在图片右侧；否则放在画布中央
       let x, y;
       if (selectedImagePos) {
@@ -84,7 +96,7 @@ export function InfiniteCanvas() {
         x = (window.innerWidth / 2 + viewport.x) / viewport.zoom;
         y = (window.innerHeight / 2 + viewport.y) / viewport.zoom;
       }
-      addVideo(base64, { x, y });
+      addVideo(src, { x, y }, poster);
     },
     [addVideo, viewport, selectedImagePos]
   );
@@ -203,6 +215,27 @@ export function InfiniteCanvas() {
 
   const handleUploadClick = useCallback(() => fileInputRef.current?.click(), []);
 
+  /**
+   * 服务端渲染导出整个画布并下载
+   */
+  const handleExport = useCallback(async () => {
+    const items = getCanvasItems();
+    if (items.length === 0 || isExporting) return;
+    setIsExporting(true);
+    try {
+      const blob = await exportCanvas(items);
+      const link = document.createElement('a');
+      link.href = URL.createObjectURL(blob);
+      link.download = `canvas_${Date.now()}.png`;
+      link.click();
+      URL.revokeObjectURL(link.href);
+    } catch (err) {
+      console.error('Failed to export canvas:', err);
+    } finally {
+      setIsExporting(false);
+    }
+  }, [getCanvasItems, isExporting]);
+
   const handleFileChange = useCallback(
     (e: React.ChangeEvent<HTMLInputElement>) => {
       const file = e.target.files?.[0];
@@ -269,6 +302,7 @@ export function InfiniteCanvas() {
         onImageGenerated={handleImageGenerated}
         onVideoGenerated={handleVideoGenerated}
         selectedImageDataUrl={selectedImageUrl}
+        selectedItems={selectedItems}
       />
 
       {/* 左侧工具侧边栏 */}
@@ -286,6 +320,12 @@ export function InfiniteCanvas() {
           </svg>
         </button>
 
+        <button onClick={handleExport} className="sidebar-button" data-tip="导出" disabled={isExporting}>
+          <svg viewBox="0 0 24 24" fill="none" stroke="currentColor">
+            <path d="M12 4v11M7 10l5 5 5-5M5 20h14" strokeLinecap="round" strokeLinejoin="round" />
+          </svg>
+        </button>
+
         <div className="sidebar-divider" />
 
         <button
@@ -1,6 +1,97 @@
 import { useEffect, useRef, useCallback, useState } from 'react';
 import { Canvas, Point, Image as FabricImage, Textbox, type Canvas as FabricCanvas } from 'fabric';
-import { COLORS, LIMITS, type Viewport } from '../types';
+import { COLORS, LIMITS, type CanvasItem, type ImageItem, type TextNoteItem, type Viewport } from '../types';
+import type { ImageRenditions, Rendition } from '../api';
+
+// ==================== 图片派生版本 ====================
+
+/** 派生版本档位，从小到大 */
+const RENDITION_TIERS = ['thumb', 'preview', 'full'] as const;
+type RenditionTier = (typeof RENDITION_TIERS)[number];
+
+/** 缩放停止后多久切换派生版本（毫秒） */
+const RENDITION_SWITCH_DELAY_MS = 200;
+
+/** 画布图片的派生版本与当前加载的档位 */
+const imageRenditions = new WeakMap<FabricImage, { renditions: ImageRenditions; tier: RenditionTier }>();
+
+/** 浏览器无法解码 AVIF 时置位，之后只请求 WebP */
+let avifUnsupported = false;
+
+/** 显示尺寸（屏幕像素，已乘 devicePixelRatio）所需的最小档位 */
+function pickRenditionTier(renditions: ImageRenditions, screenSize: number): RenditionTier {
+  return (
+    RENDITION_TIERS.find((tier) => {
+      const { width, height } = renditions[tier];
+      return Math.max(width, height) >= screenSize;
+    }) ?? 'full'
+  );
+}
+
+function renditionUrl(rendition: Rendition): string | undefined {
+  return (!avifUnsupported && rendition.avif) || rendition.webp;
+}
+
+/** 加载派生版本，AVIF 解码失败时改用 WebP；没有可用格式时返回 null */
+async function loadRendition<T>(rendition: Rendition, load: (url: string) => Promise<T>): Promise<T | null> {
+  const url = renditionUrl(rendition);
+  if (!url) return null;
+  try {
+    return await load(url);
+  } catch (err) {
+    if (url !== rendition.avif || !rendition.webp) throw err;
+    avifUnsupported = true;
+    return await load(rendition.webp);
+  }
+}
+
+// ==================== 选中元素 ====================
+
+/** 画布图片的原始地址（派生版本切换后 getSrc() 不再是原图） */
+const imageSources = new WeakMap<FabricImage, string>();
+
+/** 图片在画布坐标下的几何信息（多选时对象位于 ActiveSelection 内，需换算到画布坐标） */
+function toImageItem(obj: FabricImage, index: number): ImageItem | null {
+  const url = imageSources.get(obj);
+  if (!url) return null;
+  const center = obj.getCenterPoint();
+  const scaling = obj.getObjectScaling();
+  const width = obj.width * Math.abs(scaling.x);
+  const height = obj.height * Math.abs(scaling.y);
+  return {
+    id: (obj as any).data?.id ?? `image-${index}`,
+    type: 'image',
+    url,
+    x: center.x - width / 2,
+    y: center.y - height / 2,
+    width,
+    height,
+    rotation: obj.getTotalAngle(),
+  };
+}
+
+/** 文字在画布坐标下的几何信息（字号按缩放换算） */
+function toTextItem(obj: Textbox, index: number): TextNoteItem {
+  const center = obj.getCenterPoint();
+  const scaling = obj.getObjectScaling();
+  const width = obj.width * Math.abs(scaling.x);
+  const height = obj.height * Math.abs(scaling.y);
+  return {
+    id: (obj as any).data?.id ?? `text-${index}`,
+    type: 'text',
+    content: obj.text ?? '',
+    x: center.x - width / 2,
+    y: center.y - height / 2,
+    width,
+    height,
+    rotation: obj.getTotalAngle(),
+    fontSize: (obj.fontSize ?? LIMITS.defaultFontSize) * Math.abs(scaling.y),
+    color: typeof obj.fill === 'string' ? obj.fill : COLORS.text,
+    fontFamily: obj.fontFamily ?? '',
+    minWidth: LIMITS.minTextWidth,
+    minHeight: 0,
+  };
+}
 
 // ==================== Fabric 画布 Hook ====================
 
@@ -19,6 +110,8 @@ export interface UseFabricCanvasOptions {
   onViewportChange?: (viewport: Viewport) => void;
   onImageSelect?: (info: ImageSelectInfo) => void;
   onSelectionClear?: () => void;
+  /** 多选 2 张及以上图片时回调（移动选区后再次回调），按绘制顺序 */
+  onItemsSelect?: (items: ImageItem[]) => void;
 }
 
 export function useFabricCanvas(
@@ -34,15 +127,18 @@ export function useFabricCanvas(
 
   const fabricCanvasRef = useRef<FabricCanvas | null>(null);
   const viewportRef = useRef<Viewport>({ x: 0, y: 0, zoom: 1 });
+  const renditionTimerRef = useRef<number | null>(null);
   const [viewport, setViewport] = useState<Viewport>({ x: 0, y: 0, zoom: 1 });
   const [isReady, setIsReady] = useState(false);
 
   // 保持回调 refs 最新，避免事件监听器中的旧闭包
   const onImageSelectRef = useRef(options.onImageSelect);
   const onSelectionClearRef = useRef(options.onSelectionClear);
+  const onItemsSelectRef = useRef(options.onItemsSelect);
 
   useEffect(() => { onImageSelectRef.current = options.onImageSelect; }, [options.onImageSelect]);
   useEffect(() => { onSelectionClearRef.current = options.onSelectionClear; }, [options.onSelectionClear]);
+  useEffect(() => { onItemsSelectRef.current = options.onItemsSelect; }, [options.onItemsSelect]);
 
   // 初始化画布
   useEffect(() => {
@@ -90,20 +186,36 @@ export function useFabricCanvas(
       });
     };
 
-    canvas.on('selection:created', (e: any) => {
-      if (e.selected?.length === 1) {
-        notifyImageSelected(e.selected[0]);
+    // 多选图片时通知外部（用于合成搭配拼图），按画布绘制顺序
+    const notifyItemsSelected = () => {
+      const active = new Set(canvas.getActiveObjects());
+      const items = canvas
+        .getObjects()
+        .filter((obj): obj is FabricImage => obj instanceof FabricImage && active.has(obj))
+        .map(toImageItem)
+        .filter((item): item is ImageItem => item !== null);
+      if (items.length > 1) {
+        onItemsSelectRef.current?.(items);
       } else {
         onSelectionClearRef.current?.();
       }
-    });
+    };
 
-    canvas.on('selection:updated', (e: any) => {
-      if (e.selected?.length === 1) {
-        notifyImageSelected(e.selected[0]);
+    const handleSelection = () => {
+      const active = canvas.getActiveObjects();
+      if (active.length === 1) {
+        notifyImageSelected(active[0]);
       } else {
-        onSelectionClearRef.current?.();
+        notifyItemsSelected();
       }
+    };
+
+    canvas.on('selection:created', handleSelection);
+    canvas.on('selection:updated', handleSelection);
+
+    // 移动、缩放或旋转选区后更新多选元素的几何信息
+    canvas.on('object:modified', () => {
+      if (canvas.getActiveObjects().length > 1) notifyItemsSelected();
     });
 
     canvas.on('selection:cleared', () => {
@@ -114,6 +226,7 @@ export function useFabricCanvas(
     setIsReady(true);
 
     return () => {
+      if (renditionTimerRef.current !== null) window.clearTimeout(renditionTimerRef.current);
       canvas.dispose();
       fabricCanvasRef.current = null;
       setIsReady(false);
@@ -129,6 +242,41 @@ export function useFabricCanvas(
     canvas.renderAll();
   }, []);
 
+  // 按当前缩放级别为每张图片切换派生版本（保持显示尺寸不变）
+  const refreshRenditions = useCallback(() => {
+    const canvas = fabricCanvasRef.current;
+    if (!canvas) return;
+    const zoom = viewportRef.current.zoom * (window.devicePixelRatio || 1);
+
+    canvas.getObjects().forEach((obj) => {
+      if (!(obj instanceof FabricImage)) return;
+      const entry = imageRenditions.get(obj);
+      if (!entry) return;
+      const tier = pickRenditionTier(entry.renditions, Math.max(obj.getScaledWidth(), obj.getScaledHeight()) * zoom);
+      if (tier === entry.tier) return;
+
+      const displayWidth = obj.getScaledWidth();
+      entry.tier = tier;
+      loadRendition(entry.renditions[tier], (url) => obj.setSrc(url, { crossOrigin: 'anonymous' }).then(() => true))
+        .then((loaded) => {
+          if (!loaded) return;
+          obj.scale(displayWidth / obj.width);
+          obj.setCoords();
+          canvas.requestRenderAll();
+        })
+        .catch((err) => console.error('Failed to switch image rendition:', err));
+    });
+  }, []);
+
+  // 缩放停止后再切换派生版本，避免滚轮缩放过程中反复请求
+  const scheduleRenditionRefresh = useCallback(() => {
+    if (renditionTimerRef.current !== null) window.clearTimeout(renditionTimerRef.current);
+    renditionTimerRef.current = window.setTimeout(() => {
+      renditionTimerRef.current = null;
+      refreshRenditions();
+    }, RENDITION_SWITCH_DELAY_MS);
+  }, [refreshRenditions]);
+
   // 设置缩放
   const setZoom = useCallback(
     (zoom: number, center?: { x: number; y: number }) => {
@@ -153,8 +301,9 @@ export function useFabricCanvas(
       }
 
       canvas.requestRenderAll();
+      scheduleRenditionRefresh();
     },
-    [onViewportChange]
+    [onViewportChange, scheduleRenditionRefresh]
   );
 
   // 平移画布
@@ -180,23 +329,45 @@ export function useFabricCanvas(
     [onViewportChange]
   );
 
-  // 添加图片（禁用旋转）
+  // 添加图片（禁用旋转）；有派生版本时按显示尺寸与缩放级别加载合适的一档，不下载原图
   const addImage = useCallback(
-    async (url: string, options: { x?: number; y?: number; id?: string } = {}) => {
+    async (
+      url: string,
+      options: { x?: number; y?: number; id?: string } = {},
+      renditions?: ImageRenditions | null,
+    ) => {
       const canvas = fabricCanvasRef.current;
       if (!canvas) return null;
 
       try {
-        const isDataUrl = url.startsWith('data:');
-        const img = await FabricImage.fromURL(url, isDataUrl ? {} : { crossOrigin: 'anonymous' });
+        // 限制图片最大尺寸（相对画布适中）
+        const maxSize = 280;
+        let img: FabricImage | null = null;
+        let tier: RenditionTier | null = null;
+        if (renditions) {
+          const displaySize = Math.min(maxSize, Math.max(renditions.width, renditions.height));
+          tier = pickRenditionTier(renditions, displaySize * viewportRef.current.zoom * (window.devicePixelRatio || 1));
+          img = await loadRendition(renditions[tier], (renditionUrl) =>
+            FabricImage.fromURL(renditionUrl, { crossOrigin: 'anonymous' }),
+          );
+        }
+        if (!img) {
+          const isDataUrl = url.startsWith('data:');
+          img = await FabricImage.fromURL(url, isDataUrl ? {} : { crossOrigin: 'anonymous' });
+          tier = null;
+        }
         if (!img) return null;
 
         const { x = 100, y = 100, id } = options;
 
-        // 限制图片最大尺寸（相对画布适中）
-        const maxSize = 280;
-        const scale = Math.min(1, maxSize / Math.max(img.width!, img.height!));
-        if (scale < 1) img.scale(scale);
+        // 按原图尺寸计算显示大小，派生版本只决定清晰度
+        const sourceWidth = renditions && tier ? renditions.width : img.width!;
+        const sourceHeight = renditions && tier ? renditions.height : img.height!;
+        const scale = Math.min(1, maxSize / Math.max(sourceWidth, sourceHeight));
+        const displayScale = (sourceWidth * scale) / img.width!;
+        if (displayScale !== 1) img.scale(displayScale);
+        if (renditions && tier) imageRenditions.set(img, { renditions, tier });
+        imageSources.set(img, url);
 
         // 设置 origin 为中心；带边框，隐藏选择控制手柄
         img.set({
@@ -260,7 +431,11 @@ export function useFabricCanvas(
 
   // 添加视频到画布（简单的覆盖层实现）
   const addVideo = useCallback(
-    (base64: string, options: { x: number; y: number } = { x: 100, y: 100 }) => {
+    (
+      src: string,
+      options: { x: number; y: number } = { x: 100, y: 100 },
+      poster?: string | null,
+    ) => {
       const canvas = fabricCanvasRef.current;
       if (!canvas) return;
 
@@ -268,7 +443,10 @@ export function useFabricCanvas(
 
       // 创建 video 元素
       const videoElement = document.createElement('video');
-      videoElement.src = `data:video/mp4;base64,${base64}`;
+      // src 为地址（/api/v1/assets/... 或 http(s)）或 base64 内容
+      videoElement.src = /^(\/api\/|https?:|data:|blob:)/.test(src) ? src : `data:video/mp4;base64,${src}`;
+      if (poster) videoElement.poster = poster;
+      videoElement.preload = 'auto';
       videoElement.autoplay = true;
       videoElement.loop = true;
       videoElement.muted = true;
@@ -359,6 +537,19 @@ export function useFabricCanvas(
     }
   }, []);
 
+  // 画布全部图片与文字元素（画布坐标，按绘制顺序），用于服务端渲染导出
+  const getCanvasItems = useCallback((): CanvasItem[] => {
+    const canvas = fabricCanvasRef.current;
+    if (!canvas) return [];
+    return canvas.getObjects().flatMap((obj, index): CanvasItem[] => {
+      if (obj instanceof FabricImage) {
+        const item = toImageItem(obj, index);
+        return item ? [item] : [];
+      }
+      return obj instanceof Textbox ? [toTextItem(obj, index)] : [];
+    });
+  }, []);
+
   // 清空画布
   const clear = useCallback(() => {
     const canvas = fabricCanvasRef.current;
@@ -379,6 +570,7 @@ export function useFabricCanvas(
     addVideo,
     addText,
     deleteSelected,
+    getCanvasItems,
     clear,
   };
 }
@@ -0,0 +1,200 @@
+"""
+资源下载路由测试
+
+测试图片上传、资源下载的 Range、条件请求与缓存头，以及各存储后端的发送方式。
+"""
+
+import importlib
+from email.utils import formatdate
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.backend.api.assets import RangeNotSatisfiable, parse_range
+from src.backend.main import app
+from src.backend.storage import LocalStorage, MemoryStorage, TieredStorage, content_key
+
+client = TestClient(app)
+
+
+def use_storage(monkeypatch, backend):
+    """将路由与上传端点使用的存储替换为 backend"""
+    for module in ("src.backend.api.assets", "src.backend.api.router"):
+        monkeypatch.setattr(importlib.import_module(module), "storage", backend)
+    return backend
+
+
+@pytest.fixture
+def local_storage(tmp_path, monkeypatch):
+    return use_storage(monkeypatch, LocalStorage(str(tmp_path), signing_secret="secret"))
+
+
+class TestParseRange:
+    """测试 Range 头解析"""
+
+    def test_forms(self):
+        """测试闭区间、开放区间与后缀区间"""
+        assert parse_range("bytes=0-9", 100) == (0, 9)
+        assert parse_range("bytes=90-", 100) == (90, 99)
+        assert parse_range("bytes=95-200", 100) == (95, 99)
+        assert parse_range("bytes=-10", 100) == (90, 99)
+        assert parse_range("bytes=-200", 100) == (0, 99)
+
+    def test_ignored_and_unsatisfiable(self):
+        """测试无效与多区间请求被忽略，越界抛出 RangeNotSatisfiable"""
+        for header in ("items=0-9", "bytes=a-b", "bytes=9-0", "bytes=0-1,5-6", "bytes=-"):
+            assert parse_range(header, 100) is None
+        with pytest.raises(RangeNotSatisfiable):
+            parse_range("bytes=100-", 100)
+        with pytest.raises(RangeNotSatisfiable):
+            parse_range("bytes=-0", 100)
+
+
+class TestUploadAPI:
+    """测试图片上传端点"""
+
+    def test_upload_is_content_addressed(self, local_storage):
+        """测试上传按内容寻址，同一内容返回同一地址，下载为 immutable 缓存"""
+        response = client.post("/api/v1/upload/image", files={"file": ("cat.PNG", b"0123456789", "image/png")})
+        body = response.json()
+        assert body["success"] is True
+        assert body["url"] == f"/api/v1/assets/{content_key(b'0123456789', 'png')}"
+
+        again = client.post("/api/v1/upload/image", files={"file": ("dog.png", b"0123456789", "image/png")})
+        assert again.json()["url"] == body["url"]
+
+        download = client.get(body["url"])
+        assert download.content == b"0123456789"
+        assert download.headers["content-type"] == "image/png"
+        assert download.headers["cache-control"] == "public, max-age=31536000, immutable"
+
+
+class TestAssetAPI:
+    """测试资源下载端点"""
+
+    def test_full_and_range(self, local_storage):
+        """测试完整下载与 206 区间下载"""
+        local_storage.put("v.mp4", bytes(range(100)))
+
+        full = client.get("/api/v1/assets/v.mp4")
+        assert full.status_code == 200
+        assert full.content == bytes(range(100))
+        assert full.headers["accept-ranges"] == "bytes"
+        assert full.headers["cache-control"] == "public, no-cache"
+
+        partial = client.get("/api/v1/assets/v.mp4", headers={"Range": "bytes=10-19"})
+        assert partial.status_code == 206
+        assert partial.content == bytes(range(10, 20))
+        assert partial.headers["content-range"] == "bytes 10-19/100"
+        assert partial.headers["content-length"] == "10"
+
+        tail = client.get("/api/v1/assets/v.mp4", headers={"Range": "bytes=-5"})
+        assert tail.content == bytes(range(95, 100))
+
+        outside = client.get("/api/v1/assets/v.mp4", headers={"Range": "bytes=100-"})
+        assert outside.status_code == 416
+        assert outside.headers["content-range"] == "bytes */100"
+
+    def test_conditional_get(self, local_storage):
+        """测试 If-None-Match 与 If-Modified-Since 命中时返回 304"""
+        info = local_storage.put("a.png", b"x")
+        etag = f'"{info.etag}"'
+
+        first = client.get("/api/v1/assets/a.png")
+        assert first.headers["etag"] == etag
+        assert first.headers["last-modified"] == formatdate(info.last_modified, usegmt=True)
+
+        cached = client.get("/api/v1/assets/a.png", headers={"If-None-Match": f'W/{etag}, "other"'})
+        assert cached.status_code == 304
+        assert cached.content == b""
+        assert cached.headers["etag"] == etag
+
+        stale = client.get("/api/v1/assets/a.png", headers={"If-None-Match": '"other"'})
+        assert stale.status_code == 200
+
+        since = client.get("/api/v1/assets/a.png", headers={"If-Modified-Since": first.headers["last-modified"]})
+        assert since.status_code == 304
+
+    def test_if_range_mismatch_returns_full(self, local_storage):
+        """测试 If-Range 与当前版本不一致时忽略 Range"""
+        local_storage.put("a.bin", b"0123456789")
+        response = client.get("/api/v1/assets/a.bin", headers={"Range": "bytes=0-1", "If-Range": '"old"'})
+        assert response.status_code == 200
+        assert response.content == b"0123456789"
+
+    def test_head(self, local_storage):
+        """测试 HEAD 只返回响应头"""
+        local_storage.put("a.bin", b"0123456789")
+        response = client.head("/api/v1/assets/a.bin")
+        assert response.status_code == 200
+        assert response.headers["content-length"] == "10"
+        assert response.content == b""
+
+    def test_presigned_download(self, local_storage):
+        """测试 presign 地址校验签名，篡改返回 403"""
+        local_storage.put("a.txt", b"x")
+        assert client.get(local_storage.presign("a.txt")).status_code == 200
+        assert client.get("/api/v1/assets/a.txt?expires=9999999999&signature=bad").status_code == 403
+
+    def test_missing_asset(self, local_storage):
+        """测试不存在或越界的键返回 404"""
+        assert client.get("/api/v1/assets/missing.png").status_code == 404
+        assert client.get("/api/v1/assets/..%2F..%2Fetc%2Fpasswd").status_code == 404
+
+    def test_memory_backend_streams_range(self, monkeypatch):
+        """测试 memory 后端分块流式返回，支持 Range"""
+        backend = use_storage(monkeypatch, MemoryStorage())
+        info = backend.put("a.bin", b"abc" * 1000)
+
+        response = client.get("/api/v1/assets/a.bin")
+        assert response.content == b"abc" * 1000
+        assert response.headers["etag"] == f'"{info.etag}"'
+
+        partial = client.get("/api/v1/assets/a.bin", headers={"Range": "bytes=3-5"})
+        assert partial.status_code == 206
+        assert partial.content == b"abc"
+
+    def test_tiered_backend_serves_from_cache(self, tmp_path, monkeypatch):
+        """测试 tiered 后端未命中时回填本地缓存，之后从磁盘发送并支持 Range"""
+        origin = MemoryStorage()
+        origin.put("v.mp4", bytes(range(100)))
+        backend = use_storage(
+            monkeypatch, TieredStorage(origin, str(tmp_path), 1000, public_base_url="http://testserver")
+        )
+
+        assert client.get("/api/v1/assets/v.mp4").content == bytes(range(100))
+        partial = client.get("/api/v1/assets/v.mp4", headers={"Range": "bytes=10-19"})
+        assert partial.status_code == 206
+        assert partial.content == bytes(range(10, 20))
+        assert backend.snapshot()["fills"] == 1
+        assert backend.snapshot()["hits"] == 1
+
+
+class TestAssetFileResponse:
+    """测试磁盘文件的 zero-copy 发送"""
+
+    @pytest.mark.parametrize("extension", ["http.response.zerocopysend", "http.response.pathsend"])
+    def test_uses_server_extension(self, local_storage, extension):
+        """测试服务器声明 zerocopysend / pathsend 扩展时交给服务器发送文件"""
+        import anyio
+
+        from src.backend.api.assets import AssetFileResponse
+
+        local_storage.put("a.bin", b"0123456789")
+        path = local_storage.local_path("a.bin")
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        async def run():
+            scope = {"type": "http", "method": "GET", "extensions": {extension: {}}}
+            await AssetFileResponse(path, 0, 10, 200, {"Content-Length": "10"})(scope, None, send)
+
+        anyio.run(run)
+        assert messages[0]["type"] == "http.response.start"
+        assert messages[1]["type"] == extension
+        if extension == "http.response.zerocopysend":
+            assert (messages[1]["offset"], messages[1]["count"]) == (0, 10)
+        else:
+            assert messages[1]["path"] == path
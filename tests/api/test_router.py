@@ -253,3 +253,705 @@ class TestExposedParams:
         exposed_params = thirtytwo["info"]["exposed_params"]
         # thirtytwo LLM 没有暴露参数
         assert len(exposed_params) == 0
+
+
+class TestRateLimitAPI:
+    """测试限流响应"""
+
+    def test_rate_limited_returns_429_with_retry_after(self, monkeypatch):
+        """测试超出限流时返回 429 与 Retry-After 头"""
+        from src.backend.services.provider_service import LLMService
+
+        def fake_generate(vendor, prompt, queue_timeout=None, **kwargs):
+            return {
+                "success": False,
+                "error": "Rate limit exceeded",
+                "error_type": "rate_limited",
+                "retry_after": 2.3,
+                "vendor": vendor,
+            }
+
+        monkeypatch.setattr(LLMService, "generate", staticmethod(fake_generate))
+
+        response = client.post(
+            "/api/v1/llm/generate",
+            json={"vendor": "zhipu", "prompt": "test", "queue_timeout": 0},
+        )
+        assert response.status_code == 429
+        assert response.headers["Retry-After"] == "3"
+        data = response.json()
+        assert data["error_type"] == "rate_limited"
+        assert data["retry_after"] == 2.3
+
+
+class TestMetricsAPI:
+    """测试指标端点"""
+
+    def test_metrics_include_adaptive_concurrency(self):
+        """测试指标包含自适应并发状态"""
+        from src.backend.services.concurrency import adaptive_limiter_registry
+
+        adaptive_limiter_registry.get("zhipu")
+
+        response = client.get("/api/v1/metrics")
+        assert response.status_code == 200
+        data = response.json()
+        assert "counters" in data
+        assert "summaries" in data
+        zhipu = data["gauges"]["adaptive_concurrency"]["zhipu"]
+        assert "limit" in zhipu
+        assert "inflight" in zhipu
+
+
+class TestAutoVendorAPI:
+    """测试 vendor=auto 自动路由"""
+
+    def test_auto_llm_routes_to_selected_vendor(self, monkeypatch):
+        """测试 auto 请求由选中的厂商处理并返回 requested_vendor"""
+        from src.backend.services.provider_service import LLMService
+        from src.backend.services.routing import AutoRouter
+
+        monkeypatch.setattr(
+            AutoRouter, "resolve", staticmethod(lambda provider_type, vendor, params: ("gemini", params))
+        )
+        monkeypatch.setattr(
+            LLMService,
+            "generate",
+            staticmethod(lambda vendor, prompt, queue_timeout=None, **kwargs: {
+                "success": True, "content": "ok", "vendor": vendor,
+            }),
+        )
+
+        response = client.post("/api/v1/llm/generate", json={"vendor": "auto", "prompt": "test"})
+        assert response.status_code == 200
+        data = response.json()
+        assert data["vendor"] == "gemini"
+        assert data["requested_vendor"] == "auto"
+
+    def test_auto_without_eligible_vendor(self):
+        """测试没有厂商支持请求参数时返回失败"""
+        response = client.post(
+            "/api/v1/video/generate",
+            json={"vendor": "auto", "prompt": "test", "parameters": {"unknown_param": 1}},
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert data["success"] is False
+        assert data["vendor"] == "auto"
+
+
+class TestBatchAPI:
+    """测试批量生成端点"""
+
+    def test_image_batch_streams_ndjson(self, monkeypatch):
+        """测试图片批量以 NDJSON 流式返回，单项参数覆盖共享参数"""
+        import json
+
+        from src.backend.services.routing import ImageRoutingService
+
+        calls = []
+
+        def fake_generate(vendor, prompt, fallback_vendors=None, return_format="base64",
+                          queue_timeout=None, **kwargs):
+            calls.append(kwargs)
+            if prompt == "bad":
+                return {"success": False, "error": "boom", "vendor": vendor}
+            return {"success": True, "content": "aW1n", "vendor": vendor}
+
+        monkeypatch.setattr(ImageRoutingService, "generate", staticmethod(fake_generate))
+
+        response = client.post(
+            "/api/v1/image/generate:batch",
+            json={
+                "vendor": "thirtytwo_seedream",
+                "parameters": {"aspect_ratio": "3:4"},
+                "items": [
+                    {"prompt": "ok", "parameters": {"aspect_ratio": "1:1"}},
+                    {"prompt": "bad"},
+                ],
+            },
+        )
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        by_index = {line["index"]: line for line in lines if "index" in line}
+        assert by_index[0]["success"] is True
+        assert by_index[1]["success"] is False
+        assert lines[-1]["done"] is True
+        assert {"aspect_ratio": "1:1"} in calls
+        assert {"aspect_ratio": "3:4"} in calls
+
+    def test_batch_sse(self, monkeypatch):
+        """测试 Accept: text/event-stream 时返回 SSE"""
+        from src.backend.services.provider_service import LLMService
+
+        monkeypatch.setattr(
+            LLMService,
+            "generate",
+            staticmethod(lambda vendor, prompt, queue_timeout=None, **kwargs: {
+                "success": True, "content": prompt, "vendor": vendor,
+            }),
+        )
+
+        response = client.post(
+            "/api/v1/llm/generate:batch",
+            json={"vendor": "zhipu", "items": [{"prompt": "a"}]},
+            headers={"Accept": "text/event-stream"},
+        )
+        assert response.status_code == 200
+        assert "event: result" in response.text
+        assert "event: done" in response.text
+
+
+class FakeHTTPRequest:
+    """模拟断开的客户端请求"""
+
+    def __init__(self, request_id: str):
+        self.headers = {"x-request-id": request_id}
+
+    async def is_disconnected(self) -> bool:
+        return True
+
+
+class TestCancellationAPI:
+    """测试客户端断开时取消或转为后台任务"""
+
+    @pytest.fixture
+    def slow_service(self, monkeypatch):
+        """执行 0.3 秒的服务函数，返回记录是否被取消的列表"""
+        import time
+
+        from src.backend.config import config
+        from src.backend.providers.context import current_context
+
+        monkeypatch.setattr(config, "DISCONNECT_POLL_INTERVAL", 0.01)
+        observed = []
+
+        def service(vendor, prompt):
+            time.sleep(0.3)
+            observed.append(current_context().cancelled)
+            return {"success": True, "content": "ok", "vendor": vendor}
+
+        return service, observed
+
+    def test_disconnect_cancels_request(self, slow_service):
+        """测试断开时返回 cancelled 并向服务层传播取消"""
+        import asyncio
+        import time
+
+        from src.backend.api.router import _run_cancellable
+
+        service, observed = slow_service
+        result = asyncio.run(
+            _run_cancellable(FakeHTTPRequest("req-1"), "video", service, vendor="thirtytwo_kling", prompt="p")
+        )
+        assert result["error_type"] == "cancelled"
+        time.sleep(0.4)
+        assert observed == [True]
+
+    def test_disconnect_detaches_job(self, slow_service):
+        """测试 detach_on_disconnect 时任务继续运行，结果可通过 /jobs 取回"""
+        import asyncio
+
+        from src.backend.api.router import _run_cancellable
+
+        service, observed = slow_service
+
+        async def run():
+            result = await _run_cancellable(
+                FakeHTTPRequest("req-detached"),
+                "video",
+                service,
+                detach_on_disconnect=True,
+                vendor="thirtytwo_kling",
+                prompt="p",
+            )
+            assert result["error_type"] == "cancelled"
+            assert client.get("/api/v1/jobs/req-detached").json()["status"] == "running"
+            await asyncio.sleep(0.5)
+
+        asyncio.run(run())
+        assert observed == [False]
+        job = client.get("/api/v1/jobs/req-detached").json()
+        assert job["status"] == "done"
+        assert job["result"]["content"] == "ok"
+        assert client.get("/api/v1/jobs/unknown").status_code == 404
+
+    def test_server_cancel_while_draining_uses_shutdown_reason(self, monkeypatch):
+        """测试停机时请求协程被取消，以停机原因取消（不转为后台任务），厂商任务得以保留"""
+        import asyncio
+        import time
+
+        from src.backend.api.router import _run_cancellable
+        from src.backend.providers.context import RequestCancelled, current_context
+        from src.backend.services.drain import drain_controller
+
+        class ConnectedRequest(FakeHTTPRequest):
+            async def is_disconnected(self) -> bool:
+                return False
+
+        observed = []
+
+        def service(vendor, prompt):
+            try:
+                current_context().sleep(2)
+            except RequestCancelled as e:
+                observed.append(e.shutdown)
+                raise
+            return {"success": True, "vendor": vendor}
+
+        async def run():
+            task = asyncio.ensure_future(
+                _run_cancellable(
+                    ConnectedRequest("req-shutdown"),
+                    "video",
+                    service,
+                    detach_on_disconnect=True,
+                    vendor="thirtytwo_kling",
+                    prompt="p",
+                )
+            )
+            await asyncio.sleep(0.05)
+            monkeypatch.setattr(drain_controller, "_draining", True)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(run())
+        for _ in range(100):
+            if observed:
+                break
+            time.sleep(0.01)
+        assert observed == [True]
+
+
+class TestDeadlineAPI:
+    """测试请求时间预算"""
+
+    def test_invalid_timeout_header(self):
+        """测试非法的 X-Request-Timeout 头返回 400"""
+        response = client.post(
+            "/api/v1/llm/generate",
+            json={"vendor": "zhipu", "prompt": "test"},
+            headers={"X-Request-Timeout": "abc"},
+        )
+        assert response.status_code == 400
+
+    def test_deadline_exceeded_returns_504(self, monkeypatch):
+        """测试预算耗尽时返回 504，且预算经上下文传入服务层"""
+        from src.backend.providers.context import DeadlineExceeded, current_context
+        from src.backend.services.hedging import LLMHedgingService
+
+        budgets = []
+
+        def fake_generate(vendor, prompt, **kwargs):
+            budgets.append(current_context().remaining())
+            return {
+                "success": False,
+                "error": str(DeadlineExceeded()),
+                "error_type": DeadlineExceeded.error_type,
+                "vendor": vendor,
+            }
+
+        monkeypatch.setattr(LLMHedgingService, "generate", staticmethod(fake_generate))
+
+        response = client.post(
+            "/api/v1/llm/generate",
+            json={"vendor": "zhipu", "prompt": "test"},
+            headers={"X-Request-Timeout": "30"},
+        )
+        assert response.status_code == 504
+        assert response.json()["error_type"] == "deadline_exceeded"
+        assert 0 < budgets[0] <= 30
+
+
+class TestPriorityAPI:
+    """测试调度优先级与租户"""
+
+    def test_priority_and_tenant_reach_context(self, monkeypatch):
+        """测试请求的 priority 与用户/设计方案头经上下文传入服务层"""
+        from src.backend.providers.context import current_context
+        from src.backend.services.hedging import LLMHedgingService
+
+        contexts = []
+
+        def fake_generate(vendor, prompt, **kwargs):
+            contexts.append(current_context())
+            return {"success": True, "data": "ok", "vendor": vendor}
+
+        monkeypatch.setattr(LLMHedgingService, "generate", staticmethod(fake_generate))
+
+        response = client.post(
+            "/api/v1/llm/generate",
+            json={"vendor": "zhipu", "prompt": "test", "priority": "background"},
+            headers={"X-User-ID": "u1", "X-Design-Scheme-ID": "s1"},
+        )
+        assert response.status_code == 200
+        assert contexts[0].priority == "background"
+        assert contexts[0].tenant == "u1/s1"
+
+    def test_invalid_priority(self):
+        """测试未知的优先级返回 422"""
+        response = client.post(
+            "/api/v1/llm/generate",
+            json={"vendor": "zhipu", "prompt": "test", "priority": "urgent"},
+        )
+        assert response.status_code == 422
+
+
+class TestAdmissionAPI:
+    """测试准入控制"""
+
+    def test_overloaded_returns_503_with_retry_after(self, monkeypatch):
+        """测试被拒绝的请求返回 503 与 Retry-After，且不调用服务层"""
+        from src.backend.services.admission import AdmissionController
+        from src.backend.services.hedging import LLMHedgingService
+
+        calls = []
+        monkeypatch.setattr(LLMHedgingService, "generate", staticmethod(lambda **kwargs: calls.append(kwargs)))
+        monkeypatch.setattr(
+            AdmissionController, "check",
+            classmethod(lambda cls, provider_type, vendor, deadline=None, priority="interactive": {
+                "success": False,
+                "error": "overloaded",
+                "error_type": "overloaded",
+                "retry_after": 12.3,
+                "vendor": vendor,
+            }),
+        )
+
+        response = client.post("/api/v1/llm/generate", json={"vendor": "zhipu", "prompt": "test"})
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "13"
+        assert calls == []
+
+
+class TestDrainAPI:
+    """测试停机排空"""
+
+    def test_draining_rejects_new_work(self, monkeypatch):
+        """测试排空期间生成端点与批量端点返回 503，健康检查返回 503"""
+        from src.backend.services.drain import drain_controller
+
+        monkeypatch.setattr(drain_controller, "_draining", True)
+
+        response = client.post("/api/v1/llm/generate", json={"vendor": "zhipu", "prompt": "test"})
+        assert response.status_code == 503
+        assert response.json()["error_type"] == "shutting_down"
+        assert "Retry-After" in response.headers
+
+        response = client.post(
+            "/api/v1/image/generate:batch",
+            json={"vendor": "thirtytwo_seedream", "items": [{"prompt": "test"}]},
+        )
+        assert response.status_code == 503
+        assert client.get("/health").status_code == 503
+
+
+class TestIdempotencyAPI:
+    """测试幂等键"""
+
+    def test_duplicate_key_runs_once(self, monkeypatch):
+        """测试同一幂等键的重复请求只调用一次服务层并返回相同结果"""
+        from src.backend.services.hedging import LLMHedgingService
+
+        calls = []
+
+        def fake_generate(vendor, prompt, **kwargs):
+            calls.append(prompt)
+            return {"success": True, "data": f"result-{len(calls)}", "vendor": vendor}
+
+        monkeypatch.setattr(LLMHedgingService, "generate", staticmethod(fake_generate))
+
+        headers = {"Idempotency-Key": "test-duplicate-key"}
+        body = {"vendor": "zhipu", "prompt": "test"}
+        first = client.post("/api/v1/llm/generate", json=body, headers=headers)
+        second = client.post("/api/v1/llm/generate", json=body, headers=headers)
+        assert first.status_code == second.status_code == 200
+        assert first.json() == second.json()
+        assert calls == ["test"]
+
+    def test_mismatched_payload_rejected(self, monkeypatch):
+        """测试同一幂等键配不同请求体返回 422"""
+        from src.backend.services.hedging import LLMHedgingService
+
+        monkeypatch.setattr(
+            LLMHedgingService, "generate",
+            staticmethod(lambda vendor, prompt, **kwargs: {"success": True, "data": "ok", "vendor": vendor}),
+        )
+
+        headers = {"Idempotency-Key": "test-mismatch-key"}
+        client.post("/api/v1/llm/generate", json={"vendor": "zhipu", "prompt": "a"}, headers=headers)
+        response = client.post("/api/v1/llm/generate", json={"vendor": "zhipu", "prompt": "b"}, headers=headers)
+        assert response.status_code == 422
+
+    def test_key_scoped_by_tenant(self, monkeypatch):
+        """测试不同用户使用同一幂等键互不影响"""
+        from src.backend.services.hedging import LLMHedgingService
+
+        calls = []
+        monkeypatch.setattr(
+            LLMHedgingService, "generate",
+            staticmethod(
+                lambda vendor, prompt, **kwargs: calls.append(prompt) or {"success": True, "data": "ok", "vendor": vendor}
+            ),
+        )
+
+        for user in ("u1", "u2"):
+            response = client.post(
+                "/api/v1/llm/generate",
+                json={"vendor": "zhipu", "prompt": "test"},
+                headers={"Idempotency-Key": "test-tenant-key", "X-User-ID": user},
+            )
+            assert response.status_code == 200
+        assert len(calls) == 2
+
+    def test_service_error_releases_key(self, monkeypatch):
+        """测试服务层抛出异常时返回 500 且不保存结果，同一键重试时重新执行"""
+        from src.backend.services.hedging import LLMHedgingService
+
+        calls = []
+
+        def flaky_generate(vendor, prompt, **kwargs):
+            calls.append(prompt)
+            if len(calls) == 1:
+                raise RuntimeError("boom")
+            return {"success": True, "data": "ok", "vendor": vendor}
+
+        monkeypatch.setattr(LLMHedgingService, "generate", staticmethod(flaky_generate))
+
+        headers = {"Idempotency-Key": "test-error-key"}
+        body = {"vendor": "zhipu", "prompt": "test"}
+        first = client.post("/api/v1/llm/generate", json=body, headers=headers)
+        assert first.status_code == 500
+        assert first.json()["error_type"] == "internal_error"
+
+        second = client.post("/api/v1/llm/generate", json=body, headers=headers)
+        assert second.status_code == 200
+        assert len(calls) == 2
+
+    def test_duplicate_wait_is_bounded(self, monkeypatch):
+        """测试执行中的重复请求等待超时返回 409"""
+        import threading
+
+        from src.backend.config import config
+        from src.backend.services.hedging import LLMHedgingService
+
+        started, release = threading.Event(), threading.Event()
+
+        def slow_generate(vendor, prompt, **kwargs):
+            started.set()
+            release.wait(2)
+            return {"success": True, "data": "ok", "vendor": vendor}
+
+        monkeypatch.setattr(LLMHedgingService, "generate", staticmethod(slow_generate))
+        monkeypatch.setattr(config, "IDEMPOTENCY_WAIT_TIMEOUT", 0.05)
+
+        headers = {"Idempotency-Key": "test-wait-key"}
+        body = {"vendor": "zhipu", "prompt": "test"}
+        first = threading.Thread(target=lambda: client.post("/api/v1/llm/generate", json=body, headers=headers))
+        first.start()
+        assert started.wait(2)
+
+        response = client.post("/api/v1/llm/generate", json=body, headers=headers)
+        assert response.status_code == 409
+        release.set()
+        first.join()
+
+
+class TestKlingCallbackAPI:
+    """测试 Kling 回调端点"""
+
+    def test_invalid_signature_rejected(self):
+        """测试签名无效返回 401"""
+        response = client.post(
+            "/api/v1/callbacks/kling?token=t&expires=9999999999&signature=bad",
+            json={"task_id": "task-api", "task_status": "succeed"},
+        )
+        assert response.status_code == 401
+
+    def test_duplicate_delivery(self):
+        """测试重复投递返回 duplicate，兼容 data 包装"""
+        from src.backend.providers.callbacks import kling_callbacks
+
+        token, url = kling_callbacks.issue()
+        kling_callbacks.bind(token, "task-api-dup")
+        path = "/api/v1/callbacks/kling?" + url.split("?", 1)[1]
+        body = {"data": {"task_id": "task-api-dup", "task_status": "succeed", "updated_at": 1}}
+
+        assert client.post(path, json=body).json() == {"success": True, "duplicate": False}
+        assert client.post(path, json=body).json() == {"success": True, "duplicate": True}
+        assert client.post(path, json={"task_status": "succeed"}).status_code == 400
+        kling_callbacks.unwatch("task-api-dup")
+
+    def test_other_task_rejected(self):
+        """测试回调地址不能投递其他任务的通知，未绑定任务前同样拒绝"""
+        from src.backend.providers.callbacks import kling_callbacks
+
+        token, url = kling_callbacks.issue()
+        path = "/api/v1/callbacks/kling?" + url.split("?", 1)[1]
+        body = {"task_id": "task-api-bound", "task_status": "succeed", "updated_at": 1}
+        assert client.post(path, json=body).status_code == 403
+
+        kling_callbacks.bind(token, "task-api-bound")
+        assert client.post(path, json=body | {"task_id": "task-api-forged"}).status_code == 403
+        assert client.post(path, json=body).status_code == 200
+        kling_callbacks.unwatch("task-api-bound")
+
+
+class TestJobEventsAPI:
+    """测试任务进度推送（/ws）与异步响应"""
+
+    def test_async_request_pushes_events(self, monkeypatch):
+        """测试 Prefer: respond-async 立即返回 202，/ws 推送 queued 到 done，结果可经 Location 取回"""
+        from src.backend.providers.events import emit
+        from src.backend.services.drain import drain_controller
+        from src.backend.services.hedging import LLMHedgingService
+
+        def fake_generate(vendor, prompt, **kwargs):
+            emit("started", vendor=vendor)
+            return {"success": True, "data": "ok", "vendor": vendor, "content": "https://example.com/a.png"}
+
+        monkeypatch.setattr(LLMHedgingService, "generate", staticmethod(fake_generate))
+        # 后台任务需要常驻的事件循环：以上下文管理器方式使用 TestClient（关闭时会进入排空模式，测试后还原）
+        monkeypatch.setattr(drain_controller, "_draining", False)
+
+        with TestClient(app) as portal_client, portal_client.websocket_connect("/ws") as ws:
+            ws.send_json({"action": "subscribe", "job_ids": ["job-ws-1"]})
+            response = portal_client.post(
+                "/api/v1/llm/generate",
+                json={"vendor": "zhipu", "prompt": "test"},
+                headers={"X-Request-ID": "job-ws-1", "Prefer": "respond-async"},
+            )
+            assert response.status_code == 202
+            assert response.json()["job_id"] == "job-ws-1"
+            assert response.headers["Location"] == "/api/v1/jobs/job-ws-1"
+
+            events = []
+            while not events or events[-1]["event"] != "done":
+                events.append(ws.receive_json())
+            assert portal_client.get("/api/v1/jobs/job-ws-1").json()["status"] == "done"
+
+        assert [e["event"] for e in events] == ["queued", "started", "done"]
+        assert events[-1]["asset_urls"] == ["https://example.com/a.png"]
+        assert events[-1]["result_url"] == "/api/v1/jobs/job-ws-1"
+
+    def test_invalid_message(self):
+        """测试格式错误的消息返回 error 事件，连接保持"""
+        with client.websocket_connect("/ws") as ws:
+            ws.send_json({"action": "watch"})
+            assert ws.receive_json()["event"] == "error"
+
+
+
+class TestOutfitCollageAPI:
+    """测试搭配拼图端点"""
+
+    def test_compose(self):
+        """测试合成拼图并返回可作为参考图的地址"""
+        import base64
+        import io
+
+        pil = pytest.importorskip("PIL.Image")
+        buffer = io.BytesIO()
+        pil.new("RGB", (40, 20), "red").save(buffer, "PNG")
+        url = "data:image/png;base64," + base64.b64encode(buffer.getvalue()).decode()
+
+        response = client.post(
+            "/api/v1/outfit/collage",
+            json={
+                "items": [
+                    {"url": url, "x": 0, "y": 0, "width": 40, "height": 20},
+                    {"url": url, "x": 40, "y": 20, "width": 40, "height": 20, "rotation": 15},
+                ],
+                "size": 160,
+                "format": "png",
+            },
+        )
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["success"] is True
+        assert data["width"] == 160
+        assert "/api/v1/assets/tmp/collages/" in data["url"]
+        assert data["reference_url"]
+
+    def test_invalid_request(self):
+        """测试单品数量超限返回 400，缺少尺寸返回 422"""
+        item = {"url": "https://example.com/a.png", "x": 0, "y": 0, "width": 10, "height": 10}
+        response = client.post("/api/v1/outfit/collage", json={"items": [item] * 7})
+        assert response.status_code == 400
+        assert "items" in response.json()["detail"]
+
+        response = client.post("/api/v1/outfit/collage", json={"items": [{"url": "a", "x": 0, "y": 0}]})
+        assert response.status_code == 422
+
+
+class TestCanvasAPI:
+    """测试画布渲染端点"""
+
+    ITEMS = [
+        {"type": "image", "url": "", "x": 0, "y": 0, "width": 40, "height": 20, "rotation": 10},
+        {"type": "text", "id": "t1", "content": "hello", "x": 60, "y": 0, "width": 80, "height": 20,
+         "rotation": 0, "fontSize": 14, "color": "#000000", "fontFamily": "Inter", "minWidth": 80, "minHeight": 20},
+    ]
+
+    @pytest.fixture
+    def items(self):
+        import base64
+        import io
+
+        pil = pytest.importorskip("PIL.Image")
+        buffer = io.BytesIO()
+        pil.new("RGB", (40, 20), "red").save(buffer, "PNG")
+        url = "data:image/png;base64," + base64.b64encode(buffer.getvalue()).decode()
+        return [dict(self.ITEMS[0], url=url), self.ITEMS[1]]
+
+    def test_render_view(self, items):
+        """测试渲染视口，分块位置相对视口左上角，再次渲染复用分块"""
+        body = {"items": items, "viewport": {"x": -10, "y": -10, "zoom": 2}, "width": 300, "height": 100}
+
+        data = client.post("/api/v1/canvas/render", json=body).json()
+
+        assert data["success"] is True
+        assert data["scale"] == 2
+        assert data["tiles"][0]["x"] == 10 - data["tile_size"]
+        assert all("/api/v1/assets/tmp/canvas/" in tile["url"] for tile in data["tiles"])
+        again = client.post("/api/v1/canvas/render", json=body).json()
+        assert all(tile["cached"] for tile in again["tiles"])
+
+    def test_export_image(self, items):
+        """测试导出整张图片"""
+        import io
+
+        from PIL import Image
+
+        response = client.post("/api/v1/canvas/export", json={"items": items, "format": "webp", "padding": 5})
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "image/webp"
+        assert "attachment" in response.headers["content-disposition"]
+        # 旋转 10 度的图片外接矩形从 x=-1.43 开始，文字到 x=140，两侧各留白 5
+        assert Image.open(io.BytesIO(response.content)).width == 152
+
+    def test_export_tiles(self, items):
+        """测试以 NDJSON 流式导出分块，最后一行为汇总"""
+        import json
+
+        response = client.post("/api/v1/canvas/export", json={"items": items, "mode": "tiles", "scale": 4})
+
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        assert lines[-1]["done"] is True
+        assert lines[-1]["total"] == len(lines) - 1
+        assert lines[-1]["width"] > 512
+        assert "error" not in lines[-1]
+
+    def test_invalid_request(self):
+        """测试缩放倍数超限返回 400，未知元素类型返回 422"""
+        item = {"type": "image", "url": "a", "x": 0, "y": 0, "width": 10, "height": 10}
+        response = client.post("/api/v1/canvas/export", json={"items": [item], "scale": 100})
+        assert response.status_code == 400
+
+        response = client.post("/api/v1/canvas/export", json={"items": [dict(item, type="video")]})
+        assert response.status_code == 422
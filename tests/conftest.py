@@ -53,3 +53,24 @@ def ensure_output_dir():
     for dir_path in output_dirs:
         os.makedirs(dir_path, exist_ok=True)
     yield
+
+
+@pytest.fixture(autouse=True)
+def isolate_pending_tasks(tmp_path, monkeypatch):
+    """厂商任务持久化写入临时目录，避免测试污染工作区"""
+    from src.backend.providers.tasks import pending_tasks
+
+    monkeypatch.setattr(pending_tasks, "path", str(tmp_path / "pending_tasks.json"))
+    yield
+
+
+@pytest.fixture(autouse=True)
+def isolate_storage(tmp_path, monkeypatch):
+    """对象存储写入临时目录，媒体后处理在测试线程内执行（不启动进程池）"""
+    from src.backend.services.media import media_processor
+    from src.backend.storage import storage
+
+    if hasattr(storage, "root"):
+        monkeypatch.setattr(storage, "root", str(tmp_path / "storage"))
+    monkeypatch.setattr(media_processor, "workers", 0)
+    yield
@@ -0,0 +1,144 @@
+"""画布元素合成测试
+
+合成测试需要 Pillow，未安装时跳过；未安装 Pillow 的降级路径始终测试。
+"""
+
+import importlib
+import io
+
+import pytest
+
+from src.backend.media.compose import (
+    ComposeError,
+    Placement,
+    TextBlock,
+    Tile,
+    compose,
+    render_tile,
+    rotated_bounds,
+    stitch,
+)
+
+# media 包导出的 compose 函数遮蔽了同名子模块
+compose_module = importlib.import_module("src.backend.media.compose")
+
+RED = (255, 0, 0, 255)
+
+
+def solid_tile(width, height, color=RED):
+    return Tile(width=width, height=height, data=bytes(color) * (width * height))
+
+
+class TestWithoutPillow:
+    """测试未安装 Pillow 时的降级"""
+
+    def test_render_tile_returns_none(self, monkeypatch):
+        """测试无法解码时返回 None"""
+        monkeypatch.setattr(compose_module, "Image", None)
+        assert render_tile(b"\x89PNG...", 10, 10) is None
+
+    def test_compose_raises(self, monkeypatch):
+        """测试无法合成时抛出 ComposeError"""
+        monkeypatch.setattr(compose_module, "Image", None)
+        with pytest.raises(ComposeError):
+            compose(10, 10, [])
+        with pytest.raises(ComposeError):
+            stitch(10, 10, [])
+
+
+class TestRotatedBounds:
+    """测试旋转后的外接矩形"""
+
+    def test_bounds(self):
+        """测试不旋转时为原矩形，旋转 90 度时宽高互换"""
+        assert rotated_bounds(10, 20, 100, 40) == (10, 20, 110, 60)
+        assert [round(v) for v in rotated_bounds(0, 0, 100, 40, 90)] == [30, -30, 70, 70]
+
+
+class TestCompose:
+    """测试合成"""
+
+    @pytest.fixture(autouse=True)
+    def pil(self):
+        return pytest.importorskip("PIL.Image")
+
+    def decode(self, pil, data):
+        return pil.open(io.BytesIO(data)).convert("RGBA")
+
+    def test_render_tile(self, pil):
+        """测试解码并缩放为 RGBA 像素"""
+        buffer = io.BytesIO()
+        pil.new("RGB", (400, 200), (0, 0, 255)).save(buffer, "JPEG")
+
+        tile = render_tile(buffer.getvalue(), 40, 20)
+
+        assert (tile.width, tile.height) == (40, 20)
+        assert tile.nbytes == 40 * 20 * 4
+        assert render_tile(b"not an image", 40, 20) is None
+
+    def test_placement(self, pil):
+        """测试按位置绘制，Tile 拉伸到位置宽高，后绘制的在上"""
+        layers = [
+            (solid_tile(2, 2), Placement(x=10, y=10, width=20, height=10)),
+            (solid_tile(1, 1, (0, 0, 255, 255)), Placement(x=25, y=15, width=10, height=10)),
+        ]
+        image = self.decode(pil, compose(40, 40, layers, fmt="png"))
+
+        assert image.getpixel((5, 5)) == (255, 255, 255, 255)
+        assert image.getpixel((12, 12)) == RED
+        assert image.getpixel((28, 18)) == (0, 0, 255, 255)
+
+    def test_rotation(self, pil):
+        """测试绕中心顺时针旋转"""
+        layers = [(solid_tile(20, 4), Placement(x=0, y=8, width=20, height=4, rotation=90))]
+        image = self.decode(pil, compose(20, 20, layers, fmt="png"))
+
+        assert image.getpixel((10, 2)) == RED
+        assert image.getpixel((2, 10)) == (255, 255, 255, 255)
+
+    def test_clipping(self, pil):
+        """测试超出画布的部分被裁掉"""
+        layers = [(solid_tile(10, 10), Placement(x=-5, y=15, width=10, height=10))]
+        image = self.decode(pil, compose(20, 20, layers, fmt="png"))
+
+        assert image.getpixel((2, 18)) == RED
+        assert image.getpixel((8, 18)) == (255, 255, 255, 255)
+
+    def test_transparent_background(self, pil):
+        """测试透明背景：png 保留透明，jpg 铺白"""
+        layers = [(solid_tile(4, 4), Placement(x=0, y=0, width=4, height=4))]
+
+        png = self.decode(pil, compose(10, 10, layers, background=None, fmt="png"))
+        assert png.getpixel((8, 8))[3] == 0
+
+        jpg = pil.open(io.BytesIO(compose(10, 10, layers, background=None, fmt="jpg")))
+        assert jpg.format == "JPEG"
+        assert all(channel > 240 for channel in jpg.getpixel((8, 8)))
+
+    def test_invalid_arguments(self):
+        """测试无效的背景色与格式"""
+        with pytest.raises(ComposeError):
+            compose(10, 10, [], background="not-a-colour")
+        with pytest.raises(ComposeError):
+            compose(10, 10, [], fmt="gif")
+
+    def test_text(self, pil):
+        """测试文字按宽度逐字换行并绘制在位置内"""
+        layers = [(TextBlock("ab" * 20, font_size=12, color="#000000"), Placement(x=10, y=10, width=40, height=60))]
+        image = self.decode(pil, compose(100, 100, layers, background=None, fmt="png"))
+
+        rows = [y for y in range(100) if any(image.getpixel((x, y))[3] > 0 for x in range(100))]
+        columns = [x for x in range(100) if any(image.getpixel((x, y))[3] > 0 for y in range(100))]
+        assert min(rows) >= 10 and max(rows) < 70
+        assert min(columns) >= 10 and max(columns) < 50
+        assert max(rows) - min(rows) > 24
+
+    def test_stitch(self, pil):
+        """测试按位置拼接分块，超出范围的部分裁掉"""
+        red = compose(10, 10, [], background="#ff0000", fmt="png")
+        blue = compose(10, 10, [], background="#0000ff", fmt="png")
+        image = self.decode(pil, stitch(15, 10, [(red, -5, 0), (blue, 5, 0)], fmt="png"))
+
+        assert image.size == (15, 10)
+        assert image.getpixel((2, 5)) == RED
+        assert image.getpixel((12, 5)) == (0, 0, 255, 255)
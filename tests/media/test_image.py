@@ -0,0 +1,68 @@
+"""图片派生版本编码测试
+
+编码测试需要 Pillow，未安装时跳过；未安装 Pillow 的降级路径始终测试。
+"""
+
+import io
+
+import pytest
+
+from src.backend.media import image
+from src.backend.media.image import encode_renditions, supported_formats
+
+
+class TestWithoutPillow:
+    """测试未安装 Pillow 时的降级"""
+
+    def test_returns_none(self, monkeypatch):
+        """测试没有可用格式时不编码"""
+        monkeypatch.setattr(image, "Image", None)
+        assert supported_formats(["avif", "webp"]) == []
+        assert encode_renditions(b"\x89PNG...") is None
+
+    def test_unknown_format_ignored(self):
+        """测试未知格式被过滤"""
+        assert "gif" not in supported_formats(["gif"])
+
+
+class TestEncodeRenditions:
+    """测试派生版本编码"""
+
+    @pytest.fixture(autouse=True)
+    def pil(self):
+        return pytest.importorskip("PIL.Image")
+
+    def png(self, pil, size, mode="RGB"):
+        buffer = io.BytesIO()
+        pil.new(mode, size, (200, 100, 50, 128) if mode == "RGBA" else (200, 100, 50)).save(buffer, "PNG")
+        return buffer.getvalue()
+
+    def test_three_tiers(self, pil):
+        """测试按长边生成 thumb / preview / full 并保持宽高比"""
+        if not supported_formats(["webp"]):
+            pytest.skip("Pillow built without WebP")
+        result = encode_renditions(self.png(pil, (3024, 1296)), ["webp"])
+
+        assert (result.width, result.height) == (3024, 1296)
+        sizes = {name: (r.width, r.height) for name, r in result.renditions.items()}
+        assert sizes == {"thumb": (256, 110), "preview": (1024, 439), "full": (3024, 1296)}
+        with pil.open(io.BytesIO(result.renditions["thumb"].files["webp"])) as thumb:
+            assert thumb.format == "WEBP"
+            assert thumb.size == (256, 110)
+
+    def test_small_source_shares_rendition(self, pil):
+        """测试原图小于档位上限时不放大，相同尺寸的档位复用同一份内容"""
+        if not supported_formats(["webp"]):
+            pytest.skip("Pillow built without WebP")
+        result = encode_renditions(self.png(pil, (600, 400), "RGBA"), ["webp"])
+
+        assert result.renditions["preview"] is result.renditions["full"]
+        assert (result.renditions["thumb"].width, result.renditions["thumb"].height) == (256, 171)
+        with pil.open(io.BytesIO(result.renditions["full"].files["webp"])) as full:
+            assert full.mode == "RGBA"
+
+    def test_undecodable_source(self):
+        """测试无法解码的内容返回 None"""
+        if not supported_formats(["webp"]):
+            pytest.skip("Pillow built without WebP")
+        assert encode_renditions(b"not an image", ["webp"]) is None
@@ -0,0 +1,141 @@
+"""MP4 faststart 与封面截取测试
+
+以手工构造的最小 MP4（ftyp + mdat + moov）验证 moov 重排与分块偏移修正。
+"""
+
+import struct
+import subprocess
+
+import pytest
+
+from src.backend.media import mp4
+from src.backend.media.mp4 import MP4Error, faststart, is_faststart, iter_boxes, postprocess_video
+
+
+def box(box_type: bytes, payload: bytes) -> bytes:
+    return struct.pack(">I4s", 8 + len(payload), box_type) + payload
+
+
+def chunk_table(box_type: bytes, offsets: list[int]) -> bytes:
+    fmt = ">I" if box_type == b"stco" else ">Q"
+    return box(box_type, b"\0\0\0\0" + struct.pack(">I", len(offsets)) + b"".join(struct.pack(fmt, o) for o in offsets))
+
+
+def moov_with(table: bytes, tracks: int = 1) -> bytes:
+    trak = box(b"trak", box(b"tkhd", b"\0" * 12) + box(b"mdia", box(b"minf", box(b"stbl", table))))
+    return box(b"moov", box(b"mvhd", b"\0" * 20) + trak * tracks)
+
+
+def make_mp4(table_type: bytes = b"stco", moov_last: bool = True) -> tuple[bytes, list[bytes]]:
+    """构造 moov 在末尾的 MP4，返回 (文件内容, 各分块内容)"""
+    ftyp = box(b"ftyp", b"isom\0\0\0\0isomavc1")
+    chunks = [b"chunk-one", b"chunk-two", b"chunk-three"]
+    mdat_payload = b"".join(chunks)
+    mdat_start = len(ftyp)
+    offsets, position = [], mdat_start + 8
+    for chunk in chunks:
+        offsets.append(position)
+        position += len(chunk)
+    mdat = box(b"mdat", mdat_payload)
+    moov = moov_with(chunk_table(table_type, offsets))
+    if moov_last:
+        return ftyp + mdat + moov, chunks
+    # moov 在前时偏移需要加上 moov 长度
+    moov = moov_with(chunk_table(table_type, [o + len(moov) for o in offsets]))
+    return ftyp + moov + mdat, chunks
+
+
+def read_chunks(data: bytes) -> list[bytes]:
+    """按 moov 中的分块偏移读取各分块（长度取测试数据的固定长度）"""
+    sizes = [len(b"chunk-one"), len(b"chunk-two"), len(b"chunk-three")]
+    moov = next(b for b in iter_boxes(data) if b.type == b"moov")
+    raw = data[moov.start:moov.end]
+    for table_type, fmt, width in ((b"stco", ">I", 4), (b"co64", ">Q", 8)):
+        pos = raw.find(table_type)
+        if pos >= 0:
+            (count,) = struct.unpack_from(">I", raw, pos + 8)
+            offsets = [struct.unpack_from(fmt, raw, pos + 12 + i * width)[0] for i in range(count)]
+            return [data[o:o + size] for o, size in zip(offsets, sizes)]
+    raise AssertionError("no chunk table")
+
+
+class TestFaststart:
+    """测试 moov 重排"""
+
+    @pytest.mark.parametrize("table_type", [b"stco", b"co64"])
+    def test_moves_moov_and_patches_offsets(self, table_type):
+        """测试 moov 移到 mdat 之前，分块偏移仍指向原内容"""
+        data, chunks = make_mp4(table_type)
+        assert not is_faststart(data)
+        assert read_chunks(data) == chunks
+
+        result = faststart(data)
+        assert len(result) == len(data)
+        assert [b.type for b in iter_boxes(result)] == [b"ftyp", b"moov", b"mdat"]
+        assert is_faststart(result)
+        assert read_chunks(result) == chunks
+
+    def test_already_faststart_unchanged(self):
+        """测试已是 faststart 的文件原样返回"""
+        data, chunks = make_mp4(moov_last=False)
+        assert read_chunks(data) == chunks
+        assert faststart(data) is data
+
+    def test_largesize_mdat(self):
+        """测试 64 位长度的 mdat 盒子"""
+        data, chunks = make_mp4()
+        ftyp_end = iter_boxes(data)[0].end
+        mdat = iter_boxes(data)[1]
+        payload = data[mdat.start + 8:mdat.end]
+        large = struct.pack(">I4sQ", 1, b"mdat", 16 + len(payload)) + payload
+        moov = moov_with(chunk_table(b"stco", [ftyp_end + 16, ftyp_end + 25, ftyp_end + 34]))
+        data = data[:ftyp_end] + large + moov
+
+        result = faststart(data)
+        assert read_chunks(result) == chunks
+
+    def test_rejects_unsupported(self):
+        """测试缺少 mdat、分片 MP4 与截断的文件"""
+        data, _ = make_mp4()
+        with pytest.raises(MP4Error):
+            faststart(box(b"ftyp", b"isom") + box(b"moov", b""))
+        with pytest.raises(MP4Error):
+            faststart(data + box(b"moof", b""))
+        with pytest.raises(MP4Error):
+            faststart(data[:-3])
+
+
+class TestPoster:
+    """测试封面截取"""
+
+    def test_without_ffmpeg(self, monkeypatch):
+        """测试未安装 ffmpeg 时跳过封面"""
+        monkeypatch.setattr(mp4.shutil, "which", lambda name: None)
+        data, _ = make_mp4()
+        video, poster = postprocess_video(data)
+        assert is_faststart(video)
+        assert poster is None
+
+    def test_with_ffmpeg(self, monkeypatch):
+        """测试调用 ffmpeg 截取首帧，失败时返回 None"""
+        calls = []
+
+        def fake_run(args, capture_output, timeout):
+            calls.append(args)
+            return subprocess.CompletedProcess(args, 0, stdout=b"\xff\xd8jpeg", stderr=b"")
+
+        monkeypatch.setattr(mp4.shutil, "which", lambda name: "/usr/bin/ffmpeg")
+        monkeypatch.setattr(mp4.subprocess, "run", fake_run)
+        assert mp4.extract_poster(b"video") == b"\xff\xd8jpeg"
+        assert calls[0][0] == "/usr/bin/ffmpeg"
+        assert "-frames:v" in calls[0]
+
+        monkeypatch.setattr(
+            mp4.subprocess, "run", lambda args, **kwargs: subprocess.CompletedProcess(args, 1, b"", b"bad input")
+        )
+        assert mp4.extract_poster(b"video") is None
+
+    def test_unsupported_video_kept(self, monkeypatch):
+        """测试无法重排的视频原样保留"""
+        monkeypatch.setattr(mp4.shutil, "which", lambda name: None)
+        assert postprocess_video(b"not an mp4") == (b"not an mp4", None)
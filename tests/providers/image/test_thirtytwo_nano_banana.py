@@ -92,3 +92,67 @@ class TestThirtyTwoNanoBananaGenerate:
         assert image_data
         assert isinstance(image_data, bytes)
         assert len(image_data) > 1000
+
+
+class FakeResponse:
+    """模拟 requests 响应"""
+
+    def __init__(self, json_data=None, content=b""):
+        self._json = json_data
+        self.content = content
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._json
+
+
+class TestThirtyTwoNanoBananaMultiOutput:
+    """测试 num_images 多张生成（模拟 HTTP）"""
+
+    def test_generate_images_issues_parallel_requests(self, monkeypatch):
+        """测试多张时并行请求并返回全部图片"""
+        import itertools
+        import requests
+
+        provider = ThirtyTwoNanoBananaProvider()
+        provider.client = True
+        provider.api_key = "test"
+        counter = itertools.count()
+
+        def fake_post(url, headers=None, json=None, timeout=None):
+            return FakeResponse({"code": 200, "data": {"outputs": [f"https://example.com/{next(counter)}.png"]}})
+
+        monkeypatch.setattr(requests, "post", fake_post)
+        monkeypatch.setattr(requests, "get", lambda url, timeout=None: FakeResponse(content=url.encode()))
+
+        images = provider.generate_images("test", num_images=4)
+        assert len(images) == 4
+        assert len(set(images)) == 4
+
+    def test_cost_scales_with_images_and_resolution(self):
+        """测试价格按张数与分辨率计算"""
+        assert ThirtyTwoNanoBananaProvider.estimate_cost(resolution="4k", num_images=2) == pytest.approx(0.32)
+
+    def test_inline_base64_output_is_decoded(self, monkeypatch):
+        """测试 2k 图片启用 base64 内联输出并直接解码 data URI"""
+        import base64
+        import requests
+
+        provider = ThirtyTwoNanoBananaProvider()
+        provider.client = True
+        provider.api_key = "test"
+        payloads = []
+
+        def fake_post(url, headers=None, json=None, timeout=None):
+            payloads.append(json)
+            output = "data:image/png;base64," + base64.b64encode(b"inline").decode()
+            return FakeResponse({"code": 200, "data": {"outputs": [output]}})
+
+        monkeypatch.setattr(requests, "post", fake_post)
+
+        assert provider.generate("test", resolution="2k") == b"inline"
+        assert payloads[0]["enable_base64_output"] is True
+        provider.generate("test", resolution="4k")
+        assert payloads[1]["enable_base64_output"] is False
@@ -95,3 +95,119 @@ class TestThirtyTwoSeedreamGenerate:
         assert image_data
         assert isinstance(image_data, bytes)
         assert len(image_data) > 1000
+
+
+class FakeResponse:
+    """模拟 requests 响应"""
+
+    def __init__(self, json_data=None, content=b""):
+        self._json = json_data
+        self.content = content
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._json
+
+
+class TestThirtyTwoSeedreamMultiOutput:
+    """测试组图（num_images）返回全部输出（模拟 HTTP）"""
+
+    def test_generate_images_returns_all_outputs(self, monkeypatch):
+        """测试组图参数写入请求体，且全部图片均被下载"""
+        import requests
+
+        provider = ThirtyTwoSeedreamProvider()
+        provider.client = True
+        provider.api_key = "test"
+        payloads = []
+
+        def fake_post(url, headers=None, json=None, timeout=None):
+            payloads.append(json)
+            urls = [f"https://example.com/{i}.png" for i in range(3)]
+            return FakeResponse({"data": [{"url": u} for u in urls]})
+
+        monkeypatch.setattr(requests, "post", fake_post)
+        monkeypatch.setattr(requests, "get", lambda url, timeout=None: FakeResponse(content=url.encode()))
+
+        images = provider.generate_images("test", num_images=3)
+        assert images == [f"https://example.com/{i}.png".encode() for i in range(3)]
+        assert payloads[0]["sequential_image_generation"] == "auto"
+        assert payloads[0]["sequential_image_generation_options"] == {"max_images": 3}
+
+        # 单张生成不启用组图，只返回第一张
+        assert provider.generate("test") == b"https://example.com/0.png"
+        assert "sequential_image_generation" not in payloads[1]
+
+
+class TestThirtyTwoSeedreamTransferMode:
+    """测试按输出大小选择内联 base64 或 URL 下载（模拟 HTTP）"""
+
+    @pytest.fixture
+    def provider(self, monkeypatch):
+        """返回请求体记录列表与 provider，响应同时包含 b64_json 与 url"""
+        import base64
+        import requests
+
+        provider = ThirtyTwoSeedreamProvider()
+        provider.client = True
+        provider.api_key = "test"
+        payloads = []
+
+        def fake_post(url, headers=None, json=None, timeout=None):
+            payloads.append(json)
+            item = {"url": "https://example.com/0.png"}
+            if json["response_format"] == "b64_json":
+                item["b64_json"] = base64.b64encode(b"inline").decode()
+            return FakeResponse({"data": [item]})
+
+        monkeypatch.setattr(requests, "post", fake_post)
+        monkeypatch.setattr(requests, "get", lambda url, timeout=None: FakeResponse(content=b"downloaded"))
+        return provider, payloads
+
+    def test_small_output_is_inlined(self, provider):
+        """测试小图使用 b64_json 且不再下载"""
+        provider, payloads = provider
+        assert provider.generate("test", aspect_ratio="16:9") == b"inline"
+        assert payloads[0]["response_format"] == "b64_json"
+
+    def test_large_output_uses_url(self, provider, monkeypatch):
+        """测试超过阈值时回退为 URL 下载"""
+        from src.backend.config import config
+
+        monkeypatch.setattr(config, "INLINE_TRANSFER_MAX_BYTES", 1024)
+        provider, payloads = provider
+        assert provider.generate("test", size="4K") == b"downloaded"
+        assert payloads[0]["response_format"] == "url"
+
+
+class TestThirtyTwoSeedreamDeadline:
+    """测试重试遵守请求时间预算（模拟 HTTP）"""
+
+    def test_retry_fails_fast_when_budget_is_short(self, monkeypatch):
+        """测试剩余预算不足以等待重试间隔时立即失败"""
+        import time
+
+        import requests
+
+        from src.backend.providers.context import DeadlineExceeded, RequestContext, use_context
+
+        provider = ThirtyTwoSeedreamProvider()
+        provider.client = True
+        provider.api_key = "test"
+        timeouts = []
+
+        def fake_post(url, headers=None, json=None, timeout=None):
+            timeouts.append(timeout)
+            raise requests.ConnectionError("connection reset")
+
+        monkeypatch.setattr(requests, "post", fake_post)
+
+        start = time.monotonic()
+        with use_context(RequestContext(deadline=time.monotonic() + 1)), pytest.raises(DeadlineExceeded):
+            provider.generate("test")
+
+        assert time.monotonic() - start < 0.5
+        assert len(timeouts) == 1
+        assert timeouts[0] <= 1
@@ -0,0 +1,80 @@
+"""厂商任务回调测试
+
+测试回调地址签名与任务绑定、重复通知去重、先到达的通知暂存与等待者唤醒。
+"""
+
+import time
+from urllib.parse import parse_qs, urlparse
+
+from src.backend.providers.callbacks import TaskCallbackHub
+
+
+def make_hub(secret: str = "secret") -> TaskCallbackHub:
+    return TaskCallbackHub(base_url="https://muse.example.com/", path="/api/v1/callbacks/kling", secret=secret)
+
+
+class TestTaskCallbackHub:
+    """测试回调中心"""
+
+    def test_signed_url_verifies(self):
+        """测试签发的地址可通过校验，篡改、换密钥或过期后失败"""
+        hub = make_hub()
+        token, callback_url = hub.issue()
+        url = urlparse(callback_url)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        assert f"{url.scheme}://{url.netloc}{url.path}" == "https://muse.example.com/api/v1/callbacks/kling"
+        assert query["token"] == token
+        expires = int(query["expires"])
+
+        assert hub.verify(token, expires, query["signature"])
+        assert not hub.verify(token + "x", expires, query["signature"])
+        assert not hub.verify(token, expires + 3600, query["signature"])
+        assert not hub.verify(token, expires, None)
+        assert not make_hub("other").verify(token, expires, query["signature"])
+
+        expired = TaskCallbackHub(base_url="https://muse.example.com", path="/cb", secret="secret", ttl=-1)
+        token, callback_url = expired.issue()
+        query = {k: v[0] for k, v in parse_qs(urlparse(callback_url).query).items()}
+        assert int(query["expires"]) < time.time()
+        assert not expired.verify(token, int(query["expires"]), query["signature"])
+
+    def test_token_bound_to_task(self):
+        """测试 token 只接受所绑定任务的通知，未绑定或非本进程签发的 token 被拒绝"""
+        hub = make_hub()
+        token, _ = hub.issue()
+        assert not hub.owns(token, "t1")
+
+        hub.bind(token, "t1")
+        assert hub.owns(token, "t1")
+        assert not hub.owns(token, "t2")
+
+        hub.bind("unknown", "t2")
+        assert not hub.owns("unknown", "t2")
+
+    def test_disabled_without_base_url(self):
+        """测试未配置外部地址时不启用"""
+        assert not TaskCallbackHub(base_url="", path="/cb").enabled
+
+    def test_duplicate_ignored(self):
+        """测试同一任务、状态与 updated_at 的重复通知被忽略"""
+        hub = make_hub()
+        payload = {"task_id": "t1", "task_status": "succeed", "updated_at": 1}
+        assert hub.deliver("t1", payload) is True
+        assert hub.deliver("t1", dict(payload)) is False
+        assert hub.deliver("t1", payload | {"task_status": "failed"}) is True
+
+    def test_early_delivery_wakes_watcher(self):
+        """测试等待前到达的通知在开始等待时立即可取，取出后复位事件"""
+        hub = make_hub()
+        hub.deliver("t1", {"task_id": "t1", "task_status": "processing"})
+
+        event = hub.watch("t1")
+        assert event.is_set()
+        assert hub.take("t1")["task_status"] == "processing"
+        assert not event.is_set()
+        assert hub.take("t1") is None
+
+        hub.deliver("t1", {"task_id": "t1", "task_status": "succeed"})
+        assert event.is_set()
+        hub.unwatch("t1")
+        assert hub.snapshot() == {"enabled": True, "watching": 0, "pending": 0}
@@ -0,0 +1,144 @@
+"""请求上下文与取消传播测试
+
+测试取消唤醒等待、放弃等待中的调用、跨线程传递上下文与截止时间预算。
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.backend.providers.context import (
+    CANCEL_SHUTDOWN,
+    DeadlineExceeded,
+    RequestCancelled,
+    RequestContext,
+    bind,
+    check_cancelled,
+    current_context,
+    sleep,
+    use_context,
+    wait_event,
+)
+
+
+class TestRequestContext:
+    """测试取消信号"""
+
+    def test_cancel_interrupts_sleep(self):
+        """测试取消立即打断 sleep"""
+        ctx = RequestContext()
+        threading.Timer(0.05, ctx.cancel).start()
+        start = time.monotonic()
+        with use_context(ctx), pytest.raises(RequestCancelled):
+            sleep(5)
+        assert time.monotonic() - start < 1
+
+    def test_wait_event_wakes_early_or_on_cancel(self):
+        """测试事件置位时提前返回，取消时抛出 RequestCancelled"""
+        ctx = RequestContext()
+        event = threading.Event()
+        threading.Timer(0.05, event.set).start()
+        start = time.monotonic()
+        with use_context(ctx):
+            assert wait_event(event, 5) is True
+            assert wait_event(threading.Event(), 0.01) is False
+        assert time.monotonic() - start < 1
+
+        threading.Timer(0.05, ctx.cancel).start()
+        with use_context(ctx), pytest.raises(RequestCancelled):
+            wait_event(threading.Event(), 5)
+
+    def test_wait_for_abandons_running_call(self):
+        """测试取消时放弃等待仍在运行的调用"""
+        ctx = RequestContext()
+        release = threading.Event()
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(release.wait, 5)
+            threading.Timer(0.05, ctx.cancel).start()
+            with pytest.raises(RequestCancelled):
+                ctx.wait_for(future)
+            assert not future.done()
+            release.set()
+
+    def test_wait_for_returns_result(self):
+        """测试未取消时返回调用结果"""
+        ctx = RequestContext()
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            assert ctx.wait_for(executor.submit(lambda: 42)) == 42
+
+    def test_detached_context_ignores_cancel(self):
+        """测试转为后台任务后不再响应取消"""
+        ctx = RequestContext()
+        ctx.detach()
+        assert ctx.cancel() is False
+        with use_context(ctx):
+            check_cancelled()
+
+    def test_shutdown_cancels_detached_context(self):
+        """测试停机取消对后台任务同样生效，且异常带有停机原因"""
+        ctx = RequestContext()
+        ctx.detach()
+        assert ctx.cancel(CANCEL_SHUTDOWN) is True
+        with use_context(ctx), pytest.raises(RequestCancelled) as exc_info:
+            check_cancelled()
+        assert exc_info.value.shutdown
+
+    def test_bind_propagates_to_thread_pool(self):
+        """测试 bind 将上下文传入自建线程池"""
+        ctx = RequestContext()
+        with use_context(ctx), ThreadPoolExecutor(max_workers=2) as executor:
+            assert executor.submit(current_context).result() is None
+            assert list(executor.map(bind(lambda _: current_context()), range(3))) == [ctx] * 3
+
+    def test_child_context_is_cancelled_with_parent(self):
+        """测试子上下文随父上下文取消，单独取消子上下文不影响父上下文"""
+        parent = RequestContext(deadline=time.monotonic() + 5, priority="batch")
+        first, second = parent.child(), parent.child()
+        assert first.request_id == parent.request_id
+        assert first.priority == "batch" and first.deadline == parent.deadline
+
+        first.cancel()
+        assert first.cancelled and not parent.cancelled and not second.cancelled
+
+        parent.cancel(CANCEL_SHUTDOWN)
+        with use_context(second), pytest.raises(RequestCancelled) as exc_info:
+            check_cancelled()
+        assert exc_info.value.shutdown
+        assert parent.child().cancelled
+
+
+class TestDeadlineBudget:
+    """测试截止时间预算"""
+
+    def test_budget_timeout_is_truncated(self):
+        """测试单次操作超时不超过剩余预算"""
+        ctx = RequestContext(deadline=time.monotonic() + 2)
+        assert ctx.budget_timeout(600) <= 2
+        assert RequestContext().budget_timeout(600) == 600
+
+    def test_sleep_beyond_budget_fails_fast(self):
+        """测试预算不足以睡完时立即失败"""
+        ctx = RequestContext(deadline=time.monotonic() + 1)
+        start = time.monotonic()
+        with use_context(ctx), pytest.raises(DeadlineExceeded):
+            sleep(5)
+        assert time.monotonic() - start < 0.5
+
+    def test_wait_for_gives_up_at_deadline(self):
+        """测试等待调用时预算耗尽即放弃"""
+        ctx = RequestContext(deadline=time.monotonic() + 0.05)
+        release = threading.Event()
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(release.wait, 5)
+            with pytest.raises(DeadlineExceeded):
+                ctx.wait_for(future)
+            release.set()
+
+    def test_detach_clears_deadline(self):
+        """测试转为后台任务后不再受预算限制"""
+        ctx = RequestContext(deadline=time.monotonic() - 1)
+        ctx.detach()
+        ctx.check()
+        assert ctx.remaining() is None
@@ -0,0 +1,103 @@
+"""任务进度事件测试
+
+测试事件广播、订阅时回放、取消关注、按请求上下文发布与下载进度上报。
+"""
+
+from src.backend.providers.context import RequestContext, use_context
+from src.backend.providers.events import EVENT_DOWNLOAD, JobEventBus, emit, job_events
+
+
+class TestJobEventBus:
+    """测试事件广播"""
+
+    def test_fan_out_to_followers(self):
+        """测试同一事件投递给所有关注该任务的订阅者，不投递给未关注者"""
+        bus = JobEventBus()
+        a, b, other = [], [], []
+        sub_a = bus.subscribe(a.append)
+        sub_b = bus.subscribe(b.append)
+        sub_other = bus.subscribe(other.append)
+        bus.follow(sub_a, "job-1")
+        bus.follow(sub_b, "job-1")
+        bus.follow(sub_other, "job-2")
+
+        bus.publish("job-1", "started", vendor="v")
+        assert [e["event"] for e in a] == [e["event"] for e in b] == ["started"]
+        assert a[0]["job_id"] == "job-1" and a[0]["vendor"] == "v"
+        assert other == []
+
+    def test_follow_replays_history(self):
+        """测试晚于事件关注的订阅者先收到回放，且回放有上限"""
+        bus = JobEventBus(events_per_job=2)
+        for event in ("queued", "started", "done"):
+            bus.publish("job-1", event)
+
+        received = []
+        bus.follow(bus.subscribe(received.append), "job-1")
+        assert [e["event"] for e in received] == ["started", "done"]
+
+    def test_unsubscribe_stops_delivery(self):
+        """测试注销后不再投递，任务不再被关注"""
+        bus = JobEventBus()
+        received = []
+        subscription = bus.subscribe(received.append)
+        bus.follow(subscription, "job-1")
+        assert bus.watched("job-1")
+
+        bus.unsubscribe(subscription)
+        bus.publish("job-1", "done")
+        assert received == []
+        assert not bus.watched("job-1")
+        assert bus.snapshot()["subscribers"] == 0
+
+
+class TestEmit:
+    """测试 Provider 侧发布"""
+
+    def test_emit_uses_request_id(self):
+        """测试以当前请求 ID 为任务 ID 发布，不在请求中时忽略"""
+        received = []
+        subscription = job_events.subscribe(received.append)
+        job_events.follow(subscription, "req-emit")
+        try:
+            emit("retry", attempt=1)
+            with use_context(RequestContext(request_id="req-emit")):
+                emit("retry", attempt=2)
+        finally:
+            job_events.unsubscribe(subscription)
+        assert [e["attempt"] for e in received] == [2]
+
+    def test_download_reports_progress_when_watched(self, monkeypatch):
+        """测试有订阅者时分块下载并上报进度"""
+        import requests
+
+        from src.backend.providers import http
+
+        class StreamResponse:
+            headers = {"Content-Length": "6"}
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *args):
+                return False
+
+            def raise_for_status(self):
+                pass
+
+            def iter_content(self, chunk_size):
+                yield b"abc"
+                yield b"def"
+
+        monkeypatch.setattr(requests, "get", lambda url, timeout=None, stream=False: StreamResponse())
+        received = []
+        subscription = job_events.subscribe(received.append)
+        job_events.follow(subscription, "req-download")
+        try:
+            with use_context(RequestContext(request_id="req-download")):
+                assert http.download("https://example.com/v.mp4") == b"abcdef"
+        finally:
+            job_events.unsubscribe(subscription)
+
+        progress = [(e["received"], e["total"]) for e in received if e["event"] == EVENT_DOWNLOAD]
+        assert progress == [(0, 6), (3, 6), (6, 6)]
@@ -0,0 +1,152 @@
+"""Provider 熔断与健康评分测试
+
+测试 CircuitBreaker 的状态转换与健康评分。
+"""
+
+import pytest
+
+from src.backend.providers.health import CircuitBreaker
+from src.backend.providers.image.thirtytwo_seedream import ThirtyTwoSeedreamProvider
+
+
+class FakeClock:
+    """可手动推进的时钟"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_breaker(clock: FakeClock, **kwargs) -> CircuitBreaker:
+    """创建使用固定参数的熔断器"""
+    params = {
+        "latency_slo": 10.0,
+        "window_seconds": 60,
+        "min_calls": 4,
+        "failure_rate_threshold": 0.5,
+        "consecutive_failures": 3,
+        "open_seconds": 30,
+        "clock": clock,
+    }
+    params.update(kwargs)
+    return CircuitBreaker(**params)
+
+
+class TestCircuitBreaker:
+    """测试熔断状态转换"""
+
+    def test_opens_on_consecutive_failures(self):
+        """测试连续失败后打开"""
+        clock = FakeClock()
+        breaker = make_breaker(clock)
+        for _ in range(3):
+            breaker.record_failure(1.0)
+        assert breaker.state == CircuitBreaker.OPEN
+        assert not breaker.allow_request()
+        assert breaker.retry_after() == pytest.approx(30.0)
+
+    def test_opens_on_failure_rate(self):
+        """测试失败率超过阈值后打开"""
+        clock = FakeClock()
+        breaker = make_breaker(clock)
+        breaker.record_success(1.0)
+        breaker.record_failure(1.0)
+        breaker.record_success(1.0)
+        assert breaker.state == CircuitBreaker.CLOSED
+        breaker.record_failure(1.0)
+        assert breaker.state == CircuitBreaker.OPEN
+
+    def test_half_open_probe_success_closes(self):
+        """测试冷却后半开探测成功恢复"""
+        clock = FakeClock()
+        breaker = make_breaker(clock)
+        for _ in range(3):
+            breaker.record_failure(1.0)
+
+        clock.now += 30
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert breaker.allow_request()
+        # 探测名额只有一个
+        assert not breaker.allow_request()
+
+        breaker.record_success(1.0)
+        assert breaker.state == CircuitBreaker.CLOSED
+        assert breaker.snapshot()["success_rate"] == 1.0
+
+    def test_half_open_probe_failure_reopens(self):
+        """测试半开探测失败重新打开"""
+        clock = FakeClock()
+        breaker = make_breaker(clock)
+        for _ in range(3):
+            breaker.record_failure(1.0)
+        clock.now += 30
+        assert breaker.allow_request()
+        breaker.record_failure(1.0)
+        assert breaker.state == CircuitBreaker.OPEN
+
+    def test_abandoned_probe_is_returned(self):
+        """测试放弃的探测归还名额"""
+        clock = FakeClock()
+        breaker = make_breaker(clock)
+        for _ in range(3):
+            breaker.record_failure(1.0)
+        clock.now += 30
+        assert breaker.allow_request()
+        breaker.abandon_request()
+        assert breaker.allow_request()
+
+    def test_old_failures_leave_window(self):
+        """测试窗口外的失败不再计入"""
+        clock = FakeClock()
+        breaker = make_breaker(clock, consecutive_failures=10)
+        breaker.record_failure(1.0)
+        breaker.record_failure(1.0)
+        clock.now += 61
+        breaker.record_success(1.0)
+        breaker.record_failure(1.0)
+        assert breaker.state == CircuitBreaker.CLOSED
+        assert breaker.snapshot()["calls"] == 2
+
+
+class TestHealthScore:
+    """测试健康评分"""
+
+    def test_score_reflects_success_rate_and_latency(self):
+        """测试评分 = 成功率 × 延迟因子"""
+        clock = FakeClock()
+        breaker = make_breaker(clock, consecutive_failures=10, min_calls=100)
+        assert breaker.health_score() == 1.0
+
+        for _ in range(3):
+            breaker.record_success(5.0)
+        breaker.record_failure(5.0)
+        assert breaker.health_score() == pytest.approx(0.75)
+
+        breaker.record_success(20.0)
+        # p95 = 20s，超出 10s SLO 一倍
+        assert breaker.health_score() == pytest.approx(0.8 * 0.5)
+
+    def test_open_circuit_scores_zero(self):
+        """测试熔断打开时评分为 0"""
+        clock = FakeClock()
+        breaker = make_breaker(clock)
+        for _ in range(3):
+            breaker.record_failure(1.0)
+        assert breaker.health_score() == 0.0
+
+
+class TestProviderAvailability:
+    """测试 Provider 可用性受熔断器影响"""
+
+    def test_is_available_honours_circuit(self):
+        """测试熔断打开时 is_available 返回 False"""
+        provider = ThirtyTwoSeedreamProvider()
+        provider.client = True
+        provider.circuit_breaker = make_breaker(FakeClock())
+        assert provider.is_available()
+
+        for _ in range(3):
+            provider.circuit_breaker.record_failure(1.0)
+        assert not provider.is_available()
@@ -0,0 +1,78 @@
+"""
+Provider HTTP 工具测试
+
+测试调用会话中断阻塞中的厂商请求。
+"""
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from src.backend.providers import http
+from src.backend.providers.context import RequestCancelled, RequestContext, use_context
+
+
+class _SlowHandler(BaseHTTPRequestHandler):
+    """读完请求后长时间不响应，模拟同步生成中的厂商"""
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        time.sleep(5)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def slow_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _SlowHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+class TestCallSession:
+    """测试调用会话"""
+
+    def test_abort_interrupts_blocked_read(self, slow_server):
+        """测试 abort() 让阻塞中的请求立即失败，并转为取消"""
+        ctx = RequestContext()
+        session = http.CallSession()
+        errors = []
+
+        def call():
+            with use_context(ctx), http.use_session(session):
+                try:
+                    http.post(slow_server, json={"prompt": "x"}, timeout=30)
+                except Exception as e:
+                    errors.append(e)
+
+        thread = threading.Thread(target=call)
+        thread.start()
+        time.sleep(0.2)
+        start = time.monotonic()
+        ctx.cancel()
+        session.abort()
+        thread.join(timeout=3)
+
+        assert not thread.is_alive()
+        assert time.monotonic() - start < 1
+        assert isinstance(errors[0], RequestCancelled)
+
+    def test_aborted_session_refuses_new_connections(self, slow_server):
+        """测试中断后新建的连接立即断开"""
+        session = http.CallSession()
+        session.abort()
+        with http.use_session(session), pytest.raises(requests.ConnectionError):
+            http.post(slow_server, timeout=30)
+
+    def test_without_session_uses_requests(self, monkeypatch):
+        """测试不在调用会话中时使用 requests 模块函数"""
+        monkeypatch.setattr(requests, "get", lambda url, **kwargs: ("module", url))
+        assert http.get("http://example.invalid") == ("module", "http://example.invalid")
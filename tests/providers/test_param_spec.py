@@ -107,6 +107,7 @@ class TestImageParamSpec:
         # 用户参数应该暴露
         assert "image" in param_names
         assert "aspect_ratio" in param_names
+        assert "num_images" in param_names
 
         # 验证 aspect_ratio 的可选值
         aspect_ratio_param = ThirtyTwoSeedreamProvider.get_param_dict()["aspect_ratio"]
@@ -128,6 +129,7 @@ class TestImageParamSpec:
         assert "images" in param_names
         assert "resolution" in param_names
         assert "aspect_ratio" in param_names
+        assert "num_images" in param_names
 
 
 class TestVideoParamSpec:
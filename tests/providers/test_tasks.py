@@ -0,0 +1,37 @@
+"""已提交厂商任务持久化测试
+
+测试任务的登记、移除与跨实例（进程重启）读取。
+"""
+
+from src.backend.providers.tasks import PendingTaskStore
+
+
+class TestPendingTaskStore:
+    """测试任务持久化"""
+
+    def test_tasks_survive_restart(self, tmp_path):
+        """测试新实例（模拟重启）能读到之前登记的任务"""
+        path = str(tmp_path / "sub" / "pending.json")
+        store = PendingTaskStore(path)
+        store.add("thirtytwo_kling", "task-1", request_id="req-1", is_text2video=False)
+        store.add("thirtytwo_kling", "task-2")
+
+        tasks = {t["task_id"]: t for t in PendingTaskStore(path).list()}
+        assert set(tasks) == {"task-1", "task-2"}
+        assert tasks["task-1"]["request_id"] == "req-1"
+        assert tasks["task-1"]["task_info"] == {"is_text2video": False}
+
+    def test_remove(self, tmp_path):
+        """测试移除后不再恢复，移除不存在的任务无副作用"""
+        store = PendingTaskStore(str(tmp_path / "pending.json"))
+        store.add("thirtytwo_kling", "task-1")
+        store.remove("task-1")
+        store.remove("missing")
+        assert store.list() == []
+
+    def test_empty_path_disables_persistence(self, tmp_path):
+        """测试路径为空时不写文件"""
+        store = PendingTaskStore("")
+        store.add("thirtytwo_kling", "task-1")
+        assert store.list() == []
+        assert list(tmp_path.iterdir()) == []
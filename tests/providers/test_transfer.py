@@ -0,0 +1,56 @@
+"""
+结果传输方式测试
+
+测试按预估大小选择内联/URL、base64 解码与按方式统计。
+"""
+
+import base64
+
+from src.backend.config import config
+from src.backend.providers.transfer import (
+    INLINE,
+    URL,
+    TransferStats,
+    choose_transfer_mode,
+    decode_inline,
+    estimate_output_bytes,
+)
+
+
+class TestTransferMode:
+    """测试传输方式选择"""
+
+    def test_choose_by_estimated_size(self, monkeypatch):
+        """测试阈值内内联，超出走 URL"""
+        monkeypatch.setattr(config, "INLINE_TRANSFER_MAX_BYTES", 5_000_000)
+        monkeypatch.setattr(config, "INLINE_TRANSFER_BYTES_PER_PIXEL", 1.0)
+        assert choose_transfer_mode(estimate_output_bytes(2048, 2048)) == INLINE
+        assert choose_transfer_mode(estimate_output_bytes(2048, 2048, 2)) == URL
+        assert choose_transfer_mode(estimate_output_bytes(4096, 4096)) == URL
+
+    def test_decode_inline_accepts_data_uri(self):
+        """测试解码纯 base64 与 data URI"""
+        encoded = base64.b64encode(b"image").decode()
+        assert decode_inline(encoded) == b"image"
+        assert decode_inline(f"data:image/png;base64,{encoded}") == b"image"
+
+
+class TestTransferStats:
+    """测试按厂商与方式统计"""
+
+    def test_record_and_snapshot(self):
+        """测试耗时分位数、重试次数与字节数"""
+        stats = TransferStats()
+        stats.record("seedream", INLINE, 1.0, 0, 100)
+        stats.record("seedream", INLINE, 3.0, 2, 200)
+        stats.record("seedream", URL, 5.0, 1, 1000)
+
+        snapshot = stats.snapshot()
+        assert snapshot["seedream:inline"] == {
+            "count": 2,
+            "retries": 2,
+            "bytes": 300,
+            "latency_p50": 1.0,
+            "latency_p95": 3.0,
+        }
+        assert snapshot["seedream:url"]["retries"] == 1
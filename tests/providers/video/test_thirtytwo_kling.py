@@ -115,3 +115,237 @@ class TestThirtyTwoKlingGenerate:
         assert video_data
         assert isinstance(video_data, bytes)
         assert len(video_data) > 10000
+
+
+class FakeResponse:
+    """模拟 requests 响应"""
+
+    status_code = 200
+
+    def __init__(self, json_data=None, content=b""):
+        self._json = json_data
+        self.content = content
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._json
+
+
+class TestThirtyTwoKlingCancellation:
+    """测试请求取消时停止轮询（模拟 HTTP）"""
+
+    def test_cancel_stops_polling(self, monkeypatch):
+        """测试取消后立即停止轮询，不再下载"""
+        import threading
+        import time
+
+        import requests
+
+        from src.backend.providers.context import RequestCancelled, RequestContext, use_context
+
+        provider = ThirtyTwoKlingProvider()
+        provider.client = True
+        provider.api_key = "test"
+        polls = []
+
+        monkeypatch.setattr(
+            requests, "post",
+            lambda url, headers=None, json=None, timeout=None: FakeResponse(
+                {"status": 200, "data": {"task_id": "task-1", "task_status": "submitted"}}
+            ),
+        )
+
+        def fake_get(url, headers=None, timeout=None):
+            polls.append(url)
+            return FakeResponse({"code": 0, "data": {"task_status": "processing"}})
+
+        monkeypatch.setattr(requests, "get", fake_get)
+
+        ctx = RequestContext()
+        threading.Timer(0.1, ctx.cancel).start()
+        start = time.monotonic()
+        with use_context(ctx), pytest.raises(RequestCancelled):
+            provider.generate("test")
+
+        assert time.monotonic() - start < 2
+        assert polls == [f"{provider.FETCH_API_BASE_TEXT2VIDEO}/task-1"]
+
+    def test_deadline_stops_polling(self, monkeypatch):
+        """测试预算不足以等待下一次轮询时立即失败，而不是轮询到 max_polling_time"""
+        import time
+
+        import requests
+
+        from src.backend.providers.context import DeadlineExceeded, RequestContext, use_context
+
+        provider = ThirtyTwoKlingProvider()
+        provider.client = True
+        provider.api_key = "test"
+        timeouts = []
+
+        monkeypatch.setattr(
+            requests, "post",
+            lambda url, headers=None, json=None, timeout=None: FakeResponse(
+                {"status": 200, "data": {"task_id": "task-1"}}
+            ),
+        )
+
+        def fake_get(url, headers=None, timeout=None):
+            timeouts.append(timeout)
+            return FakeResponse({"code": 0, "data": {"task_status": "processing"}})
+
+        monkeypatch.setattr(requests, "get", fake_get)
+
+        start = time.monotonic()
+        with use_context(RequestContext(deadline=time.monotonic() + 2)), pytest.raises(DeadlineExceeded):
+            provider.generate("test")
+
+        assert time.monotonic() - start < 1
+        assert len(timeouts) == 1
+        assert timeouts[0] <= 2
+
+
+class TestThirtyTwoKlingPendingTasks:
+    """测试已提交任务的持久化与恢复（模拟 HTTP）"""
+
+    @pytest.fixture
+    def provider(self, monkeypatch):
+        import requests
+
+        provider = ThirtyTwoKlingProvider()
+        provider.client = True
+        provider.api_key = "test"
+        provider.polling_interval = 0.01
+        monkeypatch.setattr(
+            requests, "post",
+            lambda url, headers=None, json=None, timeout=None: FakeResponse(
+                {"status": 200, "data": {"task_id": "task-1"}}
+            ),
+        )
+        return provider
+
+    def test_shutdown_keeps_task_for_resume(self, provider, monkeypatch):
+        """测试因停机中断轮询时保留任务，客户端取消时移除"""
+        import threading
+
+        import requests
+
+        from src.backend.providers.context import CANCEL_SHUTDOWN, RequestCancelled, RequestContext, use_context
+        from src.backend.providers.tasks import pending_tasks
+
+        monkeypatch.setattr(
+            requests, "get",
+            lambda url, headers=None, timeout=None: FakeResponse({"code": 0, "data": {"task_status": "processing"}}),
+        )
+
+        ctx = RequestContext(request_id="req-1")
+        threading.Timer(0.05, ctx.cancel, args=(CANCEL_SHUTDOWN,)).start()
+        with use_context(ctx), pytest.raises(RequestCancelled):
+            provider.generate("test")
+        tasks = pending_tasks.list()
+        assert [(t["task_id"], t["request_id"]) for t in tasks] == [("task-1", "req-1")]
+        assert tasks[0]["task_info"] == {"is_text2video": True}
+
+        ctx = RequestContext()
+        threading.Timer(0.05, ctx.cancel).start()
+        with use_context(ctx), pytest.raises(RequestCancelled):
+            provider.generate("test")
+        assert pending_tasks.list() == []
+
+    def test_resume_polls_without_resubmitting(self, provider, monkeypatch):
+        """测试恢复任务只轮询并下载，不重新提交，完成后移除登记"""
+        import requests
+
+        from src.backend.providers.tasks import pending_tasks
+
+        def fail_post(*args, **kwargs):
+            raise AssertionError("task must not be resubmitted")
+
+        def fake_get(url, headers=None, timeout=None):
+            if url.endswith("/task-1"):
+                return FakeResponse({"code": 0, "data": {
+                    "task_status": "succeed",
+                    "task_result": {"videos": [{"url": "https://example.com/v.mp4"}]},
+                }})
+            return FakeResponse(content=b"video")
+
+        monkeypatch.setattr(requests, "post", fail_post)
+        monkeypatch.setattr(requests, "get", fake_get)
+        pending_tasks.add("thirtytwo_kling", "task-1", request_id="req-1", is_text2video=True)
+
+        assert provider.resume("task-1", is_text2video=True) == b"video"
+        assert pending_tasks.list() == []
+
+
+class FakeKlingVendor:
+    """本地模拟的 Kling 厂商：记录提交的 callback_url，经回调端点推送任务状态，统计轮询次数"""
+
+    def __init__(self, client):
+        self.client = client
+        self.callback_url: str | None = None
+        self.polls: list[str] = []
+        self.responses: list[int] = []
+
+    def post(self, url, headers=None, json=None, timeout=None):
+        self.callback_url = json.get("callback_url")
+        return FakeResponse({"status": 200, "data": {"task_id": "task-cb", "task_status": "submitted"}})
+
+    def get(self, url, headers=None, timeout=None):
+        if url.endswith("/task-cb"):
+            self.polls.append(url)
+            return FakeResponse({"code": 0, "data": {"task_status": "processing"}})
+        return FakeResponse(content=b"video")
+
+    def push(self, task_status: str, updated_at: int, **fields) -> None:
+        """向回调地址推送一次任务状态"""
+        body = {"task_id": "task-cb", "task_status": task_status, "updated_at": updated_at, **fields}
+        self.responses.append(self.client.post(self.callback_url, json=body).status_code)
+
+
+class TestThirtyTwoKlingCallbacks:
+    """测试厂商回调取代轮询（本地模拟厂商）"""
+
+    def test_callback_replaces_polling(self, monkeypatch):
+        """测试提交时附带签名回调地址，回调唤醒等待，轮询只发生一次，重复通知被忽略"""
+        import threading
+        import time
+
+        import requests
+        from fastapi.testclient import TestClient
+
+        from src.backend.main import app
+        from src.backend.providers.callbacks import kling_callbacks
+
+        vendor = FakeKlingVendor(TestClient(app))
+        monkeypatch.setattr(kling_callbacks, "base_url", "http://testserver")
+        monkeypatch.setattr(requests, "post", vendor.post)
+        monkeypatch.setattr(requests, "get", vendor.get)
+
+        provider = ThirtyTwoKlingProvider()
+        provider.client = True
+        provider.api_key = "test"
+        provider.callback_poll_interval = 30
+
+        def deliver():
+            while vendor.callback_url is None or kling_callbacks.snapshot()["watching"] == 0:
+                time.sleep(0.01)
+            vendor.push("processing", 1)
+            vendor.push("succeed", 2, task_result={"videos": [{"url": "https://example.com/v.mp4"}]})
+            vendor.push("succeed", 2, task_result={"videos": [{"url": "https://example.com/v.mp4"}]})
+
+        thread = threading.Thread(target=deliver)
+        thread.start()
+        start = time.monotonic()
+        assert provider.generate("test") == b"video"
+        thread.join(timeout=5)
+
+        assert time.monotonic() - start < 5
+        assert vendor.callback_url.startswith("http://testserver/api/v1/callbacks/kling?token=")
+        assert len(vendor.polls) == 1
+        assert vendor.responses == [200, 200, 200]
+        assert kling_callbacks.snapshot()["watching"] == 0
+        # 该任务的回调地址不能投递其他任务的通知
+        forged = {"task_id": "task-other", "task_status": "succeed", "updated_at": 3}
+        assert vendor.client.post(vendor.callback_url, json=forged).status_code == 403
@@ -0,0 +1,99 @@
+"""
+准入控制测试
+
+测试排队等待时间估算，以及按时间预算与各 Provider 类型阈值提前拒绝请求。
+"""
+
+import pytest
+
+from src.backend.services.admission import ERROR_OVERLOADED, AdmissionController
+from src.backend.services.concurrency import adaptive_limiter_registry
+from src.backend.services.provider_service import ProviderRegistry
+
+
+class FakeBreaker:
+    """固定 p50 延迟的熔断器"""
+
+    def __init__(self, latency_p50):
+        self.latency_p50 = latency_p50
+
+    def snapshot(self):
+        return {"latency_p50": self.latency_p50}
+
+
+class FakeProvider:
+    """模拟 Provider"""
+
+    model_name = "fake-model"
+
+    def __init__(self, latency_p50=10.0):
+        self.circuit_breaker = FakeBreaker(latency_p50)
+
+    def is_available(self):
+        return True
+
+
+class TestEstimateWait:
+    """测试排队等待时间估算"""
+
+    def test_idle_vendor_has_no_wait(self):
+        """测试空闲厂商无需排队"""
+        assert AdmissionController.estimate_wait("admission_idle", FakeProvider()) == 0.0
+
+    def test_unknown_latency(self):
+        """测试尚无延迟样本时无法估算"""
+        assert AdmissionController.estimate_wait("admission_new", FakeProvider(None)) is None
+
+    def test_saturated_vendor_waits_one_service_time(self):
+        """测试槽位占满时新请求需等待一次服务时间"""
+        limiter = adaptive_limiter_registry.get("admission_busy")
+        slots = int(limiter.limit)
+        for _ in range(slots):
+            limiter.acquire(0)
+        try:
+            wait = AdmissionController.estimate_wait("admission_busy", FakeProvider(10.0))
+        finally:
+            for _ in range(slots):
+                limiter.release(10.0)
+        assert wait == pytest.approx(10.0)
+
+
+class TestAdmissionCheck:
+    """测试准入判断"""
+
+    @pytest.fixture
+    def busy(self, monkeypatch):
+        """预计排队 30 秒、服务时间 10 秒的厂商"""
+        providers = {"busy": FakeProvider(10.0)}
+        monkeypatch.setattr(ProviderRegistry, "get_providers", classmethod(lambda cls, t: providers))
+        monkeypatch.setattr(
+            AdmissionController, "estimate_wait", staticmethod(lambda vendor, provider, priority="interactive": 30.0)
+        )
+
+    def test_rejects_when_wait_exceeds_deadline(self, busy):
+        """测试预计耗时超出预算时拒绝并给出 retry_after"""
+        result = AdmissionController.check("image", "busy", deadline=35)
+        assert result["error_type"] == ERROR_OVERLOADED
+        assert result["retry_after"] == pytest.approx(30.0)
+        assert AdmissionController.check("image", "busy", deadline=60) is None
+
+    def test_per_type_threshold_without_deadline(self, busy):
+        """测试未设置预算时按 Provider 类型阈值判断"""
+        assert AdmissionController.check("llm", "busy") is not None
+        assert AdmissionController.check("video", "busy") is None
+
+    def test_auto_uses_shortest_wait(self, monkeypatch):
+        """测试 auto 时只要有厂商能在预算内完成就放行"""
+        providers = {"slow": FakeProvider(10.0), "fast": FakeProvider(1.0)}
+        waits = {"slow": 100.0, "fast": 0.0}
+        monkeypatch.setattr(ProviderRegistry, "get_providers", classmethod(lambda cls, t: providers))
+        monkeypatch.setattr(
+            AdmissionController, "estimate_wait",
+            staticmethod(lambda vendor, provider, priority="interactive": waits[vendor]),
+        )
+        assert AdmissionController.check("image", "auto", deadline=5) is None
+        assert AdmissionController.check("image", "slow", deadline=5) is not None
+
+    def test_unknown_vendor_is_admitted(self):
+        """测试未知厂商交给服务层处理"""
+        assert AdmissionController.check("image", "missing_vendor", deadline=1) is None
@@ -0,0 +1,58 @@
+"""
+批量生成测试
+
+测试 BatchService 的有界并发、按完成顺序产出与单项失败隔离。
+"""
+
+import threading
+import time
+
+from src.backend.services.batch import BatchService
+
+
+class TestBatchService:
+    """测试批量执行"""
+
+    def test_results_stream_in_completion_order(self):
+        """测试先完成的项先产出，最后产出汇总"""
+        items = [{"delay": 0.2}, {"delay": 0.0}]
+
+        def worker(item):
+            time.sleep(item["delay"])
+            return {"success": True, "vendor": "v"}
+
+        results = list(BatchService.run(items, worker, concurrency=2))
+        assert [r.get("index") for r in results[:2]] == [1, 0]
+        assert results[-1] == {"done": True, "total": 2, "succeeded": 2, "failed": 0}
+
+    def test_concurrency_is_bounded(self):
+        """测试并发数不超过上限"""
+        lock = threading.Lock()
+        active = []
+        peak = []
+
+        def worker(item):
+            with lock:
+                active.append(1)
+                peak.append(len(active))
+            time.sleep(0.02)
+            with lock:
+                active.pop()
+            return {"success": True}
+
+        list(BatchService.run([{}] * 8, worker, concurrency=2))
+        assert max(peak) <= 2
+
+    def test_failures_are_per_item(self):
+        """测试单项异常不影响其他项"""
+        def worker(item):
+            if item["fail"]:
+                raise RuntimeError("boom")
+            return {"success": True, "vendor": "v"}
+
+        results = list(BatchService.run([{"fail": True, "vendor": "v"}, {"fail": False}], worker))
+        by_index = {r["index"]: r for r in results if "index" in r}
+        assert by_index[0]["success"] is False
+        assert by_index[0]["error"] == "boom"
+        assert by_index[1]["success"] is True
+        assert results[-1]["failed"] == 1
@@ -0,0 +1,204 @@
+"""画布渲染测试
+
+测试分块网格、按覆盖内容哈希复用分块、视口渲染与整体导出。
+渲染测试需要 Pillow，未安装时跳过。
+"""
+
+import io
+
+import pytest
+
+from src.backend.config import config
+from src.backend.services import canvas, media
+from src.backend.services.canvas import CanvasRenderer, ImageElement, Region, TextElement
+from src.backend.services.media import TileCache
+from src.backend.storage import MemoryStorage, content_key
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    """内存存储、独立的 Tile 缓存，分块边长 100"""
+    storage = MemoryStorage()
+    monkeypatch.setattr(canvas, "storage", storage)
+    monkeypatch.setattr(media, "storage", storage)
+    monkeypatch.setattr(media, "tile_cache", TileCache(64 * 1024 * 1024))
+    monkeypatch.setattr(config, "CANVAS_TILE_SIZE", 100)
+    return storage
+
+
+@pytest.fixture
+def pil():
+    return pytest.importorskip("PIL.Image")
+
+
+@pytest.fixture
+def composed(monkeypatch):
+    """记录实际合成的分块数"""
+    calls = []
+    compose = canvas.compose
+
+    def record(*args):
+        calls.append(args[:2])
+        return compose(*args)
+
+    monkeypatch.setattr(canvas, "compose", record)
+    return calls
+
+
+def put(storage, name, data=b"image"):
+    """存入非内容寻址的对象，返回地址"""
+    storage.put(f"uploads/{name}.png", data, "image/png")
+    return f"/api/v1/assets/uploads/{name}.png"
+
+
+def upload(storage, pil, color):
+    buffer = io.BytesIO()
+    pil.new("RGB", (80, 80), color).save(buffer, "PNG")
+    key = content_key(buffer.getvalue(), "png")
+    storage.put(key, buffer.getvalue(), "image/png")
+    return f"/api/v1/assets/{key}"
+
+
+class TestGrid:
+    """测试分块网格"""
+
+    def test_cells_aligned_to_canvas(self, backend):
+        """测试网格与画布坐标对齐，负坐标向下取整"""
+        renderer = CanvasRenderer([], scale=1)
+        assert renderer.cells(Region(-50, 0, 150, 100)) == [(-1, 0), (0, 0), (1, 0)]
+        assert renderer.cells(Region(0, 0, 100, 100)) == [(0, 0)]
+
+    def test_content_region(self, backend):
+        """测试外接区域包含旋转与留白，并按 scale 换算为输出像素"""
+        renderer = CanvasRenderer([ImageElement("a", 0, 0, 100, 40, rotation=90)], scale=2)
+        assert renderer.content_region() == Region(60, -60, 140, 140)
+        assert renderer.content_region(padding=10) == Region(40, -80, 160, 160)
+        with pytest.raises(ValueError):
+            CanvasRenderer([], scale=1).content_region()
+
+    def test_limits(self, backend, monkeypatch):
+        """测试元素数量、缩放倍数、格式与输出像素上限"""
+        item = ImageElement("a", 0, 0, 10, 10)
+        monkeypatch.setattr(config, "CANVAS_MAX_ITEMS", 2)
+        with pytest.raises(ValueError):
+            CanvasRenderer([item] * 3)
+        with pytest.raises(ValueError):
+            CanvasRenderer([item], scale=config.CANVAS_MAX_SCALE + 1)
+        with pytest.raises(ValueError):
+            CanvasRenderer([item], fmt="gif")
+        with pytest.raises(ValueError):
+            CanvasRenderer([ImageElement("a", 0, 0, 0, 10)])
+        monkeypatch.setattr(config, "CANVAS_MAX_PIXELS", 100 * 100 * 3)
+        with pytest.raises(ValueError, match="too large"):
+            CanvasRenderer([item]).cells(Region(0, 0, 400, 100))
+
+
+class TestTileKey:
+    """测试分块键"""
+
+    def test_only_intersecting_tiles_change(self, backend):
+        """测试移动元素只改变与其新旧位置相交的分块"""
+        a, b = put(backend, "a", b"a"), put(backend, "b", b"b")
+        before = CanvasRenderer([ImageElement(a, 10, 10, 50, 50), ImageElement(b, 210, 10, 50, 50)])
+        after = CanvasRenderer([ImageElement(a, 10, 10, 50, 50), ImageElement(b, 220, 10, 50, 50)])
+
+        assert before.tile_key(0, 0) == after.tile_key(0, 0)
+        assert before.tile_key(2, 0) != after.tile_key(2, 0)
+
+    def test_same_content_shares_key(self, backend):
+        """测试内容相同的分块（空白、相对位置相同的元素）共用一个键"""
+        a = put(backend, "a")
+        renderer = CanvasRenderer([ImageElement(a, 10, 10, 50, 50), ImageElement(a, 310, 10, 50, 50)])
+
+        assert renderer.tile_key(0, 0) == renderer.tile_key(3, 0)
+        assert renderer.tile_key(1, 0) == renderer.tile_key(5, 5)
+        assert renderer.tile_key(0, 0) != renderer.tile_key(1, 0)
+
+    def test_parameters_in_key(self, backend):
+        """测试文字内容、背景色与格式参与哈希"""
+        text = TextElement("hello", 0, 0, 50, 20)
+        keys = {
+            CanvasRenderer([text]).tile_key(0, 0),
+            CanvasRenderer([TextElement("world", 0, 0, 50, 20)]).tile_key(0, 0),
+            CanvasRenderer([text], background="#ffffff").tile_key(0, 0),
+            CanvasRenderer([text], fmt="webp").tile_key(0, 0),
+        }
+        assert len(keys) == 4
+
+    def test_replaced_asset_changes_key(self, backend):
+        """测试非内容寻址的对象被覆盖后（ETag 变化）分块键随之变化"""
+        url = put(backend, "a", b"before")
+        before = CanvasRenderer([ImageElement(url, 0, 0, 50, 50)]).tile_key(0, 0)
+        assert CanvasRenderer([ImageElement(url, 0, 0, 50, 50)]).tile_key(0, 0) == before
+
+        put(backend, "a", b"after")
+        assert CanvasRenderer([ImageElement(url, 0, 0, 50, 50)]).tile_key(0, 0) != before
+
+    def test_external_source_keyed_by_content(self, backend, monkeypatch):
+        """测试外部地址按读取到的内容哈希：内容变化时键变化，同一内容的不同地址共用键，每个地址只读取一次"""
+        contents = {"https://example.com/a.png": b"one", "https://example.com/b.png": b"one"}
+        fetched = []
+
+        def fetch(url):
+            fetched.append(url)
+            return contents[url]
+
+        monkeypatch.setattr(canvas, "fetch_source", fetch)
+
+        def key(url):
+            renderer = CanvasRenderer([ImageElement(url, 0, 0, 50, 50), ImageElement(url, 100, 0, 50, 50)])
+            return renderer.tile_key(0, 0)
+
+        first = key("https://example.com/a.png")
+        assert fetched == ["https://example.com/a.png"]
+        assert key("https://example.com/b.png") == first
+
+        contents["https://example.com/a.png"] = b"two"
+        assert key("https://example.com/a.png") != first
+
+
+class TestRender:
+    """测试渲染"""
+
+    def test_view_renders_changed_tiles_only(self, backend, pil, composed):
+        """测试视口渲染：内容相同的分块只渲染一次，再次渲染时复用，移动元素只重新渲染受影响的分块"""
+        red = upload(backend, pil, "red")
+        tiles = CanvasRenderer([ImageElement(red, 10, 10, 80, 80)]).render_view(0, 0, 300, 100)
+
+        assert [(t.col, t.row) for t in tiles] == [(0, 0), (1, 0), (2, 0)]
+        assert tiles[1].key == tiles[2].key
+        assert len(composed) == 2
+        image = pil.open(io.BytesIO(backend.get(tiles[0].key))).convert("RGBA")
+        assert image.getpixel((50, 50)) == (255, 0, 0, 255)
+        assert image.getpixel((5, 5))[3] == 0
+
+        again = CanvasRenderer([ImageElement(red, 10, 10, 80, 80)]).render_view(0, 0, 300, 100)
+        assert all(t.cached for t in again)
+        assert len(composed) == 2
+
+        moved = CanvasRenderer([ImageElement(red, 25, 10, 80, 80)]).render_view(0, 0, 300, 100)
+        assert [t.cached for t in moved] == [False, False, True]
+        assert len(composed) == 4
+
+    def test_export_image(self, backend, pil):
+        """测试整体导出拼接为一张图片，跨分块的元素无缝"""
+        red, blue = upload(backend, pil, "red"), upload(backend, pil, "blue")
+        elements = [ImageElement(red, 50, 50, 100, 100), ImageElement(blue, 200, 50, 60, 60)]
+
+        data, region = CanvasRenderer(elements, background="#ffffff").export_image(padding=10, fmt="jpg")
+
+        assert region == Region(40, 40, 270, 160)
+        image = pil.open(io.BytesIO(data))
+        assert image.format == "JPEG"
+        assert image.size == (230, 120)
+        assert image.getpixel((60, 60))[0] > 200
+        assert image.getpixel((190, 40))[2] > 200
+        assert min(image.getpixel((5, 5))) > 240
+
+    def test_text(self, backend, pil):
+        """测试文字元素被绘制"""
+        renderer = CanvasRenderer([TextElement("Hello", 10, 10, 80, 30, font_size=20, color="#000000")])
+        tile = renderer.render_tile(0, 0)
+
+        image = pil.open(io.BytesIO(backend.get(tile.key))).convert("RGBA")
+        assert any(image.getpixel((x, y))[3] > 0 for x in range(10, 90) for y in range(10, 40))
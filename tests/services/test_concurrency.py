@@ -0,0 +1,145 @@
+"""
+自适应并发控制测试
+
+测试 AdaptiveConcurrencyLimiter 的 AIMD 调整与错误分类。
+"""
+
+import pytest
+import requests
+
+from src.backend.services.concurrency import (
+    AdaptiveConcurrencyLimiter,
+    AdaptiveLimiterRegistry,
+    classify_error,
+)
+from src.backend.services.rate_limit import RateLimitExceeded
+
+
+class FakeClock:
+    """可手动推进的时钟"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def run_calls(limiter: AdaptiveConcurrencyLimiter, count: int, latency: float, error_kind=None):
+    """以满并发方式执行 count 次调用"""
+    for _ in range(count):
+        concurrency = int(limiter.limit)
+        for _ in range(concurrency):
+            limiter.acquire()
+        for _ in range(concurrency):
+            limiter.release(latency, error_kind)
+
+
+class TestClassifyError:
+    """测试错误分类"""
+
+    def test_wrapped_requests_timeout(self):
+        """测试被 RuntimeError 包装的 requests 超时"""
+        try:
+            try:
+                raise requests.Timeout("read timed out")
+            except requests.Timeout as e:
+                raise RuntimeError("HTTP error after 3 retries") from e
+        except RuntimeError as wrapped:
+            assert classify_error(wrapped) == "timeout"
+
+    def test_http_429(self):
+        """测试 HTTP 429 响应"""
+        response = requests.Response()
+        response.status_code = 429
+        error = requests.HTTPError("429 Client Error", response=response)
+        assert classify_error(error) == "rate_limited"
+
+    def test_llm_error_string(self):
+        """测试 LLM 错误字符串"""
+        assert classify_error("Error generating content: Request timed out") == "timeout"
+        assert classify_error("Error generating content: invalid prompt") == "error"
+
+
+class TestAdaptiveConcurrencyLimiter:
+    """测试 AIMD 调整"""
+
+    def test_additive_increase_when_saturated(self):
+        """测试并发用满且延迟稳定时加性增"""
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=2, max_limit=10)
+        run_calls(limiter, 20, latency=0.1)
+        assert 2 < limiter.limit <= 10
+
+    def test_no_increase_when_idle(self):
+        """测试并发未用满时上限不增长"""
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=4)
+        for _ in range(20):
+            limiter.acquire()
+            limiter.release(0.1)
+        assert limiter.limit == 4
+
+    def test_multiplicative_decrease_on_timeout(self):
+        """测试超时触发乘性减"""
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=8, decrease_factor=0.5)
+        limiter.acquire()
+        limiter.release(30.0, "timeout")
+        assert limiter.limit == 4
+
+    def test_decrease_cooldown(self):
+        """测试同一波拥塞只降级一次"""
+        clock = FakeClock()
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=8, clock=clock)
+        for _ in range(3):
+            limiter.acquire()
+            limiter.release(1.0, "rate_limited")
+        assert limiter.limit == 4
+
+        clock.now += 2.0
+        limiter.acquire()
+        limiter.release(1.0, "rate_limited")
+        assert limiter.limit == 2
+
+    def test_decrease_on_rising_p95(self):
+        """测试 p95 明显上升时乘性减"""
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=8, max_limit=8, window=20)
+        run_calls(limiter, 3, latency=1.0)
+        assert limiter.limit == 8
+
+        run_calls(limiter, 2, latency=5.0)
+        assert limiter.limit < 8
+
+    def test_other_errors_do_not_change_limit(self):
+        """测试非过载错误不调整上限"""
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=4)
+        limiter.acquire()
+        limiter.release(0.5, "error")
+        assert limiter.limit == 4
+
+    def test_acquire_rejects_when_full(self):
+        """测试并发已满时拒绝"""
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=1)
+        limiter.acquire()
+        with pytest.raises(RateLimitExceeded):
+            limiter.acquire(timeout=0)
+
+
+class TestAdaptiveLimiterRegistry:
+    """测试注册表"""
+
+    def test_vendor_cap_bounds_max_limit(self):
+        """测试静态并发槽位限制自适应上限"""
+        registry = AdaptiveLimiterRegistry(1, 32, 4, vendor_caps={"kling": 2})
+        assert registry.get("kling").max_limit == 2
+        assert registry.get("kling").limit == 2
+        assert registry.get("other").max_limit == 32
+
+    def test_exception_is_classified_and_recorded(self):
+        """测试调用异常被分类并触发降级"""
+        registry = AdaptiveLimiterRegistry(1, 32, 8)
+        with pytest.raises(RuntimeError):
+            with registry.acquire("vendor", timeout=0):
+                raise RuntimeError("Request timeout")
+
+        snapshot = registry.snapshot()["vendor"]
+        assert snapshot["limit"] == 4
+        assert snapshot["inflight"] == 0
@@ -0,0 +1,124 @@
+"""
+停机排空测试
+
+测试在途调用登记、排空等待、超时取消与重启后恢复厂商任务。
+"""
+
+import threading
+import time
+
+from src.backend.providers.context import RequestContext
+from src.backend.providers.tasks import pending_tasks
+from src.backend.services.drain import ERROR_SHUTTING_DOWN, DrainController
+from src.backend.services.jobs import JOB_DONE, detached_jobs, resume_pending_tasks
+from src.backend.services.provider_service import VideoService
+
+
+class TestDrainController:
+    """测试排空"""
+
+    def test_drain_waits_for_inflight_calls(self):
+        """测试在途调用在超时内结束时自然完成"""
+        drain = DrainController()
+
+        def call():
+            with drain.track(None):
+                time.sleep(0.1)
+
+        thread = threading.Thread(target=call)
+        thread.start()
+        time.sleep(0.02)
+        assert drain.drain(timeout=2) is True
+        assert drain.draining
+        thread.join()
+
+    def test_drain_timeout_cancels_with_shutdown_reason(self):
+        """测试超时后以停机原因取消在途调用（含后台任务）"""
+        drain = DrainController()
+        ctx = RequestContext()
+        ctx.detach()
+        errors = []
+
+        def call():
+            with drain.track(ctx):
+                try:
+                    ctx.sleep(10)
+                except Exception as e:
+                    errors.append(e)
+
+        thread = threading.Thread(target=call)
+        thread.start()
+        time.sleep(0.02)
+        assert drain.drain(timeout=0.05) is False
+        thread.join(timeout=2)
+        assert errors and errors[0].shutdown
+        assert drain.snapshot() == {"draining": True, "inflight": 0}
+
+    def test_rejection(self):
+        """测试排空期间拒绝请求的结果"""
+        result = DrainController().rejection("zhipu")
+        assert result["error_type"] == ERROR_SHUTTING_DOWN
+        assert result["retry_after"] > 0
+
+    def test_signal_drains_before_forwarding(self):
+        """测试 SIGTERM 先进入排空模式，排空结束后才交给原处理函数"""
+        import signal
+
+        drain = DrainController()
+        forwarded = threading.Event()
+        original = signal.getsignal(signal.SIGTERM)
+        signal.signal(signal.SIGTERM, lambda sig, frame: forwarded.set())
+        try:
+            assert drain.install_signal_handler(timeout=2) is True
+            handler = signal.getsignal(signal.SIGTERM)
+
+            def call():
+                with drain.track(None):
+                    time.sleep(0.2)
+
+            thread = threading.Thread(target=call)
+            thread.start()
+            time.sleep(0.02)
+            handler(signal.SIGTERM, None)
+            assert drain.draining
+            assert not forwarded.is_set()
+            assert forwarded.wait(2)
+            assert drain.snapshot()["inflight"] == 0
+            thread.join()
+        finally:
+            signal.signal(signal.SIGTERM, original)
+
+
+class TestResumePendingTasks:
+    """测试重启后恢复厂商任务"""
+
+    def test_resumed_task_becomes_detached_job(self, monkeypatch):
+        """测试恢复的任务以原请求 ID 作为后台任务保存结果"""
+        calls = []
+
+        def fake_resume(vendor, task_id, **task_info):
+            calls.append((vendor, task_id, task_info))
+            return {"success": True, "content": "dmlkZW8=", "format": "base64", "vendor": vendor}
+
+        monkeypatch.setattr(VideoService, "resume", staticmethod(fake_resume))
+        pending_tasks.add("thirtytwo_kling", "task-1", request_id="resume-req-1", is_text2video=False)
+
+        assert resume_pending_tasks() == 1
+        for _ in range(100):
+            job = detached_jobs.get("resume-req-1")
+            if job["status"] == JOB_DONE:
+                break
+            time.sleep(0.01)
+        assert job["status"] == JOB_DONE
+        assert job["result"]["success"] is True
+        assert calls == [("thirtytwo_kling", "task-1", {"is_text2video": False})]
+
+    def test_expired_tasks_are_dropped(self, monkeypatch):
+        """测试超过 PENDING_TASK_MAX_AGE 的任务不恢复并被移除"""
+        from src.backend.config import config
+
+        monkeypatch.setattr(config, "PENDING_TASK_MAX_AGE", -1)
+        pending_tasks.add("thirtytwo_kling", "task-old")
+
+        assert resume_pending_tasks() == 0
+        assert pending_tasks.list() == []
@@ -0,0 +1,121 @@
+"""
+LLM 对冲请求测试
+
+测试对冲预算、对冲延迟计算与主/备请求竞速。
+"""
+
+import time
+
+import pytest
+
+from src.backend.config import config
+from src.backend.services.hedging import HedgeBudget, LatencyTracker, LLMHedgingService
+from src.backend.services.provider_service import LLMService, ProviderRegistry
+
+
+class TestHedgeBudget:
+    """测试对冲预算"""
+
+    def test_budget_limits_extra_calls(self):
+        """测试 5% 预算下每 20 个主请求才允许一次对冲"""
+        budget = HedgeBudget(0.05)
+        for _ in range(19):
+            budget.on_request()
+        assert not budget.try_spend()
+
+        budget.on_request()
+        assert budget.try_spend()
+        assert not budget.try_spend()
+
+
+class TestLatencyTracker:
+    """测试对冲延迟计算"""
+
+    def test_default_delay_until_enough_samples(self):
+        """测试样本不足时使用默认延迟"""
+        tracker = LatencyTracker()
+        tracker.record("zhipu", 1.0)
+        assert tracker.hedge_delay("zhipu", 95, min_samples=5, default=10.0) == 10.0
+
+    def test_percentile_delay(self):
+        """测试按分位数计算延迟"""
+        tracker = LatencyTracker()
+        for i in range(1, 21):
+            tracker.record("zhipu", float(i))
+        assert tracker.hedge_delay("zhipu", 95, min_samples=5, default=10.0) == 19.0
+
+
+class TestLLMHedging:
+    """测试主/备请求竞速"""
+
+    @pytest.fixture
+    def hedging(self, monkeypatch):
+        """启用对冲、预算充足且备用厂商可用"""
+        gemini = ProviderRegistry.get_llm_provider("gemini")
+        monkeypatch.setattr(gemini, "client", True)
+        gemini.circuit_breaker.reset()
+        monkeypatch.setattr(LLMHedgingService, "budget", HedgeBudget(1.0))
+        monkeypatch.setattr(LLMHedgingService, "latencies", LatencyTracker())
+        monkeypatch.setattr(config, "LLM_HEDGE_DEFAULT_DELAY", 0.05)
+        monkeypatch.setattr(config, "LLM_HEDGE_VENDORS", {"zhipu": "gemini"})
+        calls = []
+
+        def fake_generate(vendor, prompt, queue_timeout=None, **kwargs):
+            calls.append((vendor, kwargs))
+            if vendor == "zhipu":
+                time.sleep(0.5)
+            return {"success": True, "content": vendor, "vendor": vendor}
+
+        monkeypatch.setattr(LLMService, "generate", staticmethod(fake_generate))
+        yield calls
+        gemini.circuit_breaker.reset()
+
+    def test_slow_primary_is_hedged(self, hedging):
+        """测试主请求过慢时备用厂商胜出"""
+        start = time.monotonic()
+        result = LLMHedgingService.generate("zhipu", "test", hedge=True, thinking_enabled=True)
+        assert time.monotonic() - start < 0.4
+        assert result["content"] == "gemini"
+        assert result["hedged"] is True
+        assert result["requested_vendor"] == "zhipu"
+        # zhipu 专有参数不会传给 gemini
+        assert hedging[1] == ("gemini", {})
+
+    def test_fast_primary_is_not_hedged(self, hedging, monkeypatch):
+        """测试主请求在对冲延迟内返回时不发起对冲"""
+        monkeypatch.setattr(config, "LLM_HEDGE_DEFAULT_DELAY", 2.0)
+        result = LLMHedgingService.generate("zhipu", "test", hedge=True)
+        assert result["vendor"] == "zhipu"
+        assert "hedged" not in result
+        assert [vendor for vendor, _ in hedging] == ["zhipu"]
+
+    def test_exhausted_budget_waits_for_primary(self, hedging, monkeypatch):
+        """测试预算耗尽时不对冲"""
+        monkeypatch.setattr(LLMHedgingService, "budget", HedgeBudget(0.0))
+        result = LLMHedgingService.generate("zhipu", "test", hedge=True)
+        assert result["vendor"] == "zhipu"
+        assert [vendor for vendor, _ in hedging] == ["zhipu"]
+
+    def test_disabled_calls_service_directly(self, hedging):
+        """测试未启用对冲时直接调用"""
+        result = LLMHedgingService.generate("zhipu", "test", hedge=False)
+        assert result["vendor"] == "zhipu"
+        assert "hedged" not in result
+
+    def test_losing_leg_is_cancelled(self, hedging, monkeypatch):
+        """测试备用厂商胜出后取消主请求所在的上下文"""
+        from src.backend.providers.context import current_context
+
+        contexts = {}
+
+        def fake_generate(vendor, prompt, queue_timeout=None, **kwargs):
+            ctx = contexts[vendor] = current_context()
+            if vendor == "zhipu":
+                ctx.sleep(2)
+            return {"success": True, "content": vendor, "vendor": vendor}
+
+        monkeypatch.setattr(LLMService, "generate", staticmethod(fake_generate))
+        result = LLMHedgingService.generate("zhipu", "test", hedge=True)
+        assert result["content"] == "gemini"
+        assert contexts["zhipu"].cancelled
+        assert not contexts["gemini"].cancelled
@@ -0,0 +1,107 @@
+"""
+幂等键存储测试
+
+测试请求指纹冲突、执行中加入、完成后重放、瞬时失败不保存、TTL 与容量淘汰。
+"""
+
+import threading
+
+import pytest
+
+from src.backend.services.idempotency import IdempotencyConflict, IdempotencyStore, fingerprint
+
+
+class FakeClock:
+    """可手动推进的时钟"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_store(ttl: float = 60, max_keys: int = 10, max_bytes: int = 1 << 20, clock=None) -> IdempotencyStore:
+    return IdempotencyStore(ttl=ttl, max_keys=max_keys, max_bytes=max_bytes, clock=clock or FakeClock())
+
+
+class TestFingerprint:
+    """测试请求指纹"""
+
+    def test_key_order_ignored(self):
+        """测试字段顺序不影响指纹"""
+        assert fingerprint({"a": 1, "b": [1, 2]}) == fingerprint({"b": [1, 2], "a": 1})
+        assert fingerprint({"a": 1}) != fingerprint({"a": 2})
+
+
+class TestIdempotencyStore:
+    """测试幂等键存储"""
+
+    def test_replay_after_complete(self):
+        """测试完成后的重复请求直接拿到保存的结果"""
+        store = make_store()
+        future, is_owner = store.begin("k", "fp")
+        assert is_owner
+        store.complete("k", {"success": True, "data": "ok"})
+
+        replay, is_owner = store.begin("k", "fp")
+        assert not is_owner
+        assert replay.result(timeout=0) == {"success": True, "data": "ok"}
+
+    def test_join_inflight(self):
+        """测试执行中的重复请求等待同一次执行"""
+        store = make_store()
+        store.begin("k", "fp")
+        joined, is_owner = store.begin("k", "fp")
+        assert not is_owner
+        assert not joined.done()
+
+        threading.Timer(0.01, store.complete, args=("k", {"success": True, "data": "ok"})).start()
+        assert joined.result(timeout=5)["data"] == "ok"
+
+    def test_conflict_on_different_payload(self):
+        """测试同一键不同指纹抛出 IdempotencyConflict"""
+        store = make_store()
+        store.begin("k", "fp-1")
+        with pytest.raises(IdempotencyConflict):
+            store.begin("k", "fp-2")
+
+    def test_transient_failure_not_stored(self):
+        """测试瞬时失败通知等待者但不保存，重试重新执行"""
+        store = make_store()
+        store.begin("k", "fp")
+        joined, _ = store.begin("k", "fp")
+        store.complete("k", {"success": False, "error_type": "rate_limited"})
+
+        assert joined.result(timeout=0)["error_type"] == "rate_limited"
+        _, is_owner = store.begin("k", "fp")
+        assert is_owner
+
+    def test_ttl_expiry(self):
+        """测试结果超过 TTL 后键被清理"""
+        clock = FakeClock()
+        store = make_store(ttl=10, clock=clock)
+        store.begin("k", "fp")
+        store.complete("k", {"success": True})
+
+        clock.now = 11
+        _, is_owner = store.begin("k", "fp-new")
+        assert is_owner
+
+    def test_bounded_by_keys_and_bytes(self):
+        """测试超出键数或字节上限时淘汰最早完成的键，执行中的键保留"""
+        store = make_store(max_keys=2, max_bytes=10)
+        store.begin("inflight", "fp")
+        for key in ("a", "b"):
+            store.begin(key, "fp")
+            store.complete(key, {"success": True, "content": "x" * 4})
+
+        snapshot = store.snapshot()
+        assert snapshot["keys"] == 2
+        assert snapshot["inflight"] == 1
+        _, is_owner = store.begin("a", "fp")
+        assert is_owner
+
+        store.begin("big", "fp")
+        store.complete("big", {"success": True, "content": "x" * 20})
+        assert store.snapshot()["bytes"] <= 10
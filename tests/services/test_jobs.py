@@ -0,0 +1,57 @@
+"""
+后台任务存储测试
+
+测试后台任务的登记、完成、过期与容量淘汰。
+"""
+
+from src.backend.services.jobs import JOB_DONE, JOB_RUNNING, DetachedJobStore
+
+
+class FakeClock:
+    """可手动推进的时钟"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestDetachedJobStore:
+    """测试后台任务存储"""
+
+    def test_start_and_finish(self):
+        """测试运行中与完成状态"""
+        store = DetachedJobStore(ttl=60, max_jobs=10)
+        store.start("job-1", "video")
+        assert store.get("job-1")["status"] == JOB_RUNNING
+
+        store.finish("job-1", {"success": True, "vendor": "thirtytwo_kling"})
+        job = store.get("job-1")
+        assert job["status"] == JOB_DONE
+        assert job["result"]["success"] is True
+        assert store.get("missing") is None
+
+    def test_finished_jobs_expire(self):
+        """测试完成的任务在 TTL 后过期，运行中的任务不过期"""
+        clock = FakeClock()
+        store = DetachedJobStore(ttl=60, max_jobs=10, clock=clock)
+        store.start("done", "image")
+        store.start("running", "video")
+        store.finish("done", {"success": True})
+
+        clock.now = 61
+        assert store.get("done") is None
+        assert store.get("running")["status"] == JOB_RUNNING
+
+    def test_oldest_finished_job_is_evicted(self):
+        """测试超出容量时淘汰最早完成的任务"""
+        clock = FakeClock()
+        store = DetachedJobStore(ttl=600, max_jobs=2, clock=clock)
+        for i in range(3):
+            clock.now = i
+            store.start(f"job-{i}", "image")
+            store.finish(f"job-{i}", {"success": True})
+
+        assert store.get("job-0") is None
+        assert store.get("job-2") is not None
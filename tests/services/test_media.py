@@ -0,0 +1,371 @@
+"""媒体后处理服务测试
+
+测试进程池执行、视频与图片后处理结果的存储位置与视频、图片服务的返回格式，
+以及源图读取与 Tile 缓存。
+"""
+
+import base64
+import json
+import time
+
+import pytest
+
+from src.backend.media.compose import Tile
+from src.backend.media.image import ImageRenditions, Rendition
+from src.backend.media.mp4 import faststart, is_faststart
+from src.backend.services import media
+from src.backend.services.media import (
+    MediaProcessor,
+    TileCache,
+    fetch_source,
+    process_image,
+    process_video,
+    source_digest,
+)
+from src.backend.services.provider_service import ImageService, ProviderRegistry, VideoService
+from src.backend.storage import MemoryStorage
+from tests.media.test_mp4 import make_mp4
+
+
+@pytest.fixture
+def memory_storage(monkeypatch):
+    backend = MemoryStorage()
+    monkeypatch.setattr(media, "storage", backend)
+    return backend
+
+
+@pytest.fixture
+def poster(monkeypatch):
+    """以固定内容代替 ffmpeg 截取封面"""
+    monkeypatch.setattr("src.backend.media.mp4.extract_poster", lambda data: b"\xff\xd8poster")
+
+
+class TestMediaProcessor:
+    """测试进程池执行"""
+
+    def test_runs_in_process_pool(self):
+        """测试任务在子进程中执行并返回结果"""
+        processor = MediaProcessor(workers=1)
+        try:
+            data, _ = make_mp4()
+            assert is_faststart(processor.run(faststart, data))
+            assert processor.snapshot() == {"workers": 1, "running": 0}
+        finally:
+            processor.shutdown()
+
+    def test_inline_when_no_workers(self):
+        """测试 workers=0 时在调用线程内执行"""
+        assert MediaProcessor(workers=0).run(len, b"abc") == 3
+
+
+class TestProcessVideo:
+    """测试视频后处理"""
+
+    def test_stores_video_and_poster_side_by_side(self, memory_storage, poster):
+        """测试重排后的视频与封面按内容寻址并列存放"""
+        data, _ = make_mp4()
+        processed = process_video(data)
+
+        assert is_faststart(processed.video)
+        key = processed.url.removeprefix("/api/v1/assets/")
+        assert key.startswith("cas/") and key.endswith(".mp4")
+        assert memory_storage.get(key) == processed.video
+        assert memory_storage.head(key).content_type == "video/mp4"
+        assert processed.poster_url == processed.url.removesuffix(".mp4") + ".poster.jpg"
+        assert memory_storage.get(key.removesuffix(".mp4") + ".poster.jpg") == b"\xff\xd8poster"
+
+
+class TestVideoServicePostprocess:
+    """测试视频服务接入后处理"""
+
+    @pytest.fixture
+    def kling(self, monkeypatch):
+        provider = ProviderRegistry.get_video_provider("thirtytwo_kling")
+        monkeypatch.setattr(provider, "client", True)
+        provider.circuit_breaker.reset()
+        data, _ = make_mp4()
+        monkeypatch.setattr(provider, "generate", lambda prompt, **kwargs: data)
+        yield provider
+        provider.circuit_breaker.reset()
+
+    def test_url_format(self, kling, memory_storage, poster):
+        """测试 return_format=url 返回存储地址与封面地址"""
+        result = VideoService.generate("thirtytwo_kling", "clouds", return_format="url")
+        assert result["success"] is True
+        assert result["format"] == "url"
+        assert is_faststart(memory_storage.get(result["content"].removeprefix("/api/v1/assets/")))
+        assert result["poster"].endswith(".poster.jpg")
+
+    def test_base64_survives_storage_failure(self, kling, monkeypatch, poster):
+        """测试写入存储失败时 base64 格式仍返回（原始）视频"""
+        def fail(*args, **kwargs):
+            raise OSError("disk full")
+
+        backend = MemoryStorage()
+        monkeypatch.setattr(backend, "put", fail)
+        monkeypatch.setattr(media, "storage", backend)
+
+        result = VideoService.generate("thirtytwo_kling", "clouds")
+        assert result["success"] is True
+        assert result["content"]
+        assert result["poster"] is None
+
+        failed = VideoService.generate("thirtytwo_kling", "clouds", return_format="url")
+        assert failed["success"] is False
+        assert "disk full" in failed["error"]
+
+
+def fake_renditions(data, formats):
+    """以固定内容代替 Pillow 编码（1024x512 原图，preview 与 full 尺寸相同）"""
+    thumb = Rendition(256, 128, {fmt: f"thumb-{fmt}".encode() for fmt in formats})
+    full = Rendition(1024, 512, {fmt: f"full-{fmt}".encode() for fmt in formats})
+    return ImageRenditions(1024, 512, {"thumb": thumb, "preview": full, "full": full})
+
+
+@pytest.fixture
+def encoder(monkeypatch):
+    """记录编码调用次数"""
+    calls = []
+
+    def encode(data, formats):
+        calls.append(data)
+        return fake_renditions(data, formats)
+
+    monkeypatch.setattr(media, "encode_renditions", encode)
+    monkeypatch.setattr(media.config, "IMAGE_RENDITION_FORMATS", ["avif", "webp"])
+    return calls
+
+
+class TestProcessImage:
+    """测试图片派生版本"""
+
+    def test_stores_renditions_beside_original(self, memory_storage, encoder):
+        """测试原图与派生版本按内容寻址并列存放，清单记录各档尺寸与地址"""
+        processed = process_image(b"png-bytes")
+
+        key = processed.url.removeprefix("/api/v1/assets/")
+        stem = key.removesuffix(".png")
+        assert memory_storage.get(key) == b"png-bytes"
+        assert memory_storage.head(key).content_type == "image/png"
+
+        renditions = processed.renditions
+        assert (renditions["width"], renditions["height"]) == (1024, 512)
+        assert renditions["thumb"] == {
+            "width": 256,
+            "height": 128,
+            "avif": f"/api/v1/assets/{stem}.256x128.avif",
+            "webp": f"/api/v1/assets/{stem}.256x128.webp",
+        }
+        assert renditions["preview"] == renditions["full"]
+        assert memory_storage.get(f"{stem}.1024x512.avif") == b"full-avif"
+        assert memory_storage.head(f"{stem}.256x128.webp").content_type == "image/webp"
+        manifest = json.loads(memory_storage.get(f"{stem}.renditions.json"))
+        assert manifest["renditions"]["thumb"]["keys"]["webp"] == f"{stem}.256x128.webp"
+
+    def test_manifest_cache(self, memory_storage, encoder):
+        """测试同一内容再次处理时直接读取清单，不再编码"""
+        first = process_image(b"png-bytes")
+        second = process_image(b"png-bytes")
+        assert second == first
+        assert len(encoder) == 1
+
+    def test_without_encoder(self, memory_storage, monkeypatch):
+        """测试无法编码（未安装 Pillow）时只存原图"""
+        monkeypatch.setattr(media, "encode_renditions", lambda data, formats: None)
+        processed = process_image(b"png-bytes")
+        assert processed.renditions is None
+        assert memory_storage.get(processed.url.removeprefix("/api/v1/assets/")) == b"png-bytes"
+
+    def test_disabled(self, memory_storage, encoder, monkeypatch):
+        """测试 IMAGE_RENDITION_FORMATS 为空时不编码"""
+        monkeypatch.setattr(media.config, "IMAGE_RENDITION_FORMATS", [])
+        assert process_image(b"png-bytes").renditions is None
+        assert encoder == []
+
+
+class TestImageServiceRenditions:
+    """测试图片服务接入派生版本"""
+
+    @pytest.fixture
+    def nano_banana(self, monkeypatch):
+        provider = ProviderRegistry.get_image_provider("thirtytwo_nano_banana")
+        monkeypatch.setattr(provider, "client", True)
+        provider.circuit_breaker.reset()
+        outputs = iter([b"png-one", b"png-two"])
+        # 每次请求返回一张，多张时服务层按张调用 generate
+        monkeypatch.setattr(provider, "generate", lambda prompt, **kwargs: next(outputs))
+        yield provider
+        provider.circuit_breaker.reset()
+
+    def test_url_format(self, nano_banana, memory_storage, encoder):
+        """测试 return_format=url 返回原图地址与派生版本"""
+        result = ImageService.generate("thirtytwo_nano_banana", "cat", return_format="url")
+        assert result["success"] is True
+        assert memory_storage.get(result["content"].removeprefix("/api/v1/assets/")) == b"png-one"
+        assert result["renditions"]["thumb"]["webp"].endswith(".256x128.webp")
+
+    def test_multiple_images(self, nano_banana, memory_storage, encoder):
+        """测试多张图片时 renditions 与 content 一一对应"""
+        result = ImageService.generate("thirtytwo_nano_banana", "cat", num_images=2, return_format="url")
+        assert result["success"] is True
+        assert len(result["content"]) == 2
+        assert len(result["renditions"]) == 2
+        assert result["renditions"][0]["full"]["avif"] != result["renditions"][1]["full"]["avif"]
+
+    def test_base64_encodes_in_background(self, nano_banana, memory_storage, encoder):
+        """测试 base64 格式不等待编码，派生版本在后台写入，之后以 url 格式请求直接读取清单"""
+        result = ImageService.generate("thirtytwo_nano_banana", "cat")
+        assert result["success"] is True
+        assert result["renditions"] is None
+
+        deadline = time.monotonic() + 5
+        while process_image(b"png-one", wait=False).renditions is None:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+        assert process_image(b"png-one").renditions["thumb"]["webp"].endswith(".256x128.webp")
+        assert len(encoder) == 1
+
+    def test_base64_survives_storage_failure(self, nano_banana, monkeypatch, encoder):
+        """测试写入存储失败时 base64 格式仍返回原图"""
+        def fail(*args, **kwargs):
+            raise OSError("disk full")
+
+        backend = MemoryStorage()
+        monkeypatch.setattr(backend, "put", fail)
+        monkeypatch.setattr(media, "storage", backend)
+
+        result = ImageService.generate("thirtytwo_nano_banana", "cat")
+        assert result["success"] is True
+        assert result["renditions"] is None
+        assert ImageService.generate("thirtytwo_nano_banana", "cat", return_format="url")["success"] is False
+
+
+class TestTileCache:
+    """测试 Tile 缓存"""
+
+    def tile(self, nbytes):
+        return Tile(width=nbytes // 4, height=1, data=b"\0" * nbytes)
+
+    def test_lru_by_bytes(self):
+        """测试超出总字节数时淘汰最久未使用的条目"""
+        cache = TileCache(max_bytes=100)
+        cache.put("a", self.tile(40))
+        cache.put("b", self.tile(40))
+        assert cache.get("a") is not None
+        cache.put("c", self.tile(40))
+
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert cache.snapshot() == {"entries": 2, "bytes": 80, "max_bytes": 100, "hits": 2, "misses": 1}
+
+    def test_oversized_and_disabled(self):
+        """测试超过上限的条目不缓存，max_bytes=0 时不缓存"""
+        cache = TileCache(max_bytes=100)
+        cache.put("big", self.tile(200))
+        assert cache.get("big") is None
+        disabled = TileCache(max_bytes=0)
+        disabled.put("a", self.tile(4))
+        assert disabled.snapshot()["entries"] == 0
+
+
+class FakeStream:
+    """分块返回内容的 requests 响应"""
+
+    def __init__(self, chunks, headers=None, status_code=200):
+        self.chunks = chunks
+        self.headers = headers or {}
+        self.status_code = status_code
+        self.is_redirect = status_code in (301, 302, 303, 307, 308)
+        self.read = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        for chunk in self.chunks:
+            self.read += 1
+            yield chunk
+
+
+class TestFetchSource:
+    """测试源图读取"""
+
+    def test_asset_url_reads_storage(self, memory_storage, monkeypatch):
+        """测试本服务地址直接读对象存储，内容寻址的键不读取即可得到内容标识"""
+        monkeypatch.setattr(media, "_download_source", lambda url, max_bytes: pytest.fail("downloaded"))
+        key = "cas/ab/" + "ab" * 32 + ".png"
+        memory_storage.put(key, b"png", "image/png")
+
+        assert fetch_source(f"/api/v1/assets/{key}") == b"png"
+        assert source_digest(f"/api/v1/assets/{key}") == "ab" * 32
+        assert source_digest(f"/api/v1/assets/{key[:-4]}.256x128.webp") == "ab" * 32 + ".256x128"
+        assert source_digest("https://example.com/a.png") is None
+
+    def test_data_and_allowed_urls(self, monkeypatch):
+        """测试 data: 地址直接解码，允许列表中主机（含子域名条目）的地址经 HTTP 下载"""
+        monkeypatch.setattr(media.config, "SOURCE_ALLOWED_HOSTS", ["example.com", ".cdn.example.net"])
+        monkeypatch.setattr(media, "_download_source", lambda url, max_bytes: b"remote:" + url.encode())
+
+        assert fetch_source("data:image/png;base64," + base64.b64encode(b"inline").decode()) == b"inline"
+        assert fetch_source("https://example.com/a.png") == b"remote:https://example.com/a.png"
+        assert fetch_source("https://img.cdn.example.net/a.png") == b"remote:https://img.cdn.example.net/a.png"
+
+    def test_disallowed_urls_rejected(self, monkeypatch):
+        """测试其他主机、非 http(s) 地址不下载"""
+        monkeypatch.setattr(media.config, "SOURCE_ALLOWED_HOSTS", ["example.com"])
+        monkeypatch.setattr(media, "_download_source", lambda url, max_bytes: pytest.fail("downloaded"))
+
+        for url in (
+            "http://169.254.169.254/latest/meta-data",
+            "http://localhost:8000/api/v1/metrics",
+            "https://example.com.evil.io/a.png",
+            "file:///etc/passwd",
+        ):
+            with pytest.raises(ValueError, match="not allowed"):
+                fetch_source(url)
+
+    def test_data_url_size_cap(self, monkeypatch):
+        """测试 data: 内容超过 SOURCE_MAX_BYTES 时拒绝"""
+        monkeypatch.setattr(media.config, "SOURCE_MAX_BYTES", 8)
+        assert fetch_source("data:image/png;base64," + base64.b64encode(b"8 bytes!").decode()) == b"8 bytes!"
+        with pytest.raises(ValueError, match="exceeds"):
+            fetch_source("data:image/png;base64," + base64.b64encode(b"9 bytes!!").decode())
+        with pytest.raises(ValueError, match="exceeds"):
+            fetch_source("data:text/plain," + "x" * 9)
+
+    def test_download_streams_with_cap(self, monkeypatch):
+        """测试下载分块读取，超过上限立即中止；Content-Length 超限或重定向时不读取内容"""
+        import requests
+
+        monkeypatch.setattr(media.config, "SOURCE_ALLOWED_HOSTS", ["example.com"])
+        monkeypatch.setattr(media.config, "SOURCE_MAX_BYTES", 10)
+        responses = {}
+        calls = []
+
+        def get(url, **kwargs):
+            calls.append(kwargs)
+            return responses[url]
+
+        monkeypatch.setattr(requests, "get", get)
+        responses["https://example.com/ok"] = FakeStream([b"12345", b"67890"])
+        responses["https://example.com/big"] = big = FakeStream([b"123456", b"789012", b"345678"])
+        responses["https://example.com/declared"] = declared = FakeStream([b"1"], {"Content-Length": "11"})
+        responses["https://example.com/moved"] = moved = FakeStream([b"1"], status_code=302)
+
+        assert fetch_source("https://example.com/ok") == b"1234567890"
+        assert calls[0]["stream"] is True and calls[0]["allow_redirects"] is False
+
+        with pytest.raises(ValueError, match="exceeds"):
+            fetch_source("https://example.com/big")
+        assert big.read == 2
+        with pytest.raises(ValueError, match="exceeds"):
+            fetch_source("https://example.com/declared")
+        with pytest.raises(ValueError, match="redirects"):
+            fetch_source("https://example.com/moved")
+        assert declared.read == moved.read == 0
@@ -0,0 +1,146 @@
+"""搭配拼图测试
+
+测试取景与缩放、按源图哈希与尺寸复用 Tile、按请求缓存拼图与参数校验。
+合成测试需要 Pillow，未安装时跳过。
+"""
+
+import base64
+import io
+
+import pytest
+
+from src.backend.config import config
+from src.backend.services import media, outfit
+from src.backend.services.media import TileCache
+from src.backend.services.outfit import CollageItem, compose_collage, item_bounds
+from src.backend.storage import MemoryStorage, content_key
+
+BASE_URL = "https://canvas.example.com"
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    """可从外部访问（配置了 public_base_url）的内存存储，独立的 Tile 缓存"""
+    storage = MemoryStorage(public_base_url=BASE_URL, signing_secret="secret")
+    monkeypatch.setattr(outfit, "storage", storage)
+    monkeypatch.setattr(media, "storage", storage)
+    monkeypatch.setattr(media, "tile_cache", TileCache(64 * 1024 * 1024))
+    monkeypatch.setattr(config, "STORAGE_PUBLIC_BASE_URL", BASE_URL)
+    return storage
+
+
+@pytest.fixture
+def pil():
+    return pytest.importorskip("PIL.Image")
+
+
+@pytest.fixture
+def renders(monkeypatch):
+    """记录 render_tile 调用"""
+    calls = []
+    render_tile = media.render_tile
+
+    def render(data, width, height):
+        calls.append((width, height))
+        return render_tile(data, width, height)
+
+    monkeypatch.setattr(media, "render_tile", render)
+    return calls
+
+
+def png(pil, color, size=(200, 100)):
+    buffer = io.BytesIO()
+    pil.new("RGB", size, color).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def upload(storage, data):
+    key = content_key(data, "png")
+    storage.put(key, data, "image/png")
+    return f"{BASE_URL}/api/v1/assets/{key}"
+
+
+class TestItemBounds:
+    """测试旋转后的外接矩形"""
+
+    def test_rotation(self):
+        """测试旋转 90 度时宽高互换，中心不变"""
+        assert item_bounds(CollageItem("a", 0, 0, 100, 40)) == (0, 0, 100, 40)
+        left, top, right, bottom = item_bounds(CollageItem("a", 0, 0, 100, 40, rotation=90))
+        assert (round(left), round(top), round(right), round(bottom)) == (30, -30, 70, 70)
+
+
+class TestComposeCollage:
+    """测试拼图合成"""
+
+    def test_layout(self, backend, pil):
+        """测试按外接矩形取景、长边缩放到 size，结果可作为参考图"""
+        red, blue = upload(backend, png(pil, "red")), upload(backend, png(pil, "blue"))
+        items = [CollageItem(red, 0, 0, 200, 100), CollageItem(blue, 200, 100, 200, 100)]
+
+        collage = compose_collage(items, size=400)
+
+        assert (collage.width, collage.height) == (400, 200)
+        assert collage.key.startswith("tmp/collages/") and collage.key.endswith(".jpg")
+        assert collage.reference_url.startswith(f"{BASE_URL}/api/v1/assets/{collage.key}?expires=")
+        assert backend.head(collage.key).content_type == "image/jpeg"
+        image = pil.open(io.BytesIO(backend.get(collage.key))).convert("RGB")
+        assert image.getpixel((100, 50))[0] > 200
+        assert image.getpixel((300, 150))[2] > 200
+        assert min(image.getpixel((300, 50))) > 240
+
+    def test_tiles_reused_after_move(self, backend, pil, renders):
+        """测试只移动元素（显示尺寸不变）时复用缓存的 Tile，不再解码缩放"""
+        red, blue = upload(backend, png(pil, "red")), upload(backend, png(pil, "blue"))
+        first = compose_collage([CollageItem(red, 0, 0, 200, 100), CollageItem(blue, 0, 100, 200, 100)], size=200)
+        assert renders == [(200, 100), (200, 100)]
+
+        moved = compose_collage([CollageItem(red, 0, 100, 200, 100), CollageItem(blue, 0, 0, 200, 100)], size=200)
+
+        assert moved.key != first.key
+        assert len(renders) == 2
+
+    def test_same_request_cached(self, backend, pil, monkeypatch):
+        """测试相同单品与布局直接返回已有拼图"""
+        red = upload(backend, png(pil, "red"))
+        items = [CollageItem(red, 0, 0, 200, 100), CollageItem(red, 50, 50, 100, 50, rotation=30)]
+        first = compose_collage(items, fmt="png")
+        assert first.cached is False
+
+        monkeypatch.setattr(outfit, "compose", lambda *args: pytest.fail("compose called"))
+        second = compose_collage(items, fmt="png")
+
+        assert second.cached is True
+        assert second.key == first.key
+
+    def test_data_and_external_sources(self, backend, pil, monkeypatch):
+        """测试 data: 地址与外部地址按内容哈希"""
+        data = png(pil, "green")
+        monkeypatch.setattr(media, "_download_source", lambda url, max_bytes: data)
+        monkeypatch.setattr(config, "SOURCE_ALLOWED_HOSTS", ["example.com"])
+        data_url = "data:image/png;base64," + base64.b64encode(data).decode()
+        items = [CollageItem(data_url, 0, 0, 200, 100), CollageItem("https://example.com/a.png", 0, 100, 200, 100)]
+
+        collage = compose_collage(items, size=100)
+
+        assert (collage.width, collage.height) == (100, 100)
+
+    def test_undecodable_source(self, backend, pil):
+        """测试源图无法解码时抛出 ValueError"""
+        url = upload(backend, b"not an image")
+        with pytest.raises(ValueError, match="Cannot decode"):
+            compose_collage([CollageItem(url, 0, 0, 10, 10)])
+
+    def test_validation(self, backend):
+        """测试单品数量、尺寸与输出参数校验"""
+        item = CollageItem("https://example.com/a.png", 0, 0, 10, 10)
+        with pytest.raises(ValueError):
+            compose_collage([])
+        with pytest.raises(ValueError):
+            compose_collage([item] * (config.COLLAGE_MAX_ITEMS + 1))
+        with pytest.raises(ValueError):
+            compose_collage([item], size=config.COLLAGE_MAX_EDGE + 1)
+        with pytest.raises(ValueError):
+            compose_collage([item], fmt="gif")
+        with pytest.raises(ValueError):
+            compose_collage([CollageItem("https://example.com/a.png", 0, 0, 0, 10)])
@@ -283,3 +283,166 @@ class TestParamFiltering:
         assert "images" in filtered
         assert "mode" in filtered
         assert "wait_for_result" not in filtered
+
+
+class TestCircuitBreakerDispatch:
+    """测试熔断器接入服务调度"""
+
+    @pytest.fixture
+    def seedream(self, monkeypatch):
+        """配置为可用、熔断器已重置的 Seedream Provider"""
+        provider = ProviderRegistry.get_image_provider("thirtytwo_seedream")
+        monkeypatch.setattr(provider, "client", True)
+        provider.circuit_breaker.reset()
+        yield provider
+        provider.circuit_breaker.reset()
+
+    def test_failures_open_circuit(self, seedream, monkeypatch):
+        """测试连续失败后熔断，后续请求快速失败"""
+        calls = []
+
+        def failing_generate(prompt, **kwargs):
+            calls.append(prompt)
+            raise RuntimeError("HTTP error after 3 retries: 502 Bad Gateway")
+
+        monkeypatch.setattr(seedream, "generate", failing_generate)
+
+        threshold = seedream.circuit_breaker.consecutive_failures
+        for _ in range(threshold):
+            result = ImageService.generate("thirtytwo_seedream", "test")
+            assert result["success"] is False
+
+        result = ImageService.generate("thirtytwo_seedream", "test")
+        assert result["success"] is False
+        assert result["error_type"] == "circuit_open"
+        assert result["retry_after"] > 0
+        assert len(calls) == threshold
+
+        listed = next(
+            p for p in ProviderRegistry.list_image_providers() if p["vendor"] == "thirtytwo_seedream"
+        )
+        assert listed["available"] is False
+        assert listed["health"]["state"] == "open"
+        assert listed["health"]["score"] == 0.0
+
+    def test_validation_errors_do_not_count(self, seedream, monkeypatch):
+        """测试参数校验错误不计入厂商健康"""
+        def invalid_generate(prompt, **kwargs):
+            raise ValueError("Unsupported aspect_ratio")
+
+        monkeypatch.setattr(seedream, "generate", invalid_generate)
+
+        for _ in range(5):
+            ImageService.generate("thirtytwo_seedream", "test")
+        assert seedream.circuit_breaker.state == "closed"
+        assert seedream.circuit_breaker.snapshot()["calls"] == 0
+
+
+class TestMultiOutputImage:
+    """测试 num_images 多张输出"""
+
+    def test_num_images_returns_list(self, monkeypatch):
+        """测试 num_images > 1 时 content 为 base64 列表"""
+        provider = ProviderRegistry.get_image_provider("thirtytwo_seedream")
+        monkeypatch.setattr(provider, "client", True)
+        provider.circuit_breaker.reset()
+        monkeypatch.setattr(
+            provider, "generate_images", lambda prompt, num_images=1, **kwargs: [b"a"] * num_images
+        )
+
+        result = ImageService.generate("thirtytwo_seedream", "test", num_images=3)
+        assert result["success"] is True
+        assert result["content"] == ["YQ==", "YQ==", "YQ=="]
+
+    def test_single_output_vendor_takes_slot_per_image(self, monkeypatch):
+        """测试每次只返回一张的厂商按张调度，每张各计一次调用"""
+        from src.backend.services.metrics import metrics
+
+        provider = ProviderRegistry.get_image_provider("thirtytwo_nano_banana")
+        monkeypatch.setattr(provider, "client", True)
+        provider.circuit_breaker.reset()
+        monkeypatch.setattr(provider, "generate", lambda prompt, **kwargs: b"a")
+        monkeypatch.setattr(
+            provider, "generate_images", lambda *args, **kwargs: pytest.fail("generate_images should not be used")
+        )
+        before = metrics.get_counter("provider_calls", vendor="thirtytwo_nano_banana", outcome="success")
+
+        result = ImageService.generate("thirtytwo_nano_banana", "test", num_images=3)
+        assert result["content"] == ["YQ==", "YQ==", "YQ=="]
+        after = metrics.get_counter("provider_calls", vendor="thirtytwo_nano_banana", outcome="success")
+        assert after - before == 3
+        provider.circuit_breaker.reset()
+
+
+class TestCancellationDispatch:
+    """测试请求取消接入服务调度"""
+
+    def test_cancel_abandons_call_without_failing_vendor(self, monkeypatch):
+        """测试取消后立即返回 cancelled，且不计入厂商健康"""
+        import threading
+        import time
+
+        from src.backend.providers.context import RequestContext, use_context
+
+        provider = ProviderRegistry.get_image_provider("thirtytwo_seedream")
+        monkeypatch.setattr(provider, "client", True)
+        provider.circuit_breaker.reset()
+        release = threading.Event()
+
+        def slow_generate(prompt, **kwargs):
+            release.wait(5)
+            return b"late"
+
+        monkeypatch.setattr(provider, "generate", slow_generate)
+
+        ctx = RequestContext()
+        threading.Timer(0.05, ctx.cancel).start()
+        start = time.monotonic()
+        with use_context(ctx):
+            result = ImageService.generate("thirtytwo_seedream", "test")
+        release.set()
+
+        assert time.monotonic() - start < 1
+        assert result["success"] is False
+        assert result["error_type"] == "cancelled"
+        assert provider.circuit_breaker.snapshot()["calls"] == 0
+
+    def test_cancel_holds_slots_until_call_finishes(self, monkeypatch):
+        """测试被放弃的调用在线程结束前仍占用并发与排空登记"""
+        import threading
+        import time
+
+        from src.backend.providers.context import RequestContext, use_context
+        from src.backend.services.concurrency import adaptive_limiter_registry
+        from src.backend.services.drain import drain_controller
+
+        provider = ProviderRegistry.get_image_provider("thirtytwo_seedream")
+        monkeypatch.setattr(provider, "client", True)
+        provider.circuit_breaker.reset()
+        release = threading.Event()
+        finished = threading.Event()
+
+        def slow_generate(prompt, **kwargs):
+            release.wait(5)
+            finished.set()
+            return b"late"
+
+        monkeypatch.setattr(provider, "generate", slow_generate)
+        limiter = adaptive_limiter_registry.get("thirtytwo_seedream")
+
+        ctx = RequestContext()
+        threading.Timer(0.05, ctx.cancel).start()
+        with use_context(ctx):
+            result = ImageService.generate("thirtytwo_seedream", "test")
+
+        assert result["error_type"] == "cancelled"
+        assert limiter.inflight == 1
+        assert drain_controller.snapshot()["inflight"] == 1
+
+        release.set()
+        finished.wait(2)
+        deadline = time.monotonic() + 2
+        while limiter.inflight and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert limiter.inflight == 0
+        assert drain_controller.snapshot()["inflight"] == 0
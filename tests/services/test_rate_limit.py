@@ -0,0 +1,132 @@
+"""
+客户端限流测试
+
+测试 RateLimiter、RateLimiterRegistry 的令牌桶与并发槽位行为。
+"""
+
+import threading
+import time
+
+import pytest
+
+from src.backend.services.rate_limit import (
+    RateLimitExceeded,
+    RateLimiter,
+    RateLimiterRegistry,
+    RateLimitRule,
+)
+
+
+class FakeClock:
+    """可手动推进的时钟"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestRateLimiter:
+    """测试 RateLimiter"""
+
+    def test_token_bucket_allows_burst_then_rejects(self):
+        """测试令牌耗尽后立即拒绝并给出等待时间"""
+        clock = FakeClock()
+        limiter = RateLimiter(RateLimitRule(rpm=2), clock=clock)
+
+        limiter.acquire()
+        limiter.acquire()
+        with pytest.raises(RateLimitExceeded) as exc_info:
+            limiter.acquire()
+
+        # 2 RPM，补充 1 个令牌需要 30 秒
+        assert exc_info.value.retry_after == pytest.approx(30.0)
+
+    def test_token_bucket_refills_over_time(self):
+        """测试令牌随时间补充"""
+        clock = FakeClock()
+        limiter = RateLimiter(RateLimitRule(rpm=60), clock=clock)
+        for _ in range(60):
+            limiter.acquire()
+
+        clock.now += 1.0
+        limiter.acquire()
+        assert limiter.snapshot()["tokens"] == pytest.approx(0.0)
+
+    def test_token_wait_longer_than_timeout_rejects_without_waiting(self):
+        """测试令牌等待时间超过排队时间时直接拒绝"""
+        limiter = RateLimiter(RateLimitRule(rpm=1))
+        limiter.acquire()
+
+        start = time.monotonic()
+        with pytest.raises(RateLimitExceeded):
+            limiter.acquire(timeout=5.0)
+        assert time.monotonic() - start < 1.0
+
+    def test_concurrency_slots_queue_until_release(self):
+        """测试并发槽位占满时排队，释放后放行"""
+        limiter = RateLimiter(RateLimitRule(concurrency=1))
+        limiter.acquire()
+
+        acquired = threading.Event()
+
+        def worker():
+            limiter.acquire(timeout=2.0)
+            acquired.set()
+
+        thread = threading.Thread(target=worker)
+        thread.start()
+        time.sleep(0.05)
+        assert not acquired.is_set()
+        assert limiter.snapshot()["waiting"] == 1
+
+        limiter.release()
+        thread.join(timeout=2.0)
+        assert acquired.is_set()
+        assert limiter.snapshot()["inflight"] == 1
+
+    def test_concurrency_slots_reject_immediately(self):
+        """测试并发槽位占满且不排队时立即拒绝"""
+        limiter = RateLimiter(RateLimitRule(concurrency=1))
+        limiter.acquire()
+        with pytest.raises(RateLimitExceeded) as exc_info:
+            limiter.acquire()
+        assert exc_info.value.retry_after > 0
+
+
+class TestRateLimiterRegistry:
+    """测试 RateLimiterRegistry"""
+
+    def test_unconfigured_vendor_is_unlimited(self):
+        """测试未配置规则的厂商不限流"""
+        registry = RateLimiterRegistry({})
+        for _ in range(100):
+            with registry.acquire("unknown", "model", timeout=0):
+                pass
+        assert registry.get("unknown", "model") is None
+
+    def test_model_override_takes_precedence(self):
+        """测试模型级规则覆盖厂商规则"""
+        registry = RateLimiterRegistry(
+            {"vendor": {"rpm": 100, "concurrency": 10}},
+            {"vendor:slow-model": {"rpm": 1, "concurrency": 1}},
+        )
+        assert registry.get_rule("vendor", "slow-model") == RateLimitRule(rpm=1, concurrency=1)
+        assert registry.get_rule("vendor", "fast-model") == RateLimitRule(rpm=100, concurrency=10)
+
+    def test_acquire_releases_slot_and_tags_vendor(self):
+        """测试上下文管理器释放槽位，异常中携带厂商与模型"""
+        registry = RateLimiterRegistry({"vendor": {"rpm": 0, "concurrency": 1}})
+
+        with registry.acquire("vendor", "m", timeout=0):
+            with pytest.raises(RateLimitExceeded) as exc_info:
+                with registry.acquire("vendor", "m", timeout=0):
+                    pass
+        assert exc_info.value.vendor == "vendor"
+        assert exc_info.value.model == "m"
+
+        # 槽位已归还
+        with registry.acquire("vendor", "m", timeout=0):
+            pass
+        assert registry.snapshot()["vendor:m"]["inflight"] == 0
@@ -0,0 +1,180 @@
+"""参考图预处理测试
+
+测试参考图参数识别、并行拉取、缩小重编码、按原图哈希缓存与失败时保留原地址。
+缩小重编码的测试需要 Pillow，未安装时跳过。
+"""
+
+import io
+
+import pytest
+
+from src.backend.config import config
+from src.backend.providers.image import ThirtyTwoNanoBananaProvider, ThirtyTwoSeedreamProvider
+from src.backend.providers.video import ThirtyTwoKlingProvider
+from src.backend.services import media, references
+from src.backend.services.provider_service import ImageService, ProviderRegistry
+from src.backend.services.references import prepare_references
+from src.backend.storage import MemoryStorage, content_key
+
+BASE_URL = "https://canvas.example.com"
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    """可从外部访问（配置了 public_base_url）的内存存储"""
+    storage = MemoryStorage(public_base_url=BASE_URL, signing_secret="secret")
+    monkeypatch.setattr(references, "storage", storage)
+    monkeypatch.setattr(media, "storage", storage)
+    monkeypatch.setattr(config, "REFERENCE_PREPROCESS", True)
+    monkeypatch.setattr(config, "STORAGE_PUBLIC_BASE_URL", BASE_URL)
+    monkeypatch.setattr(config, "SOURCE_ALLOWED_HOSTS", ["example.com"])
+    return storage
+
+
+@pytest.fixture
+def encoder(monkeypatch):
+    """以固定内容代替 Pillow 重编码，记录调用"""
+    calls = []
+
+    def prepare(data, edge, quality):
+        calls.append((data, edge))
+        return b"small-" + data[:8], "jpg"
+
+    monkeypatch.setattr(references, "prepare_reference", prepare)
+    return calls
+
+
+class TestReferenceEdge:
+    """测试各厂商的参考图尺寸"""
+
+    def test_edges(self):
+        """测试按输出尺寸确定长边上限"""
+        assert ThirtyTwoNanoBananaProvider.reference_image_edge(resolution="4k") == 4096
+        assert ThirtyTwoNanoBananaProvider.reference_image_edge() == 2048
+        assert ThirtyTwoSeedreamProvider.reference_image_edge(aspect_ratio="21:9") == 3024
+        assert ThirtyTwoSeedreamProvider.reference_image_edge(size="2K") == 2048
+        assert ThirtyTwoKlingProvider.reference_image_edge() == 1920
+
+
+class TestPrepareReferences:
+    """测试参考图地址替换"""
+
+    def test_disabled(self, backend, encoder, monkeypatch):
+        """测试未开启时参数原样返回"""
+        monkeypatch.setattr(config, "REFERENCE_PREPROCESS", False)
+        params = {"images": ["https://example.com/a.jpg"]}
+        assert prepare_references(ThirtyTwoNanoBananaProvider, params) is params
+
+    def test_external_urls_in_parallel(self, backend, encoder, monkeypatch):
+        """测试外部地址并行下载，替换为签名地址并保持顺序"""
+        monkeypatch.setattr(media, "_download_source", lambda url, max_bytes: f"photo:{url}".encode())
+        params = {
+            "images": ["https://example.com/a.jpg", "https://example.com/b.jpg"],
+            "resolution": "1k",
+        }
+
+        result = prepare_references(ThirtyTwoNanoBananaProvider, params)
+
+        assert result["resolution"] == "1k"
+        assert params["images"] == ["https://example.com/a.jpg", "https://example.com/b.jpg"]
+        assert all(url.startswith(f"{BASE_URL}/api/v1/assets/tmp/refs/") for url in result["images"])
+        assert ".1024.jpg?expires=" in result["images"][0]
+        assert sorted(edge for _, edge in encoder) == [1024, 1024]
+        first_key = result["images"][0].removeprefix(f"{BASE_URL}/api/v1/assets/").split("?")[0]
+        assert backend.get(first_key) == b"small-photo:ht"
+
+    def test_single_url_keeps_type(self, backend, encoder, monkeypatch):
+        """测试单个地址（Seedream image 为字符串）替换后仍为字符串"""
+        monkeypatch.setattr(media, "_download_source", lambda url, max_bytes: b"photo")
+        result = prepare_references(ThirtyTwoSeedreamProvider, {"image": "https://example.com/a.jpg"})
+        assert isinstance(result["image"], str)
+        assert ".2048.jpg" in result["image"]
+
+    def test_cached_by_source_hash(self, backend, encoder, monkeypatch):
+        """测试同一内容的原图只编码一次；内容寻址的原图缓存命中时不再读取"""
+        source = b"uploaded-photo"
+        key = content_key(source, "jpg")
+        backend.put(key, source)
+        url = f"/api/v1/assets/{key}"
+
+        first = prepare_references(ThirtyTwoKlingProvider, {"images": [url]})
+        monkeypatch.setattr(backend, "get", lambda key: pytest.fail("source read on cache hit"))
+        second = prepare_references(ThirtyTwoKlingProvider, {"images": [url]})
+
+        assert len(encoder) == 1
+        assert first["images"][0].split("?")[0] == second["images"][0].split("?")[0]
+        assert ".1920.jpg" in first["images"][0]
+
+    def test_failures_keep_original(self, backend, encoder, monkeypatch):
+        """测试下载失败或无法解码时保留原地址"""
+        def fail(url, max_bytes):
+            raise OSError("connection reset")
+
+        monkeypatch.setattr(media, "_download_source", fail)
+        params = {"images": ["https://example.com/a.jpg"]}
+        assert prepare_references(ThirtyTwoNanoBananaProvider, params) == params
+
+        monkeypatch.setattr(media, "_download_source", lambda url, max_bytes: b"photo")
+        monkeypatch.setattr(references, "prepare_reference", lambda data, edge, quality: None)
+        assert prepare_references(ThirtyTwoNanoBananaProvider, params) == params
+
+    def test_disallowed_host_keeps_original(self, backend, encoder, monkeypatch):
+        """测试主机不在 SOURCE_ALLOWED_HOSTS 中时不下载，保留原地址"""
+        monkeypatch.setattr(media, "_download_source", lambda url, max_bytes: pytest.fail("downloaded"))
+        params = {"images": ["http://169.254.169.254/latest/meta-data"]}
+        assert prepare_references(ThirtyTwoNanoBananaProvider, params) == params
+        assert encoder == []
+
+    def test_unreachable_storage_keeps_original(self, encoder, monkeypatch):
+        """测试存储地址不可从外部访问（相对地址）时保留原地址"""
+        monkeypatch.setattr(references, "storage", MemoryStorage())
+        monkeypatch.setattr(config, "REFERENCE_PREPROCESS", True)
+        monkeypatch.setattr(config, "SOURCE_ALLOWED_HOSTS", ["example.com"])
+        monkeypatch.setattr(media, "_download_source", lambda url, max_bytes: b"photo")
+        params = {"images": ["https://example.com/a.jpg"]}
+        assert prepare_references(ThirtyTwoNanoBananaProvider, params) == params
+
+
+class TestImageServiceReferences:
+    """测试图片服务接入参考图预处理"""
+
+    def test_vendor_receives_prepared_urls(self, backend, encoder, monkeypatch):
+        """测试厂商收到的是预处理后的签名地址"""
+        provider = ProviderRegistry.get_image_provider("thirtytwo_nano_banana")
+        monkeypatch.setattr(provider, "client", True)
+        provider.circuit_breaker.reset()
+        received = {}
+
+        def generate(prompt, **kwargs):
+            received.update(kwargs)
+            return b"png"
+
+        monkeypatch.setattr(provider, "generate", generate)
+        monkeypatch.setattr(media, "_download_source", lambda url, max_bytes: b"photo")
+
+        result = ImageService.generate("thirtytwo_nano_banana", "cat", images=["https://example.com/a.jpg"])
+        provider.circuit_breaker.reset()
+
+        assert result["success"] is True
+        assert received["images"][0].startswith(f"{BASE_URL}/api/v1/assets/tmp/refs/")
+
+
+class TestPrepareReference:
+    """测试参考图缩小重编码"""
+
+    def test_downscale_and_strip_metadata(self):
+        """测试缩小到长边上限、去除 EXIF 并编码为 JPEG"""
+        Image = pytest.importorskip("PIL.Image")
+        from src.backend.media.image import prepare_reference
+
+        buffer = io.BytesIO()
+        exif = Image.Exif()
+        exif[0x010F] = "PhoneMaker"
+        Image.new("RGB", (4000, 3000), (10, 20, 30)).save(buffer, "JPEG", exif=exif)
+
+        data, ext = prepare_reference(buffer.getvalue(), 1024)
+
+        assert ext == "jpg"
+        with Image.open(io.BytesIO(data)) as image:
+            assert image.size == (1024, 768)
+            assert not image.getexif()
@@ -0,0 +1,183 @@
+"""
+跨厂商路由测试
+
+测试 ParamSpec 参数转换、Image 回退链与 vendor=auto 自动路由。
+"""
+
+import pytest
+
+from src.backend.providers.image.thirtytwo_nano_banana import ThirtyTwoNanoBananaProvider
+from src.backend.providers.image.thirtytwo_seedream import ThirtyTwoSeedreamProvider
+from src.backend.services.provider_service import ProviderRegistry
+from src.backend.services.routing import AutoRouter, ImageRoutingService, translate_params
+
+NANO = ThirtyTwoNanoBananaProvider.GENERATE_PARAMS
+SEEDREAM = ThirtyTwoSeedreamProvider.GENERATE_PARAMS
+
+
+@pytest.fixture
+def providers(monkeypatch):
+    """配置为可用、熔断器已重置的两个 Image Provider"""
+    nano = ProviderRegistry.get_image_provider("thirtytwo_nano_banana")
+    seedream = ProviderRegistry.get_image_provider("thirtytwo_seedream")
+    for provider in (nano, seedream):
+        monkeypatch.setattr(provider, "client", True)
+        provider.circuit_breaker.reset()
+    yield nano, seedream
+    for provider in (nano, seedream):
+        provider.circuit_breaker.reset()
+
+
+class TestTranslateParams:
+    """测试参数转换"""
+
+    def test_nano_to_seedream(self):
+        """测试 images → image，resolution 被丢弃"""
+        params = {"images": ["https://example.com/a.png"], "resolution": "4k", "aspect_ratio": "16:9"}
+        translated = translate_params(NANO, SEEDREAM, params)
+        assert translated == {"image": "https://example.com/a.png", "aspect_ratio": "16:9"}
+
+    def test_seedream_to_nano(self):
+        """测试 image → images，不支持的宽高比取最接近值"""
+        params = {"image": "https://example.com/a.png", "aspect_ratio": "21:9"}
+        translated = translate_params(SEEDREAM, NANO, params)
+        assert translated == {"images": ["https://example.com/a.png"], "aspect_ratio": "16:9"}
+
+    def test_multiple_reference_images_kept_as_list(self):
+        """测试多张参考图保持列表形式"""
+        urls = ["https://example.com/a.png", "https://example.com/b.png"]
+        translated = translate_params(NANO, SEEDREAM, {"images": urls})
+        assert translated == {"image": urls}
+
+
+class TestImageFailover:
+    """测试 Image 回退链"""
+
+    def test_fails_over_with_translated_params(self, providers, monkeypatch):
+        """测试主厂商失败后由回退厂商服务，参数按 ParamSpec 转换"""
+        nano, seedream = providers
+        received = {}
+
+        def failing_generate(prompt, **kwargs):
+            raise RuntimeError("Request timeout")
+
+        def seedream_generate(prompt, **kwargs):
+            received.update(kwargs)
+            return b"image"
+
+        monkeypatch.setattr(nano, "generate", failing_generate)
+        monkeypatch.setattr(seedream, "generate", seedream_generate)
+
+        result = ImageRoutingService.generate(
+            "thirtytwo_nano_banana",
+            "test",
+            fallback_vendors=["thirtytwo_seedream"],
+            images=["https://example.com/a.png"],
+            resolution="2k",
+            aspect_ratio="3:4",
+        )
+
+        assert result["success"] is True
+        assert result["vendor"] == "thirtytwo_seedream"
+        assert result["requested_vendor"] == "thirtytwo_nano_banana"
+        assert [a["vendor"] for a in result["attempts"]] == [
+            "thirtytwo_nano_banana",
+            "thirtytwo_seedream",
+        ]
+        assert result["attempts"][0]["success"] is False
+        assert received == {"image": "https://example.com/a.png", "aspect_ratio": "3:4"}
+
+    def test_primary_success_skips_fallback(self, providers, monkeypatch):
+        """测试主厂商成功时不调用回退厂商"""
+        nano, seedream = providers
+        monkeypatch.setattr(nano, "generate", lambda prompt, **kwargs: b"image")
+
+        def unexpected(prompt, **kwargs):
+            raise AssertionError("fallback vendor should not be called")
+
+        monkeypatch.setattr(seedream, "generate", unexpected)
+
+        result = ImageRoutingService.generate(
+            "thirtytwo_nano_banana", "test", fallback_vendors=["thirtytwo_seedream"]
+        )
+        assert result["success"] is True
+        assert result["vendor"] == "thirtytwo_nano_banana"
+        assert len(result["attempts"]) == 1
+
+    def test_empty_fallback_list_disables_failover(self, providers, monkeypatch):
+        """测试 fallback_vendors=[] 时不回退"""
+        nano, _ = providers
+        monkeypatch.setattr(
+            nano, "generate", lambda prompt, **kwargs: (_ for _ in ()).throw(RuntimeError("boom"))
+        )
+
+        result = ImageRoutingService.generate("thirtytwo_nano_banana", "test", fallback_vendors=[])
+        assert result["success"] is False
+        assert "attempts" not in result
+
+
+class TestAutoRouter:
+    """测试 vendor=auto 自动路由"""
+
+    def test_nano_cost_depends_on_resolution(self):
+        """测试 nano-banana 按分辨率计价"""
+        assert ThirtyTwoNanoBananaProvider.estimate_cost(resolution="2k") == 0.08
+        assert ThirtyTwoNanoBananaProvider.estimate_cost(resolution="4K") == 0.16
+
+    def test_prefers_cheaper_vendor_when_equally_healthy(self, providers):
+        """测试健康状况相同时选择更便宜的厂商"""
+        decision = AutoRouter.select("image", {"aspect_ratio": "16:9"})
+        assert decision.vendor == "thirtytwo_seedream"
+        assert decision.ranked_vendors == ["thirtytwo_seedream", "thirtytwo_nano_banana"]
+
+    def test_requested_params_constrain_candidates(self, providers):
+        """测试只考虑能满足请求参数的厂商"""
+        decision = AutoRouter.select("image", {"resolution": "4k"})
+        assert decision.vendor == "thirtytwo_nano_banana"
+        assert decision.params == {"resolution": "4k"}
+        rejected = next(c for c in decision.candidates if c["vendor"] == "thirtytwo_seedream")
+        assert rejected["eligible"] is False
+
+        decision = AutoRouter.select("image", {"aspect_ratio": "21:9"})
+        assert decision.ranked_vendors == ["thirtytwo_seedream"]
+
+    def test_vendor_param_names_are_translated(self, providers):
+        """测试使用任一厂商的参数名均可路由"""
+        decision = AutoRouter.select("image", {"images": ["https://example.com/a.png"]})
+        assert decision.vendor == "thirtytwo_seedream"
+        assert decision.params == {"image": "https://example.com/a.png"}
+
+    def test_error_rate_outweighs_cost(self, providers):
+        """测试错误率高的厂商排名下降"""
+        _, seedream = providers
+        seedream.circuit_breaker.record_failure(1.0)
+        seedream.circuit_breaker.record_failure(1.0)
+        seedream.circuit_breaker.record_success(1.0)
+
+        decision = AutoRouter.select("image", {})
+        assert decision.vendor == "thirtytwo_nano_banana"
+
+    def test_no_eligible_vendor(self, providers):
+        """测试没有厂商满足参数时返回 None"""
+        assert AutoRouter.select("image", {"resolution": "8k"}) is None
+        assert AutoRouter.resolve("image", "thirtytwo_seedream", {"x": 1}) == (
+            "thirtytwo_seedream",
+            {"x": 1},
+        )
+
+    def test_auto_image_generation(self, providers, monkeypatch):
+        """测试 auto 生成由选中的厂商服务，失败时回退到其余候选"""
+        nano, seedream = providers
+        monkeypatch.setattr(
+            seedream, "generate", lambda prompt, **kwargs: (_ for _ in ()).throw(RuntimeError("boom"))
+        )
+        monkeypatch.setattr(nano, "generate", lambda prompt, **kwargs: b"image")
+
+        result = ImageRoutingService.generate("auto", "test", aspect_ratio="16:9")
+        assert result["success"] is True
+        assert result["requested_vendor"] == "auto"
+        assert result["vendor"] == "thirtytwo_nano_banana"
+        assert [a["vendor"] for a in result["attempts"]] == [
+            "thirtytwo_seedream",
+            "thirtytwo_nano_banana",
+        ]
@@ -0,0 +1,166 @@
+"""
+优先级调度测试
+
+测试优先级权重、租户公平、防饿死老化、交互预留与排队时间指标。
+"""
+
+import threading
+import time
+
+import pytest
+
+from src.backend.services.metrics import metrics
+from src.backend.services.rate_limit import RateLimitExceeded
+from src.backend.services.scheduler import (
+    PRIORITY_BACKGROUND,
+    PRIORITY_BATCH,
+    PRIORITY_INTERACTIVE,
+    FairScheduler,
+    SchedulerRegistry,
+)
+
+WEIGHTS = {PRIORITY_INTERACTIVE: 8.0, PRIORITY_BATCH: 2.0, PRIORITY_BACKGROUND: 1.0}
+
+
+class FakeClock:
+    """可手动推进的时钟"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_scheduler(capacity: int = 1, aging_seconds: float = 0, reserve: int = 0, clock=time.monotonic):
+    return FairScheduler(
+        capacity=lambda: capacity,
+        weights=WEIGHTS,
+        aging_seconds=aging_seconds,
+        interactive_reserve=reserve,
+        clock=clock,
+    )
+
+
+def grant_order(scheduler: FairScheduler, requests: list[tuple[str, str, str]]) -> list[str]:
+    """占满唯一槽位后按顺序排队 requests，释放槽位后返回各请求获得槽位的顺序
+
+    Args:
+        scheduler: 容量为 1 的调度器
+        requests: (名称, 优先级, 租户) 列表
+    """
+    scheduler.acquire(PRIORITY_INTERACTIVE, "holder", timeout=0)
+    order: list[str] = []
+
+    def worker(name: str, priority: str, tenant: str) -> None:
+        scheduler.acquire(priority, tenant, timeout=10)
+        order.append(name)
+        scheduler.release()
+
+    threads = []
+    for i, (name, priority, tenant) in enumerate(requests):
+        thread = threading.Thread(target=worker, args=(name, priority, tenant))
+        thread.start()
+        threads.append(thread)
+        while sum(scheduler.snapshot()["queued"].values()) < i + 1:
+            time.sleep(0.001)
+
+    scheduler.release()
+    for thread in threads:
+        thread.join(timeout=5)
+    return order
+
+
+class TestFairScheduler:
+    """测试加权公平队列"""
+
+    def test_acquire_without_contention(self):
+        """测试有空闲槽位时立即放行"""
+        scheduler = make_scheduler(capacity=2)
+        assert scheduler.acquire(PRIORITY_BATCH, "u1", timeout=0) == pytest.approx(0.0, abs=0.01)
+        assert scheduler.snapshot()["inflight"] == 1
+        scheduler.release()
+        assert scheduler.snapshot()["inflight"] == 0
+
+    def test_interactive_served_before_batch(self):
+        """测试交互请求越过先排队的批量请求"""
+        order = grant_order(make_scheduler(), [
+            ("batch-1", PRIORITY_BATCH, "u1"),
+            ("batch-2", PRIORITY_BATCH, "u1"),
+            ("interactive", PRIORITY_INTERACTIVE, "u2"),
+        ])
+        assert order[0] == "interactive"
+
+    def test_tenants_share_fairly(self):
+        """测试同一类别内不同租户轮流获得服务"""
+        order = grant_order(make_scheduler(), [
+            ("a-1", PRIORITY_BATCH, "a"),
+            ("a-2", PRIORITY_BATCH, "a"),
+            ("a-3", PRIORITY_BATCH, "a"),
+            ("b-1", PRIORITY_BATCH, "b"),
+        ])
+        assert order.index("b-1") < order.index("a-3")
+
+    def test_aging_prevents_starvation(self):
+        """测试排队足够久的后台请求先于新到的交互请求"""
+        clock = FakeClock()
+        scheduler = make_scheduler(aging_seconds=1, clock=clock)
+        scheduler.acquire(PRIORITY_INTERACTIVE, "holder", timeout=0)
+        order: list[str] = []
+
+        def worker(name: str, priority: str) -> None:
+            scheduler.acquire(priority, name, timeout=1000)
+            order.append(name)
+            scheduler.release()
+
+        old = threading.Thread(target=worker, args=("background", PRIORITY_BACKGROUND))
+        old.start()
+        while scheduler.snapshot()["queued"][PRIORITY_BACKGROUND] < 1:
+            time.sleep(0.001)
+        clock.now = 100.0
+        new = threading.Thread(target=worker, args=("interactive", PRIORITY_INTERACTIVE))
+        new.start()
+        while scheduler.snapshot()["queued"][PRIORITY_INTERACTIVE] < 1:
+            time.sleep(0.001)
+
+        scheduler.release()
+        old.join(timeout=5)
+        new.join(timeout=5)
+        assert order == ["background", "interactive"]
+
+    def test_reserve_kept_for_interactive(self):
+        """测试批量请求不能占用交互预留槽位"""
+        scheduler = make_scheduler(capacity=2, reserve=1)
+        scheduler.acquire(PRIORITY_BATCH, "u1", timeout=0)
+        with pytest.raises(RateLimitExceeded):
+            scheduler.acquire(PRIORITY_BATCH, "u2", timeout=0)
+        scheduler.acquire(PRIORITY_INTERACTIVE, "u3", timeout=0)
+        assert scheduler.snapshot()["inflight"] == 2
+        assert scheduler.snapshot()["queued"][PRIORITY_BATCH] == 0
+
+
+class TestSchedulerRegistry:
+    """测试调度器注册表"""
+
+    def test_queue_wait_metric(self):
+        """测试按优先级导出排队时间"""
+        registry = SchedulerRegistry(WEIGHTS, aging_seconds=30, interactive_reserve=0, capacity_of=lambda v: 1)
+        with registry.acquire("test_scheduler_vendor", PRIORITY_BACKGROUND, None, timeout=1):
+            pass
+
+        summaries = [
+            s for s in metrics.snapshot()["summaries"]
+            if s["name"] == "scheduler_queue_wait_seconds" and s["labels"] == {"priority": PRIORITY_BACKGROUND}
+        ]
+        assert summaries and summaries[0]["count"] >= 1
+        assert registry.snapshot()["test_scheduler_vendor"]["inflight"] == 0
+
+    def test_timeout_names_vendor(self):
+        """测试排队超时抛出带厂商名的 RateLimitExceeded"""
+        registry = SchedulerRegistry(WEIGHTS, aging_seconds=30, interactive_reserve=0, capacity_of=lambda v: 1)
+        with registry.acquire("busy_vendor", PRIORITY_INTERACTIVE, None, timeout=0):
+            with pytest.raises(RateLimitExceeded) as exc_info:
+                with registry.acquire("busy_vendor", PRIORITY_BATCH, None, timeout=0):
+                    pass
+        assert exc_info.value.vendor == "busy_vendor"
+        assert exc_info.value.retry_after > 0
@@ -0,0 +1,165 @@
+"""对象存储后端测试
+
+local 与 memory 后端共用同一组契约测试（put / get / stream / head / delete / presign），
+oss 后端以假 bucket 验证键映射与地址生成。
+"""
+
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlparse
+
+import oss2
+import pytest
+
+from src.backend.storage import LocalStorage, MemoryStorage, ObjectNotFound, create_storage, normalize_key
+from src.backend.storage.oss import OSSStorage
+
+
+@pytest.fixture(params=["local", "memory"])
+def backend(request, tmp_path):
+    if request.param == "local":
+        return LocalStorage(str(tmp_path), "https://muse.example.com", "secret")
+    return MemoryStorage("https://muse.example.com", "secret")
+
+
+class TestStorageContract:
+    """测试存储后端契约"""
+
+    def test_put_get_head_delete(self, backend):
+        """测试写入、读取、元数据与删除"""
+        info = backend.put("upload/a.png", b"hello world")
+        assert info.key == "upload/a.png"
+        assert info.size == 11
+        assert info.content_type == "image/png"
+
+        assert backend.get("upload/a.png") == b"hello world"
+        assert backend.head("upload/a.png").etag == info.etag
+
+        backend.delete("upload/a.png")
+        backend.delete("upload/a.png")
+        assert backend.head("upload/a.png") is None
+        with pytest.raises(ObjectNotFound):
+            backend.get("upload/a.png")
+
+    def test_overwrite_changes_etag(self, backend):
+        """测试覆盖写入后内容与 etag 更新"""
+        first = backend.put("a.bin", b"one")
+        second = backend.put("a.bin", b"second")
+        assert backend.get("a.bin") == b"second"
+        assert first.etag != second.etag
+
+    def test_stream_range(self, backend):
+        """测试分块读取与闭区间字节范围"""
+        data = bytes(range(256)) * 4
+        backend.put("range.bin", data)
+
+        assert b"".join(backend.stream("range.bin", chunk_size=100)) == data
+        assert b"".join(backend.stream("range.bin", start=10, end=19, chunk_size=3)) == data[10:20]
+        assert b"".join(backend.stream("range.bin", start=1000)) == data[1000:]
+        with pytest.raises(ObjectNotFound):
+            backend.stream("missing.bin")
+
+    def test_presign_verify(self, backend):
+        """测试 presign 地址可通过校验，篡改、过期或换键后失败"""
+        url = urlparse(backend.presign("upload/a b.png", expires=60))
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        assert url.path == "/api/v1/assets/upload/a%20b.png"
+
+        expires = int(query["expires"])
+        assert backend.verify("upload/a b.png", expires, query["signature"])
+        assert not backend.verify("upload/other.png", expires, query["signature"])
+        assert not backend.verify("upload/a b.png", expires + 1, query["signature"])
+        assert not backend.verify("upload/a b.png", 0, backend._signature("upload/a b.png", 0))
+
+    def test_rejects_traversal(self, backend):
+        """测试拒绝越出根目录的键"""
+        for key in ("", "/etc/passwd", "../secret", "a/../../secret"):
+            with pytest.raises(ValueError):
+                backend.put(key, b"x")
+
+
+class TestLocalStorage:
+    """测试本地磁盘后端"""
+
+    def test_local_path(self, tmp_path):
+        """测试 local_path 指向磁盘文件，不存在时为 None"""
+        backend = LocalStorage(str(tmp_path))
+        backend.put("dir/a.txt", b"x")
+        assert backend.local_path("dir/a.txt") == str(tmp_path / "dir" / "a.txt")
+        assert backend.local_path("dir/b.txt") is None
+        assert backend.url("dir/a.txt") == "/api/v1/assets/dir/a.txt"
+
+
+def test_normalize_key():
+    """测试键规范化"""
+    assert normalize_key("a//b/./c.png") == "a/b/c.png"
+    assert normalize_key("a\\b.png") == "a/b.png"
+
+
+class FakeBucket:
+    """记录调用的假 OSS bucket"""
+
+    def __init__(self):
+        self.objects: dict[str, bytes] = {}
+
+    def put_object(self, key, data, headers=None):
+        self.objects[key] = data
+        return SimpleNamespace(etag='"ETAG"')
+
+    def get_object(self, key, byte_range=None):
+        if key not in self.objects:
+            raise oss2.exceptions.NoSuchKey(404, {}, "", {})
+        data = self.objects[key]
+        if byte_range is not None:
+            start, end = byte_range
+            data = data[start:None if end is None else end + 1]
+        chunks = iter([data, b""])
+        return SimpleNamespace(read=lambda size: next(chunks))
+
+    def head_object(self, key):
+        if key not in self.objects:
+            raise oss2.exceptions.NotFound(404, {}, "", {})
+        return SimpleNamespace(content_length=len(self.objects[key]), etag='"ETAG"', content_type="image/png", last_modified=1)
+
+    def delete_object(self, key):
+        self.objects.pop(key, None)
+
+    def sign_url(self, method, key, expires, slash_safe=False):
+        return f"https://bucket.oss.example.com/{key}?Expires={expires}"
+
+
+class TestOSSStorage:
+    """测试 OSS 后端的键映射"""
+
+    def make_storage(self, display_host="https://cdn.example.com"):
+        client = SimpleNamespace(bucket=FakeBucket(), display_host=display_host, remote_dir="upload")
+        return OSSStorage(client)
+
+    def test_keys_prefixed_with_remote_dir(self):
+        """测试对象键映射到 remote_dir 下，读写与元数据一致"""
+        backend = self.make_storage()
+        assert backend.put("a.png", b"0123456789").etag == "ETAG"
+        assert "upload/a.png" in backend.client.bucket.objects
+        assert backend.get("a.png") == b"0123456789"
+        assert b"".join(backend.stream("a.png", start=2, end=4)) == b"234"
+        assert backend.head("a.png").size == 10
+        assert backend.head("b.png") is None
+        with pytest.raises(ObjectNotFound):
+            backend.get("b.png")
+
+    def test_url(self):
+        """测试有 display_host 时返回公开地址，否则返回签名地址"""
+        assert self.make_storage().url("a.png") == "https://cdn.example.com/upload/a.png"
+        assert self.make_storage("").url("a.png").startswith("https://bucket.oss.example.com/upload/a.png?")
+
+
+def test_create_storage(monkeypatch):
+    """测试按名称创建后端，未知名称与缺少 OSS 配置时报错"""
+    from src.backend import utils
+
+    monkeypatch.setattr(utils, "DEFAULT_OSS_CONFIG", "{}")
+    assert isinstance(create_storage("memory"), MemoryStorage)
+    assert isinstance(create_storage("auto"), LocalStorage)
+    with pytest.raises(ValueError):
+        create_storage("oss")
+    with pytest.raises(ValueError):
+        create_storage("s3")
@@ -0,0 +1,213 @@
+"""分层存储测试
+
+以 memory 后端作为源站，测试读穿回填、LRU 淘汰、回写、校验与重启后重建索引。
+"""
+
+import hashlib
+import os
+import threading
+
+import pytest
+
+from src.backend.storage import MemoryStorage, ObjectNotFound, TieredStorage
+
+
+class CountingOrigin(MemoryStorage):
+    """记录读取次数、可控制写入失败与阻塞的源站"""
+
+    name = "origin"
+
+    def __init__(self):
+        super().__init__()
+        self.reads = 0
+        self.fail_puts = 0
+        self.put_gate = threading.Event()
+        self.put_gate.set()
+
+    def stream(self, key, start=0, end=None, chunk_size=1024 * 1024):
+        self.reads += 1
+        return super().stream(key, start, end, chunk_size)
+
+    def put(self, key, data, content_type=None):
+        self.put_gate.wait(5)
+        if self.fail_puts:
+            self.fail_puts -= 1
+            raise OSError("origin unavailable")
+        return super().put(key, data, content_type)
+
+
+def make_tiered(tmp_path, origin=None, max_bytes=100, write_back=True):
+    return TieredStorage(
+        origin or CountingOrigin(),
+        str(tmp_path / "cache"),
+        max_bytes,
+        write_back=write_back,
+        public_base_url="https://muse.example.com",
+        signing_secret="secret",
+        retry_delays=(0.0,),
+    )
+
+
+class TestReadThrough:
+    """测试读穿缓存"""
+
+    def test_fill_then_hit(self, tmp_path):
+        """测试首次读取从源站回填，之后从本地磁盘读取"""
+        origin = CountingOrigin()
+        origin.put("a.png", b"x" * 10)
+        tiered = make_tiered(tmp_path, origin)
+
+        path = tiered.local_path("a.png")
+        assert path == str(tmp_path / "cache" / "objects" / "a.png")
+        assert tiered.get("a.png") == b"x" * 10
+        assert b"".join(tiered.stream("a.png", start=2, end=3)) == b"xx"
+        assert origin.reads == 1
+        assert tiered.snapshot()["fills"] == 1
+        assert tiered.snapshot()["hits"] == 2
+
+    def test_range_miss_forwards_and_fills_in_background(self, tmp_path):
+        """测试 Range 读取未命中时转发源站区间，后台回填"""
+        origin = CountingOrigin()
+        origin.put("v.mp4", bytes(range(50)))
+        tiered = make_tiered(tmp_path, origin)
+
+        assert b"".join(tiered.stream("v.mp4", start=10, end=14)) == bytes(range(10, 15))
+        assert tiered.flush(5)
+        assert tiered.head("v.mp4").etag == hashlib.sha256(bytes(range(50))).hexdigest()
+
+    def test_missing_and_oversized(self, tmp_path):
+        """测试源站不存在时抛出 ObjectNotFound，超过上限的对象不缓存"""
+        origin = CountingOrigin()
+        origin.put("big.bin", b"x" * 200)
+        tiered = make_tiered(tmp_path, origin)
+
+        with pytest.raises(ObjectNotFound):
+            tiered.local_path("missing.bin")
+        assert tiered.local_path("big.bin") is None
+        assert tiered.get("big.bin") == b"x" * 200
+        assert tiered.snapshot()["entries"] == 0
+
+    def test_fill_rejects_md5_mismatch(self, tmp_path):
+        """测试源站内容与 MD5 ETag 不符时不缓存"""
+        origin = CountingOrigin()
+        origin.put("a.png", b"abc")
+        data, info = origin._objects["a.png"]
+        origin._objects["a.png"] = (b"abd", info)
+        tiered = make_tiered(tmp_path, origin)
+
+        assert tiered.local_path("a.png") is None
+        assert tiered.snapshot()["checksum_failures"] == 1
+
+
+class TestEviction:
+    """测试 LRU 淘汰"""
+
+    def test_evicts_least_recently_used(self, tmp_path):
+        """测试超出容量时淘汰最久未访问的对象"""
+        origin = CountingOrigin()
+        for name in ("a", "b", "c"):
+            origin.put(name, name.encode() * 40)
+        tiered = make_tiered(tmp_path, origin)
+
+        tiered.local_path("a")
+        tiered.local_path("b")
+        tiered.local_path("a")
+        tiered.local_path("c")
+
+        snapshot = tiered.snapshot()
+        assert snapshot["entries"] == 2
+        assert snapshot["bytes"] == 80
+        assert snapshot["evictions"] == 1
+        assert not os.path.exists(tmp_path / "cache" / "objects" / "b")
+
+    def test_dirty_objects_not_evicted(self, tmp_path):
+        """测试未写回源站的对象不被淘汰"""
+        origin = CountingOrigin()
+        origin.put_gate.clear()
+        tiered = make_tiered(tmp_path, origin)
+
+        tiered.put("a", b"a" * 60)
+        tiered.put("b", b"b" * 60)
+        assert tiered.snapshot()["entries"] == 2
+
+        origin.put_gate.set()
+        assert tiered.flush(5)
+        assert tiered.snapshot()["entries"] == 1
+        assert origin.get("a") == b"a" * 60
+
+
+class TestWriteBack:
+    """测试回写与写穿"""
+
+    def test_write_back_uploads_in_background(self, tmp_path):
+        """测试回写模式下写入立即可读，后台上传源站"""
+        origin = CountingOrigin()
+        origin.put_gate.clear()
+        tiered = make_tiered(tmp_path, origin)
+
+        info = tiered.put("a.png", b"hello")
+        assert info.etag == hashlib.sha256(b"hello").hexdigest()
+        assert tiered.get("a.png") == b"hello"
+        assert origin.head("a.png") is None
+        assert tiered.snapshot()["dirty"] == 1
+
+        origin.put_gate.set()
+        assert tiered.flush(5)
+        assert origin.get("a.png") == b"hello"
+        assert tiered.snapshot()["dirty"] == 0
+
+    def test_write_through_without_public_url(self, tmp_path):
+        """测试未配置对外地址时强制写穿，地址指向源站"""
+        origin = CountingOrigin()
+        tiered = TieredStorage(origin, str(tmp_path / "cache"), 100, write_back=True)
+
+        tiered.put("a.png", b"hello")
+        assert origin.get("a.png") == b"hello"
+        assert tiered.url("a.png") == origin.url("a.png")
+
+    def test_failed_write_back_resumes_after_restart(self, tmp_path):
+        """测试回写失败的对象保留在缓存，重启后继续上传"""
+        origin = CountingOrigin()
+        origin.fail_puts = 2
+        tiered = make_tiered(tmp_path, origin)
+        tiered.put("a.png", b"hello")
+        assert tiered.flush(5)
+        assert tiered.snapshot()["write_back_failures"] == 1
+
+        restarted = make_tiered(tmp_path, origin)
+        assert restarted.flush(5)
+        assert origin.get("a.png") == b"hello"
+        assert restarted.snapshot()["write_backs"] == 1
+
+    def test_delete_removes_both_tiers(self, tmp_path):
+        """测试删除同时移除缓存与源站"""
+        origin = CountingOrigin()
+        tiered = make_tiered(tmp_path, origin, write_back=False)
+        tiered.put("a.png", b"hello")
+        tiered.delete("a.png")
+        assert tiered.head("a.png") is None
+        assert origin.head("a.png") is None
+
+
+class TestRestart:
+    """测试重启后重建索引"""
+
+    def test_reload_and_verify(self, tmp_path):
+        """测试重启后命中已有缓存，首次读取校验 SHA-256，损坏时重新回填"""
+        origin = CountingOrigin()
+        origin.put("a.png", b"hello")
+        origin.put("b.png", b"world")
+        tiered = make_tiered(tmp_path, origin)
+        tiered.local_path("a.png")
+        tiered.local_path("b.png")
+
+        (tmp_path / "cache" / "objects" / "b.png").write_bytes(b"WORLD")
+        restarted = make_tiered(tmp_path, origin)
+        assert restarted.snapshot()["entries"] == 2
+
+        reads = origin.reads
+        assert restarted.get("a.png") == b"hello"
+        assert origin.reads == reads
+        assert restarted.get("b.png") == b"world"
+        assert origin.reads == reads + 1
+        assert restarted.snapshot()["checksum_failures"] == 1